@@ -0,0 +1,125 @@
+from memory_store import matches, project
+from bson import json_util
+from datetime import datetime, UTC
+from typing import Iterator, List, Optional
+import os
+
+try:
+    import zstandard as zstd
+except ImportError:  # compression optionnelle
+    zstd = None
+
+# Archives locales des documents sortis de la fenêtre "chaude":
+#   {ARCHIVE_DIR}/{collection}/{AAAA-MM}/{horodatage}.jsonl.zst
+# Une partition par mois de scraped_at; un fichier par lot archivé.
+# Chaque ligne est un document en Extended JSON (types BSON conservés).
+ARCHIVE_EXTENSION = ".jsonl.zst"
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS.with_options(tz_aware=True, tzinfo=UTC)  # dates UTC, comme à l'écriture
+OLDEST = datetime.min.replace(tzinfo=UTC)  # documents sans scraped_at: en dernier
+
+def get_archive_dir() -> str:
+    return os.getenv("ARCHIVE_DIR", "archives")
+
+def _require_zstd():
+    if zstd is None:
+        raise RuntimeError("zstandard is required to read or write archives")
+
+def partition_name(date: Optional[datetime]) -> str:
+    """Partition mensuelle d'un document (AAAA-MM)"""
+    return (date or datetime.now(UTC)).strftime("%Y-%m")
+
+def _partition_dir(collection_name: str, partition: str) -> str:
+    return os.path.join(get_archive_dir(), collection_name, partition)
+
+def write_archive(collection_name: str, documents: List[dict]) -> List[str]:
+    """Écrire un lot de documents dans les partitions mensuelles; retourne les fichiers créés.
+
+    Chaque fichier est écrit puis synchronisé sur disque avant d'être renommé:
+    les documents ne doivent être supprimés de la base qu'après ce retour.
+    """
+    _require_zstd()
+    by_partition = {}
+    for document in documents:
+        by_partition.setdefault(partition_name(document.get("scraped_at")), []).append(document)
+
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%f")
+    paths = []
+    for partition, partition_documents in by_partition.items():
+        directory = _partition_dir(collection_name, partition)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{stamp}{ARCHIVE_EXTENSION}")
+        payload = "".join(
+            json_util.dumps(document, json_options=JSON_OPTIONS) + "\n"
+            for document in partition_documents
+        ).encode("utf-8")
+
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(zstd.ZstdCompressor().compress(payload))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        paths.append(path)
+    return paths
+
+def list_partitions(collection_name: str = "scraped_data") -> List[dict]:
+    """Partitions archivées (la plus récente d'abord), avec nombre de fichiers et taille"""
+    root = os.path.join(get_archive_dir(), collection_name)
+    if not os.path.isdir(root):
+        return []
+    partitions = []
+    for partition in sorted(os.listdir(root), reverse=True):
+        files = _partition_files(collection_name, partition)
+        partitions.append({
+            "partition": partition,
+            "files": len(files),
+            "size_bytes": sum(os.path.getsize(path) for path in files)
+        })
+    return partitions
+
+def _partition_files(collection_name: str, partition: str) -> List[str]:
+    directory = _partition_dir(collection_name, partition)
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory), reverse=True)
+        if name.endswith(ARCHIVE_EXTENSION)
+    ]
+
+def read_archive_file(path: str) -> List[dict]:
+    """Lire les documents d'un fichier d'archive"""
+    _require_zstd()
+    with open(path, "rb") as f:
+        payload = zstd.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+    return [
+        json_util.loads(line, json_options=JSON_OPTIONS)
+        for line in payload.splitlines() if line
+    ]
+
+def iter_archived(
+    mongo_filter: Optional[dict] = None,
+    projection: Optional[dict] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    collection_name: str = "scraped_data"
+) -> Iterator[dict]:
+    """Parcourir les documents archivés qui vérifient un filtre MongoDB.
+
+    Seules les partitions mensuelles comprises entre start et end sont lues;
+    les documents sont renvoyés du plus récent au plus ancien.
+    """
+    first = partition_name(start) if start else None
+    last = partition_name(end) if end else None
+    for partition in list_partitions(collection_name):
+        name = partition["partition"]
+        if (last and name > last) or (first and name < first):
+            continue
+        for path in _partition_files(collection_name, name):
+            for document in sorted(
+                read_archive_file(path),
+                key=lambda d: (d.get("scraped_at") or OLDEST, d["_id"]),
+                reverse=True
+            ):
+                if matches(document, mongo_filter):
+                    yield project(document, projection)
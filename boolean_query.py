@@ -0,0 +1,129 @@
+from doc_format import tokenize
+from typing import List
+import re
+
+# Requêtes booléennes pour l'index positionnel (search_index.py):
+#   mot                      terme (un mot composé, ex. "e-mail", devient une phrase)
+#   "taux d'intérêt"         phrase: termes consécutifs
+#   a NEAR/5 b               a et b à 5 mots ou moins d'écart (termes ou phrases)
+#   a AND b, a b             les deux (ET implicite entre opérandes)
+#   a OR b                   l'un ou l'autre
+#   NOT a                    exclusion
+#   ( ... )                  regroupement
+# Priorités: NOT > NEAR > AND > OR. Opérateurs en majuscules.
+# L'arbre est fait de tuples: ("term", t), ("phrase", [t, ...]),
+# ("near", gauche, droite, k), ("and", [...]), ("or", [...]), ("not", n).
+
+TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|NEAR/(\d+)|(AND|OR|NOT)(?=[\s()"]|$)|([^\s()"]+))')
+POSITIONAL = ("term", "phrase", "near")
+
+def _lex(expression: str) -> list:
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        found = TOKEN.match(expression, position)
+        if found is None or found.end() == position:
+            raise ValueError(f"Invalid query near: {expression[position:position + 20]!r}")
+        position = found.end()
+        opening, closing, phrase, near, operator, word = found.groups()
+        if opening:
+            tokens.append(("(", None))
+        elif closing:
+            tokens.append((")", None))
+        elif phrase is not None:
+            tokens.append(("phrase", phrase))
+        elif near:
+            tokens.append(("near", int(near)))
+        elif operator:
+            tokens.append((operator, None))
+        elif word:
+            tokens.append(("word", word))
+    return tokens
+
+def _operand(text: str) -> tuple:
+    terms = tokenize(text)
+    return ("term", terms[0]) if len(terms) == 1 else ("phrase", terms)
+
+class _Parser:
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() in ("AND", "NOT", "word", "phrase", "("):
+            if self.peek() == "AND":
+                self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.peek() == "NOT":
+            self.take()
+            return ("not", self.parse_not())
+        return self.parse_near()
+
+    def parse_near(self):
+        node = self.parse_primary()
+        while self.peek() == "near":
+            distance = self.take()[1]
+            right = self.parse_primary()
+            if node[0] not in POSITIONAL or right[0] not in POSITIONAL:
+                raise ValueError("NEAR operands must be terms or phrases")
+            node = ("near", node, right, distance)
+        return node
+
+    def parse_primary(self):
+        kind = self.peek()
+        if kind is None:
+            raise ValueError("Unexpected end of query")
+        kind, value = self.take()
+        if kind in ("word", "phrase"):
+            return _operand(value)
+        if kind == "(":
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise ValueError("Missing closing parenthesis")
+            self.take()
+            return node
+        raise ValueError(f"Unexpected {kind} in query")
+
+def parse_query(expression: str) -> tuple:
+    """Arbre d'une requête booléenne; lève ValueError si elle est invalide"""
+    tokens = _lex(expression)
+    if not tokens:
+        raise ValueError("Empty query")
+    parser = _Parser(tokens)
+    node = parser.parse_or()
+    if parser.position < len(tokens):
+        raise ValueError(f"Unexpected {parser.peek()} in query")
+    return node
+
+def positive_terms(node: tuple) -> List[str]:
+    """Termes recherchés (hors exclusions): classement et surlignage"""
+    kind = node[0]
+    if kind == "term":
+        return [node[1]]
+    if kind == "phrase":
+        return list(node[1])
+    if kind == "near":
+        return positive_terms(node[1]) + positive_terms(node[2])
+    if kind in ("and", "or"):
+        return [term for child in node[1] for term in positive_terms(child)]
+    return []
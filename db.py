@@ -1,23 +1,262 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
+from memory_store import MemoryClient, AsyncMemoryClient
+from partitions import BASE_COLLECTION, PartitionedCollection, AsyncPartitionedCollection, partitioning_enabled
+import pymongo
 import os
+import threading
+import time
+import logging
+from datetime import datetime, UTC
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Récupère l'URI MongoDB depuis une variable d'environnement pour plus de sécurité
-MONGO_URI = os.getenv("MONGO_URI")
-if not MONGO_URI:
-    raise ValueError("MONGO_URI environment variable is not set. Please set it in .env file.")
+logger = logging.getLogger(__name__)
 
-# Créer le client MongoDB
-client = MongoClient(MONGO_URI)
+DATABASE_NAME = "webscraper"
 
-# Sélection de la base de données
-db = client["webscraper"]
+# Moteurs de stockage: MongoDB (par défaut) ou moteur en mémoire (tests, CI,
+# tests de charge), choisi par STORAGE_BACKEND. Les routes n'utilisent que les
+# collections exposées ici, quel que soit le moteur.
+STORAGE_BACKENDS = ("mongo", "memory")
 
-# Sélection de la collection
-collection = db["scraped_data"]
-sources_collection = db["sources"]
+# Le client est créé à la première utilisation (et non à l'import),
+# pour que les tests et les imports CLI ne paient pas le coût de connexion.
+_client = None
+_async_client = None
+_client_lock = threading.RLock()
 
+# Dernière mesure de latence (ping) de la base
+ping_stats = {
+    "status": None,
+    "ping_ms": None,
+    "checked_at": None,
+    "error": None
+}
 
-print("✅ Connected to MongoDB Atlas")
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+def available_compressors() -> list:
+    """Compresseurs réseau demandés (MONGO_COMPRESSORS) dont le module est installé"""
+    from pymongo import compression_support
+
+    requested = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+    compressors = []
+    for name in (c.strip() for c in requested.split(",")):
+        # pymongo ignore (avec un avertissement) les compresseurs non installés
+        is_available = getattr(compression_support, f"_have_{name}", None)
+        if name and (is_available is None or is_available()):
+            compressors.append(name)
+    return compressors
+
+def get_client_options() -> dict:
+    """Options du pool de connexions (surchargeables par variables d'environnement)"""
+    return {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 10000),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", 30000),
+        "compressors": available_compressors(),
+        "retryWrites": os.getenv("MONGO_RETRY_WRITES", "true").lower() == "true",
+        "retryReads": True
+    }
+
+def get_mongo_uri() -> str:
+    # Récupère l'URI MongoDB depuis une variable d'environnement pour plus de sécurité
+    mongo_uri = os.getenv("MONGO_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_URI environment variable is not set. Please set it in .env file.")
+    return mongo_uri
+
+def get_storage_backend() -> str:
+    """Moteur de stockage configuré (STORAGE_BACKEND, "mongo" par défaut)"""
+    backend = os.getenv("STORAGE_BACKEND", "mongo").strip().lower()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}'. Expected one of: {', '.join(STORAGE_BACKENDS)}")
+    return backend
+
+def get_client() -> MongoClient:
+    """Obtenir le client synchrone (scheduler, scraping)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if get_storage_backend() == "memory":
+                    _client = MemoryClient()
+                else:
+                    _client = MongoClient(get_mongo_uri(), **get_client_options())
+    return _client
+
+def get_async_client() -> AsyncMongoClient:
+    """Obtenir le client asynchrone (routes async de l'API)"""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                if get_storage_backend() == "memory":
+                    # Mêmes données que le client synchrone
+                    _async_client = AsyncMemoryClient(get_client())
+                else:
+                    _async_client = AsyncMongoClient(get_mongo_uri(), **get_client_options())
+    return _async_client
+
+def get_database():
+    """Obtenir la base de données (client synchrone)"""
+    return get_client()[DATABASE_NAME]
+
+def get_async_database():
+    """Obtenir la base de données (client asynchrone)"""
+    return get_async_client()[DATABASE_NAME]
+
+class LazyDatabase:
+    """Base de données résolue à la première utilisation.
+
+    Avec SCRAPED_DATA_PARTITIONING=monthly, scraped_data est servie par la
+    façade de partitionnement mensuel (partitions.py).
+    """
+
+    def __init__(self, resolve=get_database, partitioned=None):
+        self._resolve = resolve
+        self.partitioned = partitioned
+
+    def __getitem__(self, name):
+        if name == BASE_COLLECTION and self.partitioned is not None and partitioning_enabled():
+            return self.partitioned
+        return self._resolve()[name]
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+class LazyCollection:
+    """Collection résolue à la première utilisation"""
+
+    def __init__(self, name: str, database: LazyDatabase):
+        self.name = name
+        self._database = database
+
+    def __getattr__(self, attr):
+        return getattr(self._database[self.name], attr)
+
+# Sélection de la base de données et des collections (client synchrone)
+db = LazyDatabase(get_database, PartitionedCollection(get_database))
+collection = LazyCollection("scraped_data", db)
+sources_collection = LazyCollection("sources", db)
+term_stats_collection = LazyCollection("term_stats", db)
+rss_tombstones_collection = LazyCollection("rss_tombstones", db)
+
+# Mêmes collections pour les routes async (client asynchrone)
+async_db = LazyDatabase(get_async_database, AsyncPartitionedCollection(get_async_database))
+async_collection = LazyCollection("scraped_data", async_db)
+async_sources_collection = LazyCollection("sources", async_db)
+async_rss_tombstones_collection = LazyCollection("rss_tombstones", async_db)
+
+# /health réutilise la dernière mesure pendant PING_MAX_AGE secondes
+PING_MAX_AGE = 5
+
+def _record_ping(started: float, error: Exception = None) -> dict:
+    if error is None:
+        ping_stats.update({
+            "status": "ok",
+            "ping_ms": round((time.perf_counter() - started) * 1000, 2),
+            "error": None
+        })
+    else:
+        ping_stats.update({"status": "unreachable", "ping_ms": None, "error": str(error)})
+    ping_stats["checked_at"] = datetime.now(UTC)
+    return dict(ping_stats)
+
+def ping_database(timeout: float = 2) -> dict:
+    """Mesurer la latence de la base (commande ping)"""
+    started = time.perf_counter()
+    try:
+        with pymongo.timeout(timeout):
+            get_client().admin.command("ping")
+    except Exception as e:
+        return _record_ping(started, e)
+    return _record_ping(started)
+
+async def ping_database_async(timeout: float = 2, max_age: float = PING_MAX_AGE) -> dict:
+    """Latence de la base par le client asynchrone (mesure de moins de max_age secondes réutilisée)"""
+    checked_at = ping_stats["checked_at"]
+    if checked_at and (datetime.now(UTC) - checked_at).total_seconds() < max_age:
+        return dict(ping_stats)
+    started = time.perf_counter()
+    try:
+        with pymongo.timeout(timeout):
+            await get_async_client().admin.command("ping")
+    except Exception as e:
+        return _record_ping(started, e)
+    return _record_ping(started)
+
+def connect():
+    """Démarrage: créer le client et vérifier la connexion"""
+    get_client()
+    stats = ping_database()
+    if get_storage_backend() == "memory":
+        logger.info("✅ Using in-memory storage backend")
+    elif stats["status"] == "ok":
+        logger.info(f"✅ Connected to MongoDB ({stats['ping_ms']} ms)")
+    else:
+        logger.error(f"MongoDB unreachable: {stats['error']}")
+    return stats
+
+def close():
+    """Arrêt: fermer le client synchrone et son pool de connexions"""
+    global _client, _async_client
+    with _client_lock:
+        db.partitioned.forget()
+        async_db.partitioned.forget()
+        if _client is not None:
+            _client.close()
+            if isinstance(_client, MemoryClient):
+                # Le client async partage les données du client fermé
+                _async_client = None
+            _client = None
+            logger.info("MongoDB client closed")
+
+async def close_async():
+    """Arrêt: fermer le client asynchrone et son pool de connexions"""
+    global _async_client
+    async_db.partitioned.forget()
+    if _async_client is not None:
+        client, _async_client = _async_client, None
+        await client.close()
+        logger.info("MongoDB async client closed")
+
+def ensure_indexes():
+    """Créer les index nécessaires (idempotent)"""
+    # Déduplication des entrées RSS: une entrée par flux + guid/lien
+    collection.create_index(
+        "entry_key",
+        unique=True,
+        partialFilterExpression={"entry_key": {"$exists": True}}
+    )
+    # Versions des snapshots de sources
+    collection.create_index(
+        [("source_id", 1), ("version", -1)],
+        unique=True,
+        partialFilterExpression={"version": {"$exists": True}}
+    )
+    # Pagination par curseur (keyset) sur (date, _id)
+    collection.create_index([("scraped_at", -1), ("_id", -1)])
+    collection.create_index([("source_id", 1), ("scraped_at", -1), ("_id", -1)])
+    collection.create_index([("source_name", 1), ("source_type", 1), ("scraped_at", -1), ("_id", -1)])
+    collection.create_index([("platform", 1), ("source_name", 1), ("scraped_at", -1), ("_id", -1)])
+    # Recherche par mots-clés: termes distincts de chaque document (multikey)
+    collection.create_index([("terms", 1), ("scraped_at", -1), ("_id", -1)])
+    # Groupes de quasi-doublons (near_duplicates.py)
+    collection.create_index([("cluster_id", 1), ("scraped_at", -1), ("_id", -1)])
+    # Top des mots-clés (term_stats tenue à jour à l'écriture)
+    term_stats_collection.create_index([("count", -1), ("_id", 1)])
+    sources_collection.create_index([("created_at", -1), ("_id", -1)])
+    sources_collection.create_index([("source_type", 1), ("created_at", -1), ("_id", -1)])
+    db["document_analysis"].create_index([("category", 1), ("analyzed_at", -1), ("_id", -1)])
+    db["document_analysis"].create_index([("keywords", 1), ("analyzed_at", -1), ("_id", -1)])
+    # Analyse réutilisée pour les quasi-doublons d'un document analysé
+    db["document_analysis"].create_index("cluster_id")
+    # Expiration pure (politique de rétention sans archive): date fixée à l'écriture
+    collection.create_index("expire_at", expireAfterSeconds=0)
+    # Pierres tombales des entrées RSS expirées, oubliées après RSS_TOMBSTONE_DAYS
+    rss_tombstones_collection.create_index("deleted_at", expireAfterSeconds=_env_int("RSS_TOMBSTONE_DAYS", 365) * 86400)
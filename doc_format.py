@@ -0,0 +1,246 @@
+from db import collection as scraped_collection, async_collection
+from retention import expire_at_for
+from near_duplicates import cluster_fields, register_clusters
+from partitions import UpdateOne
+from bson import Binary
+from datetime import datetime, UTC
+from collections import Counter
+from typing import List, Optional
+import json
+import logging
+import re
+import unicodedata
+
+try:
+    import zstandard as zstd
+except ImportError:  # compression optionnelle
+    zstd = None
+
+logger = logging.getLogger(__name__)
+
+# Format v1: "data": [{"index": 1, "value": "..."}, ...]
+# Format v2: "data": ["...", ...] (l'index est implicite: la position)
+#            "data_index": [...] seulement si les positions ne sont pas 1..n (deltas)
+#            "data_z": valeurs compressées zstd à la place de "data" si volumineux
+DATA_FORMAT_VERSION = 2
+COMPRESSION_THRESHOLD = 16 * 1024  # octets de texte avant compression
+DATA_FIELDS = ("data", "data_z", "data_index", "data_format")
+
+# Champs texte précalculés à l'écriture
+MAX_CONTENT_LENGTH = 50_000
+TOKEN_PATTERN = re.compile(r"\w{2,}")
+TEXT_FIELDS = ("content_text", "term_freq")
+SOURCE_TEXT_FIELDS = {"data": 1, "data_z": 1, "data_format": 1, "content": 1}
+
+migration_status = {
+    "running": False,
+    "migrated": 0,
+    "started_at": None,
+    "finished_at": None,
+    "error": None
+}
+
+def encode_data(items: List[dict]) -> dict:
+    """Encoder une liste d'éléments {"index", "value"} au format compact"""
+    values = [str(item.get("value", "")) for item in items]
+    positions = [item.get("index", i + 1) for i, item in enumerate(items)]
+
+    fields = {"data_format": DATA_FORMAT_VERSION}
+    if zstd and sum(len(value) for value in values) > COMPRESSION_THRESHOLD:
+        payload = json.dumps(values, ensure_ascii=False).encode("utf-8")
+        fields["data_z"] = Binary(zstd.ZstdCompressor().compress(payload))
+    else:
+        fields["data"] = values
+
+    if positions != list(range(1, len(values) + 1)):
+        fields["data_index"] = positions
+    return fields
+
+def compact_document(document: dict) -> dict:
+    """Copie d'un document à stocker, avec "data" encodé au format compact"""
+    stored = {k: v for k, v in document.items() if k != "data"}
+    stored.update(encode_data(document.get("data", [])))
+    return stored
+
+def normalize_text(text: str) -> str:
+    """Normaliser (NFC, espaces) et tronquer un texte"""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())[:MAX_CONTENT_LENGTH]
+
+def tokenize(text: str) -> List[str]:
+    """Termes (minuscules) d'un texte, dans l'ordre"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def token_offsets(text: str) -> List[tuple]:
+    """(début, fin) dans text de chaque terme de tokenize(text), dans l'ordre"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return [match.span() for match in TOKEN_PATTERN.finditer(lowered)]
+    # Minuscule sur plusieurs caractères (ex. "İ"): positions d'origine
+    origins = [index for index, char in enumerate(text) for _ in char.lower()]
+    return [(origins[match.start()], origins[match.end() - 1] + 1) for match in TOKEN_PATTERN.finditer(lowered)]
+
+def compute_term_freq(text: str) -> dict:
+    """Fréquence des termes (minuscules) d'un texte"""
+    return dict(Counter(tokenize(text)))
+
+def build_text_fields(text: str) -> dict:
+    """Champs texte précalculés: content_text, term_freq et terms (termes distincts, indexés)"""
+    content_text = normalize_text(text)
+    term_freq = compute_term_freq(content_text)
+    return {
+        "content_text": content_text,
+        "term_freq": term_freq,
+        "terms": sorted(term_freq)
+    }
+
+def items_text(items: List[dict]) -> str:
+    """Texte brut d'une liste d'éléments {"index", "value"}"""
+    return " ".join(str(item.get("value", "")) for item in items)
+
+def prepare_document(document: dict, text: Optional[str] = None) -> dict:
+    """Document prêt à être stocké: format compact + champs texte précalculés.
+
+    text: texte de la version complète quand les données stockées n'en sont
+    qu'une partie (delta de version, snapshots.py).
+    """
+    stored = compact_document(document)
+    if text is None:
+        text = items_text(document["data"]) if document.get("data") else document.get("content", "")
+    stored.update(build_text_fields(text))
+    # Quasi-doublons: signature MinHash et groupe (near_duplicates.py)
+    stored.update(cluster_fields(tokenize(stored["content_text"]), document.get("source_id")))
+    # Expiration pure (index TTL) si la politique de rétention n'archive pas
+    expire_at = expire_at_for(document)
+    if expire_at:
+        stored["expire_at"] = expire_at
+    return stored
+
+def decode_values(doc: dict) -> List[str]:
+    """Lire les valeurs d'un document, quel que soit son format"""
+    if doc.get("data_format", 1) >= 2:
+        if "data_z" in doc:
+            if zstd is None:
+                raise RuntimeError("zstandard is required to read compressed documents")
+            payload = zstd.ZstdDecompressor().decompress(bytes(doc["data_z"]))
+            return json.loads(payload)
+        return list(doc.get("data", []))
+
+    data = doc.get("data")
+    if isinstance(data, list):
+        return [str(item.get("value", "")) if isinstance(item, dict) else str(item) for item in data]
+    return []
+
+def decode_items(doc: dict) -> List[dict]:
+    """Lire les éléments {"index", "value"} d'un document, quel que soit son format"""
+    if doc.get("data_format", 1) < 2:
+        return [item for item in doc.get("data") or [] if isinstance(item, dict)]
+
+    values = decode_values(doc)
+    positions = doc.get("data_index") or range(1, len(values) + 1)
+    return [{"index": index, "value": value} for index, value in zip(positions, values)]
+
+def extract_text(doc: dict) -> str:
+    """Texte brut d'un document (données extraites ou champ content)"""
+    if any(field in doc for field in ("data", "data_z")):
+        return " ".join(decode_values(doc))
+    return doc.get("content", "")
+
+def _documents_missing_text(docs: List[dict], fields) -> tuple:
+    """Documents à compléter, et _id de ceux dont il faut relire les données"""
+    missing = [doc for doc in docs if any(field not in doc for field in fields)]
+    to_fetch = [
+        doc["_id"] for doc in missing
+        if not any(field in doc for field in SOURCE_TEXT_FIELDS)
+    ]
+    return missing, to_fetch
+
+def _complete_text_fields(missing: List[dict], fetched: dict):
+    for doc in missing:
+        source = fetched.get(doc.get("_id"), doc)
+        for field, value in build_text_fields(extract_text(source)).items():
+            doc.setdefault(field, value)
+
+def fill_text_fields(docs: List[dict], fields=TEXT_FIELDS) -> List[dict]:
+    """Compléter les champs texte des documents qui ne les ont pas encore (anciens documents).
+
+    Les documents lus avec une projection sur les champs texte n'ont pas leurs
+    données: elles ne sont relues que pour les documents à compléter.
+    """
+    missing, to_fetch = _documents_missing_text(docs, fields)
+    fetched = {}
+    if to_fetch:
+        fetched = {
+            doc["_id"]: doc
+            for doc in scraped_collection.find({"_id": {"$in": to_fetch}}, SOURCE_TEXT_FIELDS)
+        }
+    _complete_text_fields(missing, fetched)
+    return docs
+
+async def fill_text_fields_async(docs: List[dict], fields=TEXT_FIELDS) -> List[dict]:
+    """Version asynchrone de fill_text_fields (routes async)"""
+    missing, to_fetch = _documents_missing_text(docs, fields)
+    fetched = {}
+    if to_fetch:
+        cursor = async_collection.find({"_id": {"$in": to_fetch}}, SOURCE_TEXT_FIELDS)
+        fetched = {doc["_id"]: doc for doc in await cursor.to_list(None)}
+    _complete_text_fields(missing, fetched)
+    return docs
+
+def migrate_data_format(batch_size: int = 500) -> int:
+    """Convertir par lots les anciens documents au format compact (avec champs texte)"""
+    from snapshots import version_text  # snapshots.py dépend de ce module
+    migration_status.update({
+        "running": True,
+        "migrated": 0,
+        "started_at": datetime.now(UTC),
+        "finished_at": None,
+        "error": None
+    })
+    try:
+        while True:
+            batch = list(
+                scraped_collection.find(
+                    {"$or": [
+                        {"data_format": {"$exists": False}, "data": {"$type": "array"}},
+                        {"content_text": {"$exists": False}},
+                        {"terms": {"$exists": False}},
+                        {"minhash": {"$exists": False}},
+                        # Deltas indexés sur leurs seuls éléments ajoutés
+                        {"storage": "delta", "full_text": {"$exists": False}}
+                    ]},
+                    {**SOURCE_TEXT_FIELDS, "storage": 1, "source_id": 1, "version": 1, "keyframe_version": 1}
+                ).limit(batch_size)
+            )
+            if not batch:
+                break
+
+            operations = []
+            clustered = []
+            for doc in batch:
+                if doc.get("storage") == "delta":
+                    fields = {**build_text_fields(version_text(doc)), "full_text": True}
+                else:
+                    fields = build_text_fields(extract_text(doc))
+                fields.update(cluster_fields(tokenize(fields["content_text"]), doc.get("source_id")))
+                clustered.append({"minhash": fields["minhash"], "cluster_id": fields["cluster_id"], "source_id": doc.get("source_id")})
+                if doc.get("data_format", 1) < 2 and isinstance(doc.get("data"), list):
+                    fields.update(encode_data(decode_items(doc)))
+                update = {"$set": fields}
+                if "data_z" in fields:
+                    update["$unset"] = {"data": ""}
+                operations.append(UpdateOne({"_id": doc["_id"]}, update))
+            scraped_collection.bulk_write(operations, ordered=False)
+            # Documents déjà stockés: groupes enregistrés après l'écriture
+            register_clusters(clustered)
+
+            migration_status["migrated"] += len(batch)
+            logger.info(f"Migrated {migration_status['migrated']} documents to data format v{DATA_FORMAT_VERSION}")
+        return migration_status["migrated"]
+    except Exception as e:
+        migration_status["error"] = str(e)
+        logger.error(f"Error migrating data format: {str(e)}")
+        raise
+    finally:
+        migration_status["running"] = False
+        migration_status["finished_at"] = datetime.now(UTC)
@@ -0,0 +1,87 @@
+from bson import ObjectId
+from collections import Counter
+from datetime import datetime, UTC, timedelta
+from typing import Dict, List
+
+# Facettes de recherche: comptes par valeur (source, type de contenu, type
+# de source) et histogramme des dates, calculés avec la page de résultats:
+# - recherche MongoDB: sous-pipelines d'un même $facet (un aller-retour)
+# - recherche par l'index en mémoire: comptage sur les documents trouvés
+# Les deux chemins produisent le même format: [{"value", "count"}].
+FACET_FIELDS = ("source_id", "content_type", "source_type", "scraped_at")
+FACET_INTERVALS = ("hour", "day", "week", "month")
+FACET_LIMIT = 20  # valeurs les plus fréquentes par facette (hors histogramme)
+
+def validate_facets(facets: List[str], interval: str):
+    """Lève ValueError si une facette ou l'intervalle n'est pas pris en charge"""
+    unknown = [facet for facet in facets if facet not in FACET_FIELDS]
+    if unknown:
+        raise ValueError(f"Unsupported facets: {', '.join(unknown)}. Expected: {', '.join(FACET_FIELDS)}")
+    if interval not in FACET_INTERVALS:
+        raise ValueError(f"Unsupported facet interval '{interval}'. Expected: {', '.join(FACET_INTERVALS)}")
+
+def facet_pipelines(facets: List[str], interval: str) -> Dict[str, list]:
+    """Sous-pipelines $facet de chaque facette demandée"""
+    pipelines = {}
+    for facet in dict.fromkeys(facets):
+        if facet == "scraped_at":
+            bucket = {"$dateTrunc": {"date": "$scraped_at", "unit": interval, "startOfWeek": "monday"}}
+            pipelines[facet] = [
+                {"$group": {"_id": bucket, "count": {"$sum": 1}}},
+                {"$sort": {"_id": 1}}
+            ]
+        else:
+            pipelines[facet] = [
+                {"$group": {"_id": f"${facet}", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": FACET_LIMIT}
+            ]
+    return pipelines
+
+def facet_value(value):
+    """Valeur de facette sérialisable (chaîne, date ISO en UTC ou None)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=UTC)
+        return value.isoformat()
+    return str(value)
+
+def format_facets(raw: Dict[str, list]) -> Dict[str, List[dict]]:
+    """Résultats des sous-pipelines $facet → [{"value", "count"}] par facette"""
+    return {
+        facet: [{"value": facet_value(row["_id"]), "count": row["count"]} for row in rows]
+        for facet, rows in raw.items()
+    }
+
+def truncate_date(timestamp: float, interval: str) -> datetime:
+    """Début de l'intervalle (UTC) contenant timestamp, comme $dateTrunc"""
+    date = datetime.fromtimestamp(timestamp, UTC)
+    if interval == "hour":
+        return date.replace(minute=0, second=0, microsecond=0)
+    date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        return date - timedelta(days=date.weekday())
+    if interval == "month":
+        return date.replace(day=1)
+    return date
+
+def count_facets(counters: Dict[str, Counter]) -> Dict[str, List[dict]]:
+    """Comptes calculés en mémoire → même format et même ordre que facet_pipelines"""
+    formatted = {}
+    for facet, counter in counters.items():
+        if facet == "scraped_at":
+            rows = sorted(counter.items(), key=lambda item: (item[0] is not None, item[0] or datetime.min.replace(tzinfo=UTC)))
+        else:
+            rows = sorted(counter.items(), key=lambda item: (-item[1], _sort_key(item[0])))[:FACET_LIMIT]
+        formatted[facet] = [{"value": facet_value(value), "count": count} for value, count in rows]
+    return formatted
+
+def _sort_key(value) -> tuple:
+    # Ordre BSON: null, chaînes, ObjectId
+    if value is None:
+        return (0, "")
+    if isinstance(value, ObjectId):
+        return (2, str(value))
+    return (1, str(value))
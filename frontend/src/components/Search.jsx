@@ -2,6 +2,27 @@ import React, { useState } from 'react';
 import { searchAPI } from '../api/client';
 import { Search as SearchIcon, Calendar } from 'lucide-react';
 
+// Extrait avec les occurrences surlignées (offsets en points de code, comme l'API)
+function Snippet({ result }) {
+  const chars = Array.from(result.content || '');
+  const parts = [];
+  let cursor = 0;
+  (result.highlights || []).forEach(([start, end], idx) => {
+    if (start > cursor) parts.push(chars.slice(cursor, start).join(''));
+    parts.push(
+      <mark key={idx} className="bg-yellow-200 rounded px-0.5">{chars.slice(start, end).join('')}</mark>
+    );
+    cursor = end;
+  });
+  parts.push(chars.slice(cursor).join(''));
+  return (
+    <>
+      {result.content_offset > 0 && '… '}
+      {parts}
+    </>
+  );
+}
+
 export default function Search() {
   const [keyword, setKeyword] = useState('');
   const [results, setResults] = useState([]);
@@ -72,7 +93,7 @@ export default function Search() {
                   </span>
                 </div>
 
-                <p className="text-gray-700 mb-3 line-clamp-2">{result.content}</p>
+                <p className="text-gray-700 mb-3 line-clamp-2"><Snippet result={result} /></p>
 
                 <div className="flex items-center text-xs text-gray-500 gap-4">
                   <div className="flex items-center gap-1">
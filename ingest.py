@@ -0,0 +1,42 @@
+from typing import Callable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Abonnés aux écritures de scraped_data (index de recherche, statistiques...).
+# Les chemins d'écriture (scrape, snapshots, RSS, réseaux sociaux, rétention)
+# notifient les documents insérés ou supprimés après l'écriture en base
+# (documents tels que stockés, avec au moins leur _id);
+# une erreur d'un abonné est journalisée et n'annule jamais l'écriture.
+
+_hooks = {}  # nom → {"inserted": callable, "deleted": callable}
+
+def register(name: str, on_insert: Optional[Callable] = None, on_delete: Optional[Callable] = None):
+    """Abonner (ou remplacer) un consommateur des écritures de scraped_data"""
+    _hooks[name] = {"inserted": on_insert, "deleted": on_delete}
+
+def unregister(name: str):
+    _hooks.pop(name, None)
+
+def registered() -> List[str]:
+    return list(_hooks)
+
+def _notify(event: str, payload: list):
+    if not payload:
+        return
+    for name, hooks in list(_hooks.items()):
+        hook = hooks[event]
+        if hook is None:
+            continue
+        try:
+            hook(payload)
+        except Exception as e:
+            logger.error(f"Ingest hook '{name}' failed on {event} documents: {str(e)}")
+
+def documents_inserted(documents: List[dict]):
+    """Notifier des documents insérés (avec _id et champs texte précalculés)"""
+    _notify("inserted", documents)
+
+def documents_deleted(documents: List[dict]):
+    """Notifier des documents supprimés (lus avant suppression)"""
+    _notify("deleted", documents)
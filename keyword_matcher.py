@@ -0,0 +1,189 @@
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+import re
+
+# Recherche simultanée de nombreux mots-clés (automate d'Aho-Corasick):
+# chaque document est parcouru une seule fois, quel que soit le nombre de
+# mots-clés, là où une alternance regex essaie chaque mot-clé à chaque
+# position. L'automate est construit une fois par ensemble de mots-clés
+# (cache LRU) et réutilisé pour tous les documents et requêtes suivantes.
+MATCHER_CACHE_SIZE = 128
+
+# Extraits de résultats: fenêtre autour du meilleur groupe d'occurrences
+SNIPPET_LENGTH = 240
+WORD_BOUNDARY_SEARCH = 20  # caractères parcourus pour ne pas couper un mot
+_WORD_CHAR = re.compile(r"\w")
+
+class KeywordMatcher:
+    """Automate d'Aho-Corasick sur un ensemble de mots-clés"""
+
+    def __init__(self, keywords: Iterable[str], case_sensitive: bool = False):
+        self.keywords = [keyword for keyword in dict.fromkeys(keywords) if keyword]
+        self.case_sensitive = case_sensitive
+        self._goto = [{}]   # état → {caractère: état suivant}
+        self._fail = [0]    # état → plus long suffixe propre présent dans l'automate
+        self._out = [[]]    # état → mots-clés (indices) reconnus en arrivant ici
+        self._lengths = []
+
+        for number, keyword in enumerate(self.keywords):
+            pattern = self._normalize(keyword)
+            self._lengths.append(len(pattern))
+            state = 0
+            for char in pattern:
+                following = self._goto[state].get(char)
+                if following is None:
+                    following = len(self._goto)
+                    self._goto[state][char] = following
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = following
+            self._out[state].append(number)
+
+        # Liens d'échec en largeur: sorties héritées du suffixe
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(char, 0)
+                self._out[following] = self._out[following] + self._out[self._fail[following]]
+
+        # À la racine, sauter directement au prochain premier caractère possible
+        first_chars = "".join(self._goto[0])
+        self._start = re.compile(f"[{re.escape(first_chars)}]") if first_chars else None
+
+    def _normalize(self, text: str) -> str:
+        return text if self.case_sensitive else text.lower()
+
+    def _scan(self, text: str):
+        """(position de fin, indice du mot-clé) de chaque occurrence, chevauchements compris"""
+        if self._start is None:
+            return
+        goto, fail, out = self._goto, self._fail, self._out
+        state, position, size = 0, 0, len(text)
+        while position < size:
+            if not state:
+                found = self._start.search(text, position)
+                if found is None:
+                    return
+                position = found.start()
+            char = text[position]
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for number in out[state]:
+                yield position, number
+            position += 1
+
+    def find(self, text: str, max_positions: Optional[int] = None) -> Dict[str, List[int]]:
+        """Mots-clés trouvés (ordre de première occurrence) et leurs positions de début dans text"""
+        normalized = self._normalize(text)
+        origins = None
+        if len(normalized) != len(text):
+            # Minuscule sur plusieurs caractères (ex. "İ"): positions d'origine
+            origins = [index for index, char in enumerate(text) for _ in self._normalize(char)]
+            normalized = "".join(self._normalize(char) for char in text)
+
+        positions = {}
+        for end, number in self._scan(normalized):
+            found = positions.setdefault(self.keywords[number], [])
+            if max_positions is None or len(found) < max_positions:
+                start = end - self._lengths[number] + 1
+                found.append(origins[start] if origins else start)
+        return positions
+
+    def matched(self, text: str) -> List[str]:
+        """Mots-clés présents dans text"""
+        found = []
+        for _, number in self._scan(self._normalize(text)):
+            keyword = self.keywords[number]
+            if keyword not in found:
+                found.append(keyword)
+                if len(found) == len(self.keywords):
+                    break
+        return found
+
+@lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def _cached_matcher(keywords: tuple, case_sensitive: bool) -> KeywordMatcher:
+    return KeywordMatcher(keywords, case_sensitive)
+
+def get_matcher(keywords: Iterable[str], case_sensitive: bool = False) -> KeywordMatcher:
+    """Automate pour un ensemble de mots-clés (indépendant de l'ordre), mis en cache"""
+    return _cached_matcher(tuple(sorted(set(keywords))), case_sensitive)
+
+def whole_words(text: str, positions: Dict[str, List[int]]) -> Dict[str, List[int]]:
+    """Occurrences qui ne sont ni précédées ni suivies d'un caractère de mot"""
+    kept = {}
+    for keyword, starts in positions.items():
+        found = [
+            start for start in starts
+            if not (start and _WORD_CHAR.match(text[start - 1]))
+            and not _WORD_CHAR.match(text, start + len(keyword))
+        ]
+        if found:
+            kept[keyword] = found
+    return kept
+
+def build_snippet(text: str, positions: Dict[str, List[int]], size: int = SNIPPET_LENGTH) -> tuple:
+    """Extrait centré sur le groupe d'occurrences le plus riche: (extrait, début dans text, surlignages).
+
+    Calculé à partir des positions déjà trouvées par l'automate: seule la
+    fenêtre retenue est découpée dans text. Les surlignages sont des
+    intervalles [début, fin) relatifs à l'extrait.
+    """
+    return snippet_around(text, [
+        (start, start + len(keyword), keyword)
+        for keyword, starts in positions.items()
+        for start in starts
+    ], size)
+
+def snippet_around(text: str, spans: List[tuple], size: int = SNIPPET_LENGTH) -> tuple:
+    """Comme build_snippet, à partir d'occurrences (début, fin, libellé) dans text"""
+    spans = sorted(spans)
+    if not spans:
+        return text[:size], 0, []
+
+    # Fenêtre glissante: le plus de mots-clés distincts, puis le plus d'occurrences
+    best, left, counts = None, 0, Counter()
+    for right, (_, end, keyword) in enumerate(spans):
+        counts[keyword] += 1
+        while end - spans[left][0] > size and left < right:
+            counts[spans[left][2]] -= 1
+            if not counts[spans[left][2]]:
+                del counts[spans[left][2]]
+            left += 1
+        score = (len(counts), right - left + 1)
+        if best is None or score > best[0]:
+            best = (score, left, right)
+    _, left, right = best
+    first = spans[left][0]
+    last = max(end for _, end, _ in spans[left:right + 1])
+
+    centre = (first + last) // 2
+    start = max(0, min(centre - size // 2, len(text) - size))
+    end = min(len(text), start + size)
+    # Ne pas couper de mot aux bords (sans exclure les occurrences retenues)
+    if start > 0:
+        space = text.find(" ", start, min(first, start + WORD_BOUNDARY_SEARCH))
+        if space != -1:
+            start = space + 1
+    if end < len(text):
+        space = text.rfind(" ", max(last, end - WORD_BOUNDARY_SEARCH), end)
+        if space != -1:
+            end = space
+
+    highlights = []
+    for span_start, span_end, _ in spans:
+        if span_start < start or span_end > end:
+            continue
+        span = [span_start - start, span_end - start]
+        if highlights and span[0] <= highlights[-1][1]:
+            highlights[-1][1] = max(highlights[-1][1], span[1])
+        else:
+            highlights.append(span)
+    return text[start:end], start, highlights
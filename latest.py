@@ -0,0 +1,89 @@
+from doc_format import encode_data, decode_items
+from bson import ObjectId
+from datetime import datetime
+from typing import List, Optional
+
+# État courant de chaque source, embarqué dans son document (champ "latest")
+# et mis à jour par la même écriture que last_scraped / scrape_count:
+# lire le dernier état d'une source (ou de toutes) est une lecture de
+# sources, quelle que soit la taille de l'historique dans scraped_data.
+#   - sources scrappées (store_snapshot): version courante et ses données
+#   - sources RSS: les LATEST_RSS_ENTRIES dernières entrées (plus récente d'abord)
+LATEST_RSS_ENTRIES = 50
+
+# Champs du résumé de l'état courant (sans le contenu)
+LATEST_SUMMARY_FIELDS = ("document_id", "version", "changed_at", "scraped_at", "count")
+
+# Contenu exclu des lectures de statut (listes de sources)
+LATEST_CONTENT_EXCLUDED = {
+    "latest.data": 0, "latest.data_z": 0, "latest.data_index": 0, "latest.entries": 0
+}
+
+def scrape_update(document: dict, snapshot: dict) -> dict:
+    """Mise à jour de la source après un scrape versionné: compteurs et état courant"""
+    data = encode_data(document["data"])
+    state = {
+        "document_id": snapshot["document_id"],
+        "version": snapshot["version"],
+        "snapshot_status": snapshot["status"],
+        "changed_at": snapshot.get("changed_at") or document["scraped_at"],
+        "scraped_at": document["scraped_at"],
+        "content_type": document.get("content_type"),
+        "count": len(document["data"]),
+        **data
+    }
+    # Champs mis à jour un par un: latest.entries (RSS) est conservé
+    return {
+        "$set": {"last_scraped": document["scraped_at"], **{f"latest.{k}": v for k, v in state.items()}},
+        "$unset": {f"latest.{field}": "" for field in ("data", "data_z", "data_index") if field not in data},
+        "$inc": {"scrape_count": 1}
+    }
+
+def rss_update(new_documents: List[dict], now: datetime) -> dict:
+    """Mise à jour d'une source RSS: nouvelles entrées en tête de latest.entries"""
+    update = {
+        "$set": {"last_scraped": now, "latest.scraped_at": now},
+        "$inc": {"scrape_count": 1}
+    }
+    if new_documents:
+        # Même ordre que scraped_data trié par (scraped_at, _id) décroissants
+        entries = [
+            {
+                "_id": ObjectId(document["_id"]),
+                "title": document.get("title", ""),
+                "summary": document.get("summary", ""),
+                "published": document.get("published", ""),
+                "author": document.get("author", ""),
+                "scraped_at": document["scraped_at"]
+            }
+            for document in reversed(new_documents)
+        ]
+        update["$set"]["latest.changed_at"] = now
+        update["$push"] = {
+            "latest.entries": {"$each": entries, "$position": 0, "$slice": LATEST_RSS_ENTRIES}
+        }
+    return update
+
+def latest_summary(source: dict) -> Optional[dict]:
+    """Résumé de l'état courant d'une source (sans le contenu)"""
+    latest = source.get("latest")
+    if not latest:
+        return None
+    summary = {field: latest.get(field) for field in LATEST_SUMMARY_FIELDS}
+    if summary["document_id"]:
+        summary["document_id"] = str(summary["document_id"])
+    return summary
+
+def latest_data(source: dict) -> Optional[List[dict]]:
+    """Données de la version courante d'une source scrappée"""
+    latest = source.get("latest")
+    if not latest or "data_format" not in latest:
+        return None
+    return decode_items(latest)
+
+def latest_entries(source: dict, limit: int) -> Optional[List[dict]]:
+    """Dernières entrées RSS d'une source, ou None si elles ne couvrent pas la page"""
+    entries = (source.get("latest") or {}).get("entries")
+    if entries is None or limit > LATEST_RSS_ENTRIES or len(entries) < limit:
+        return None
+    return entries[:limit]
@@ -9,8 +9,17 @@ from routes.scheduler_routes import router as scheduler_router
 from routes.rss import router as rss_router
 from routes.social_media import router as social_media_router
 from routes.analytics import router as analytics_router
+from routes.export import router as export_router
 from scheduler import start_scheduler, stop_scheduler
+from retention import refresh_policy
+from search_index import load_search_index, save_search_index
+from semantic_index import load_semantic_index, save_semantic_index
+from near_duplicates import begin_duplicate_index_load, load_duplicate_index
+from term_stats import bootstrap_term_stats, flush_term_stats
+from trending import warm_trending
+import db
 import logging
+import threading
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,13 +30,42 @@ async def lifespan(app: FastAPI):
     """Gestion du cycle de vie de l'application"""
     # Startup
     logger.info("🚀 Starting Web Crawler API...")
+    db.connect()
+    try:
+        db.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating indexes: {str(e)}")
+    try:
+        refresh_policy()
+    except Exception as e:
+        logger.error(f"Error loading retention policy: {str(e)}")
+    # Quasi-doublons: représentants des groupes existants, en chargement avant
+    # toute écriture (scheduler, routes d'ingestion) qui attend alors sa fin
+    begin_duplicate_index_load()
+    threading.Thread(target=load_duplicate_index, name="duplicate-index", daemon=True).start()
     start_scheduler()
+    # Index de recherche: instantané + rattrapage en arrière-plan
+    threading.Thread(target=load_search_index, name="search-index", daemon=True).start()
+    # Index sémantique: matrice projetée + rattrapage en arrière-plan
+    threading.Thread(target=load_semantic_index, name="semantic-index", daemon=True).start()
+    # Fréquences des mots-clés: amorçage depuis les documents existants
+    threading.Thread(target=bootstrap_term_stats, name="term-stats", daemon=True).start()
+    # Termes tendance: résumés horaires reconstruits depuis les documents récents
+    threading.Thread(target=warm_trending, name="trending", daemon=True).start()
     
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down Web Crawler API...")
     stop_scheduler()
+    save_search_index()
+    save_semantic_index()
+    try:
+        flush_term_stats()
+    except Exception as e:
+        logger.error(f"Error flushing term stats: {str(e)}")
+    db.close()
+    await db.close_async()
 
 app = FastAPI(
     title="Web Crawler API",
@@ -48,6 +86,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Inclure les routes
@@ -59,12 +98,14 @@ app.include_router(scheduler_router)
 app.include_router(rss_router)
 app.include_router(social_media_router)
 app.include_router(analytics_router)
+app.include_router(export_router)
 
 @app.get("/health")
 async def health_check():
-    """Vérification de santé de l'API"""
+    """Vérification de santé de l'API (avec latence de la base)"""
     return {
         "status": "healthy",
         "version": "1.0.0",
-        "message": "Web Crawler API is running"
+        "message": "Web Crawler API is running",
+        "database": await db.ping_database_async()
     }
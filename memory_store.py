@@ -0,0 +1,1270 @@
+from bson import ObjectId, Regex, Decimal128, encode, decode
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.operations import InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+from pymongo.results import InsertOneResult, InsertManyResult, UpdateResult, DeleteResult, BulkWriteResult
+from datetime import datetime, UTC, timedelta
+from decimal import Decimal
+from typing import List, Optional
+import math
+import re
+import threading
+
+# Moteur de stockage en mémoire, compatible avec le sous-ensemble de l'API
+# PyMongo utilisé par l'application (requêtes, mises à jour, bulk_write,
+# index uniques, agrégations simples). Sélectionné par STORAGE_BACKEND=memory:
+# l'API tourne alors sans MongoDB (tests, CI, tests de charge).
+#
+# Les documents sont copiés par un aller-retour BSON à l'écriture et à la
+# lecture, comme avec un vrai serveur: types BSON uniquement, dates naïves
+# en UTC tronquées à la milliseconde, aucune référence partagée.
+
+def _copy(document: dict) -> dict:
+    return decode(encode(document))
+
+# ==================== Comparaison des valeurs ====================
+
+def _normalize(value):
+    """Dates avec fuseau → UTC naïf (comme les dates relues depuis MongoDB)"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(UTC).replace(tzinfo=None)
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    return value
+
+def _bracket(value) -> int:
+    """Rang du type BSON dans l'ordre de tri de MongoDB"""
+    if value is None:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float, Decimal)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, bytes):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+def _sort_key(value):
+    value = _normalize(value)
+    rank = _bracket(value)
+    if isinstance(value, dict):
+        return rank, tuple((k, _sort_key(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return rank, tuple(_sort_key(v) for v in value)
+    if value is None:
+        return rank, 0
+    if isinstance(value, ObjectId):
+        return rank, value.binary
+    if rank == 10:
+        return rank, str(value)
+    return rank, value
+
+def _hashable(value):
+    """Clé hashable d'une valeur (index uniques, $group, distinct)"""
+    return _sort_key(value)
+
+def _compare(a, b) -> Optional[int]:
+    """Comparer deux valeurs de même type BSON (None si types différents)"""
+    a, b = _normalize(a), _normalize(b)
+    if _bracket(a) != _bracket(b):
+        return None
+    key_a, key_b = _sort_key(a), _sort_key(b)
+    return (key_a > key_b) - (key_a < key_b)
+
+def _equal(a, b) -> bool:
+    return _compare(a, b) == 0
+
+# ==================== Chemins pointés ====================
+
+def _lookup(document, path: str) -> list:
+    """Valeurs d'un chemin pointé (les tableaux de sous-documents sont parcourus)"""
+    values = [document]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit():
+                    if int(part) < len(value):
+                        found.append(value[int(part)])
+                else:
+                    found.extend(item[part] for item in value if isinstance(item, dict) and part in item)
+        values = found
+    return values
+
+def _resolve(document, path: str):
+    """Valeur d'un chemin pour les expressions d'agrégation (None si absent)"""
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list):
+            value = [item.get(part) for item in value if isinstance(item, dict) and part in item]
+        else:
+            return None
+    return value
+
+def _set_path(document: dict, path: str, value):
+    parts = path.split(".")
+    target = document
+    for part in parts[:-1]:
+        if isinstance(target, list) and part.isdigit():
+            target = target[int(part)]
+            continue
+        if not isinstance(target.get(part), (dict, list)):
+            target[part] = {}
+        target = target[part]
+    if isinstance(target, list) and parts[-1].isdigit():
+        target[int(parts[-1])] = value
+    else:
+        target[parts[-1]] = value
+
+def _get_path(document: dict, path: str):
+    """(trouvé, valeur) d'un chemin, sans parcourir les tableaux"""
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return False, None
+    return True, value
+
+def _unset_path(document: dict, path: str):
+    parent_path, _, key = path.rpartition(".")
+    found, parent = _get_path(document, parent_path) if parent_path else (True, document)
+    if found and isinstance(parent, dict):
+        parent.pop(key, None)
+
+# ==================== Filtres ====================
+
+_TYPE_NAMES = {
+    1: "double", 2: "string", 3: "object", 4: "array", 5: "binData",
+    7: "objectId", 8: "bool", 9: "date", 10: "null", 11: "regex",
+    16: "int", 18: "long"
+}
+
+def _type_name(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if -2**31 <= value < 2**31 else "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, bytes):
+        return "binData"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, (re.Pattern, Regex)):
+        return "regex"
+    return type(value).__name__
+
+def _compile_regex(pattern, options: str = "") -> re.Pattern:
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    if isinstance(pattern, Regex):
+        return pattern.try_compile()
+    flags = 0
+    for option, flag in (("i", re.IGNORECASE), ("m", re.MULTILINE), ("s", re.DOTALL), ("x", re.VERBOSE)):
+        if option in options:
+            flags |= flag
+    return re.compile(pattern, flags)
+
+def _candidates(values: list) -> list:
+    """Valeurs testées par un opérateur: la valeur et, pour un tableau, ses éléments"""
+    expanded = []
+    for value in values:
+        expanded.append(value)
+        if isinstance(value, list):
+            expanded.extend(value)
+    return expanded
+
+def _is_operator_dict(condition) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(k.startswith("$") for k in condition)
+
+def _match_equal(values: list, expected) -> bool:
+    if isinstance(expected, (re.Pattern, Regex)):
+        regex = _compile_regex(expected)
+        return any(isinstance(v, str) and regex.search(v) for v in _candidates(values))
+    if not values:
+        return expected is None
+    return any(_equal(v, expected) for v in _candidates(values))
+
+def _match_compare(values: list, expected, accept) -> bool:
+    for value in _candidates(values):
+        result = _compare(value, expected)
+        if result is not None and accept(result):
+            return True
+    return False
+
+def _match_element(item, condition) -> bool:
+    if _is_operator_dict(condition):
+        return _match_values([item], condition)
+    return isinstance(item, dict) and matches(item, condition)
+
+def _match_operator(values: list, operator: str, argument, condition: dict) -> bool:
+    if operator == "$eq":
+        return _match_equal(values, argument)
+    if operator == "$ne":
+        return not _match_equal(values, argument)
+    if operator == "$gt":
+        return _match_compare(values, argument, lambda r: r > 0)
+    if operator == "$gte":
+        return _match_compare(values, argument, lambda r: r >= 0)
+    if operator == "$lt":
+        return _match_compare(values, argument, lambda r: r < 0)
+    if operator == "$lte":
+        return _match_compare(values, argument, lambda r: r <= 0)
+    if operator == "$in":
+        return any(_match_equal(values, expected) for expected in argument)
+    if operator == "$nin":
+        return not any(_match_equal(values, expected) for expected in argument)
+    if operator == "$exists":
+        return bool(values) == bool(argument)
+    if operator == "$regex":
+        regex = _compile_regex(argument, condition.get("$options", ""))
+        return any(isinstance(v, str) and regex.search(v) for v in _candidates(values))
+    if operator == "$options":
+        return True
+    if operator == "$type":
+        expected = argument if isinstance(argument, list) else [argument]
+        names = {_TYPE_NAMES.get(name, name) for name in expected}
+        if "array" in names and any(isinstance(v, list) for v in values):
+            return True
+        found = {_type_name(v) for v in _candidates(values)}
+        if "number" in names:
+            names |= {"int", "long", "double"}
+        return bool(found & names)
+    if operator == "$not":
+        if isinstance(argument, (re.Pattern, Regex)):
+            return not _match_equal(values, argument)
+        return not _match_values(values, argument)
+    if operator == "$size":
+        return any(isinstance(v, list) and len(v) == argument for v in values)
+    if operator == "$all":
+        return all(_match_equal(values, expected) for expected in argument)
+    if operator == "$elemMatch":
+        return any(
+            isinstance(v, list) and any(_match_element(item, argument) for item in v)
+            for v in values
+        )
+    raise OperationFailure(f"unknown operator: {operator}", code=2)
+
+def _match_values(values: list, condition) -> bool:
+    if _is_operator_dict(condition):
+        return all(
+            _match_operator(values, operator, argument, condition)
+            for operator, argument in condition.items()
+        )
+    return _match_equal(values, condition)
+
+def matches(document: dict, query: Optional[dict]) -> bool:
+    """Le document vérifie-t-il le filtre MongoDB ?"""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(document, q) for q in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, q) for q in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, q) for q in condition):
+                return False
+        elif key == "$comment":
+            continue
+        elif key.startswith("$"):
+            raise OperationFailure(f"unknown top level operator: {key}", code=2)
+        elif not _match_values(_lookup(document, key), condition):
+            return False
+    return True
+
+# ==================== Projection et tri ====================
+
+def _include_path(source: dict, target: dict, parts: List[str]):
+    key = parts[0]
+    if key not in source:
+        return
+    value = source[key]
+    if len(parts) == 1:
+        target[key] = value
+    elif isinstance(value, dict):
+        _include_path(value, target.setdefault(key, {}), parts[1:])
+    elif isinstance(value, list):
+        items = [item for item in value if isinstance(item, dict)]
+        projected = target.setdefault(key, [{} for _ in items])
+        for item, out in zip(items, projected):
+            _include_path(item, out, parts[1:])
+
+def project(document: dict, projection) -> dict:
+    """Appliquer une projection (inclusion ou exclusion) à une copie du document"""
+    if not projection:
+        return document
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if any(isinstance(v, dict) for v in fields.values()):
+        raise OperationFailure("projection operators are not supported by the memory backend", code=2)
+    include_id = bool(projection.get("_id", 1))
+    inclusion = any(bool(v) for v in fields.values())
+    if inclusion and not all(bool(v) for v in fields.values()):
+        raise OperationFailure("Cannot do exclusion on field in inclusion projection", code=31254)
+
+    if inclusion:
+        result = {}
+        if include_id and "_id" in document:
+            result["_id"] = document["_id"]
+        for path in fields:
+            _include_path(document, result, path.split("."))
+        return result
+
+    for path in fields:
+        _unset_path(document, path)
+    if not include_id:
+        document.pop("_id", None)
+    return document
+
+def normalize_sort(key_or_list, direction=None) -> list:
+    """Spécification de tri pymongo ("champ", [(champ, sens)], {champ: sens}) → [(champ, sens)]"""
+    if key_or_list is None:
+        return []
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [(k, d) if isinstance(k, str) else k for k, d in key_or_list]
+
+def _field_sort_key(document: dict, field: str, descending: bool):
+    values = _lookup(document, field)
+    value = values[0] if values else None
+    if isinstance(value, list) and value:
+        pick = max if descending else min
+        value = pick(value, key=_sort_key)
+    return _sort_key(value)
+
+def sort_documents(documents: list, sort: list) -> list:
+    """Trier des documents selon [(champ, direction), ...] (tri stable, clé par clé)"""
+    for field, direction in reversed(sort):
+        if not isinstance(direction, int):
+            raise OperationFailure(f"unsupported sort direction for {field}", code=2)
+        descending = direction < 0
+        documents.sort(key=lambda document: _field_sort_key(document, field, descending), reverse=descending)
+    return documents
+
+class DocumentSortKey:
+    """Clé de tri d'un document selon [(champ, direction), ...] (fusion de flux déjà triés)"""
+
+    __slots__ = ("keys", "directions")
+
+    def __init__(self, document: dict, sort: list):
+        self.directions = [direction for _, direction in sort]
+        self.keys = [_field_sort_key(document, field, direction < 0) for field, direction in sort]
+
+    def __eq__(self, other) -> bool:
+        return self.keys == other.keys
+
+    def __lt__(self, other) -> bool:
+        for mine, theirs, direction in zip(self.keys, other.keys, self.directions):
+            if mine != theirs:
+                return mine < theirs if direction > 0 else mine > theirs
+        return False
+
+# ==================== Mises à jour ====================
+
+def _check_id_unchanged(document: dict, path: str, value):
+    if path == "_id" and "_id" in document and not _equal(document["_id"], value):
+        raise OperationFailure(
+            "Performing an update on the path '_id' would modify the immutable field '_id'",
+            code=66
+        )
+
+def apply_update(document: dict, update: dict, inserting: bool = False) -> dict:
+    """Appliquer des opérateurs de mise à jour ($set, $inc...) à un document (modifié en place)"""
+    for operator, fields in update.items():
+        if operator == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            found, current = _get_path(document, path)
+            if operator in ("$set", "$setOnInsert"):
+                _check_id_unchanged(document, path, value)
+                _set_path(document, path, value)
+            elif operator == "$unset":
+                _unset_path(document, path)
+            elif operator == "$inc":
+                _set_path(document, path, (current if found else 0) + value)
+            elif operator == "$mul":
+                _set_path(document, path, (current if found else 0) * value)
+            elif operator == "$min":
+                if not found or _sort_key(value) < _sort_key(current):
+                    _set_path(document, path, value)
+            elif operator == "$max":
+                if not found or _sort_key(value) > _sort_key(current):
+                    _set_path(document, path, value)
+            elif operator == "$currentDate":
+                _set_path(document, path, datetime.now(UTC))
+            elif operator == "$rename":
+                if found:
+                    _unset_path(document, path)
+                    _set_path(document, value, current)
+            elif operator in ("$push", "$addToSet"):
+                modifiers = value if isinstance(value, dict) and "$each" in value else {"$each": [value]}
+                array = list(current) if found else []
+                if found and not isinstance(current, list):
+                    raise OperationFailure(f"The field '{path}' must be an array", code=2)
+                items = []
+                for item in modifiers["$each"]:
+                    if operator == "$push" or not any(_equal(item, existing) for existing in array + items):
+                        items.append(item)
+                # Modificateurs de $push: $position puis $slice
+                position = modifiers.get("$position", len(array))
+                array[position:position] = items
+                if "$slice" in modifiers:
+                    size = modifiers["$slice"]
+                    array = array[:size] if size >= 0 else array[size:]
+                _set_path(document, path, array)
+            elif operator == "$pull":
+                if found and isinstance(current, list):
+                    _set_path(document, path, [
+                        item for item in current
+                        if not (_match_element(item, value) if isinstance(value, dict) else _equal(item, value))
+                    ])
+            else:
+                raise OperationFailure(f"Unknown modifier: {operator}", code=9)
+    return document
+
+def _upsert_seed(query: dict) -> dict:
+    """Document de départ d'un upsert: champs d'égalité du filtre"""
+    seed = {}
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            for sub_query in condition:
+                for path, value in _upsert_seed(sub_query).items():
+                    _set_path(seed, path, value)
+        elif key.startswith("$") or isinstance(condition, (re.Pattern, Regex)):
+            continue
+        elif _is_operator_dict(condition):
+            if "$eq" in condition:
+                _set_path(seed, key, condition["$eq"])
+        else:
+            _set_path(seed, key, condition)
+    return seed
+
+def _is_replacement(update: dict) -> bool:
+    return not any(key.startswith("$") for key in update)
+
+# ==================== Agrégation ====================
+
+def _expression_args(document, argument) -> list:
+    if not isinstance(argument, list):
+        argument = [argument]
+    return [evaluate(document, arg) for arg in argument]
+
+def _operands(args: list) -> list:
+    """Arguments d'un opérateur appliqué à un tableau ou à une liste d'expressions"""
+    return args[0] if len(args) == 1 and isinstance(args[0], list) else args
+
+def _numbers(values) -> list:
+    flat = []
+    for value in values:
+        flat.extend(value if isinstance(value, list) else [value])
+    return [v for v in flat if _bracket(v) == 2]
+
+_EXPRESSION_OPERATORS = {
+    "$add": lambda args: sum(_numbers(args)),
+    "$subtract": lambda args: args[0] - args[1],
+    "$multiply": lambda args: math.prod(_numbers(args)),
+    "$divide": lambda args: args[0] / args[1],
+    "$sum": lambda args: _accumulate("$sum", args),
+    "$avg": lambda args: _accumulate("$avg", args),
+    "$max": lambda args: _accumulate("$max", _operands(args)),
+    "$min": lambda args: _accumulate("$min", _operands(args)),
+    "$size": lambda args: len(args[0]),
+    "$ifNull": lambda args: next((v for v in args if v is not None), None),
+    "$toLower": lambda args: (args[0] or "").lower(),
+    "$toUpper": lambda args: (args[0] or "").upper(),
+    "$concat": lambda args: None if any(v is None for v in args) else "".join(args),
+    "$arrayElemAt": lambda args: args[0][args[1]] if -len(args[0]) <= args[1] < len(args[0]) else None,
+    "$in": lambda args: any(_equal(args[0], v) for v in args[1]),
+    "$eq": lambda args: _equal(args[0], args[1]),
+    "$ne": lambda args: not _equal(args[0], args[1]),
+    "$gt": lambda args: _sort_key(args[0]) > _sort_key(args[1]),
+    "$gte": lambda args: _sort_key(args[0]) >= _sort_key(args[1]),
+    "$lt": lambda args: _sort_key(args[0]) < _sort_key(args[1]),
+    "$lte": lambda args: _sort_key(args[0]) <= _sort_key(args[1]),
+    "$and": lambda args: all(args),
+    "$or": lambda args: any(args),
+    "$not": lambda args: not args[0],
+    "$dateTrunc": lambda args: _date_trunc(args[0]),
+}
+
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+def _date_trunc(options: dict):
+    """$dateTrunc (binSize 1, UTC): début de l'heure, du jour, de la semaine ou du mois"""
+    date, unit = options.get("date"), options.get("unit")
+    if date is None:
+        return None
+    if unit == "hour":
+        return date.replace(minute=0, second=0, microsecond=0)
+    if unit not in ("day", "week", "month"):
+        raise OperationFailure(f"$dateTrunc unsupported unit: {unit}", code=5439015)
+    date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "week":
+        first_day = _WEEKDAYS.index(str(options.get("startOfWeek", "sunday")).lower())
+        return date - timedelta(days=(date.weekday() - first_day) % 7)
+    if unit == "month":
+        return date.replace(day=1)
+    return date
+
+def evaluate(document: dict, expression):
+    """Évaluer une expression d'agrégation ("$champ", littéraux, opérateurs simples)"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        if expression == "$$ROOT":
+            return document
+        if expression.startswith("$$"):
+            raise OperationFailure(f"Use of undefined variable: {expression[2:]}", code=17276)
+        return _resolve(document, expression[1:])
+    if isinstance(expression, list):
+        return [evaluate(document, item) for item in expression]
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            (operator, argument), = expression.items()
+            if operator == "$literal":
+                return argument
+            if operator == "$cond":
+                if isinstance(argument, dict):
+                    argument = [argument["if"], argument["then"], argument["else"]]
+                branch = argument[1] if evaluate(document, argument[0]) else argument[2]
+                return evaluate(document, branch)
+            if operator.startswith("$"):
+                if operator not in _EXPRESSION_OPERATORS:
+                    raise OperationFailure(f"Unrecognized expression '{operator}'", code=168)
+                return _EXPRESSION_OPERATORS[operator](_expression_args(document, argument))
+        return {key: evaluate(document, value) for key, value in expression.items()}
+    return expression
+
+def _accumulate(operator: str, values: list):
+    if operator == "$sum":
+        return sum(_numbers(values))
+    if operator == "$avg":
+        numbers = _numbers(values)
+        return sum(numbers) / len(numbers) if numbers else None
+    if operator == "$min":
+        present = [v for v in values if v is not None]
+        return min(present, key=_sort_key) if present else None
+    if operator == "$max":
+        present = [v for v in values if v is not None]
+        return max(present, key=_sort_key) if present else None
+    if operator == "$first":
+        return values[0] if values else None
+    if operator == "$last":
+        return values[-1] if values else None
+    if operator == "$push":
+        return values
+    if operator == "$addToSet":
+        unique = {}
+        for value in values:
+            unique.setdefault(_hashable(value), value)
+        return list(unique.values())
+    if operator == "$count":
+        return len(values)
+    raise OperationFailure(f"unknown group operator '{operator}'", code=15952)
+
+def _group(documents: list, spec: dict) -> list:
+    groups = {}
+    for document in documents:
+        group_id = evaluate(document, spec["_id"])
+        groups.setdefault(_hashable(group_id), (group_id, []))[1].append(document)
+
+    results = []
+    for group_id, members in groups.values():
+        result = {"_id": group_id}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (operator, argument), = accumulator.items()
+            result[field] = _accumulate(operator, [evaluate(member, argument) for member in members])
+        results.append(result)
+    return results
+
+def _is_flag(value) -> bool:
+    return isinstance(value, (bool, int)) and value in (0, 1)
+
+def _project_stage(document: dict, spec: dict) -> dict:
+    fields = {k: v for k, v in spec.items() if k != "_id"}
+    if all(_is_flag(v) and not v for v in fields.values()) and _is_flag(spec.get("_id", 1)):
+        return project(document, spec)
+
+    result = {}
+    id_spec = spec.get("_id", 1)
+    if not _is_flag(id_spec):
+        result["_id"] = evaluate(document, id_spec)
+    elif id_spec and "_id" in document:
+        result["_id"] = document["_id"]
+    for field, value in fields.items():
+        if not _is_flag(value):
+            _set_path(result, field, evaluate(document, value))
+        elif value:
+            _include_path(document, result, field.split("."))
+        else:
+            raise OperationFailure("Cannot do exclusion in inclusion projection", code=31254)
+    return result
+
+def _unwind(documents: list, spec) -> list:
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec["path"][1:]
+    preserve = spec.get("preserveNullAndEmptyArrays", False)
+    index_field = spec.get("includeArrayIndex")
+
+    results = []
+    for document in documents:
+        found, value = _get_path(document, path)
+        if isinstance(value, list) and value:
+            for i, item in enumerate(value):
+                unwound = _copy(document)
+                _set_path(unwound, path, item)
+                if index_field:
+                    unwound[index_field] = i
+                results.append(unwound)
+        elif (found and value is not None and not isinstance(value, list)) or preserve:
+            if index_field:
+                document[index_field] = None
+            results.append(document)
+    return results
+
+def run_pipeline(documents: list, pipeline: list, database=None) -> list:
+    """Exécuter un pipeline d'agrégation sur une liste de documents"""
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            documents = [d for d in documents if matches(d, spec)]
+        elif name == "$project":
+            documents = [_project_stage(d, spec) for d in documents]
+        elif name in ("$addFields", "$set"):
+            for document in documents:
+                for field, expression in spec.items():
+                    _set_path(document, field, evaluate(document, expression))
+        elif name == "$unset":
+            fields = [spec] if isinstance(spec, str) else spec
+            documents = [project(d, {field: 0 for field in fields}) for d in documents]
+        elif name == "$group":
+            documents = _group(documents, spec)
+        elif name == "$sort":
+            documents = sort_documents(documents, list(spec.items()))
+        elif name == "$skip":
+            documents = documents[spec:]
+        elif name == "$limit":
+            documents = documents[:spec]
+        elif name == "$unwind":
+            documents = _unwind(documents, spec)
+        elif name == "$count":
+            documents = [{spec: len(documents)}] if documents else []
+        elif name == "$sortByCount":
+            documents = _group(documents, {"_id": spec, "count": {"$sum": 1}})
+            documents = sort_documents(documents, [("count", -1)])
+        elif name == "$facet":
+            documents = [{
+                facet: run_pipeline([_copy(d) for d in documents], sub_pipeline, database)
+                for facet, sub_pipeline in spec.items()
+            }]
+        elif name == "$unionWith":
+            if isinstance(spec, str):
+                spec = {"coll": spec}
+            other = database[spec["coll"]]
+            with other._lock:
+                union = [_copy(d) for d in other._documents.values()]
+            documents = documents + run_pipeline(union, spec.get("pipeline", []), database)
+        else:
+            raise OperationFailure(f"Unrecognized pipeline stage name: '{name}'", code=40324)
+    return documents
+
+# ==================== Curseurs ====================
+
+class MemoryCommandCursor:
+    """Curseur sur une liste de résultats déjà calculés (agrégations)"""
+
+    def __init__(self, documents: list):
+        self._documents = documents
+        self._iterator = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._documents)
+        return next(self._iterator)
+
+    def to_list(self, length: Optional[int] = None) -> list:
+        documents = list(self)
+        return documents[:length] if length else documents
+
+    def close(self):
+        self._iterator = iter(())
+
+class MemoryCursor(MemoryCommandCursor):
+    """Curseur de find(): filtre, tri, skip et limit évalués à la première lecture"""
+
+    def __init__(self, collection, filter=None, projection=None, sort=None, skip=0, limit=0):
+        super().__init__(None)
+        self._collection = collection
+        self._filter = filter or {}
+        self._projection = projection
+        self._sort = normalize_sort(sort)
+        self._skip = skip
+        self._limit = limit
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int):
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._collection._find(
+                self._filter, self._projection, self._sort, self._skip, self._limit
+            ))
+        return next(self._iterator)
+
+# ==================== Collections ====================
+
+class MemoryIndex:
+    """Index déclaré par create_index (seuls les index uniques sont maintenus)"""
+
+    def __init__(self, name: str, keys: list, unique=False, partial=None, **options):
+        self.name = name
+        self.keys = keys
+        self.unique = unique
+        self.partial = partial
+        self.options = options
+        self.entries = {}  # clé → _id (index uniques)
+
+    def key_for(self, document: dict):
+        if self.partial is not None and not matches(document, self.partial):
+            return None
+        values = []
+        for field, _ in self.keys:
+            found = _lookup(document, field)
+            values.append(_hashable(found[0] if found else None))
+        return tuple(values)
+
+    def describe(self) -> dict:
+        info = {"v": 2, "key": dict(self.keys), "name": self.name}
+        if self.unique:
+            info["unique"] = True
+        if self.partial is not None:
+            info["partialFilterExpression"] = self.partial
+        info.update(self.options)
+        return info
+
+def _index_name(keys: list) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+class MemoryCollection:
+    """Collection en mémoire (API synchrone de pymongo.collection.Collection)"""
+
+    def __init__(self, database, name: str):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+        self._documents = {}  # clé de _id → document stocké
+        self._indexes = {}
+        self._lock = threading.RLock()
+
+    # ----- Lecture -----
+
+    def _select(self, query: dict) -> list:
+        query = query if isinstance(query, dict) else {"_id": query}
+        _id = query.get("_id")
+        if len(query) == 1 and _id is not None and not isinstance(_id, (dict, re.Pattern, Regex)):
+            document = self._documents.get(_hashable(_id))
+            return [document] if document is not None else []
+        return [document for document in self._documents.values() if matches(document, query)]
+
+    def _find(self, query, projection=None, sort=None, skip=0, limit=0) -> list:
+        with self._lock:
+            documents = self._select(query)
+            if sort:
+                documents = sort_documents(documents, sort)
+            documents = documents[skip or 0:]
+            if limit:
+                documents = documents[:abs(limit)]
+            return [project(_copy(document), projection) for document in documents]
+
+    def find(self, filter=None, projection=None, skip=0, limit=0, sort=None, **kwargs) -> MemoryCursor:
+        return MemoryCursor(self, filter, projection, sort, skip, limit)
+
+    def find_one(self, filter=None, projection=None, *args, sort=None, skip=0, **kwargs) -> Optional[dict]:
+        documents = self._find(filter, projection, normalize_sort(sort), skip, 1)
+        return documents[0] if documents else None
+
+    def count_documents(self, filter: dict, skip: int = 0, limit: int = 0, **kwargs) -> int:
+        with self._lock:
+            count = max(len(self._select(filter)) - skip, 0)
+            return min(count, limit) if limit else count
+
+    def estimated_document_count(self, **kwargs) -> int:
+        return len(self._documents)
+
+    def distinct(self, key: str, filter=None, **kwargs) -> list:
+        with self._lock:
+            values = {}
+            for document in self._select(filter or {}):
+                for value in _lookup(document, key):
+                    for item in value if isinstance(value, list) else [value]:
+                        values.setdefault(_hashable(item), item)
+            return [_copy({"v": value})["v"] for value in values.values()]
+
+    def aggregate(self, pipeline: list, **kwargs) -> MemoryCommandCursor:
+        with self._lock:
+            documents = [_copy(document) for document in self._documents.values()]
+        return MemoryCommandCursor(run_pipeline(documents, pipeline, self.database))
+
+    # ----- Index -----
+
+    def create_index(self, keys, unique: bool = False, partialFilterExpression=None, name=None, **options) -> str:
+        keys = normalize_sort(keys, 1)
+        name = name or _index_name(keys)
+        with self._lock:
+            if name in self._indexes:
+                return name
+            index = MemoryIndex(name, keys, unique, partialFilterExpression, **options)
+            if unique:
+                for document in self._documents.values():
+                    self._index_check(index, document, None)
+                    self._index_add(index, document)
+            self._indexes[name] = index
+        return name
+
+    def create_indexes(self, indexes: list, **kwargs) -> list:
+        return [self.create_index(index.document["key"].items(), **{
+            k: v for k, v in index.document.items() if k != "key"
+        }) for index in indexes]
+
+    def index_information(self) -> dict:
+        info = {"_id_": {"v": 2, "key": [("_id", 1)]}}
+        for index in self._indexes.values():
+            described = index.describe()
+            described["key"] = list(described["key"].items())
+            info[index.name] = described
+        return info
+
+    def list_indexes(self) -> MemoryCommandCursor:
+        indexes = [{"v": 2, "key": {"_id": 1}, "name": "_id_"}]
+        indexes.extend(index.describe() for index in self._indexes.values())
+        return MemoryCommandCursor(indexes)
+
+    def drop_index(self, index_or_name, **kwargs):
+        name = index_or_name if isinstance(index_or_name, str) else _index_name(normalize_sort(index_or_name, 1))
+        with self._lock:
+            if self._indexes.pop(name, None) is None:
+                raise OperationFailure(f"index not found with name [{name}]", code=27)
+
+    def drop_indexes(self, **kwargs):
+        with self._lock:
+            self._indexes.clear()
+
+    def drop(self, **kwargs):
+        self.database.drop_collection(self.name)
+
+    def _index_check(self, index: MemoryIndex, document: dict, current_id):
+        key = index.key_for(document)
+        if key is None:
+            return
+        existing = index.entries.get(key)
+        if existing is not None and existing != current_id:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.full_name} index: {index.name}",
+                11000
+            )
+
+    def _index_add(self, index: MemoryIndex, document: dict):
+        key = index.key_for(document)
+        if key is not None:
+            index.entries[key] = _hashable(document["_id"])
+
+    def _index_remove(self, index: MemoryIndex, document: dict):
+        key = index.key_for(document)
+        if key is not None and index.entries.get(key) == _hashable(document["_id"]):
+            del index.entries[key]
+
+    def _unique_indexes(self) -> list:
+        return [index for index in self._indexes.values() if index.unique]
+
+    # ----- Écriture -----
+
+    def _insert(self, document: dict):
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        stored = _copy(document)
+        key = _hashable(stored["_id"])
+        if key in self._documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.full_name} index: _id_",
+                11000
+            )
+        indexes = self._unique_indexes()
+        for index in indexes:
+            self._index_check(index, stored, None)
+        for index in indexes:
+            self._index_add(index, stored)
+        self._documents[key] = stored
+        self.database._touch(self.name)
+        return stored["_id"]
+
+    def _replace(self, previous: dict, updated: dict) -> bool:
+        updated = _copy(updated)
+        if updated == previous:
+            return False
+        key = _hashable(previous["_id"])
+        indexes = self._unique_indexes()
+        for index in indexes:
+            self._index_check(index, updated, key)
+        for index in indexes:
+            self._index_remove(index, previous)
+            self._index_add(index, updated)
+        self._documents[key] = updated
+        return True
+
+    def _update(self, filter: dict, update: dict, upsert=False, multi=False, sort=None) -> dict:
+        replacement = _is_replacement(update)
+        with self._lock:
+            documents = self._select(filter)
+            if sort:
+                documents = sort_documents(documents, normalize_sort(sort))
+            if not multi:
+                documents = documents[:1]
+
+            modified = 0
+            for document in documents:
+                if replacement:
+                    updated = {"_id": document["_id"], **{k: v for k, v in update.items() if k != "_id"}}
+                else:
+                    updated = apply_update(_copy(document), update)
+                modified += self._replace(document, updated)
+
+            result = {"n": len(documents), "nModified": modified}
+            if not documents and upsert:
+                seed = _upsert_seed(filter)
+                if replacement:
+                    created = {**seed, **update} if "_id" not in update else dict(update)
+                else:
+                    created = apply_update(seed, update, inserting=True)
+                if "_id" not in created:
+                    created = {"_id": ObjectId(), **created}
+                result.update({"n": 1, "upserted": self._insert(created)})
+            return result
+
+    def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents: list, ordered: bool = True, **kwargs) -> InsertManyResult:
+        documents = list(documents)
+        self.bulk_write([InsertOne(document) for document in documents], ordered=ordered)
+        return InsertManyResult([document["_id"] for document in documents], True)
+
+    def update_one(self, filter: dict, update: dict, upsert: bool = False, sort=None, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, sort=sort), True)
+
+    def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, multi=True), True)
+
+    def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        if not _is_replacement(replacement):
+            raise ValueError("replacement can not include $ operators")
+        return UpdateResult(self._update(filter, replacement, upsert), True)
+
+    def _delete(self, filter: dict, multi: bool, sort=None) -> List[dict]:
+        with self._lock:
+            documents = self._select(filter)
+            if sort:
+                documents = sort_documents(documents, normalize_sort(sort))
+            if not multi:
+                documents = documents[:1]
+            for document in documents:
+                for index in self._unique_indexes():
+                    self._index_remove(index, document)
+                del self._documents[_hashable(document["_id"])]
+            return documents
+
+    def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        return DeleteResult({"n": len(self._delete(filter, multi=False))}, True)
+
+    def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        return DeleteResult({"n": len(self._delete(filter, multi=True))}, True)
+
+    def find_one_and_update(self, filter: dict, update: dict, projection=None, sort=None,
+                            upsert: bool = False, return_document=ReturnDocument.BEFORE, **kwargs):
+        with self._lock:
+            before = self.find_one(filter, sort=sort)
+            result = self._update(filter if before is None else {"_id": before["_id"]}, update, upsert)
+            if return_document == ReturnDocument.AFTER:
+                target = before["_id"] if before else result.get("upserted")
+                return self.find_one({"_id": target}, projection) if target is not None else None
+            return project(before, projection) if before else None
+
+    def find_one_and_delete(self, filter: dict, projection=None, sort=None, **kwargs):
+        deleted = self._delete(filter, multi=False, sort=sort)
+        return project(_copy(deleted[0]), projection) if deleted else None
+
+    def bulk_write(self, requests: list, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        result = {
+            "writeErrors": [], "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0,
+            "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []
+        }
+        with self._lock:
+            for position, request in enumerate(requests):
+                try:
+                    if isinstance(request, InsertOne):
+                        self._insert(request._doc)
+                        result["nInserted"] += 1
+                    elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+                        outcome = self._update(
+                            request._filter, request._doc, bool(request._upsert),
+                            multi=isinstance(request, UpdateMany)
+                        )
+                        if "upserted" in outcome:
+                            result["nUpserted"] += 1
+                            result["upserted"].append({"index": position, "_id": outcome["upserted"]})
+                        else:
+                            result["nMatched"] += outcome["n"]
+                            result["nModified"] += outcome["nModified"]
+                    elif isinstance(request, (DeleteOne, DeleteMany)):
+                        deleted = self._delete(request._filter, multi=isinstance(request, DeleteMany))
+                        result["nRemoved"] += len(deleted)
+                    else:
+                        raise TypeError(f"{request!r} is not a valid request")
+                except DuplicateKeyError as e:
+                    result["writeErrors"].append({
+                        "index": position, "code": e.code, "errmsg": str(e), "op": request
+                    })
+                    if ordered:
+                        break
+
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+class MemoryDatabase:
+    """Base de données en mémoire (collections créées à la première utilisation)"""
+
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+        self._collections = {}
+        self._created = set()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(self, name)
+            return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        return self[name]
+
+    def create_collection(self, name: str, **kwargs) -> MemoryCollection:
+        self._touch(name)
+        return self[name]
+
+    def _touch(self, name: str):
+        self._created.add(name)
+
+    def list_collection_names(self, **kwargs) -> list:
+        return sorted(self._created)
+
+    def drop_collection(self, name_or_collection, **kwargs):
+        name = getattr(name_or_collection, "name", name_or_collection)
+        with self._lock:
+            self._collections.pop(name, None)
+            self._created.discard(name)
+
+    def command(self, command, *args, **kwargs) -> dict:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        raise OperationFailure(f"command {name} is not supported by the memory backend", code=59)
+
+class MemoryClient:
+    """Client en mémoire: les données vivent aussi longtemps que le client"""
+
+    def __init__(self):
+        self._databases = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = MemoryDatabase(self, name)
+            return self._databases[name]
+
+    def get_database(self, name: str, **kwargs) -> MemoryDatabase:
+        return self[name]
+
+    @property
+    def admin(self) -> MemoryDatabase:
+        return self["admin"]
+
+    def drop_database(self, name_or_database):
+        with self._lock:
+            self._databases.pop(getattr(name_or_database, "name", name_or_database), None)
+
+    def close(self):
+        pass
+
+# ==================== Façade asynchrone ====================
+
+class AsyncMemoryCursor:
+    """Curseur asynchrone (API de pymongo AsyncCursor) autour d'un curseur en mémoire"""
+
+    def __init__(self, cursor: MemoryCommandCursor):
+        self._cursor = cursor
+
+    def sort(self, key_or_list, direction=None):
+        self._cursor.sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int):
+        self._cursor.skip(skip)
+        return self
+
+    def limit(self, limit: int):
+        self._cursor.limit(limit)
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length: Optional[int] = None) -> list:
+        return self._cursor.to_list(length)
+
+    async def close(self):
+        self._cursor.close()
+
+def _async_method(name: str):
+    async def method(self, *args, **kwargs):
+        return getattr(self._collection, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+class AsyncMemoryCollection:
+    """Collection en mémoire avec l'API de pymongo AsyncCollection"""
+
+    def __init__(self, collection: MemoryCollection):
+        self._collection = collection
+        self.name = collection.name
+        self.full_name = collection.full_name
+
+    def find(self, *args, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline: list, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.aggregate(pipeline, **kwargs))
+
+    async def list_indexes(self) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.list_indexes())
+
+for _name in (
+    "find_one", "count_documents", "estimated_document_count", "distinct",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "find_one_and_update", "find_one_and_delete",
+    "bulk_write", "create_index", "create_indexes", "index_information",
+    "drop_index", "drop_indexes", "drop"
+):
+    setattr(AsyncMemoryCollection, _name, _async_method(_name))
+
+class AsyncMemoryDatabase:
+    """Base de données en mémoire avec l'API de pymongo AsyncDatabase"""
+
+    def __init__(self, database: MemoryDatabase):
+        self._database = database
+        self.name = database.name
+
+    def __getitem__(self, name: str) -> AsyncMemoryCollection:
+        return AsyncMemoryCollection(self._database[name])
+
+    def __getattr__(self, name: str) -> AsyncMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs) -> AsyncMemoryCollection:
+        return self[name]
+
+    async def list_collection_names(self, **kwargs) -> list:
+        return self._database.list_collection_names()
+
+    async def drop_collection(self, name_or_collection, **kwargs):
+        self._database.drop_collection(name_or_collection)
+
+    async def command(self, command, *args, **kwargs) -> dict:
+        return self._database.command(command, *args, **kwargs)
+
+class AsyncMemoryClient:
+    """Client asynchrone partageant les données d'un MemoryClient"""
+
+    def __init__(self, client: MemoryClient):
+        self._client = client
+
+    def __getitem__(self, name: str) -> AsyncMemoryDatabase:
+        return AsyncMemoryDatabase(self._client[name])
+
+    def get_database(self, name: str, **kwargs) -> AsyncMemoryDatabase:
+        return self[name]
+
+    @property
+    def admin(self) -> AsyncMemoryDatabase:
+        return self["admin"]
+
+    async def close(self):
+        self._client.close()
@@ -0,0 +1,224 @@
+from db import collection as scraped_collection
+from ingest import register
+from bson import Binary, ObjectId
+from typing import List, Optional
+import numpy as np
+import logging
+import os
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Quasi-doublons (même communiqué repris par plusieurs flux et sites):
+# - signature MinHash des 5-grammes de mots du contenu, calculée à
+#   l'écriture (prepare_document) et stockée avec le document (minhash)
+# - index LSH en mémoire: NUM_BANDS bandes de BAND_ROWS valeurs; deux
+#   documents partageant une bande sont candidats, puis la similarité de
+#   Jaccard estimée (valeurs égales des signatures) est vérifiée
+# - groupes: chaque document reçoit le cluster_id du premier groupe dont le
+#   représentant (premier document du groupe) dépasse DUPLICATE_THRESHOLD,
+#   sinon un nouveau cluster_id; seul le représentant est gardé en mémoire
+# - un groupe ne reçoit qu'un document par source_id: les versions
+#   successives d'une source (snapshots.py) restent dans des groupes
+#   distincts, chacune est analysée et retrouvée comme un document à part;
+#   les documents sans source_id (flux RSS, scrapes manuels) ne sont pas concernés
+# - un groupe n'est enregistré qu'à l'insertion d'un de ses documents (hook
+#   d'ingestion): à la préparation, un nouveau groupe n'est que réservé
+#   (reprises préparées en même temps regroupées) et une réservation sans
+#   insertion (upsert d'une entrée déjà stockée, version déjà prise) expire
+#   après PENDING_SECONDS, sans laisser de représentant fantôme
+SHINGLE_SIZE = 5
+NUM_BANDS = 16
+BAND_ROWS = 8
+NUM_PERM = NUM_BANDS * BAND_ROWS
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+PENDING_SECONDS = 60
+_PRIME = (1 << 31) - 1  # hachage universel (a·x + b) mod p, sans dépassement sur 64 bits
+_generator = np.random.default_rng(20240601)  # graine fixe: signatures comparables entre processus
+_A = _generator.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _generator.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+def shingles(tokens: List[str]) -> set:
+    """5-grammes de mots (le texte entier s'il est plus court)"""
+    if len(tokens) <= SHINGLE_SIZE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+def minhash(tokens: List[str]) -> Optional[np.ndarray]:
+    """Signature MinHash (NUM_PERM valeurs uint32), ou None pour un texte vide"""
+    grams = shingles(tokens)
+    if not grams:
+        return None
+    hashes = np.fromiter((zlib.crc32(gram.encode("utf-8")) % _PRIME for gram in grams), dtype=np.uint64, count=len(grams))
+    signature = np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    # Par blocs: matrice temporaire bornée pour les longs documents
+    for start in range(0, len(hashes), 4096):
+        block = hashes[start:start + 4096, None]
+        np.minimum(signature, ((block * _A + _B) % _PRIME).min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Similarité de Jaccard estimée entre deux signatures"""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+def decode_signature(value) -> Optional[np.ndarray]:
+    return None if value is None else np.frombuffer(bytes(value), dtype=np.uint32)
+
+class DuplicateIndex:
+    """Index LSH des représentants de groupes de quasi-doublons"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.bands = [{} for _ in range(NUM_BANDS)]  # bande → clé → [cluster_id]
+            self.signatures = {}  # cluster_id → signature du représentant
+            self.sources = {}     # cluster_id → source_id des membres
+            self.pending = {}     # cluster_id → (signature, source_id, réservé à): groupes sans document inséré
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    @staticmethod
+    def _keys(signature: np.ndarray) -> list:
+        return [hash(signature[band * BAND_ROWS:(band + 1) * BAND_ROWS].tobytes()) for band in range(NUM_BANDS)]
+
+    def _add(self, cluster_id, signature: np.ndarray):
+        self.signatures[cluster_id] = signature
+        for band, key in zip(self.bands, self._keys(signature)):
+            band.setdefault(key, []).append(cluster_id)
+
+    def _join(self, cluster_id, source_id):
+        if source_id is not None:
+            self.sources.setdefault(cluster_id, set()).add(source_id)
+
+    def add(self, cluster_id, signature: np.ndarray, source_id=None):
+        """Enregistrer un membre d'un groupe (le premier connu en devient le représentant)"""
+        with self._lock:
+            self.pending.pop(cluster_id, None)
+            if cluster_id not in self.signatures:
+                self._add(cluster_id, signature)
+            self._join(cluster_id, source_id)
+
+    def find(self, signature: np.ndarray, threshold: float = DUPLICATE_THRESHOLD, source_id=None) -> Optional[tuple]:
+        """(cluster_id, similarité) du groupe le plus proche au-delà du seuil, ou None"""
+        with self._lock:
+            return self._find(signature, threshold, source_id)
+
+    def _find(self, signature: np.ndarray, threshold: float, source_id=None) -> Optional[tuple]:
+        candidates = dict.fromkeys(
+            cluster_id
+            for band, key in zip(self.bands, self._keys(signature))
+            for cluster_id in band.get(key, ())
+        )
+        best = None
+        for cluster_id in candidates:
+            if source_id is not None and source_id in self.sources.get(cluster_id, ()):
+                continue  # autre version de la même source
+            score = similarity(signature, self.signatures[cluster_id])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (cluster_id, score)
+        return best
+
+    def assign(self, signature: np.ndarray, source_id=None) -> ObjectId:
+        """cluster_id du groupe le plus proche sans document de source_id, ou d'un nouveau groupe réservé (enregistré par add à l'insertion)"""
+        with self._lock:
+            found = self._find(signature, DUPLICATE_THRESHOLD, source_id) or self._find_pending(signature, source_id)
+            if found:
+                return found[0]
+            cluster_id = ObjectId()
+            self.pending[cluster_id] = (signature, source_id, time.monotonic())
+            return cluster_id
+
+    def _find_pending(self, signature: np.ndarray, source_id=None) -> Optional[tuple]:
+        expired = time.monotonic() - PENDING_SECONDS
+        best = None
+        for cluster_id, (pending, pending_source, reserved_at) in list(self.pending.items()):
+            if reserved_at < expired:
+                del self.pending[cluster_id]
+                continue
+            if source_id is not None and source_id == pending_source:
+                continue
+            score = similarity(signature, pending)
+            if score >= DUPLICATE_THRESHOLD and (best is None or score > best[1]):
+                best = (cluster_id, score)
+        return best
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "clusters": len(self.signatures),
+                "pending": len(self.pending),
+                "bands": NUM_BANDS,
+                "rows_per_band": BAND_ROWS,
+                "threshold": DUPLICATE_THRESHOLD
+            }
+
+duplicate_index = DuplicateIndex()
+
+duplicates_status = {
+    "state": "empty",  # empty, loading, ready, error
+    "documents": 0,
+    "error": None
+}
+
+# Levé hors chargement: pendant le rechargement des représentants, les
+# attributions attendent (sinon chaque reprise ouvrirait un nouveau groupe)
+_loaded = threading.Event()
+_loaded.set()
+
+def cluster_fields(tokens: List[str], source_id=None) -> dict:
+    """Champs stockés avec un document: signature MinHash et cluster_id (aucun groupe pour un texte vide)"""
+    signature = minhash(tokens)
+    if signature is None:
+        return {"minhash": None, "cluster_id": None}
+    _loaded.wait()
+    return {"minhash": Binary(signature.tobytes()), "cluster_id": duplicate_index.assign(signature, source_id)}
+
+def register_clusters(documents: List[dict]):
+    """Hook d'ingestion: enregistrer le groupe des documents insérés"""
+    for doc in documents:
+        signature = decode_signature(doc.get("minhash"))
+        if signature is not None and doc.get("cluster_id") is not None:
+            duplicate_index.add(doc["cluster_id"], signature, doc.get("source_id"))
+
+register("near_duplicates", register_clusters)
+
+def begin_duplicate_index_load():
+    """Marquer l'index en chargement avant d'accepter des écritures (démarrage)"""
+    duplicates_status.update({"state": "loading", "documents": 0, "error": None})
+    _loaded.clear()
+
+def load_duplicate_index(batch_size: int = 1000):
+    """Démarrage: recharger le représentant (premier document) et les sources de chaque groupe"""
+    begin_duplicate_index_load()
+    try:
+        last_id = None
+        while True:
+            query = {"cluster_id": {"$ne": None}}
+            if last_id:
+                query["_id"] = {"$gt": last_id}
+            batch = list(
+                scraped_collection.find(query, {"minhash": 1, "cluster_id": 1, "source_id": 1})
+                .sort("_id", 1)
+                .limit(batch_size)
+            )
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+            for doc in batch:
+                signature = decode_signature(doc.get("minhash"))
+                if signature is not None:
+                    duplicate_index.add(doc["cluster_id"], signature, doc.get("source_id"))
+            duplicates_status["documents"] += len(batch)
+        duplicates_status["state"] = "ready"
+        logger.info(f"✅ Duplicate index ready: {len(duplicate_index)} clusters")
+    except Exception as e:
+        duplicates_status.update({"state": "error", "error": str(e)})
+        logger.error(f"Error loading duplicate index: {str(e)}")
+    finally:
+        _loaded.set()
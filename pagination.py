@@ -0,0 +1,52 @@
+from bson import ObjectId
+from datetime import datetime
+from typing import List, Optional
+import base64
+import json
+
+# Pagination par curseur (keyset): le curseur encode la clé de tri (champ, _id)
+# du dernier document renvoyé; la page suivante repart de cette clé au lieu de
+# sauter N documents, ce qui garde un coût constant quelle que soit la page.
+
+def encode_cursor(value, doc_id) -> str:
+    """Encoder un curseur opaque à partir de la clé de tri du dernier document"""
+    if isinstance(value, datetime):
+        payload = {"t": value.isoformat(), "id": str(doc_id)}
+    else:
+        payload = {"v": value, "id": str(doc_id)}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Décoder un curseur; lève ValueError s'il est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = datetime.fromisoformat(payload["t"]) if "t" in payload else payload["v"]
+        return value, ObjectId(payload["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def sort_spec(field: str) -> list:
+    """Tri décroissant sur (champ, _id), cohérent avec les index keyset"""
+    return [(field, -1), ("_id", -1)]
+
+def keyset_filter(mongo_filter: dict, field: str, cursor: Optional[str]) -> dict:
+    """Ajouter au filtre la condition "après le curseur" (ordre décroissant)"""
+    if not cursor:
+        return mongo_filter
+    value, doc_id = decode_cursor(cursor)
+    after = {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": doc_id}}
+    ]}
+    if not mongo_filter:
+        return after
+    return {"$and": [mongo_filter, after]}
+
+def next_cursor(documents: List[dict], field: str, limit: int) -> Optional[str]:
+    """Curseur de la page suivante, ou None si la page est la dernière"""
+    if not limit or len(documents) < limit:
+        return None
+    last = documents[-1]
+    return encode_cursor(last.get(field), last["_id"])
@@ -0,0 +1,689 @@
+from memory_store import matches, project, normalize_sort, DocumentSortKey
+from pymongo.errors import BulkWriteError
+from pymongo import operations
+from pymongo.results import InsertOneResult, InsertManyResult, UpdateResult, DeleteResult, BulkWriteResult
+from bson import ObjectId, encode
+from datetime import datetime, UTC
+from itertools import chain, islice
+from typing import List, Optional
+import heapq
+import os
+import re
+import time
+
+# Partitionnement mensuel (optionnel) de scraped_data:
+#   scraped_data_2026_10, scraped_data_2026_11, ...
+# Les écritures vont dans la partition du mois de scraped_at; les lectures
+# n'interrogent que les partitions qui recouvrent l'intervalle de scraped_at
+# du filtre. La collection scraped_data d'origine reste lue (données antérieures
+# au partitionnement). Une partition entière se supprime en O(1) (drop).
+
+BASE_COLLECTION = "scraped_data"
+PARTITION_PATTERN = re.compile(r"^scraped_data_(\d{4})_(\d{2})$")
+PARTITION_CACHE_SECONDS = 60
+
+# Index déclarés par ensure_indexes, recréés sur chaque nouvelle partition
+partition_indexes = []
+
+def partitioning_enabled() -> bool:
+    return os.getenv("SCRAPED_DATA_PARTITIONING", "none").strip().lower() == "monthly"
+
+def partition_for(date: Optional[datetime]) -> str:
+    """Nom de la partition d'une date (mois courant si absente)"""
+    date = date or datetime.now(UTC)
+    return f"{BASE_COLLECTION}_{date.year:04d}_{date.month:02d}"
+
+def _month(name: str) -> tuple:
+    year, month = PARTITION_PATTERN.match(name).groups()
+    return int(year), int(month)
+
+def _as_date(value) -> Optional[datetime]:
+    return value if isinstance(value, datetime) else None
+
+# Opérations de bulk_write sur scraped_data: celles de pymongo, qui gardent
+# aussi leurs arguments (filter, document, upsert) pour le routage par
+# partition. Utilisables telles quelles sur une collection non partitionnée.
+class RoutedOperation:
+    filter = None    # filtre (None pour une insertion)
+    document = None  # document inséré, mise à jour ou remplacement
+    upsert = False
+
+class InsertOne(RoutedOperation, operations.InsertOne):
+    def __init__(self, document, **kwargs):
+        super().__init__(document, **kwargs)
+        self.document = document
+
+class UpdateOne(RoutedOperation, operations.UpdateOne):
+    def __init__(self, filter, update, upsert: bool = False, **kwargs):
+        super().__init__(filter, update, upsert=upsert, **kwargs)
+        self.filter, self.document, self.upsert = filter, update, upsert
+
+class UpdateMany(RoutedOperation, operations.UpdateMany):
+    def __init__(self, filter, update, upsert: bool = False, **kwargs):
+        super().__init__(filter, update, upsert=upsert, **kwargs)
+        self.filter, self.document, self.upsert = filter, update, upsert
+
+class ReplaceOne(RoutedOperation, operations.ReplaceOne):
+    def __init__(self, filter, replacement, upsert: bool = False, **kwargs):
+        super().__init__(filter, replacement, upsert=upsert, **kwargs)
+        self.filter, self.document, self.upsert = filter, replacement, upsert
+
+class DeleteOne(RoutedOperation, operations.DeleteOne):
+    def __init__(self, filter, **kwargs):
+        super().__init__(filter, **kwargs)
+        self.filter = filter
+
+class DeleteMany(RoutedOperation, operations.DeleteMany):
+    def __init__(self, filter, **kwargs):
+        super().__init__(filter, **kwargs)
+        self.filter = filter
+
+def scraped_at_range(mongo_filter: Optional[dict]) -> tuple:
+    """Bornes (début, fin) de scraped_at imposées par un filtre (None: non bornée)"""
+    start, end = None, None
+    for key, condition in (mongo_filter or {}).items():
+        if key == "scraped_at":
+            if isinstance(condition, dict):
+                low = _as_date(condition.get("$gte", condition.get("$gt", condition.get("$eq"))))
+                high = _as_date(condition.get("$lte", condition.get("$lt", condition.get("$eq"))))
+            else:
+                low = high = _as_date(condition)
+            start = max(filter(None, (start, low)), default=None)
+            end = min(filter(None, (end, high)), default=None)
+        elif key == "$and":
+            for sub_filter in condition:
+                low, high = scraped_at_range(sub_filter)
+                start = max(filter(None, (start, low)), default=None)
+                end = min(filter(None, (end, high)), default=None)
+        elif key == "$or" and condition:
+            # Union des branches: bornée seulement si toutes les branches le sont
+            ranges = [scraped_at_range(sub_filter) for sub_filter in condition]
+            if all(low for low, _ in ranges):
+                start = max(filter(None, (start, min(low for low, _ in ranges))), default=None)
+            if all(high for _, high in ranges):
+                end = min(filter(None, (end, max(high for _, high in ranges))), default=None)
+    return start, end
+
+def _month_key(date: Optional[datetime]) -> Optional[tuple]:
+    return (date.year, date.month) if date else None
+
+def _filter_fields(mongo_filter: dict) -> set:
+    """Champs de premier niveau utilisés par un filtre"""
+    fields = set()
+    for key, condition in mongo_filter.items():
+        if key in ("$and", "$or", "$nor"):
+            for sub_filter in condition:
+                fields |= _filter_fields(sub_filter)
+        elif not key.startswith("$"):
+            fields.add(key.split(".")[0])
+    return fields
+
+def _upsert_date(mongo_filter: dict, update: dict) -> Optional[datetime]:
+    """scraped_at du document créé par un upsert"""
+    for operator in ("$setOnInsert", "$set"):
+        date = _as_date(update.get(operator, {}).get("scraped_at"))
+        if date:
+            return date
+    return _as_date(update.get("scraped_at")) or _as_date(mongo_filter.get("scraped_at"))
+
+def _sort_projection(projection, sort: list) -> tuple:
+    """Projection complétée des champs de tri (nécessaires à la fusion), et champs ajoutés"""
+    if not projection or not sort:
+        return projection, []
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    if not any(value for key, value in projection.items() if key != "_id"):
+        # Projection d'exclusion: les champs de tri exclus sont réintégrés
+        excluded = [field for field, _ in sort if field in projection and field != "_id"]
+        return {k: v for k, v in projection.items() if k not in excluded}, excluded
+    added = [field for field, _ in sort if field != "_id" and field not in projection]
+    return {**projection, **{field: 1 for field in added}}, added
+
+def _sort_key(sort: list):
+    return lambda document: DocumentSortKey(document, sort)
+
+def _merge(streams: list, sort: list, skip: int, limit: int, added: list):
+    """Fusionner les flux triés des partitions (heapq.merge): skip/limit, champs de tri retirés"""
+    documents = heapq.merge(*streams, key=_sort_key(sort)) if sort and len(streams) > 1 else chain(*streams)
+    for document in islice(documents, skip, skip + limit if limit else None):
+        for field in added:
+            document.pop(field, None)
+        yield document
+
+async def _achain(cursors):
+    """Flux asynchrones lus l'un après l'autre (chaque curseur ouvert à son tour)"""
+    for cursor in cursors:
+        async for document in cursor:
+            yield document
+
+async def _amerge(streams: list, sort: list, skip: int, limit: int, added: list):
+    """_merge pour des flux asynchrones"""
+    key = _sort_key(sort)
+    heap = []
+    for order, stream in enumerate(streams):
+        iterator = stream.__aiter__()
+        try:
+            document = await iterator.__anext__()
+        except StopAsyncIteration:
+            continue
+        heap.append((key(document) if sort else order, order, document, iterator))
+    heapq.heapify(heap)
+
+    position, stop = 0, skip + limit if limit else None
+    while heap:
+        _, order, document, iterator = heap[0]
+        if position >= skip:
+            for field in added:
+                document.pop(field, None)
+            yield document
+        position += 1
+        if stop is not None and position >= stop:
+            return
+        try:
+            following = await iterator.__anext__()
+        except StopAsyncIteration:
+            heapq.heappop(heap)
+            continue
+        heapq.heapreplace(heap, (key(following) if sort else order, order, following, iterator))
+
+def _merge_write_results(results: List[tuple]) -> dict:
+    """Fusionner les résultats de bulk_write par partition (index d'opération d'origine)"""
+    merged = {
+        "writeErrors": [], "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0,
+        "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []
+    }
+    for positions, result in results:
+        for field in ("nInserted", "nUpserted", "nMatched", "nModified", "nRemoved"):
+            merged[field] += result.get(field, 0)
+        merged["upserted"].extend({**item, "index": positions[item["index"]]} for item in result.get("upserted", []))
+        merged["writeErrors"].extend({**error, "index": positions[error["index"]]} for error in result.get("writeErrors", []))
+        merged["writeConcernErrors"].extend(result.get("writeConcernErrors", []))
+    merged["upserted"].sort(key=lambda item: item["index"])
+    return merged
+
+class _PartitionRouting:
+    """Choix des partitions (commun aux façades synchrone et asynchrone)"""
+
+    name = BASE_COLLECTION
+
+    def __init__(self, resolve):
+        self._resolve = resolve
+        self._names = None
+        self._loaded_at = 0.0
+
+    def forget(self):
+        """Oublier la liste des partitions (changement de client)"""
+        self._names = None
+
+    def _cache_valid(self) -> bool:
+        return self._names is not None and time.monotonic() - self._loaded_at < PARTITION_CACHE_SECONDS
+
+    def _remember(self, names):
+        self._names = sorted(name for name in names if PARTITION_PATTERN.match(name))
+        self._loaded_at = time.monotonic()
+
+    def _targets(self, names: list, mongo_filter: Optional[dict], sort: Optional[list] = None) -> List[tuple]:
+        """[(nom de collection, partition mensuelle ?)] à lire pour un filtre, dans l'ordre de lecture"""
+        start, end = scraped_at_range(mongo_filter)
+        first, last = _month_key(start), _month_key(end)
+        selected = [
+            name for name in names
+            if not (first and _month(name) < first) and not (last and _month(name) > last)
+        ]
+        # Plus récentes d'abord, sauf tri croissant par date
+        ascending = bool(sort) and sort[0][0] == "scraped_at" and sort[0][1] > 0
+        selected.sort(reverse=not ascending)
+
+        # Recherche par _id: la partition du mois de création de l'ObjectId d'abord
+        _id = (mongo_filter or {}).get("_id")
+        if isinstance(_id, ObjectId) and not sort:
+            likely = partition_for(_id.generation_time)
+            if likely in selected:
+                selected.remove(likely)
+                selected.insert(0, likely)
+        return [(BASE_COLLECTION, False)] + [(name, True) for name in selected]
+
+    @staticmethod
+    def _streams(targets: list, sort: Optional[list], open_cursor, chained) -> list:
+        """Flux triés à fusionner, un curseur par partition.
+
+        Sans tri, ou trié par date, les partitions mensuelles ne se recouvrent
+        pas: elles sont lues l'une après l'autre (chained), une partition
+        n'étant ouverte que si la page n'est pas encore complète. scraped_data
+        d'origine, qui couvre toutes les dates, reste un flux à part.
+        """
+        if not sort:
+            return [chained(open_cursor(collection) for collection, _ in targets)]
+        if sort[0][0] == "scraped_at":
+            base, monthly = targets[0], targets[1:]
+            return [open_cursor(base[0]), chained(open_cursor(collection) for collection, _ in monthly)]
+        return [open_cursor(collection) for collection, _ in targets]
+
+    @staticmethod
+    def _cursor(collection, mongo_filter: dict, projection, sort: Optional[list], wanted: int):
+        cursor = collection.find(mongo_filter, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if wanted:
+            cursor = cursor.limit(wanted)
+        return cursor
+
+    @staticmethod
+    def _needs_location(request) -> bool:
+        """Opération à appliquer dans la partition du document existant (ou d'un upsert)"""
+        if isinstance(request, InsertOne):
+            return False
+        return request.upsert or not isinstance(request, (UpdateMany, DeleteMany))
+
+    @staticmethod
+    def _operations(requests) -> list:
+        requests = list(requests)
+        for request in requests:
+            if not isinstance(request, RoutedOperation):
+                raise TypeError(f"{request!r}: partitioned bulk_write requires operations from partitions.py")
+        return requests
+
+    def _route_writes(self, requests: list, found: dict, names: list) -> dict:
+        """Répartir les opérations d'un bulk_write: {collection: [(position, opération)]}.
+
+        found: {collection: [documents (champs des filtres)]} lus pour les
+        opérations à localiser; UpdateMany et DeleteMany sans upsert sont
+        envoyés tels quels aux partitions qui recouvrent leur filtre.
+        """
+        routed = {}
+        for position, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                routed.setdefault(partition_for(request.document.get("scraped_at")), []).append((position, request))
+                continue
+            if not self._needs_location(request):
+                for name, _ in self._targets(names, request.filter):
+                    routed.setdefault(name, []).append((position, request))
+                continue
+            homes = [
+                name for name, documents in found.items()
+                if any(matches(document, request.filter) for document in documents)
+            ]
+            if isinstance(request, UpdateMany):
+                targets = homes
+            else:
+                targets = homes[:1]
+            if not targets and request.upsert:
+                targets = [partition_for(_upsert_date(request.filter, request.document))]
+            for name in targets:
+                routed.setdefault(name, []).append((position, request))
+        return routed
+
+class PartitionedCollection(_PartitionRouting):
+    """scraped_data partitionnée par mois (API synchrone de Collection)"""
+
+    def _database(self):
+        return self._resolve()
+
+    def partition_names(self) -> List[str]:
+        if not self._cache_valid():
+            self._remember(self._database().list_collection_names())
+        return self._names
+
+    def _partition(self, name: str):
+        """Collection d'écriture; une nouvelle partition reçoit les index déclarés"""
+        database = self._database()
+        if name != BASE_COLLECTION and name not in self.partition_names():
+            for keys, options in partition_indexes:
+                database[name].create_index(keys, **options)
+            self._remember(self._names + [name])
+        return database[name]
+
+    def _read(self, mongo_filter, sort=None) -> list:
+        database = self._database()
+        return [(database[name], monthly) for name, monthly in self._targets(self.partition_names(), mongo_filter, sort)]
+
+    def _locate(self, mongo_filter: dict):
+        for collection, _ in self._read(mongo_filter):
+            if collection.find_one(mongo_filter, {"_id": 1}):
+                return collection
+        return None
+
+    # ----- Lecture -----
+
+    def _find(self, mongo_filter, projection=None, sort=None, skip=0, limit=0):
+        """Documents des partitions dans l'ordre du tri, lus au fur et à mesure"""
+        mongo_filter = mongo_filter if isinstance(mongo_filter, dict) else {"_id": mongo_filter}
+        query_projection, added = _sort_projection(projection, sort)
+        wanted = skip + limit if limit else 0
+        streams = self._streams(
+            self._read(mongo_filter, sort),
+            sort,
+            lambda collection: self._cursor(collection, mongo_filter, query_projection, sort, wanted),
+            chain.from_iterable
+        )
+        return _merge(streams, sort, skip, limit, added)
+
+    def find(self, filter=None, projection=None, skip=0, limit=0, sort=None, **kwargs):
+        return PartitionedCursor(self, filter or {}, projection, normalize_sort(sort), skip, limit)
+
+    def find_one(self, filter=None, projection=None, *args, sort=None, **kwargs) -> Optional[dict]:
+        return next(self._find(filter or {}, projection, normalize_sort(sort), 0, 1), None)
+
+    def count_documents(self, filter: dict, **kwargs) -> int:
+        return sum(collection.count_documents(filter, **kwargs) for collection, _ in self._read(filter))
+
+    def estimated_document_count(self, **kwargs) -> int:
+        return sum(collection.estimated_document_count() for collection, _ in self._read({}))
+
+    def distinct(self, key: str, filter=None, **kwargs) -> list:
+        values = {}
+        for collection, _ in self._read(filter):
+            for value in collection.distinct(key, filter or {}):
+                values.setdefault(encode({"v": value}), value)
+        return list(values.values())
+
+    def aggregate(self, pipeline: list, **kwargs):
+        """Agréger sur les partitions concernées par le $match initial ($unionWith)"""
+        leading = pipeline[:1] if pipeline and "$match" in pipeline[0] else []
+        targets = self._read(leading[0]["$match"] if leading else {})
+        first, others = targets[0][0], targets[1:]
+        unions = [{"$unionWith": {"coll": collection.name, "pipeline": leading}} for collection, _ in others]
+        return first.aggregate(leading + unions + pipeline[len(leading):], **kwargs)
+
+    # ----- Écriture -----
+
+    def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        return self._partition(partition_for(document.get("scraped_at"))).insert_one(document, **kwargs)
+
+    def insert_many(self, documents: list, ordered: bool = True, **kwargs) -> InsertManyResult:
+        documents = list(documents)
+        self.bulk_write([InsertOne(document) for document in documents], ordered=ordered)
+        return InsertManyResult([document["_id"] for document in documents], True)
+
+    def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        collection = self._locate(filter)
+        if collection is None:
+            if not upsert:
+                return UpdateResult({"n": 0, "nModified": 0}, True)
+            collection = self._partition(partition_for(_upsert_date(filter, update)))
+        return collection.update_one(filter, update, upsert=upsert, **kwargs)
+
+    def update_many(self, filter: dict, update: dict, **kwargs) -> UpdateResult:
+        raw = {"n": 0, "nModified": 0}
+        for collection, _ in self._read(filter):
+            result = collection.update_many(filter, update, **kwargs)
+            raw["n"] += result.matched_count
+            raw["nModified"] += result.modified_count
+        return UpdateResult(raw, True)
+
+    def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        collection = self._locate(filter)
+        if collection is None:
+            return DeleteResult({"n": 0}, True)
+        return collection.delete_one(filter, **kwargs)
+
+    def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        deleted = sum(collection.delete_many(filter, **kwargs).deleted_count for collection, _ in self._read(filter))
+        return DeleteResult({"n": deleted}, True)
+
+    def bulk_write(self, requests: list, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        """bulk_write réparti par partition (l'ordre n'est garanti qu'au sein d'une partition)"""
+        requests = self._operations(requests)
+        # Localiser les documents visés (upserts, opérations sur un document),
+        # en arrêtant la lecture pour chaque filtre dès sa partition trouvée
+        pending = [r.filter for r in requests if self._needs_location(r)]
+        found = {}
+        if pending:
+            projection = {field: 1 for field in set().union(*(_filter_fields(f) for f in pending))}
+            for collection, _ in self._read({"$or": pending}):
+                documents = list(collection.find({"$or": pending}, projection))
+                found[collection.name] = documents
+                pending = [f for f in pending if not any(matches(document, f) for document in documents)]
+                if not pending:
+                    break
+
+        results = []
+        for name, routed in self._route_writes(requests, found, self.partition_names()).items():
+            positions = [position for position, _ in routed]
+            try:
+                result = self._partition(name).bulk_write([request for _, request in routed], ordered=ordered, **kwargs)
+                results.append((positions, result.bulk_api_result))
+            except BulkWriteError as e:
+                results.append((positions, e.details))
+
+        merged = _merge_write_results(results)
+        if merged["writeErrors"]:
+            raise BulkWriteError(merged)
+        return BulkWriteResult(merged, True)
+
+    # ----- Index et partitions -----
+
+    def create_index(self, keys, **options) -> str:
+        """Déclarer un index: créé sur scraped_data, les partitions existantes et futures"""
+        if (keys, options) not in partition_indexes:
+            partition_indexes.append((keys, options))
+        database = self._database()
+        for name in self.partition_names():
+            database[name].create_index(keys, **options)
+        return database[BASE_COLLECTION].create_index(keys, **options)
+
+    def list_partitions(self) -> List[dict]:
+        """Partitions mensuelles (la plus récente d'abord) avec leur nombre de documents"""
+        self.forget()
+        database = self._database()
+        return [
+            {"partition": name, "documents": database[name].estimated_document_count()}
+            for name in reversed(self.partition_names())
+        ]
+
+    def drop_partition(self, name: str):
+        """Supprimer une partition mensuelle entière (O(1))"""
+        if not PARTITION_PATTERN.match(name):
+            raise ValueError(f"Invalid partition name: {name}")
+        self._database().drop_collection(name)
+        self.forget()
+
+    def drop_empty_partitions(self) -> List[str]:
+        """Supprimer les partitions vidées (par la rétention), sauf celle du mois courant"""
+        current = partition_for(None)
+        dropped = [
+            partition["partition"] for partition in self.list_partitions()
+            if partition["documents"] == 0 and partition["partition"] != current
+        ]
+        for name in dropped:
+            self.drop_partition(name)
+        return dropped
+
+class PartitionedCursor:
+    """Curseur de find() réparti sur les partitions (fusion à la lecture)"""
+
+    def __init__(self, collection, mongo_filter, projection, sort, skip, limit):
+        self._collection = collection
+        self._filter = mongo_filter
+        self._projection = projection
+        self._sort = sort
+        self._skip = skip
+        self._limit = limit
+        self._iterator = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int):
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def _documents(self):
+        return self._collection._find(self._filter, self._projection, self._sort, self._skip, self._limit)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = self._documents()
+        return next(self._iterator)
+
+    def to_list(self, length: Optional[int] = None) -> list:
+        documents = list(self)
+        return documents[:length] if length else documents
+
+class AsyncPartitionedCollection(_PartitionRouting):
+    """scraped_data partitionnée par mois (API de AsyncCollection)"""
+
+    def _database(self):
+        return self._resolve()
+
+    async def partition_names(self) -> List[str]:
+        if not self._cache_valid():
+            self._remember(await self._database().list_collection_names())
+        return self._names
+
+    async def _partition(self, name: str):
+        database = self._database()
+        if name != BASE_COLLECTION and name not in await self.partition_names():
+            for keys, options in partition_indexes:
+                await database[name].create_index(keys, **options)
+            self._remember(self._names + [name])
+        return database[name]
+
+    async def _read(self, mongo_filter, sort=None) -> list:
+        database = self._database()
+        names = await self.partition_names()
+        return [(database[name], monthly) for name, monthly in self._targets(names, mongo_filter, sort)]
+
+    async def _locate(self, mongo_filter: dict):
+        for collection, _ in await self._read(mongo_filter):
+            if await collection.find_one(mongo_filter, {"_id": 1}):
+                return collection
+        return None
+
+    # ----- Lecture -----
+
+    async def _find(self, mongo_filter, projection=None, sort=None, skip=0, limit=0):
+        """Documents des partitions dans l'ordre du tri, lus au fur et à mesure"""
+        mongo_filter = mongo_filter if isinstance(mongo_filter, dict) else {"_id": mongo_filter}
+        query_projection, added = _sort_projection(projection, sort)
+        wanted = skip + limit if limit else 0
+        streams = self._streams(
+            await self._read(mongo_filter, sort),
+            sort,
+            lambda collection: self._cursor(collection, mongo_filter, query_projection, sort, wanted),
+            _achain
+        )
+        async for document in _amerge(streams, sort, skip, limit, added):
+            yield document
+
+    def find(self, filter=None, projection=None, skip=0, limit=0, sort=None, **kwargs):
+        return AsyncPartitionedCursor(self, filter or {}, projection, normalize_sort(sort), skip, limit)
+
+    async def find_one(self, filter=None, projection=None, *args, sort=None, **kwargs) -> Optional[dict]:
+        async for document in self._find(filter or {}, projection, normalize_sort(sort), 0, 1):
+            return document
+        return None
+
+    async def count_documents(self, filter: dict, **kwargs) -> int:
+        return sum([await collection.count_documents(filter, **kwargs) for collection, _ in await self._read(filter)])
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return sum([await collection.estimated_document_count() for collection, _ in await self._read({})])
+
+    async def distinct(self, key: str, filter=None, **kwargs) -> list:
+        values = {}
+        for collection, _ in await self._read(filter):
+            for value in await collection.distinct(key, filter or {}):
+                values.setdefault(encode({"v": value}), value)
+        return list(values.values())
+
+    async def aggregate(self, pipeline: list, **kwargs):
+        leading = pipeline[:1] if pipeline and "$match" in pipeline[0] else []
+        targets = await self._read(leading[0]["$match"] if leading else {})
+        first, others = targets[0][0], targets[1:]
+        unions = [{"$unionWith": {"coll": collection.name, "pipeline": leading}} for collection, _ in others]
+        return await first.aggregate(leading + unions + pipeline[len(leading):], **kwargs)
+
+    # ----- Écriture -----
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        collection = await self._partition(partition_for(document.get("scraped_at")))
+        return await collection.insert_one(document, **kwargs)
+
+    async def insert_many(self, documents: list, ordered: bool = True, **kwargs) -> InsertManyResult:
+        documents = list(documents)
+        await self.bulk_write([InsertOne(document) for document in documents], ordered=ordered)
+        return InsertManyResult([document["_id"] for document in documents], True)
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        collection = await self._locate(filter)
+        if collection is None:
+            if not upsert:
+                return UpdateResult({"n": 0, "nModified": 0}, True)
+            collection = await self._partition(partition_for(_upsert_date(filter, update)))
+        return await collection.update_one(filter, update, upsert=upsert, **kwargs)
+
+    async def update_many(self, filter: dict, update: dict, **kwargs) -> UpdateResult:
+        raw = {"n": 0, "nModified": 0}
+        for collection, _ in await self._read(filter):
+            result = await collection.update_many(filter, update, **kwargs)
+            raw["n"] += result.matched_count
+            raw["nModified"] += result.modified_count
+        return UpdateResult(raw, True)
+
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        collection = await self._locate(filter)
+        if collection is None:
+            return DeleteResult({"n": 0}, True)
+        return await collection.delete_one(filter, **kwargs)
+
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        deleted = 0
+        for collection, _ in await self._read(filter):
+            deleted += (await collection.delete_many(filter, **kwargs)).deleted_count
+        return DeleteResult({"n": deleted}, True)
+
+    async def bulk_write(self, requests: list, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        requests = self._operations(requests)
+        pending = [r.filter for r in requests if self._needs_location(r)]
+        found = {}
+        if pending:
+            projection = {field: 1 for field in set().union(*(_filter_fields(f) for f in pending))}
+            for collection, _ in await self._read({"$or": pending}):
+                documents = await collection.find({"$or": pending}, projection).to_list(None)
+                found[collection.name] = documents
+                pending = [f for f in pending if not any(matches(document, f) for document in documents)]
+                if not pending:
+                    break
+
+        results = []
+        for name, routed in self._route_writes(requests, found, await self.partition_names()).items():
+            positions = [position for position, _ in routed]
+            collection = await self._partition(name)
+            try:
+                result = await collection.bulk_write([request for _, request in routed], ordered=ordered, **kwargs)
+                results.append((positions, result.bulk_api_result))
+            except BulkWriteError as e:
+                results.append((positions, e.details))
+
+        merged = _merge_write_results(results)
+        if merged["writeErrors"]:
+            raise BulkWriteError(merged)
+        return BulkWriteResult(merged, True)
+
+class AsyncPartitionedCursor(PartitionedCursor):
+    """Curseur asynchrone réparti sur les partitions"""
+
+    async def to_list(self, length: Optional[int] = None) -> list:
+        documents = []
+        async for document in self:
+            documents.append(document)
+            if length and len(documents) >= length:
+                break
+        return documents
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = self._documents()
+        return await self._iterator.__anext__()
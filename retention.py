@@ -0,0 +1,219 @@
+from db import collection as scraped_collection, sources_collection, rss_tombstones_collection, db
+from partitions import partitioning_enabled
+from archive import write_archive
+from ingest import documents_deleted
+from datetime import datetime, UTC, timedelta
+from typing import List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Politique de rétention (lue dans crawler_config):
+# - retention_days: fenêtre "chaude" globale en jours (None: conservation illimitée)
+# - source_retention_days: surcharges par source {id de source: jours}
+# - archive_expired: True → les documents expirés sont archivés sur disque
+#   (archive.py) puis supprimés par le job de rétention; False → expiration
+#   pure: les documents reçoivent expire_at à l'écriture et l'index TTL les supprime.
+# Les versions de snapshots encore nécessaires pour reconstruire une version
+# récente (keyframe + deltas) ne sont jamais supprimées.
+# Les entrées RSS supprimées laissent une pierre tombale (rss_tombstones,
+# clé entry_key): un flux qui les liste encore ne les réinsère pas. Elles sont
+# donc toujours supprimées par ce job (jamais par l'index TTL, qui ne laisse
+# pas de trace).
+
+retention_policy = {
+    "retention_days": None,
+    "archive_expired": True,
+    "sources": []  # [{"_id", "name", "days"}]
+}
+
+retention_status = {
+    "running": False,
+    "archived": 0,
+    "deleted": 0,
+    "files": 0,
+    "dropped_partitions": [],
+    "started_at": None,
+    "finished_at": None,
+    "error": None
+}
+
+def load_policy(config: dict) -> dict:
+    """Charger la politique de rétention depuis la configuration du crawler"""
+    overrides = {}
+    for source_id, days in (config.get("source_retention_days") or {}).items():
+        try:
+            overrides[ObjectId(source_id)] = days
+        except Exception:
+            logger.warning(f"Ignoring retention override for invalid source id {source_id}")
+
+    sources = []
+    if overrides:
+        for source in sources_collection.find({"_id": {"$in": list(overrides)}}, {"name": 1}):
+            sources.append({"_id": source["_id"], "name": source.get("name"), "days": overrides[source["_id"]]})
+
+    retention_policy.update({
+        "retention_days": config.get("retention_days"),
+        "archive_expired": config.get("archive_expired", True),
+        "sources": sources
+    })
+    return retention_policy
+
+def refresh_policy() -> dict:
+    """Relire la politique de rétention en base"""
+    return load_policy(db["crawler_config"].find_one({}) or {})
+
+def describe_policy() -> dict:
+    """Politique de rétention en cours (sérialisable)"""
+    return {
+        "retention_days": retention_policy["retention_days"],
+        "archive_expired": retention_policy["archive_expired"],
+        "source_retention_days": {str(s["_id"]): s["days"] for s in retention_policy["sources"]}
+    }
+
+def retention_days_for(document: dict) -> Optional[int]:
+    """Fenêtre de rétention applicable à un document (surcharge de sa source ou globale)"""
+    for source in retention_policy["sources"]:
+        if document.get("source_id") == source["_id"] or (
+            source["name"] and document.get("source_name") == source["name"]
+        ):
+            return source["days"]
+    return retention_policy["retention_days"]
+
+def expire_at_for(document: dict) -> Optional[datetime]:
+    """Date d'expiration TTL d'un document (expiration pure, documents non versionnés)"""
+    if retention_policy["archive_expired"] or "version" in document or "entry_key" in document:
+        return None
+    days = retention_days_for(document)
+    if not days:
+        return None
+    return (document.get("scraped_at") or datetime.now(UTC)) + timedelta(days=days)
+
+def _policy_rules(policy: dict) -> List[tuple]:
+    """(filtre, jours) de chaque règle: surcharges par source, puis règle globale"""
+    rules = []
+    for source in policy["sources"]:
+        clauses = [{"source_id": source["_id"]}]
+        if source["name"]:
+            clauses.append({"source_name": source["name"]})
+        if source["days"]:
+            rules.append(({"$or": clauses}, source["days"]))
+
+    if policy["retention_days"]:
+        global_filter = {}
+        if policy["sources"]:
+            global_filter = {
+                "source_id": {"$nin": [s["_id"] for s in policy["sources"]]},
+                "source_name": {"$nin": [s["name"] for s in policy["sources"] if s["name"]]}
+            }
+        rules.append((global_filter, policy["retention_days"]))
+    return rules
+
+def _snapshot_floor(source_id, cutoff: datetime) -> int:
+    """Première version à conserver pour reconstruire les versions récentes d'une source"""
+    versions = {"source_id": source_id, "version": {"$exists": True}}
+    oldest_hot = scraped_collection.find_one(
+        {**versions, "scraped_at": {"$gte": cutoff}},
+        {"version": 1, "keyframe_version": 1},
+        sort=[("version", 1)]
+    )
+    # Sans version récente, la dernière version reste la base des prochains deltas
+    if oldest_hot is None:
+        oldest_hot = scraped_collection.find_one(versions, {"version": 1, "keyframe_version": 1}, sort=[("version", -1)])
+    if oldest_hot is None:
+        return 0
+    return oldest_hot.get("keyframe_version", oldest_hot["version"])
+
+def bury_rss_entries(documents: List[dict]):
+    """Pierres tombales des entrées RSS supprimées (avant la suppression)"""
+    now = datetime.now(UTC)
+    operations = [
+        UpdateOne({"_id": doc["entry_key"]}, {"$set": {"deleted_at": now}}, upsert=True)
+        for doc in documents
+        if doc.get("entry_key")
+    ]
+    if operations:
+        rss_tombstones_collection.bulk_write(operations, ordered=False)
+
+def expire_documents(mongo_filter: dict, cutoff: datetime, archive: bool, batch_size: int = 500, floors=None):
+    """Archiver (optionnel) puis supprimer par lots les documents antérieurs à cutoff"""
+    floors = {} if floors is None else floors
+    expired_filter = {"$and": [mongo_filter, {"scraped_at": {"$lt": cutoff}}]}
+    last = None
+    while True:
+        page_filter = expired_filter
+        if last:
+            page_filter = {"$and": [expired_filter, {"$or": [
+                {"scraped_at": {"$gt": last[0]}},
+                {"scraped_at": last[0], "_id": {"$gt": last[1]}}
+            ]}]}
+        batch = list(
+            scraped_collection.find(page_filter)
+            .sort([("scraped_at", 1), ("_id", 1)])
+            .limit(batch_size)
+        )
+        if not batch:
+            return
+        last = (batch[-1]["scraped_at"], batch[-1]["_id"])
+
+        expired = []
+        for doc in batch:
+            if "version" in doc:
+                source_id = doc.get("source_id")
+                if source_id not in floors:
+                    floors[source_id] = _snapshot_floor(source_id, cutoff)
+                if doc["version"] >= floors[source_id]:
+                    continue
+            expired.append(doc)
+        if not expired:
+            continue
+
+        # Archive écrite sur disque avant toute suppression
+        if archive:
+            retention_status["files"] += len(write_archive("scraped_data", expired))
+            retention_status["archived"] += len(expired)
+        bury_rss_entries(expired)
+        scraped_collection.delete_many({"_id": {"$in": [doc["_id"] for doc in expired]}})
+        documents_deleted(expired)
+        retention_status["deleted"] += len(expired)
+
+def run_retention(batch_size: int = 500) -> dict:
+    """Appliquer la politique de rétention à scraped_data"""
+    retention_status.update({
+        "running": True,
+        "archived": 0,
+        "deleted": 0,
+        "files": 0,
+        "dropped_partitions": [],
+        "started_at": datetime.now(UTC),
+        "finished_at": None,
+        "error": None
+    })
+    try:
+        policy = refresh_policy()
+        if policy["archive_expired"]:
+            # Repasser en mode archive: plus aucune expiration TTL sans archive
+            scraped_collection.update_many({"expire_at": {"$exists": True}}, {"$unset": {"expire_at": ""}})
+
+        now = datetime.now(UTC)
+        floors = {}
+        for mongo_filter, days in _policy_rules(policy):
+            expire_documents(mongo_filter, now - timedelta(days=days), policy["archive_expired"], batch_size, floors)
+        if partitioning_enabled():
+            # Partitions mensuelles vidées par la rétention: suppression en O(1)
+            retention_status["dropped_partitions"] = scraped_collection.drop_empty_partitions()
+
+        logger.info(
+            f"Retention: {retention_status['archived']} documents archived, "
+            f"{retention_status['deleted']} deleted"
+        )
+        return dict(retention_status)
+    except Exception as e:
+        retention_status["error"] = str(e)
+        logger.error(f"Error applying retention policy: {str(e)}")
+        raise
+    finally:
+        retention_status["running"] = False
+        retention_status["finished_at"] = datetime.now(UTC)
@@ -1,7 +1,10 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, ConfigDict
 from typing import List, Optional, Dict, Any
-from db import db
+from db import async_db as db
+from doc_format import fill_text_fields_async
+from pagination import keyset_filter, next_cursor, sort_spec
 from datetime import datetime, UTC
 from bson import ObjectId
 import os
@@ -153,32 +156,41 @@ Réponds UNIQUEMENT en JSON avec ce format exact:
 # ==================== Routes ====================
 
 @router.post("/analyze-document", response_model=DocumentAnalysis)
-def analyze_single_document(request: AnalyzeRequest):
+async def analyze_single_document(request: AnalyzeRequest):
     """Analyser un document spécifique avec LLM"""
     try:
         scraped_collection = db["scraped_data"]
-        doc = scraped_collection.find_one({"_id": ObjectId(request.document_id)})
+        doc = await scraped_collection.find_one(
+            {"_id": ObjectId(request.document_id)},
+            {"content_text": 1, "cluster_id": 1}
+        )
         
         if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Extraire le contenu
-        content = ""
-        if "data" in doc and isinstance(doc["data"], list):
-            content = " ".join([str(item.get("value", "")) for item in doc["data"]])
-        elif "content" in doc:
-            content = doc["content"]
+        # Quasi-doublon d'un document déjà analysé: analyse du représentant réutilisée
+        analysis_collection = db["document_analysis"]
+        if doc.get("cluster_id"):
+            existing = await analysis_collection.find_one({"cluster_id": doc["cluster_id"]})
+            if existing:
+                return DocumentAnalysis(
+                    document_id=request.document_id,
+                    **{field: existing[field] for field in ("summary", "sentiment", "category", "keywords", "entities")}
+                )
+        
+        # Contenu précalculé à l'ingestion
+        content = (await fill_text_fields_async([doc], ("content_text",)))[0]["content_text"]
         
         if not content:
             raise HTTPException(status_code=400, detail="No content to analyze")
         
         # Analyser avec LLM
-        analysis = analyze_document_with_llm(content)
+        analysis = await run_in_threadpool(analyze_document_with_llm, content)
         
         # Sauvegarder l'analyse
-        analysis_collection = db["document_analysis"]
         analysis_doc = {
             "document_id": ObjectId(request.document_id),
+            "cluster_id": doc.get("cluster_id"),
             "summary": analysis["summary"],
             "sentiment": analysis["sentiment"],
             "category": analysis["category"],
@@ -186,7 +198,7 @@ def analyze_single_document(request: AnalyzeRequest):
             "entities": analysis["entities"],
             "analyzed_at": datetime.now(UTC)
         }
-        analysis_collection.update_one(
+        await analysis_collection.update_one(
             {"document_id": ObjectId(request.document_id)},
             {"$set": analysis_doc},
             upsert=True
@@ -203,36 +215,45 @@ def analyze_single_document(request: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 @router.post("/analyze-batch")
-def analyze_batch_documents(request: BatchAnalyzeRequest):
+async def analyze_batch_documents(request: BatchAnalyzeRequest):
     """Analyser plusieurs documents en batch"""
     try:
         scraped_collection = db["scraped_data"]
         analysis_collection = db["document_analysis"]
         
-        # Récupérer les documents non analysés
-        analyzed_ids = [doc["document_id"] for doc in analysis_collection.find({}, {"document_id": 1})]
-        documents = list(scraped_collection.find(
-            {"_id": {"$nin": analyzed_ids}}
-        ).limit(request.limit))
+        # Récupérer les documents non analysés: un représentant (le plus ancien)
+        # par groupe de quasi-doublons, hors groupes déjà analysés
+        analyzed_ids = await analysis_collection.distinct("document_id")
+        analyzed_clusters = [c for c in await analysis_collection.distinct("cluster_id") if c is not None]
+        cursor = scraped_collection.find(
+            {"_id": {"$nin": analyzed_ids}, "cluster_id": {"$nin": analyzed_clusters}},
+            {"content_text": 1, "cluster_id": 1}
+        ).sort("_id", 1)
+        documents, clusters = [], set()
+        async for doc in cursor:
+            if doc.get("cluster_id"):
+                if doc["cluster_id"] in clusters:
+                    continue
+                clusters.add(doc["cluster_id"])
+            documents.append(doc)
+            if request.limit and len(documents) >= request.limit:
+                break
+        await fill_text_fields_async(documents, ("content_text",))
         
         results = []
         for doc in documents:
-            # Extraire le contenu
-            content = ""
-            if "data" in doc and isinstance(doc["data"], list):
-                content = " ".join([str(item.get("value", "")) for item in doc["data"]])
-            elif "content" in doc:
-                content = doc["content"]
+            content = doc["content_text"]
             
             if not content:
                 continue
             
             # Analyser
-            analysis = analyze_document_with_llm(content)
+            analysis = await run_in_threadpool(analyze_document_with_llm, content)
             
             # Sauvegarder
             analysis_doc = {
                 "document_id": doc["_id"],
+                "cluster_id": doc.get("cluster_id"),
                 "summary": analysis["summary"],
                 "sentiment": analysis["sentiment"],
                 "category": analysis["category"],
@@ -240,7 +261,7 @@ def analyze_batch_documents(request: BatchAnalyzeRequest):
                 "entities": analysis["entities"],
                 "analyzed_at": datetime.now(UTC)
             }
-            analysis_collection.insert_one(analysis_doc)
+            await analysis_collection.insert_one(analysis_doc)
             
             results.append({
                 "document_id": str(doc["_id"]),
@@ -256,26 +277,26 @@ def analyze_batch_documents(request: BatchAnalyzeRequest):
         raise HTTPException(status_code=500, detail=f"Batch analysis error: {str(e)}")
 
 @router.get("/stats", response_model=AnalyticsStats)
-def get_analytics_stats():
+async def get_analytics_stats():
     """Obtenir les statistiques d'analyse"""
     try:
         analysis_collection = db["document_analysis"]
         
         # Compter total
-        total = analysis_collection.count_documents({})
+        total = await analysis_collection.count_documents({})
         
         # Distribution des sentiments
         sentiment_pipeline = [
             {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}}
         ]
-        sentiment_results = list(analysis_collection.aggregate(sentiment_pipeline))
+        sentiment_results = await (await analysis_collection.aggregate(sentiment_pipeline)).to_list(None)
         sentiment_dist = {item["_id"]: item["count"] for item in sentiment_results}
         
         # Distribution des catégories
         category_pipeline = [
             {"$group": {"_id": "$category", "count": {"$sum": 1}}}
         ]
-        category_results = list(analysis_collection.aggregate(category_pipeline))
+        category_results = await (await analysis_collection.aggregate(category_pipeline)).to_list(None)
         category_dist = {item["_id"]: item["count"] for item in category_results}
         
         # Top keywords
@@ -285,7 +306,7 @@ def get_analytics_stats():
             {"$sort": {"count": -1}},
             {"$limit": 20}
         ]
-        keyword_results = list(analysis_collection.aggregate(keyword_pipeline))
+        keyword_results = await (await analysis_collection.aggregate(keyword_pipeline)).to_list(None)
         top_keywords = [{"keyword": item["_id"], "count": item["count"]} for item in keyword_results]
         
         return AnalyticsStats(
@@ -299,18 +320,24 @@ def get_analytics_stats():
         raise HTTPException(status_code=500, detail=f"Stats error: {str(e)}")
 
 @router.get("/documents-by-category/{category}")
-def get_documents_by_category(category: str, limit: int = 50):
+async def get_documents_by_category(category: str, limit: int = 50, cursor: Optional[str] = None):
     """Récupérer les documents d'une catégorie spécifique"""
     try:
         analysis_collection = db["document_analysis"]
         scraped_collection = db["scraped_data"]
         
-        # Trouver les analyses de cette catégorie
-        analyses = list(analysis_collection.find({"category": category}).limit(limit))
+        # Trouver les analyses de cette catégorie (pagination par curseur)
+        analyses = await (
+            analysis_collection
+            .find(keyset_filter({"category": category}, "analyzed_at", cursor))
+            .sort(sort_spec("analyzed_at"))
+            .limit(limit)
+            .to_list(None)
+        )
         
         results = []
         for analysis in analyses:
-            doc = scraped_collection.find_one({"_id": analysis["document_id"]})
+            doc = await scraped_collection.find_one({"_id": analysis["document_id"]})
             if doc:
                 results.append({
                     "document_id": str(doc["_id"]),
@@ -324,14 +351,17 @@ def get_documents_by_category(category: str, limit: int = 50):
         return {
             "category": category,
             "count": len(results),
-            "documents": results
+            "documents": results,
+            "next_cursor": next_cursor(analyses, "analyzed_at", limit)
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.get("/search-by-keywords")
-def search_by_keywords(keywords: str, limit: int = 20):
+async def search_by_keywords(keywords: str, limit: int = 20, cursor: Optional[str] = None):
     """Recherche sémantique par mots-clés extraits"""
     try:
         analysis_collection = db["document_analysis"]
@@ -339,13 +369,17 @@ def search_by_keywords(keywords: str, limit: int = 20):
         
         # Rechercher dans les keywords
         keyword_list = [kw.strip() for kw in keywords.split(",")]
-        analyses = list(analysis_collection.find(
-            {"keywords": {"$in": keyword_list}}
-        ).limit(limit))
+        analyses = await (
+            analysis_collection
+            .find(keyset_filter({"keywords": {"$in": keyword_list}}, "analyzed_at", cursor))
+            .sort(sort_spec("analyzed_at"))
+            .limit(limit)
+            .to_list(None)
+        )
         
         results = []
         for analysis in analyses:
-            doc = scraped_collection.find_one({"_id": analysis["document_id"]})
+            doc = await scraped_collection.find_one({"_id": analysis["document_id"]})
             if doc:
                 results.append({
                     "document_id": str(doc["_id"]),
@@ -359,8 +393,11 @@ def search_by_keywords(keywords: str, limit: int = 20):
         return {
             "searched_keywords": keyword_list,
             "count": len(results),
-            "results": results
+            "results": results,
+            "next_cursor": next_cursor(analyses, "analyzed_at", limit)
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
-from db import db
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Optional
+from db import async_db as db
+from retention import load_policy
 from datetime import datetime, UTC
 from bson import ObjectId
 
@@ -17,6 +19,9 @@ class CrawlerConfig(BaseModel):
     retry_count: int = 3  # nombre de tentatives en cas d'erreur
     retry_delay: int = 5  # délai entre les tentatives (secondes)
     enabled: bool = True
+    retention_days: Optional[int] = None  # fenêtre "chaude" en jours (None: illimitée)
+    source_retention_days: Dict[str, int] = {}  # surcharges par source (id → jours)
+    archive_expired: bool = True  # archiver avant suppression (False: expiration TTL)
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -37,10 +42,10 @@ class CrawlerStats(BaseModel):
 
 # ==================== Routes ====================
 
-def get_or_create_config():
+async def get_or_create_config():
     """Obtenir ou créer la configuration par défaut"""
     config_collection = db["crawler_config"]
-    config = config_collection.find_one({})
+    config = await config_collection.find_one({})
     
     if not config:
         default_config = {
@@ -50,26 +55,29 @@ def get_or_create_config():
             "retry_count": 3,
             "retry_delay": 5,
             "enabled": True,
+            "retention_days": None,
+            "source_retention_days": {},
+            "archive_expired": True,
             "created_at": datetime.now(UTC),
             "updated_at": datetime.now(UTC)
         }
-        result = config_collection.insert_one(default_config)
-        config = config_collection.find_one({"_id": result.inserted_id})
+        result = await config_collection.insert_one(default_config)
+        config = await config_collection.find_one({"_id": result.inserted_id})
     
     return config
 
 @router.get("/", response_model=CrawlerConfigResponse)
-def get_config():
+async def get_config():
     """Récupérer la configuration du crawler"""
     try:
-        config = get_or_create_config()
+        config = await get_or_create_config()
         config["id"] = str(config["_id"])
         return config
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting config: {str(e)}")
 
 @router.put("/", response_model=CrawlerConfigResponse)
-def update_config(crawler_config: CrawlerConfig):
+async def update_config(crawler_config: CrawlerConfig):
     """Mettre à jour la configuration du crawler"""
     try:
         config_collection = db["crawler_config"]
@@ -79,52 +87,54 @@ def update_config(crawler_config: CrawlerConfig):
             "updated_at": datetime.now(UTC)
         }
         
-        config = config_collection.find_one({})
+        config = await config_collection.find_one({})
         
         if not config:
             # Créer une nouvelle config
             update_data["created_at"] = datetime.now(UTC)
-            result = config_collection.insert_one(update_data)
-            config = config_collection.find_one({"_id": result.inserted_id})
+            result = await config_collection.insert_one(update_data)
+            config = await config_collection.find_one({"_id": result.inserted_id})
         else:
             # Mettre à jour la config existante
-            config_collection.update_one(
+            await config_collection.update_one(
                 {"_id": config["_id"]},
                 {"$set": update_data}
             )
-            config = config_collection.find_one({"_id": config["_id"]})
+            config = await config_collection.find_one({"_id": config["_id"]})
         
+        await run_in_threadpool(load_policy, config)
         config["id"] = str(config["_id"])
         return config
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error updating config: {str(e)}")
 
 @router.post("/reset", response_model=CrawlerConfigResponse)
-def reset_config():
+async def reset_config():
     """Réinitialiser la configuration par défaut"""
     try:
         config_collection = db["crawler_config"]
-        config_collection.delete_many({})
+        await config_collection.delete_many({})
         
-        config = get_or_create_config()
+        config = await get_or_create_config()
+        await run_in_threadpool(load_policy, config)
         config["id"] = str(config["_id"])
         return config
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error resetting config: {str(e)}")
 
 @router.get("/stats", response_model=CrawlerStats)
-def get_crawler_stats():
+async def get_crawler_stats():
     """Obtenir les statistiques du crawler"""
     try:
         sources_collection = db["sources"]
         scraped_collection = db["scraped_data"]
         
-        total_sources = sources_collection.count_documents({})
-        active_sources = sources_collection.count_documents({"active": True})
-        total_documents = scraped_collection.count_documents({})
+        total_sources = await sources_collection.count_documents({})
+        active_sources = await sources_collection.count_documents({"active": True})
+        total_documents = await scraped_collection.count_documents({})
         
         # Récupérer la dernière date de scrape
-        last_doc = scraped_collection.find_one(
+        last_doc = await scraped_collection.find_one(
             sort=[("scraped_at", -1)]
         )
         last_scrape_time = last_doc.get("scraped_at") if last_doc else None
@@ -139,14 +149,14 @@ def get_crawler_stats():
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
 
 @router.patch("/toggle", response_model=CrawlerConfigResponse)
-def toggle_crawler_enabled():
+async def toggle_crawler_enabled():
     """Activer/désactiver le crawler"""
     try:
         config_collection = db["crawler_config"]
-        config = get_or_create_config()
+        config = await get_or_create_config()
         
         new_enabled = not config.get("enabled", True)
-        config_collection.update_one(
+        await config_collection.update_one(
             {"_id": config["_id"]},
             {"$set": {
                 "enabled": new_enabled,
@@ -154,7 +164,7 @@ def toggle_crawler_enabled():
             }}
         )
         
-        config = config_collection.find_one({"_id": config["_id"]})
+        config = await config_collection.find_one({"_id": config["_id"]})
         config["id"] = str(config["_id"])
         return config
     except Exception as e:
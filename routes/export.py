@@ -0,0 +1,246 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional
+from db import async_collection as scraped_collection
+from doc_format import fill_text_fields_async
+from archive import iter_archived
+from pagination import keyset_filter, next_cursor, sort_spec
+from datetime import datetime, UTC
+from itertools import islice
+from bson import ObjectId
+import csv
+import io
+import json
+import logging
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # export Parquet optionnel
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+# Export en flux de scraped_data: les documents sont lus par lots (pagination
+# keyset sur (scraped_at, _id)) et écrits au fil de l'eau; la mémoire utilisée
+# ne dépend que de la taille d'un lot, pas du nombre de documents exportés.
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+EXPORT_FIELDS = [
+    "_id", "url", "source_id", "source_name", "source_type",
+    "content_type", "title", "content_text", "scraped_at"
+]
+MAX_BATCH_SIZE = 10_000
+
+# ==================== Helpers ====================
+
+def build_export_filter(
+    source_id: Optional[str] = None,
+    source_name: Optional[str] = None,
+    source_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> dict:
+    """Filtre MongoDB de l'export; lève ValueError si source_id est invalide"""
+    mongo_filter = {}
+    if source_id:
+        mongo_filter["source_id"] = ObjectId(source_id)
+    if source_name:
+        mongo_filter["source_name"] = source_name
+    if source_type:
+        mongo_filter["source_type"] = source_type
+    if start_date or end_date:
+        mongo_filter["scraped_at"] = {}
+        if start_date:
+            mongo_filter["scraped_at"]["$gte"] = start_date
+        if end_date:
+            mongo_filter["scraped_at"]["$lte"] = end_date
+    return mongo_filter
+
+def export_value(value):
+    """Valeur d'export (texte), les dates restant des datetime"""
+    if value is None or isinstance(value, (str, datetime)):
+        return value
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+def export_row(doc: dict, fields: List[str]) -> dict:
+    return {field: export_value(doc.get(field)) for field in fields}
+
+async def iter_batches(
+    mongo_filter: dict,
+    fields: List[str],
+    batch_size: int,
+    include_archived: bool = False,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> AsyncIterator[List[dict]]:
+    """Lots de lignes d'export, du plus récent au plus ancien (puis les archives)"""
+    # scraped_at et _id servent de clé de pagination, même s'ils ne sont pas exportés
+    projection = {**{field: 1 for field in fields}, "scraped_at": 1}
+    cursor = None
+    while True:
+        docs = await (
+            scraped_collection.find(keyset_filter(mongo_filter, "scraped_at", cursor), projection)
+            .sort(sort_spec("scraped_at"))
+            .limit(batch_size)
+            .to_list(None)
+        )
+        if "content_text" in fields:
+            await fill_text_fields_async(docs, ("content_text",))
+        if docs:
+            yield [export_row(doc, fields) for doc in docs]
+        cursor = next_cursor(docs, "scraped_at", batch_size)
+        if cursor is None:
+            break
+
+    if include_archived:
+        archived = iter_archived(mongo_filter, projection, start_date, end_date)
+        while True:
+            docs = await run_in_threadpool(lambda: list(islice(archived, batch_size)))
+            if not docs:
+                break
+            yield [export_row(doc, fields) for doc in docs]
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+async def csv_chunks(batches, fields: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    async for rows in batches:
+        writer.writerows({field: _iso(value) for field, value in row.items()} for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+async def ndjson_chunks(batches, fields: List[str]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield "".join(
+            json.dumps({field: _iso(value) for field, value in row.items()}, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+class _ChunkSink:
+    """Fichier en écriture seule dont le contenu est vidé au fil de l'export"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+def parquet_schema(fields: List[str]):
+    return pa.schema([
+        (field, pa.timestamp("us", tz="UTC") if field == "scraped_at" else pa.string())
+        for field in fields
+    ])
+
+async def parquet_chunks(batches, fields: List[str]) -> AsyncIterator[bytes]:
+    """Parquet en flux: un row group par lot"""
+    schema = parquet_schema(fields)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    async for rows in batches:
+        columns = {field: [row[field] for row in rows] for field in fields}
+        writer.write_table(pa.table(columns, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+async def gzip_chunks(chunks) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # en-tête gzip
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+async def _logged(chunks) -> AsyncIterator[bytes]:
+    """Les erreurs après le début du flux ne peuvent plus devenir une réponse HTTP"""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        logger.error(f"Error during export: {str(e)}")
+        raise
+
+# ==================== Routes ====================
+
+@router.get("")
+async def export_documents(
+    format: str = "csv",
+    source_id: Optional[str] = None,
+    source_name: Optional[str] = None,
+    source_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    gzip: bool = False,
+    include_archived: bool = False,
+    batch_size: int = 1000
+):
+    """Exporter les documents scrappés en flux (CSV, NDJSON ou Parquet)"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'. Expected one of: {', '.join(EXPORT_FORMATS)}")
+    if format == "parquet" and pa is None:
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow")
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"batch_size must be between 1 and {MAX_BATCH_SIZE}")
+    try:
+        mongo_filter = build_export_filter(source_id, source_name, source_type, start_date, end_date)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {str(e)}")
+
+    columns = [field.strip() for field in fields.split(",") if field.strip()] if fields else EXPORT_FIELDS
+    batches = iter_batches(mongo_filter, columns, batch_size, include_archived, start_date, end_date)
+    encoders = {"csv": csv_chunks, "ndjson": ndjson_chunks, "parquet": parquet_chunks}
+    chunks = encoders[format](batches, columns)
+
+    filename = f"export-{datetime.now(UTC).strftime('%Y%m%dT%H%M%S')}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        _logged(chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,9 +1,19 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 import feedparser
 import requests
-from db import collection as scraped_collection, sources_collection, db
+import hashlib
+from pymongo.errors import BulkWriteError
+from pymongo.results import BulkWriteResult
+from partitions import UpdateOne
+from db import async_collection as scraped_collection, async_sources_collection as sources_collection, async_db as db
+from db import async_rss_tombstones_collection as tombstones_collection
+from doc_format import prepare_document
+from ingest import documents_inserted
+from pagination import keyset_filter, next_cursor, sort_spec
+from latest import rss_update, latest_entries, latest_summary, LATEST_CONTENT_EXCLUDED
 from datetime import datetime, UTC
 from bson import ObjectId
 
@@ -25,6 +35,7 @@ class RSSEntry(BaseModel):
     """Une entrée RSS"""
     title: str
     link: str
+    guid: Optional[str] = None
     summary: Optional[str] = None
     published: Optional[str] = None
     author: Optional[str] = None
@@ -77,6 +88,7 @@ def parse_rss_feed(rss_url: str, limit: int = 20) -> dict:
             entries.append({
                 "title": entry.get("title", ""),
                 "link": entry.get("link", ""),
+                "guid": entry.get("id", ""),
                 "summary": entry.get("summary", "")[:500],  # Limiter à 500 chars
                 "published": entry.get("published", ""),
                 "author": entry.get("author", "")
@@ -95,13 +107,96 @@ def parse_rss_feed(rss_url: str, limit: int = 20) -> dict:
             "data": []
         }
 
+def compute_entry_key(feed_url: str, entry: dict) -> str:
+    """Clé unique d'une entrée RSS: hash du flux + guid (ou lien, à défaut titre)"""
+    identifier = entry.get("guid") or entry.get("link") or entry.get("title", "")
+    return hashlib.sha1(f"{feed_url}\n{identifier}".encode("utf-8")).hexdigest()
+
+async def save_rss_entries(entries: List[dict], feed_url: str, source_name: str) -> dict:
+    """Sauvegarder les entrées RSS en upsert: seules les nouvelles entrées sont insérées"""
+    now = datetime.now(UTC)
+    keys = []  # ordre du flux (filtre $in)
+    seen = set()
+    documents = []
+    for entry in entries:
+        entry_key = compute_entry_key(feed_url, entry)
+        # Un flux peut lister deux fois la même entrée
+        if entry_key in seen:
+            continue
+        seen.add(entry_key)
+        keys.append(entry_key)
+        documents.append({
+            "entry_key": entry_key,
+            "url": entry["link"],
+            "source_type": "rss",
+            "source_name": source_name,
+            "rss_feed_url": feed_url,
+            "guid": entry.get("guid", ""),
+            "title": entry["title"],
+            "summary": entry["summary"],
+            "published": entry["published"],
+            "author": entry["author"],
+            "data": [
+                {"index": 1, "value": entry["title"]},
+                {"index": 2, "value": entry["summary"]}
+            ],
+            "content_type": "rss",
+            "scraped_at": now
+        })
+
+    # Entrées supprimées par la rétention: ne pas les réinsérer
+    buried = await tombstones_collection.find({"_id": {"$in": keys}}, {"_id": 1}).to_list(None)
+    if buried:
+        buried = {doc["_id"] for doc in buried}
+        documents = [document for document in documents if document["entry_key"] not in buried]
+
+    if not documents:
+        return {"new_documents": [], "already_seen": len(keys)}
+
+    # Champs texte, MinHash et hooks d'ingestion: calcul hors de la boucle async
+    prepared = await run_in_threadpool(lambda: [prepare_document(document) for document in documents])
+    operations = [
+        UpdateOne(
+            {"entry_key": document["entry_key"]},
+            {
+                "$setOnInsert": {k: v for k, v in stored.items() if k != "entry_key"},
+                "$set": {"last_seen_at": now}
+            },
+            upsert=True
+        )
+        for document, stored in zip(documents, prepared)
+    ]
+    try:
+        result = await scraped_collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Rafraîchissement concurrent du même flux: l'entrée insérée entre-temps
+        # par l'autre écriture (E11000 sur entry_key) est déjà vue
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        result = BulkWriteResult(e.details, True)
+
+    new_documents = []
+    inserted = []
+    for position, inserted_id in result.upserted_ids.items():
+        document = documents[position]
+        document["_id"] = str(inserted_id)
+        new_documents.append(document)
+        prepared[position]["_id"] = inserted_id
+        inserted.append(prepared[position])
+    await run_in_threadpool(documents_inserted, inserted)
+
+    return {
+        "new_documents": new_documents,
+        "already_seen": len(keys) - len(new_documents)
+    }
+
 # ==================== Routes ====================
 
 @router.post("/parse")
-def parse_rss(rss_url: str, limit: int = 20):
+async def parse_rss(rss_url: str, limit: int = 20):
     """Parser un flux RSS et afficher le contenu"""
     try:
-        result = parse_rss_feed(rss_url, limit)
+        result = await run_in_threadpool(parse_rss_feed, rss_url, limit)
         
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["error"])
@@ -117,44 +212,24 @@ def parse_rss(rss_url: str, limit: int = 20):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.post("/scrape-rss")
-def scrape_rss_feed(rss_url: str, limit: int = 20):
+async def scrape_rss_feed(rss_url: str, limit: int = 20):
     """Scraper un flux RSS et sauvegarder les entrées"""
     try:
-        result = parse_rss_feed(rss_url, limit)
+        result = await run_in_threadpool(parse_rss_feed, rss_url, limit)
         
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["error"])
         
-        # Sauvegarder chaque entrée
+        # Sauvegarder les entrées (seules les nouvelles sont insérées)
         feed_info = result["feed_info"]
-        entries = result["entries"]
-        
-        documents = []
-        for i, entry in enumerate(entries):
-            document = {
-                "url": entry["link"],
-                "source_type": "rss",
-                "source_name": feed_info["title"],
-                "rss_feed_url": rss_url,
-                "title": entry["title"],
-                "summary": entry["summary"],
-                "published": entry["published"],
-                "author": entry["author"],
-                "data": [
-                    {"index": 1, "value": entry["title"]},
-                    {"index": 2, "value": entry["summary"]}
-                ],
-                "content_type": "rss",
-                "scraped_at": datetime.now(UTC)
-            }
-            inserted = scraped_collection.insert_one(document)
-            document["_id"] = str(inserted.inserted_id)
-            documents.append(document)
+        saved = await save_rss_entries(result["entries"], rss_url, feed_info["title"])
         
         return {
             "feed_info": feed_info,
-            "scraped_entries": len(documents),
-            "documents": documents
+            "scraped_entries": result["total_entries"],
+            "new_entries": len(saved["new_documents"]),
+            "already_seen": saved["already_seen"],
+            "documents": saved["new_documents"]
         }
     except HTTPException:
         raise
@@ -162,11 +237,11 @@ def scrape_rss_feed(rss_url: str, limit: int = 20):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.post("/add-source")
-def add_rss_source(request: RSSSourceCreate):
+async def add_rss_source(request: RSSSourceCreate):
     """Ajouter une source RSS à la base de données"""
     try:
         # Valider le flux RSS
-        result = parse_rss_feed(request.rss_url, limit=1)
+        result = await run_in_threadpool(parse_rss_feed, request.rss_url, 1)
         if not result["success"]:
             raise HTTPException(status_code=400, detail=f"Invalid RSS feed: {result['error']}")
         
@@ -184,7 +259,7 @@ def add_rss_source(request: RSSSourceCreate):
             "scrape_count": 0
         }
         
-        inserted = sources_collection.insert_one(source_doc)
+        inserted = await sources_collection.insert_one(source_doc)
         source_doc["id"] = str(inserted.inserted_id)
         
         return {
@@ -197,40 +272,66 @@ def add_rss_source(request: RSSSourceCreate):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.get("/sources")
-def get_rss_sources():
-    """Obtenir toutes les sources RSS"""
+async def get_rss_sources(limit: Optional[int] = None, cursor: Optional[str] = None):
+    """Obtenir les sources RSS (toutes, ou par pages avec limit/cursor)"""
     try:
-        sources = list(sources_collection.find({"source_type": "rss"}))
+        query = {"source_type": "rss"}
+        page_cursor = None
+        if limit or cursor:
+            limit = limit or 100
+            sources = await (
+                sources_collection
+                .find(keyset_filter(query, "created_at", cursor), LATEST_CONTENT_EXCLUDED)
+                .sort(sort_spec("created_at"))
+                .limit(limit)
+                .to_list(None)
+            )
+            page_cursor = next_cursor(sources, "created_at", limit)
+        else:
+            sources = await sources_collection.find(query, LATEST_CONTENT_EXCLUDED).to_list(None)
         
+        # Dernières entrées (latest.entries) hors liste: résumé seulement
         return {
             "total": len(sources),
+            "next_cursor": page_cursor,
             "sources": [
                 {
                     "id": str(source["_id"]),
-                    **{k: v for k, v in source.items() if k != "_id"}
+                    **{k: v for k, v in source.items() if k != "_id"},
+                    "latest": latest_summary(source)
                 }
                 for source in sources
             ]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.get("/source/{source_id}/latest")
-def get_rss_source_latest(source_id: str, limit: int = 10):
+async def get_rss_source_latest(source_id: str, limit: int = 10, cursor: Optional[str] = None):
     """Obtenir les dernières entrées d'une source RSS"""
     try:
-        source = sources_collection.find_one({"_id": ObjectId(source_id), "source_type": "rss"})
+        source = await sources_collection.find_one({"_id": ObjectId(source_id), "source_type": "rss"})
         if not source:
             raise HTTPException(status_code=404, detail="RSS source not found")
         
-        # Récupérer les derniers documents scrappés de cette source
-        docs = list(
-            scraped_collection.find(
-                {"source_name": source["name"], "source_type": "rss"}
+        # Première page: dernières entrées embarquées dans la source
+        docs = None if cursor else latest_entries(source, limit)
+        if docs is None:
+            # Pages suivantes (ou source jamais rafraîchie): scraped_data
+            docs = await (
+                scraped_collection.find(
+                    keyset_filter(
+                        {"source_name": source["name"], "source_type": "rss"},
+                        "scraped_at",
+                        cursor
+                    )
+                )
+                .sort(sort_spec("scraped_at"))
+                .limit(limit)
+                .to_list(None)
             )
-            .sort("scraped_at", -1)
-            .limit(limit)
-        )
         
         return {
             "source": {
@@ -249,65 +350,47 @@ def get_rss_source_latest(source_id: str, limit: int = 10):
                 }
                 for doc in docs
             ],
-            "total": len(docs)
+            "total": len(docs),
+            "next_cursor": next_cursor(docs, "scraped_at", limit)
         }
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.post("/refresh/{source_id}")
-def refresh_rss_source(source_id: str):
+async def refresh_rss_source(source_id: str):
     """Rafraîchir une source RSS manuellement"""
     try:
-        source = sources_collection.find_one({"_id": ObjectId(source_id), "source_type": "rss"})
+        source = await sources_collection.find_one({"_id": ObjectId(source_id), "source_type": "rss"})
         if not source:
             raise HTTPException(status_code=404, detail="RSS source not found")
         
         # Parser et scraper
-        result = parse_rss_feed(source["url"], source.get("limit", 20))
+        result = await run_in_threadpool(parse_rss_feed, source["url"], source.get("limit", 20))
         
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["error"])
         
-        # Sauvegarder les entrées
-        entries = result["entries"]
-        documents = []
-        
-        for entry in entries:
-            document = {
-                "url": entry["link"],
-                "source_type": "rss",
-                "source_name": source["name"],
-                "rss_feed_url": source["url"],
-                "title": entry["title"],
-                "summary": entry["summary"],
-                "published": entry["published"],
-                "author": entry["author"],
-                "data": [
-                    {"index": 1, "value": entry["title"]},
-                    {"index": 2, "value": entry["summary"]}
-                ],
-                "content_type": "rss",
-                "scraped_at": datetime.now(UTC)
-            }
-            inserted = scraped_collection.insert_one(document)
-            documents.append(str(inserted.inserted_id))
+        # Sauvegarder les entrées (seules les nouvelles sont insérées)
+        saved = await save_rss_entries(result["entries"], source["url"], source["name"])
+        new_ids = [document["_id"] for document in saved["new_documents"]]
         
-        # Mettre à jour la source
-        sources_collection.update_one(
+        # Mettre à jour la source et ses dernières entrées (une seule écriture)
+        await sources_collection.update_one(
             {"_id": ObjectId(source_id)},
-            {
-                "$set": {"last_scraped": datetime.now(UTC)},
-                "$inc": {"scrape_count": 1}
-            }
+            rss_update(saved["new_documents"], datetime.now(UTC))
         )
         
         return {
-            "message": f"RSS source refreshed: {len(documents)} new entries",
+            "message": f"RSS source refreshed: {len(new_ids)} new entries",
             "source_name": source["name"],
-            "entries_scraped": len(documents),
-            "document_ids": documents
+            "entries_scraped": result["total_entries"],
+            "new_entries": len(new_ids),
+            "already_seen": saved["already_seen"],
+            "document_ids": new_ids
         }
     except HTTPException:
         raise
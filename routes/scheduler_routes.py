@@ -4,8 +4,15 @@ from typing import List
 from scheduler import (
     schedule_source, unschedule_source, reschedule_all_sources,
     start_scheduler, stop_scheduler, get_scheduler_status, get_job_details,
-    scrape_source_job
+    scrape_source_job, start_data_format_migration, start_retention,
+    start_term_stats_rebuild
 )
+from doc_format import migration_status
+from retention import retention_status, describe_policy
+from term_stats import term_stats_status
+from archive import list_partitions
+from partitions import partitioning_enabled, PARTITION_PATTERN, partition_for
+from db import db
 
 router = APIRouter(prefix="/scheduler", tags=["scheduler"])
 
@@ -137,3 +144,78 @@ def test_scrape_endpoint(source_id: str):
             raise HTTPException(status_code=500, detail=result["error"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+@router.post("/migrate-data-format")
+def migrate_data_format_endpoint(batch_size: int = 500):
+    """Convertir en tâche de fond les anciens documents au format compact"""
+    result = start_data_format_migration(batch_size)
+    if not result["success"]:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return {"message": result["message"], "batch_size": batch_size}
+
+@router.get("/migrate-data-format")
+def get_migration_status():
+    """Obtenir l'avancement de la migration du format de stockage"""
+    return migration_status
+
+@router.post("/term-stats")
+def rebuild_term_stats_endpoint(batch_size: int = 1000):
+    """Recalculer en tâche de fond les fréquences des mots-clés depuis scraped_data"""
+    result = start_term_stats_rebuild(batch_size)
+    if not result["success"]:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return {"message": result["message"], "batch_size": batch_size}
+
+@router.get("/term-stats")
+def get_term_stats_status():
+    """Obtenir l'avancement du recalcul des fréquences des mots-clés"""
+    return term_stats_status
+
+@router.post("/retention")
+def run_retention_endpoint(batch_size: int = 500):
+    """Appliquer la politique de rétention maintenant (archivage puis suppression)"""
+    result = start_retention(batch_size)
+    if not result["success"]:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return {"message": result["message"], "batch_size": batch_size}
+
+@router.get("/retention")
+def get_retention_status():
+    """Obtenir la politique de rétention, le dernier passage et les partitions archivées"""
+    try:
+        return {
+            **retention_status,
+            "policy": describe_policy(),
+            "partitions": list_partitions()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting retention status: {str(e)}")
+
+@router.get("/partitions")
+def get_partitions():
+    """Lister les partitions mensuelles de scraped_data"""
+    if not partitioning_enabled():
+        return {"enabled": False, "current": None, "partitions": []}
+    try:
+        return {
+            "enabled": True,
+            "current": partition_for(None),
+            "partitions": db["scraped_data"].list_partitions()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing partitions: {str(e)}")
+
+@router.delete("/partitions/{name}")
+def drop_partition(name: str):
+    """Supprimer une partition mensuelle entière (drop de collection, O(1))"""
+    if not partitioning_enabled():
+        raise HTTPException(status_code=400, detail="Monthly partitioning is not enabled")
+    if not PARTITION_PATTERN.match(name):
+        raise HTTPException(status_code=400, detail=f"Invalid partition name: {name}")
+    if name == partition_for(None):
+        raise HTTPException(status_code=409, detail="The current partition cannot be dropped")
+    try:
+        db["scraped_data"].drop_partition(name)
+        return {"message": f"Partition {name} dropped"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error dropping partition: {str(e)}")
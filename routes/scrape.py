@@ -6,6 +6,10 @@ from bs4 import BeautifulSoup
 import io
 from pypdf import PdfReader
 from db import collection as scraped_collection, sources_collection, db
+from snapshots import store_snapshot
+from latest import scrape_update, latest_summary, LATEST_CONTENT_EXCLUDED
+from doc_format import prepare_document
+from ingest import documents_inserted
 from datetime import datetime, UTC
 from bson import ObjectId
 
@@ -159,7 +163,10 @@ def scrape_manual(request: ScrapeRequest):
             "source_id": None,
             "scraped_at": datetime.now(UTC)
         }
-        inserted_doc = scraped_collection.insert_one(document)
+        stored = prepare_document(document)
+        inserted_doc = scraped_collection.insert_one(stored)
+        stored["_id"] = inserted_doc.inserted_id
+        documents_inserted([stored])
         document["_id"] = str(inserted_doc.inserted_id)
 
         return document
@@ -208,20 +215,17 @@ def scrape_by_source(request: ScrapeBySourceRequest):
             "content_type": result["content_type"],
             "scraped_at": datetime.now(UTC)
         }
-        inserted_doc = collection.insert_one(document)
+        # Versionner: un snapshot identique n'est pas re-stocké
+        snapshot = store_snapshot(document)
 
-        # Mettre à jour la source : last_scraped et scrape_count
-        sources_collection.update_one(
-            {"_id": ObjectId(request.source_id)},
-            {
-                "$set": {"last_scraped": datetime.now(UTC)},
-                "$inc": {"scrape_count": 1}
-            }
-        )
+        # Mettre à jour la source : last_scraped, scrape_count et état courant
+        sources_collection.update_one({"_id": ObjectId(request.source_id)}, scrape_update(document, snapshot))
 
         # Convertir les ObjectId en string pour la réponse
-        document["_id"] = str(inserted_doc.inserted_id)
+        document["_id"] = str(snapshot["document_id"])
         document["source_id"] = str(document["source_id"])
+        document["version"] = snapshot["version"]
+        document["snapshot_status"] = snapshot["status"]
         return document
 
     except HTTPException:
@@ -233,7 +237,7 @@ def scrape_by_source(request: ScrapeBySourceRequest):
 def get_sources_scrape_status():
     """Obtenir le statut de scrape de toutes les sources"""
     try:
-        sources = list(sources_collection.find({"active": True}))
+        sources = list(sources_collection.find({"active": True}, LATEST_CONTENT_EXCLUDED))
         
         status = []
         for source in sources:
@@ -244,7 +248,8 @@ def get_sources_scrape_status():
                 "last_scraped": source.get("last_scraped"),
                 "scrape_count": source.get("scrape_count", 0),
                 "frequency": source.get("frequency", 24),
-                "next_scrape": source.get("last_scraped") if source.get("last_scraped") else None
+                "next_scrape": source.get("last_scraped") if source.get("last_scraped") else None,
+                "latest": latest_summary(source)
             })
         
         return {
@@ -1,7 +1,20 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
-from db import collection as scraped_collection, db
+from typing import Dict, List, Optional
+from db import async_collection as scraped_collection, async_db as db
+from doc_format import fill_text_fields_async, build_text_fields, extract_text, tokenize, token_offsets, SOURCE_TEXT_FIELDS, TOKEN_PATTERN
+from archive import iter_archived, OLDEST
+from search_index import search_index, catch_up, index_status
+from semantic_index import semantic_index, catch_up_semantic, semantic_status
+from near_duplicates import duplicate_index, duplicates_status
+from boolean_query import parse_query
+from keyword_matcher import get_matcher, snippet_around, whole_words
+from term_stats import top_terms
+from trending import trending_terms, WINDOWS
+from search_cache import search_cache
+from facets import validate_facets, facet_pipelines, format_facets, count_facets
+from pagination import decode_cursor, encode_cursor, keyset_filter, next_cursor, sort_spec
 from datetime import datetime, UTC
 from bson import ObjectId
 import re
@@ -12,14 +25,23 @@ router = APIRouter(prefix="/search", tags=["search"])
 
 class SearchQuery(BaseModel):
     """Modèle pour une requête de recherche"""
-    keywords: List[str]  # Mots-clés à rechercher
+    keywords: List[str] = []  # Mots-clés à rechercher
+    expression: Optional[str] = None  # Requête booléenne: "phrase", a NEAR/5 b, AND/OR/NOT (prioritaire sur keywords)
     case_sensitive: bool = False
-    exact_match: bool = False  # Recherche exacte ou contient
+    exact_match: bool = False  # Mots entiers seulement (sinon sous-chaîne: "rate" trouve "corporate")
     limit: int = 50
-    skip: int = 0
+    skip: int = 0  # Pagination par offset (compatibilité)
+    cursor: Optional[str] = None  # Pagination par curseur (prioritaire sur skip)
     source_id: Optional[str] = None  # Filtrer par source spécifique
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
+    include_archived: bool = False  # Lire aussi les partitions archivées (à la suite des données chaudes)
+    ranked: bool = False  # Classer par pertinence (BM25) plutôt que par date
+    fuzzy: bool = False  # Tolérer les fautes (trigrammes + distance d'édition)
+    max_edits: Optional[int] = None  # Modifications tolérées par mot (par défaut selon sa longueur)
+    facets: List[str] = []  # Comptes par source_id, content_type, source_type, scraped_at
+    facet_interval: str = "day"  # Intervalle de l'histogramme scraped_at: hour, day, week, month
+    collapse_duplicates: bool = False  # Un seul résultat par groupe de quasi-doublons (cluster_id)
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -28,28 +50,360 @@ class SearchResult(BaseModel):
     id: str
     url: str
     source_id: Optional[str]
-    content: str
+    content: str  # Extrait centré sur les occurrences
+    content_offset: int = 0  # Début de l'extrait dans le contenu complet
+    highlights: List[List[int]] = []  # Occurrences dans l'extrait: [début, fin)
     matched_keywords: List[str]
+    positions: Dict[str, List[int]] = {}  # Début des occurrences de chaque mot-clé dans le contenu
     scraped_at: datetime
+    archived: bool = False
+    score: Optional[float] = None  # Score BM25 (recherche classée)
+    cluster_id: Optional[str] = None  # Groupe de quasi-doublons
+    duplicates: Optional[int] = None  # Documents correspondants du groupe (collapse_duplicates, recherche par date)
     
     model_config = ConfigDict(from_attributes=True)
 
+# Champs lus pour la recherche (le contenu brut n'est pas rechargé)
+SEARCH_PROJECTION = {"url": 1, "source_id": 1, "scraped_at": 1, "content_text": 1, "cluster_id": 1}
+
+class FacetCount(BaseModel):
+    """Nombre de documents correspondants pour une valeur de facette"""
+    value: Optional[str]
+    count: int
+
 class SearchResponse(BaseModel):
     """Réponse de recherche"""
     total: int
     results: List[SearchResult]
     query: SearchQuery
+    next_cursor: Optional[str] = None
+    facets: Optional[Dict[str, List[FacetCount]]] = None
+
+class SemanticQuery(BaseModel):
+    """Requête de recherche sémantique (plusieurs textes traités en un lot)"""
+    queries: List[str]
+    limit: int = 10  # Résultats par requête
+    source_id: Optional[str] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    approximate: Optional[bool] = None  # Index approché (par défaut au-delà de SEMANTIC_ANN_THRESHOLD documents)
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class SemanticMatches(BaseModel):
+    """Documents les plus proches d'une requête, par similarité cosinus décroissante"""
+    query: str
+    results: List[SearchResult]
+
+class SemanticResponse(BaseModel):
+    """Réponse de recherche sémantique"""
+    approximate: bool
+    results: List[SemanticMatches]
 
 # ==================== Routes ====================
 
-def build_search_regex(keywords: List[str], case_sensitive: bool = False):
-    """Construire une regex pour la recherche"""
-    flags = 0 if case_sensitive else re.IGNORECASE
-    pattern = '|'.join(re.escape(kw) for kw in keywords)
-    return re.compile(pattern, flags)
+# Occurrences renvoyées par mot-clé et par résultat
+MAX_POSITIONS = 20
+
+# Termes du vocabulaire au-delà desquels une sous-chaîne est vérifiée par regex seule
+MAX_SUBSTRING_TERMS = 1000
+
+# Curseur d'une page d'archives (include_archived): clé (scraped_at, _id) du
+# dernier résultat archivé, préfixe hors de l'alphabet des curseurs keyset
+ARCHIVE_CURSOR_PREFIX = "a."
+
+def build_keyword_filter(keywords: List[str], case_sensitive: bool = False, whole_word: bool = False) -> dict:
+    """Filtre MongoDB des documents contenant au moins un des mots-clés.
+
+    L'index multikey sur terms restreint d'abord la lecture aux documents
+    candidats; la regex sur content_text ne fait que vérifier la casse,
+    l'expression de plusieurs mots et la sous-chaîne. Les documents sans
+    terms (pas encore migrés) restent vérifiés par la regex.
+    - whole_word: documents contenant exactement les termes du mot-clé
+    - sous-chaîne (par défaut): documents contenant un terme du vocabulaire
+      de l'index en mémoire qui contient le plus long terme du mot-clé; sans
+      index prêt, ou au-delà de MAX_SUBSTRING_TERMS termes, regex seule
+    """
+    clauses = []
+    for keyword in keywords:
+        pattern = re.escape(keyword)
+        if whole_word:
+            pattern = rf"(?<!\w){pattern}(?!\w)"
+        content_match = {"content_text": {"$regex": pattern}}
+        if not case_sensitive:
+            content_match["content_text"]["$options"] = "i"
+        terms = list(dict.fromkeys(TOKEN_PATTERN.findall(keyword.lower())))
+        candidates = None
+        if whole_word and terms:
+            candidates = {"terms": {"$all": terms}}
+        elif terms and index_status["state"] == "ready":
+            vocabulary = search_index.containing(max(terms, key=len), MAX_SUBSTRING_TERMS)
+            if vocabulary is not None:
+                candidates = {"terms": {"$in": vocabulary}}
+        if candidates:
+            clauses.append({"$and": [{"$or": [candidates, {"terms": {"$exists": False}}]}, content_match]})
+        else:
+            clauses.append(content_match)
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+def text_spans(content_text: str, token_spans: List[tuple]) -> List[tuple]:
+    """Occurrences (début, fin, termes) dans le contenu, depuis des intervalles en positions de mots de l'index"""
+    offsets = token_offsets(content_text)
+    spans = []
+    for start, end in token_spans:
+        if end <= len(offsets):
+            text_start, text_end = offsets[start][0], offsets[end - 1][1]
+            spans.append((text_start, text_end, " ".join(tokenize(content_text[text_start:text_end]))))
+    return spans
+
+def match_document(
+    doc: dict,
+    query: SearchQuery,
+    matcher,
+    archived: bool = False,
+    required: bool = True,
+    whole_word: bool = False,
+    token_spans: Optional[List[tuple]] = None
+) -> Optional[SearchResult]:
+    """Résultat de recherche pour un document, ou None s'il ne contient aucun mot-clé (si required).
+
+    Occurrences trouvées par l'automate des mots-clés, ou données par
+    l'index (token_spans) pour les recherches qui en proviennent.
+    """
+    content_text = doc["content_text"]
+    
+    if token_spans is None:
+        # Un seul parcours du contenu pour tous les mots-clés
+        positions = matcher.find(content_text, MAX_POSITIONS)
+        if whole_word:
+            positions = whole_words(content_text, positions)
+        spans = [(start, start + len(keyword), keyword) for keyword, starts in positions.items() for start in starts]
+    else:
+        positions, spans = {}, []
+        for span in text_spans(content_text, token_spans):
+            found = positions.setdefault(span[2], [])
+            if len(found) < MAX_POSITIONS:
+                found.append(span[0])
+                spans.append(span)
+    if not positions and required:
+        return None
+    snippet, offset, highlights = snippet_around(content_text, spans)
+    return SearchResult(
+        id=str(doc["_id"]),
+        url=doc.get("url", ""),
+        source_id=str(doc.get("source_id")) if doc.get("source_id") else None,
+        content=snippet,
+        content_offset=offset,
+        highlights=highlights,
+        matched_keywords=list(positions),
+        positions=positions,
+        scraped_at=doc.get("scraped_at", datetime.now(UTC)),
+        archived=archived,
+        cluster_id=str(doc["cluster_id"]) if doc.get("cluster_id") else None,
+        duplicates=doc.get("duplicates")
+    )
+
+def query_terms(keywords: List[str]) -> List[str]:
+    """Termes de l'index correspondant aux mots-clés"""
+    return list(dict.fromkeys(term for keyword in keywords for term in TOKEN_PATTERN.findall(keyword.lower())))
+
+def index_source_id(query: SearchQuery):
+    if not query.source_id:
+        return None
+    try:
+        return ObjectId(query.source_id)
+    except:
+        return query.source_id
+
+async def index_results(query: SearchQuery, total: int, top: list, node: tuple, counts: dict) -> SearchResponse:
+    """Lire en base la page de documents trouvés par l'index, dans l'ordre de l'index.
+
+    Seuls les documents de la page sont lus; les documents disparus
+    (partition supprimée, autre processus) sont retirés de l'index au passage.
+    Les surlignages viennent des postings positionnels de la requête (node):
+    mots entiers, comme la correspondance de l'index.
+    """
+    top = top[query.skip:]
+    ids = [doc_id for _, doc_id in top]
+    documents = await scraped_collection.find({"_id": {"$in": ids}}, SEARCH_PROJECTION).to_list(None)
+    await fill_text_fields_async(documents, ("content_text",))
+    by_id = {doc["_id"]: doc for doc in documents}
+
+    spans = await run_in_threadpool(search_index.spans, node, ids)
+    results = []
+    for score, doc_id in top:
+        doc = by_id.get(doc_id)
+        if doc is None:
+            await run_in_threadpool(search_index.remove, doc_id)
+            total -= 1
+            continue
+        result = match_document(doc, query, None, required=False, token_spans=spans.get(doc_id, []))
+        if score is not None:
+            result.score = round(score, 4)
+        results.append(result)
+
+    facets = count_facets(counts) if query.facets else None
+    return SearchResponse(total=total, results=results, query=query, facets=facets)
+
+async def ranked_search(query: SearchQuery) -> SearchResponse:
+    """Recherche classée par BM25 depuis l'index inversé en mémoire"""
+    await run_in_threadpool(catch_up)
+    terms = query_terms(query.keywords)
+    total, top, counts = await run_in_threadpool(
+        search_index.search,
+        terms,
+        query.skip + query.limit,
+        query.start_date,
+        query.end_date,
+        index_source_id(query),
+        query.facets,
+        query.facet_interval,
+        query.collapse_duplicates
+    )
+    return await index_results(query, total, top, ("or", [("term", term) for term in terms]), counts)
+
+def fuzzy_query(keywords: List[str], max_edits: Optional[int]) -> tuple:
+    """Requête booléenne des variantes indexées: un des mots-clés, tous ses termes (à une variante près)"""
+    clauses = []
+    for keyword in keywords:
+        parts = [("or", [("term", variant) for variant in search_index.expand(term, max_edits)]) for term in tokenize(keyword)]
+        if parts:
+            clauses.append(parts[0] if len(parts) == 1 else ("and", parts))
+    return ("or", clauses)
+
+async def fuzzy_search(query: SearchQuery) -> SearchResponse:
+    """Recherche tolérante aux fautes: variantes des mots-clés dans le vocabulaire, puis index"""
+    await run_in_threadpool(catch_up)
+    node = await run_in_threadpool(fuzzy_query, query.keywords, query.max_edits)
+    total, top, counts = await run_in_threadpool(
+        search_index.query,
+        node,
+        query.skip + query.limit,
+        query.start_date,
+        query.end_date,
+        index_source_id(query),
+        query.ranked,
+        query.facets,
+        query.facet_interval,
+        query.collapse_duplicates
+    )
+    return await index_results(query, total, top, node, counts)
+
+async def expression_search(query: SearchQuery) -> SearchResponse:
+    """Requête booléenne (phrases, NEAR/k, AND/OR/NOT) par intersection des postings positionnels"""
+    node = parse_query(query.expression)
+    await run_in_threadpool(catch_up)
+    total, top, counts = await run_in_threadpool(
+        search_index.query,
+        node,
+        query.skip + query.limit,
+        query.start_date,
+        query.end_date,
+        index_source_id(query),
+        query.ranked,
+        query.facets,
+        query.facet_interval,
+        query.collapse_duplicates
+    )
+    return await index_results(query, total, top, node, counts)
+
+def search_archives(mongo_filter: dict, query: SearchQuery, matcher, limit: int, offset: int = 0, after: Optional[tuple] = None) -> tuple:
+    """Rechercher dans les partitions archivées (lecture disque, hors boucle async).
+
+    Renvoie (nombre de documents archivés correspondants, page de limit
+    résultats après les offset premiers, ou après la clé after).
+    """
+    count = 0
+    skipped = 0
+    results = []
+    documents = iter_archived(
+        mongo_filter,
+        {**SEARCH_PROJECTION, **SOURCE_TEXT_FIELDS},
+        start=query.start_date,
+        end=query.end_date
+    )
+    for doc in documents:
+        if "content_text" not in doc:
+            doc["content_text"] = build_text_fields(extract_text(doc))["content_text"]
+        result = match_document(doc, query, matcher, archived=True, whole_word=query.exact_match)
+        if not result:
+            continue
+        count += 1
+        if after is not None and (doc.get("scraped_at") or OLDEST, doc["_id"]) >= after:
+            continue  # pages archivées précédentes (ordre décroissant)
+        if skipped < offset:
+            skipped += 1
+        elif len(results) < limit:
+            results.append(result)
+    return count, results
+
+def collapse_stages() -> list:
+    """Étapes gardant le document le plus récent de chaque groupe de quasi-doublons.
+
+    Les documents sans cluster_id forment chacun leur propre groupe; le
+    nombre de documents correspondants du groupe est renvoyé (duplicates).
+    """
+    fields = [*SEARCH_PROJECTION, "content_type", "source_type"]
+    return [
+        {"$project": {field: 1 for field in fields}},
+        {"$sort": dict(sort_spec("scraped_at"))},
+        {"$group": {
+            "_id": {"$ifNull": ["$cluster_id", "$_id"]},
+            "document_id": {"$first": "$_id"},
+            "duplicates": {"$sum": 1},
+            **{field: {"$first": f"${field}"} for field in fields}
+        }},
+        {"$project": {"_id": "$document_id", "duplicates": 1, **{field: 1 for field in fields}}}
+    ]
+
+async def aggregate_page(search_filter: dict, query: SearchQuery) -> tuple:
+    """Total, page de documents et facettes par une agrégation $facet unique.
+
+    Le filtre de recherche n'est évalué qu'une fois; chaque sous-pipeline
+    (total, page, facettes) part des mêmes documents correspondants, ou des
+    représentants des groupes de quasi-doublons si collapse_duplicates.
+    """
+    page = []
+    if query.cursor:
+        page.append({"$match": keyset_filter({}, "scraped_at", query.cursor)})
+    page.append({"$sort": dict(sort_spec("scraped_at"))})
+    if query.skip and not query.cursor:
+        page.append({"$skip": query.skip})
+    if query.limit:
+        page.append({"$limit": query.limit})
+    page.append({"$project": {**SEARCH_PROJECTION, "duplicates": 1}})
+
+    pipeline = [{"$match": search_filter}]
+    if query.collapse_duplicates:
+        pipeline.extend(collapse_stages())
+    pipeline.append(
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "page": page,
+            **facet_pipelines(query.facets, query.facet_interval)
+        }}
+    )
+    cursor = await scraped_collection.aggregate(pipeline)
+    result = (await cursor.to_list(None))[0]
+    total = result.pop("total")
+    documents = result.pop("page")
+    for doc in documents:
+        # $first d'un champ absent: null (anciens documents sans content_text, complétés ensuite)
+        if doc.get("content_text") is None:
+            doc.pop("content_text", None)
+    facets = format_facets(result) if query.facets else None
+    return (total[0]["count"] if total else 0), documents, facets
 
 @router.get("/", response_model=SearchResponse)
-def search_simple(keyword: str, limit: int = 50, skip: int = 0, source_id: Optional[str] = None):
+async def search_simple(
+    keyword: str,
+    limit: int = 50,
+    skip: int = 0,
+    source_id: Optional[str] = None,
+    cursor: Optional[str] = None
+):
     """Recherche simple par mot-clé (endpoint GET)"""
     query = SearchQuery(
         keywords=[keyword],
@@ -57,14 +411,48 @@ def search_simple(keyword: str, limit: int = 50, skip: int = 0, source_id: Optio
         exact_match=False,
         limit=limit,
         skip=skip,
+        cursor=cursor,
         source_id=source_id
     )
-    return search_documents(query)
+    return await search_documents(query)
 
 @router.post("/", response_model=SearchResponse)
-def search_documents(query: SearchQuery):
+async def search_documents(query: SearchQuery):
     """Rechercher dans les documents scrappés par keywords"""
+    # Réponse en cache si aucune écriture ne l'a invalidée depuis son calcul
+    cache_key = search_cache.key(query)
+    generation = search_cache.generation(query.source_id)
+    if uses_index(query):
+        # Index en mémoire: aucun cache avant la fin du chargement, et la
+        # réponse dépend aussi du dernier document indexé après rattrapage
+        if index_status["state"] != "ready":
+            return await run_search(query)
+        await run_in_threadpool(catch_up)
+        generation = (*generation, search_index.last_id)
+    cached = search_cache.get(cache_key, generation)
+    if cached is not None:
+        return cached.model_copy(update={"query": query})
+    response = await run_search(query)
+    if not uses_index(query) or index_status["state"] == "ready":
+        search_cache.put(cache_key, generation, response)
+    return response
+
+def uses_index(query: SearchQuery) -> bool:
+    """Requête servie par l'index inversé en mémoire (expression, floue ou classée)"""
+    return bool(query.expression or query.fuzzy or query.ranked)
+
+async def run_search(query: SearchQuery) -> SearchResponse:
+    """Exécuter une recherche (sans cache)"""
     try:
+        if query.facets:
+            validate_facets(query.facets, query.facet_interval)
+        if query.expression:
+            return await expression_search(query)
+        if query.fuzzy:
+            return await fuzzy_search(query)
+        if query.ranked:
+            return await ranked_search(query)
+
         # Construire le filtre MongoDB
         mongo_filter = {}
         
@@ -84,103 +472,214 @@ def search_documents(query: SearchQuery):
                 date_filter["$lte"] = query.end_date
             mongo_filter["scraped_at"] = date_filter
         
-        # Compter le total
-        total = scraped_collection.count_documents(mongo_filter)
+        # Correspondance des mots-clés côté base: total et pages ne portent
+        # que sur les documents qui correspondent (vocabulaire de l'index à jour)
+        if index_status["state"] == "ready" and not query.exact_match:
+            await run_in_threadpool(catch_up)
+        keyword_filter = build_keyword_filter(query.keywords, query.case_sensitive, query.exact_match)
+        search_filter = {"$and": [mongo_filter, keyword_filter]} if mongo_filter and keyword_filter else mongo_filter or keyword_filter
+
+        # Curseur d'une page d'archives: les données chaudes sont épuisées
+        archive_after = None
+        hot_query = query
+        if query.include_archived and query.cursor and query.cursor.startswith(ARCHIVE_CURSOR_PREFIX):
+            value, doc_id = decode_cursor(query.cursor[len(ARCHIVE_CURSOR_PREFIX):])
+            archive_after = (value or OLDEST, doc_id)
+            hot_query = query.model_copy(update={"cursor": None})
+
+        facets = None
+        if query.facets or query.collapse_duplicates:
+            # Total, page et facettes en un seul aller-retour
+            total, documents, facets = await aggregate_page(search_filter, hot_query)
+            if archive_after is not None:
+                documents = []
+        else:
+            # Compter le total
+            total = await scraped_collection.count_documents(search_filter)
+            
+            # Récupérer les documents (curseur keyset si fourni, sinon offset)
+            documents = []
+            if archive_after is None:
+                page_filter = keyset_filter(search_filter, "scraped_at", query.cursor)
+                documents = await (
+                    scraped_collection
+                    .find(page_filter, SEARCH_PROJECTION)
+                    .skip(0 if query.cursor else query.skip)
+                    .limit(query.limit)
+                    .sort(sort_spec("scraped_at"))
+                    .to_list(None)
+                )
         
-        # Récupérer les documents
-        documents = list(
-            scraped_collection
-            .find(mongo_filter)
-            .skip(query.skip)
-            .limit(query.limit)
-            .sort("scraped_at", -1)
-        )
+        await fill_text_fields_async(documents, ("content_text",))
         
-        # Construire la regex
-        search_regex = build_search_regex(query.keywords, query.case_sensitive)
+        # Automate des mots-clés (mis en cache par ensemble de mots-clés)
+        matcher = get_matcher(query.keywords, query.case_sensitive)
         
         # Filtrer et formater les résultats
         results = []
         for doc in documents:
-            matched_keywords = []
-            content_text = ""
-            
-            # Extraire le contenu
-            if "data" in doc and isinstance(doc["data"], list):
-                content_text = " ".join([str(item.get("value", "")) for item in doc["data"]])
-            elif "content" in doc:
-                content_text = doc["content"]
-            
-            # Chercher les keywords
-            if query.exact_match:
-                # Recherche exacte
-                if query.case_sensitive:
-                    matched = [kw for kw in query.keywords if kw in content_text]
-                else:
-                    matched = [
-                        kw for kw in query.keywords 
-                        if kw.lower() in content_text.lower()
-                    ]
-            else:
-                # Recherche contient (regex)
-                matched = search_regex.findall(content_text)
-                matched = list(set(matched))  # Déduplicater
-            
-            if matched:
-                results.append(SearchResult(
-                    id=str(doc["_id"]),
-                    url=doc.get("url", ""),
-                    source_id=str(doc.get("source_id")) if doc.get("source_id") else None,
-                    content=content_text[:500],  # Limiter à 500 caractères
-                    matched_keywords=matched,
-                    scraped_at=doc.get("scraped_at", datetime.now(UTC))
-                ))
+            result = match_document(doc, query, matcher, whole_word=query.exact_match)
+            if result:
+                results.append(result)
+        
+        # Archives à la suite des données chaudes (plus anciennes): le total
+        # les compte sur chaque page; la dernière page chaude est complétée
+        # par les premières, les suivantes sont paginées par leur propre curseur
+        cursor = next_cursor(documents, "scraped_at", query.limit)
+        if query.include_archived:
+            needed = 0 if cursor else query.limit - len(results)
+            # Pagination par offset: position dans les archives après les données chaudes
+            offset = 0 if query.cursor else max(0, query.skip - total)
+            archived_total, archived = await run_in_threadpool(
+                search_archives, mongo_filter, query, matcher, needed, offset, archive_after
+            )
+            results.extend(archived)
+            total += archived_total
+            if needed and len(archived) == needed:
+                cursor = ARCHIVE_CURSOR_PREFIX + encode_cursor(archived[-1].scraped_at, ObjectId(archived[-1].id))
         
         return SearchResponse(
             total=total,
             results=results,
-            query=query
+            query=query,
+            next_cursor=cursor,
+            facets=facets
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error searching: {str(e)}")
 
+@router.post("/semantic", response_model=SemanticResponse)
+async def semantic_search(query: SemanticQuery):
+    """Rechercher les documents proches du sens des requêtes (plongements TF-IDF locaux)"""
+    if not query.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    try:
+        await run_in_threadpool(catch_up_semantic)
+        vectors = await run_in_threadpool(semantic_index.embed_queries, query.queries)
+        approximate, found = await run_in_threadpool(
+            semantic_index.search,
+            vectors,
+            query.limit,
+            query.start_date,
+            query.end_date,
+            index_source_id(query),
+            query.approximate
+        )
+
+        # Une lecture pour les documents de toutes les requêtes
+        ids = list(dict.fromkeys(doc_id for top in found for _, doc_id in top))
+        documents = await scraped_collection.find({"_id": {"$in": ids}}, SEARCH_PROJECTION).to_list(None)
+        await fill_text_fields_async(documents, ("content_text",))
+        by_id = {doc["_id"]: doc for doc in documents}
+
+        matches = []
+        for text, top in zip(query.queries, found):
+            matcher = get_matcher(tokenize(text))
+            results = []
+            for score, doc_id in top:
+                doc = by_id.get(doc_id)
+                if doc is None:
+                    await run_in_threadpool(semantic_index.remove, doc_id)
+                    continue
+                result = match_document(doc, query, matcher, required=False, whole_word=True)
+                result.score = round(score, 4)
+                results.append(result)
+            matches.append(SemanticMatches(query=text, results=results))
+
+        return SemanticResponse(approximate=approximate, results=matches)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error in semantic search: {str(e)}")
+
+@router.get("/semantic", response_model=dict)
+async def get_semantic_status():
+    """État de l'index de recherche sémantique"""
+    return {**semantic_status, **semantic_index.stats()}
+
+@router.get("/duplicates/{document_id}", response_model=dict)
+async def get_duplicates(document_id: str, limit: int = 50, cursor: Optional[str] = None):
+    """Documents du même groupe de quasi-doublons, du plus récent au plus ancien"""
+    try:
+        doc = await scraped_collection.find_one({"_id": ObjectId(document_id)}, {"cluster_id": 1})
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid document id")
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not doc.get("cluster_id"):
+        return {"cluster_id": None, "documents": [], "next_cursor": None}
+
+    try:
+        documents = await (
+            scraped_collection
+            .find(
+                keyset_filter({"cluster_id": doc["cluster_id"]}, "scraped_at", cursor),
+                {"url": 1, "source_id": 1, "source_name": 1, "scraped_at": 1}
+            )
+            .sort(sort_spec("scraped_at"))
+            .limit(limit)
+            .to_list(None)
+        )
+        return {
+            "cluster_id": str(doc["cluster_id"]),
+            "documents": [
+                {
+                    "id": str(member["_id"]),
+                    "url": member.get("url", ""),
+                    "source_id": str(member["source_id"]) if member.get("source_id") else None,
+                    "source_name": member.get("source_name"),
+                    "scraped_at": member.get("scraped_at")
+                }
+                for member in documents
+            ],
+            "next_cursor": next_cursor(documents, "scraped_at", limit)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error listing duplicates: {str(e)}")
+
+@router.get("/index", response_model=dict)
+async def get_index_status():
+    """État de l'index de recherche classée"""
+    return {**index_status, **search_index.stats(), "duplicates": {**duplicates_status, **duplicate_index.stats()}}
+
+@router.get("/cache", response_model=dict)
+async def get_cache_metrics():
+    """Statistiques du cache des réponses de recherche"""
+    return search_cache.metrics()
+
+@router.delete("/cache", response_model=dict)
+async def clear_cache():
+    """Vider le cache des réponses de recherche"""
+    search_cache.clear()
+    return {"message": "Search cache cleared"}
+
 @router.get("/keywords", response_model=dict)
-def get_top_keywords(limit: int = 20):
+async def get_top_keywords(limit: int = 20):
     """Obtenir les keywords les plus fréquents dans les documents"""
     try:
-        # Récupérer tous les documents
-        documents = list(scraped_collection.find({}))
-        
-        keyword_count = {}
-        
-        for doc in documents:
-            # Extraire le contenu
-            content_text = ""
-            if "data" in doc and isinstance(doc["data"], list):
-                content_text = " ".join([str(item.get("value", "")) for item in doc["data"]])
-            elif "content" in doc:
-                content_text = doc["content"]
-            
-            # Extraire les mots (simple tokenization)
-            words = re.findall(r'\b[a-zA-Z]{3,}\b', content_text.lower())
-            for word in words:
-                keyword_count[word] = keyword_count.get(word, 0) + 1
-        
-        # Trier et retourner les top keywords
-        top_keywords = sorted(
-            keyword_count.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:limit]
+        # Table term_stats tenue à jour à l'écriture: lecture des k premiers via l'index
+        total, top_keywords = await run_in_threadpool(top_terms, limit)
         
         return {
-            "total_unique_keywords": len(keyword_count),
-            "top_keywords": [{"keyword": kw, "count": count} for kw, count in top_keywords]
+            "total_unique_keywords": total,
+            "top_keywords": [
+                {"keyword": kw, "count": count, "documents": documents}
+                for kw, count, documents in top_keywords
+            ]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting keywords: {str(e)}")
 
+@router.get("/trending", response_model=dict)
+async def get_trending_terms(window: str = "day", limit: int = 20):
+    """Termes les plus fréquents parmi les documents ingérés dans la fenêtre (hour, day, week)"""
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Unsupported window '{window}'. Expected one of: {', '.join(WINDOWS)}")
+    return {
+        "window": window,
+        "terms": trending_terms.top(window, limit),
+        **trending_terms.stats()
+    }
+
 @router.post("/advanced", response_model=SearchResponse)
-def advanced_search(query: SearchQuery):
+async def advanced_search(query: SearchQuery):
     """Recherche avancée avec plusieurs options"""
-    return search_documents(query)
+    return await search_documents(query)
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 import requests
-from db import collection as scraped_collection, sources_collection, db
+from db import async_collection as scraped_collection, async_sources_collection as sources_collection, async_db as db
+from doc_format import prepare_document
+from ingest import documents_inserted
+from pagination import keyset_filter, next_cursor, sort_spec
 from datetime import datetime, UTC
 from bson import ObjectId
 import logging
@@ -138,7 +142,7 @@ def fetch_linkedin_data(profile_id: str, limit: int = 20) -> dict:
 # ==================== Routes ====================
 
 @router.post("/add-source")
-def add_social_media_source(request: SocialMediaSourceCreate):
+async def add_social_media_source(request: SocialMediaSourceCreate):
     """Ajouter une source de réseau social"""
     try:
         # Valider la plateforme
@@ -169,7 +173,7 @@ def add_social_media_source(request: SocialMediaSourceCreate):
         if request.api_key:
             source_doc["has_api_key"] = True
         
-        inserted = sources_collection.insert_one(source_doc)
+        inserted = await sources_collection.insert_one(source_doc)
         source_doc["id"] = str(inserted.inserted_id)
         
         return {
@@ -187,14 +191,14 @@ def add_social_media_source(request: SocialMediaSourceCreate):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.get("/sources")
-def get_social_media_sources(platform: Optional[str] = None):
+async def get_social_media_sources(platform: Optional[str] = None):
     """Obtenir les sources de réseaux sociaux"""
     try:
         query = {"source_type": "social_media"}
         if platform:
             query["platform"] = platform.lower()
         
-        sources = list(sources_collection.find(query))
+        sources = await sources_collection.find(query).to_list(None)
         
         return {
             "total": len(sources),
@@ -215,10 +219,10 @@ def get_social_media_sources(platform: Optional[str] = None):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.post("/test-connection/{source_id}")
-def test_social_media_connection(source_id: str):
+async def test_social_media_connection(source_id: str):
     """Tester la connexion à une source de réseau social"""
     try:
-        source = sources_collection.find_one({
+        source = await sources_collection.find_one({
             "_id": ObjectId(source_id),
             "source_type": "social_media"
         })
@@ -259,10 +263,10 @@ def test_social_media_connection(source_id: str):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.post("/scrape/{source_id}")
-def scrape_social_media_source(source_id: str):
+async def scrape_social_media_source(source_id: str):
     """Scraper une source de réseau social"""
     try:
-        source = sources_collection.find_one({
+        source = await sources_collection.find_one({
             "_id": ObjectId(source_id),
             "source_type": "social_media"
         })
@@ -316,11 +320,14 @@ def scrape_social_media_source(source_id: str):
                 "content_type": "social_media",
                 "scraped_at": datetime.now(UTC)
             }
-            inserted = scraped_collection.insert_one(document)
+            stored = await run_in_threadpool(prepare_document, document)
+            inserted = await scraped_collection.insert_one(stored)
+            stored["_id"] = inserted.inserted_id
+            await run_in_threadpool(documents_inserted, [stored])
             documents.append(str(inserted.inserted_id))
         
         # Mettre à jour la source
-        sources_collection.update_one(
+        await sources_collection.update_one(
             {"_id": ObjectId(source_id)},
             {
                 "$set": {"last_scraped": datetime.now(UTC)},
@@ -341,10 +348,10 @@ def scrape_social_media_source(source_id: str):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.get("/source/{source_id}/posts")
-def get_social_media_posts(source_id: str, limit: int = 20):
+async def get_social_media_posts(source_id: str, limit: int = 20, cursor: Optional[str] = None):
     """Obtenir les posts scrappés d'une source"""
     try:
-        source = sources_collection.find_one({
+        source = await sources_collection.find_one({
             "_id": ObjectId(source_id),
             "source_type": "social_media"
         })
@@ -353,12 +360,17 @@ def get_social_media_posts(source_id: str, limit: int = 20):
             raise HTTPException(status_code=404, detail="Social media source not found")
         
         # Récupérer les documents scrappés
-        docs = list(
+        docs = await (
             scraped_collection.find(
-                {"platform": source.get("platform"), "source_name": source.get("name")}
+                keyset_filter(
+                    {"platform": source.get("platform"), "source_name": source.get("name")},
+                    "scraped_at",
+                    cursor
+                )
             )
-            .sort("scraped_at", -1)
+            .sort(sort_spec("scraped_at"))
             .limit(limit)
+            .to_list(None)
         )
         
         return {
@@ -380,15 +392,18 @@ def get_social_media_posts(source_id: str, limit: int = 20):
                 }
                 for doc in docs
             ],
-            "total": len(docs)
+            "total": len(docs),
+            "next_cursor": next_cursor(docs, "scraped_at", limit)
         }
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.get("/stats")
-def get_social_media_stats():
+async def get_social_media_stats():
     """Obtenir les statistiques des réseaux sociaux"""
     try:
         # Compter les sources par plateforme
@@ -396,12 +411,12 @@ def get_social_media_stats():
         stats = {}
         
         for platform in platforms:
-            count = sources_collection.count_documents({
+            count = await sources_collection.count_documents({
                 "source_type": "social_media",
                 "platform": platform,
                 "active": True
             })
-            posts_count = scraped_collection.count_documents({
+            posts_count = await scraped_collection.count_documents({
                 "source_type": "social_media",
                 "platform": platform
             })
@@ -410,8 +425,8 @@ def get_social_media_stats():
                 "posts_scraped": posts_count
             }
         
-        total_sources = sources_collection.count_documents({"source_type": "social_media"})
-        total_posts = scraped_collection.count_documents({"source_type": "social_media"})
+        total_sources = await sources_collection.count_documents({"source_type": "social_media"})
+        total_posts = await scraped_collection.count_documents({"source_type": "social_media"})
         
         return {
             "total_sources": total_sources,
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, ConfigDict
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ConfigDict, ValidationError
 from typing import List, Optional
-from db import sources_collection
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from db import async_sources_collection as sources_collection
+from snapshots import list_versions, reconstruct_version
+from latest import latest_summary, latest_data, LATEST_SUMMARY_FIELDS
+from pagination import keyset_filter, next_cursor, sort_spec
+from source_io import SOURCE_FORMATS, parse_sources, dump_sources
+from routes.rss import parse_rss_feed
+from scheduler import schedule_sources
 from datetime import datetime, UTC
 from bson import ObjectId
+import asyncio
 
 router = APIRouter(prefix="/sources", tags=["sources"])
 
@@ -40,7 +50,7 @@ class SourceResponse(SourceCreate):
 # ==================== Routes ====================
 
 @router.post("/", response_model=SourceResponse, status_code=201)
-def create_source(source: SourceCreate):
+async def create_source(source: SourceCreate):
     """Créer une nouvelle source"""
     try:
         document = {
@@ -49,18 +59,37 @@ def create_source(source: SourceCreate):
             "last_scraped": None,
             "scrape_count": 0
         }
-        result = sources_collection.insert_one(document)
+        result = await sources_collection.insert_one(document)
         document["id"] = str(result.inserted_id)
         return document
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error creating source: {str(e)}")
 
 @router.get("/", response_model=List[SourceResponse])
-def list_sources(active_only: bool = False):
-    """Lister toutes les sources"""
+async def list_sources(
+    response: Response,
+    active_only: bool = False,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """Lister les sources (toutes, ou par pages avec limit/cursor)"""
     try:
         query = {"active": True} if active_only else {}
-        sources = list(sources_collection.find(query))
+        if limit or cursor:
+            # Pagination par curseur: le curseur suivant est renvoyé dans X-Next-Cursor
+            limit = limit or 100
+            sources = await (
+                sources_collection
+                .find(keyset_filter(query, "created_at", cursor), {"latest": 0})
+                .sort(sort_spec("created_at"))
+                .limit(limit)
+                .to_list(None)
+            )
+            page_cursor = next_cursor(sources, "created_at", limit)
+            if page_cursor:
+                response.headers["X-Next-Cursor"] = page_cursor
+        else:
+            sources = await sources_collection.find(query, {"latest": 0}).to_list(None)
         
         # Formater les réponses
         return [
@@ -69,14 +98,183 @@ def list_sources(active_only: bool = False):
                 "id": str(source["_id"])
             } for source in sources
         ]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error listing sources: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing sources: {str(e)}")
 
+# ==================== Import / export en masse ====================
+
+MAX_IMPORT_CONCURRENCY = 50
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+async def validate_feeds(rows: List[dict], concurrency: int):
+    """Valider les flux RSS en parallèle (au plus concurrency requêtes simultanées)"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def validate(row: dict):
+        async with semaphore:
+            result = await run_in_threadpool(parse_rss_feed, row["source"].url, 1)
+        if not result["success"]:
+            row.update({"status": "invalid", "error": f"Invalid RSS feed: {result['error']}"})
+        elif not row["source"].description:
+            row["source"].description = result["feed_info"]["description"] or None
+
+    await asyncio.gather(*(validate(row) for row in rows))
+
+@router.post("/import")
+async def import_sources(
+    request: Request,
+    format: str = "json",
+    validate: bool = True,
+    schedule: bool = True,
+    concurrency: int = 10
+):
+    """Importer des sources en masse (corps CSV, JSON ou OPML) avec un rapport par ligne"""
+    if format not in SOURCE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'. Expected one of: {', '.join(SOURCE_FORMATS)}")
+    if not 1 <= concurrency <= MAX_IMPORT_CONCURRENCY:
+        raise HTTPException(status_code=400, detail=f"concurrency must be between 1 and {MAX_IMPORT_CONCURRENCY}")
+    try:
+        rows = parse_sources((await request.body()).decode("utf-8-sig"), format)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Error reading import: {str(e)}")
+
+    try:
+        # Validation du modèle et doublons dans le fichier
+        report = []
+        seen = set()
+        for position, row in enumerate(rows, start=1):
+            entry = {"row": position, "name": None, "url": None, "status": "pending"}
+            report.append(entry)
+            if not isinstance(row, dict):
+                entry.update({"status": "invalid", "error": "Expected an object"})
+                continue
+            entry.update({"name": row.get("name"), "url": row.get("url")})
+            if row.get("source_type") == "rss":
+                row.setdefault("limit", 20)  # même défaut que /rss/add-source
+            try:
+                entry["source"] = SourceCreate.model_validate(row)
+            except ValidationError as e:
+                entry.update({"status": "invalid", "error": _validation_message(e)})
+                continue
+            if entry["url"] in seen:
+                entry["status"] = "duplicate"
+            seen.add(entry["url"])
+
+        # Doublons avec les sources existantes (une seule requête)
+        pending = [entry for entry in report if entry["status"] == "pending"]
+        existing = {
+            source["url"] for source in await sources_collection.find(
+                {"url": {"$in": [entry["url"] for entry in pending]}}, {"url": 1}
+            ).to_list(None)
+        }
+        for entry in pending:
+            if entry["url"] in existing:
+                entry["status"] = "duplicate"
+
+        if validate:
+            await validate_feeds([
+                entry for entry in report
+                if entry["status"] == "pending" and entry["source"].source_type == "rss"
+            ], concurrency)
+
+        # Écriture en un seul bulk_write
+        now = datetime.now(UTC)
+        created = []
+        for entry in report:
+            if entry["status"] == "pending":
+                entry["document"] = {
+                    "_id": ObjectId(),
+                    **entry["source"].model_dump(),
+                    "created_at": now,
+                    "last_scraped": None,
+                    "scrape_count": 0
+                }
+                created.append(entry)
+        failed = {}
+        if created:
+            try:
+                await sources_collection.bulk_write(
+                    [InsertOne(entry["document"]) for entry in created], ordered=False
+                )
+            except BulkWriteError as e:
+                failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        for index, entry in enumerate(created):
+            if index in failed:
+                entry.update({"status": "error", "error": failed[index]})
+            else:
+                entry.update({"status": "created", "id": str(entry["document"]["_id"])})
+
+        inserted = [entry["document"] for entry in created if entry["status"] == "created"]
+        scheduled = 0
+        if schedule and inserted:
+            scheduled = (await run_in_threadpool(schedule_sources, inserted))["scheduled_count"]
+
+        for entry in report:
+            entry.pop("source", None)
+            entry.pop("document", None)
+        return {
+            "total": len(report),
+            "created": len(inserted),
+            "duplicates": sum(entry["status"] == "duplicate" for entry in report),
+            "invalid": sum(entry["status"] == "invalid" for entry in report),
+            "errors": sum(entry["status"] == "error" for entry in report),
+            "scheduled": scheduled,
+            "rows": report
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing sources: {str(e)}")
+
+@router.get("/export")
+async def export_sources(format: str = "json", source_type: Optional[str] = None, active_only: bool = False):
+    """Exporter les sources (CSV, JSON ou OPML), réimportables par /sources/import"""
+    if format not in SOURCE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'. Expected one of: {', '.join(SOURCE_FORMATS)}")
+    try:
+        query = {"source_type": source_type} if source_type else {}
+        if active_only:
+            query["active"] = True
+        sources = await sources_collection.find(query).sort(sort_spec("created_at")).to_list(None)
+        return Response(
+            content=dump_sources(sources, format),
+            media_type=SOURCE_FORMATS[format],
+            headers={"Content-Disposition": f'attachment; filename="sources.{format}"'}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting sources: {str(e)}")
+
+@router.get("/latest")
+async def get_latest_states(active_only: bool = True):
+    """État courant (dernière version) de toutes les sources en une lecture"""
+    try:
+        query = {"active": True} if active_only else {}
+        projection = {"name": 1, "source_type": 1, **{f"latest.{field}": 1 for field in LATEST_SUMMARY_FIELDS}}
+        sources = await sources_collection.find(query, projection).to_list(None)
+        return {
+            "total": len(sources),
+            "sources": [
+                {
+                    "source_id": str(source["_id"]),
+                    "name": source.get("name"),
+                    "source_type": source.get("source_type"),
+                    "latest": latest_summary(source)
+                }
+                for source in sources
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching latest states: {str(e)}")
+
 @router.get("/{source_id}", response_model=SourceResponse)
-def get_source(source_id: str):
+async def get_source(source_id: str):
     """Récupérer une source spécifique"""
     try:
-        source = sources_collection.find_one({"_id": ObjectId(source_id)})
+        source = await sources_collection.find_one({"_id": ObjectId(source_id)})
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
         
@@ -86,7 +284,7 @@ def get_source(source_id: str):
         raise HTTPException(status_code=400, detail=f"Error fetching source: {str(e)}")
 
 @router.put("/{source_id}", response_model=SourceResponse)
-def update_source(source_id: str, source_update: SourceUpdate):
+async def update_source(source_id: str, source_update: SourceUpdate):
     """Mettre à jour une source"""
     try:
         update_data = {k: v for k, v in source_update.model_dump().items() if v is not None}
@@ -94,7 +292,7 @@ def update_source(source_id: str, source_update: SourceUpdate):
         if not update_data:
             raise HTTPException(status_code=400, detail="No fields to update")
         
-        result = sources_collection.update_one(
+        result = await sources_collection.update_one(
             {"_id": ObjectId(source_id)},
             {"$set": update_data}
         )
@@ -103,17 +301,17 @@ def update_source(source_id: str, source_update: SourceUpdate):
             raise HTTPException(status_code=404, detail="Source not found")
         
         # Récupérer le document mis à jour
-        source = sources_collection.find_one({"_id": ObjectId(source_id)})
+        source = await sources_collection.find_one({"_id": ObjectId(source_id)})
         source["id"] = str(source["_id"])
         return source
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error updating source: {str(e)}")
 
 @router.delete("/{source_id}", status_code=204)
-def delete_source(source_id: str):
+async def delete_source(source_id: str):
     """Supprimer une source"""
     try:
-        result = sources_collection.delete_one({"_id": ObjectId(source_id)})
+        result = await sources_collection.delete_one({"_id": ObjectId(source_id)})
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Source not found")
@@ -123,21 +321,82 @@ def delete_source(source_id: str):
         raise HTTPException(status_code=400, detail=f"Error deleting source: {str(e)}")
 
 @router.patch("/{source_id}/toggle", response_model=SourceResponse)
-def toggle_source_active(source_id: str):
+async def toggle_source_active(source_id: str):
     """Activer/désactiver une source"""
     try:
-        source = sources_collection.find_one({"_id": ObjectId(source_id)})
+        source = await sources_collection.find_one({"_id": ObjectId(source_id)})
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
         
         new_active = not source.get("active", True)
-        result = sources_collection.update_one(
+        result = await sources_collection.update_one(
             {"_id": ObjectId(source_id)},
             {"$set": {"active": new_active}}
         )
         
-        source = sources_collection.find_one({"_id": ObjectId(source_id)})
+        source = await sources_collection.find_one({"_id": ObjectId(source_id)})
         source["id"] = str(source["_id"])
         return source
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error toggling source: {str(e)}")
+
+@router.get("/{source_id}/latest")
+async def get_source_latest(source_id: str):
+    """Données de la version courante d'une source (sans rejouer les deltas)"""
+    try:
+        source = await sources_collection.find_one({"_id": ObjectId(source_id)}, {"latest.entries": 0})
+        if not source:
+            raise HTTPException(status_code=404, detail="Source not found")
+
+        data = latest_data(source)
+        if data is None:
+            # Source scrappée avant l'état courant embarqué: dernière version reconstruite
+            versions = await list_versions(ObjectId(source_id))
+            if not versions:
+                raise HTTPException(status_code=404, detail="Source has not been scraped yet")
+            snapshot = await reconstruct_version(ObjectId(source_id), versions[0]["version"])
+            data = snapshot["data"]
+            summary = {"document_id": str(snapshot["_id"]), "version": snapshot["version"], "changed_at": snapshot.get("scraped_at")}
+        else:
+            summary = latest_summary(source)
+
+        return {"source_id": source_id, **summary, "data": data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error fetching latest version: {str(e)}")
+
+@router.get("/{source_id}/versions")
+async def get_source_versions(source_id: str):
+    """Lister les versions scrappées d'une source"""
+    try:
+        versions = await list_versions(ObjectId(source_id))
+        return {
+            "source_id": source_id,
+            "total": len(versions),
+            "versions": [
+                {
+                    "document_id": str(version["_id"]),
+                    **{k: v for k, v in version.items() if k != "_id"}
+                }
+                for version in versions
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error listing versions: {str(e)}")
+
+@router.get("/{source_id}/versions/{version}")
+async def get_source_version(source_id: str, version: int):
+    """Reconstruire une version scrappée d'une source"""
+    try:
+        snapshot = await reconstruct_version(ObjectId(source_id), version)
+        if not snapshot:
+            raise HTTPException(status_code=404, detail="Version not found")
+        
+        snapshot["_id"] = str(snapshot["_id"])
+        snapshot["source_id"] = str(snapshot["source_id"])
+        return snapshot
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error fetching version: {str(e)}")
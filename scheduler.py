@@ -1,12 +1,20 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from db import sources_collection, collection as scraped_collection, db
+from snapshots import store_snapshot
+from latest import scrape_update
+from doc_format import migrate_data_format, migration_status
+from retention import run_retention, retention_status
+from search_index import save_search_index
+from semantic_index import save_semantic_index
+from term_stats import flush_term_stats, rebuild_term_stats, term_stats_status
 import requests
 from bs4 import BeautifulSoup
 import io
 from pypdf import PdfReader
 from datetime import datetime, UTC
 from bson import ObjectId
+from typing import List
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -27,7 +35,10 @@ def get_config():
             "timeout": 15,
             "retry_count": 3,
             "retry_delay": 5,
-            "enabled": True
+            "enabled": True,
+            "retention_days": None,
+            "source_retention_days": {},
+            "archive_expired": True
         }
     return config
 
@@ -126,62 +137,78 @@ def scrape_source_job(source_id: str):
             "content_type": result["content_type"],
             "scraped_at": datetime.now(UTC)
         }
-        inserted_doc = scraped_collection.insert_one(document)
+        # Versionner: un snapshot identique n'est pas re-stocké
+        snapshot = store_snapshot(document)
 
-        # Mettre à jour la source
-        sources_collection.update_one(
-            {"_id": ObjectId(source_id)},
-            {
-                "$set": {"last_scraped": datetime.now(UTC)},
-                "$inc": {"scrape_count": 1}
-            }
-        )
+        # Mettre à jour la source et son état courant (une seule écriture)
+        sources_collection.update_one({"_id": ObjectId(source_id)}, scrape_update(document, snapshot))
 
-        logger.info(f"✅ Successfully scraped {source['name']}: {result['count']} items")
+        logger.info(f"✅ Successfully scraped {source['name']}: {result['count']} items ({snapshot['status']})")
         return {
             "success": True,
             "source_name": source["name"],
             "items_count": result["count"],
-            "document_id": str(inserted_doc.inserted_id)
+            "document_id": str(snapshot["document_id"]),
+            "version": snapshot["version"],
+            "snapshot_status": snapshot["status"]
         }
 
     except Exception as e:
         logger.error(f"Error in scrape_source_job for {source_id}: {str(e)}")
         return {"success": False, "error": str(e)}
 
+def _add_scrape_job(source_id: str, frequency_hours: int):
+    """Ajouter (ou remplacer) le job de scraping d'une source"""
+    job_id = f"scrape_{source_id}"
+
+    # Supprimer le job existant s'il y en a un
+    if job_id in scheduled_jobs:
+        scheduler.remove_job(job_id)
+        del scheduled_jobs[job_id]
+
+    # Ajouter le nouveau job
+    job = scheduler.add_job(
+        scrape_source_job,
+        IntervalTrigger(hours=frequency_hours),
+        args=[source_id],
+        id=job_id,
+        name=f"Scrape source {source_id}",
+        replace_existing=True,
+        max_instances=1
+    )
+
+    scheduled_jobs[job_id] = {
+        "source_id": source_id,
+        "frequency_hours": frequency_hours,
+        "job": job
+    }
+    return job_id
+
 def schedule_source(source_id: str, frequency_hours: int):
     """Programmer une source pour scraping automatique"""
     try:
-        job_id = f"scrape_{source_id}"
-        
-        # Supprimer le job existant s'il y en a un
-        if job_id in scheduled_jobs:
-            scheduler.remove_job(job_id)
-            del scheduled_jobs[job_id]
-        
-        # Ajouter le nouveau job
-        job = scheduler.add_job(
-            scrape_source_job,
-            IntervalTrigger(hours=frequency_hours),
-            args=[source_id],
-            id=job_id,
-            name=f"Scrape source {source_id}",
-            replace_existing=True,
-            max_instances=1
-        )
-        
-        scheduled_jobs[job_id] = {
-            "source_id": source_id,
-            "frequency_hours": frequency_hours,
-            "job": job
-        }
-        
+        job_id = _add_scrape_job(source_id, frequency_hours)
         logger.info(f"✅ Scheduled {job_id} every {frequency_hours} hours")
         return {"success": True, "job_id": job_id, "frequency_hours": frequency_hours}
     except Exception as e:
         logger.error(f"Error scheduling source {source_id}: {str(e)}")
         return {"success": False, "error": str(e)}
 
+def schedule_sources(sources: List[dict]):
+    """Programmer en une passe les sources actives d'un import en masse"""
+    scheduled = 0
+    errors = []
+    for source in sources:
+        if not source.get("active", True):
+            continue
+        try:
+            _add_scrape_job(str(source["_id"]), source.get("frequency", 24))
+            scheduled += 1
+        except Exception as e:
+            errors.append({"source_id": str(source["_id"]), "error": str(e)})
+    logger.info(f"✅ Scheduled {scheduled} imported sources")
+    return {"success": not errors, "scheduled_count": scheduled, "errors": errors}
+
 def unschedule_source(source_id: str):
     """Arrêter le scraping automatique d'une source"""
     try:
@@ -226,6 +253,42 @@ def start_scheduler():
             logger.info("✅ Scheduler started")
             # Re-programmer les sources
             reschedule_all_sources()
+            # Rétention: une passe par jour
+            scheduler.add_job(
+                run_retention,
+                trigger=IntervalTrigger(hours=24),
+                id="retention",
+                name="Apply retention policy",
+                replace_existing=True,
+                max_instances=1
+            )
+            # Fréquences des mots-clés: écriture des variations en attente
+            scheduler.add_job(
+                flush_term_stats,
+                trigger=IntervalTrigger(minutes=1),
+                id="term_stats_flush",
+                name="Flush keyword frequencies",
+                replace_existing=True,
+                max_instances=1
+            )
+            # Index de recherche: instantané disque toutes les 10 minutes
+            scheduler.add_job(
+                save_search_index,
+                trigger=IntervalTrigger(minutes=10),
+                id="search_index_snapshot",
+                name="Save search index snapshot",
+                replace_existing=True,
+                max_instances=1
+            )
+            # Index sémantique: métadonnées et entraînement de l'index approché
+            scheduler.add_job(
+                save_semantic_index,
+                trigger=IntervalTrigger(minutes=10),
+                id="semantic_index_snapshot",
+                name="Save semantic index",
+                replace_existing=True,
+                max_instances=1
+            )
         return {"success": True, "message": "Scheduler started"}
     except Exception as e:
         logger.error(f"Error starting scheduler: {str(e)}")
@@ -242,6 +305,69 @@ def stop_scheduler():
         logger.error(f"Error stopping scheduler: {str(e)}")
         return {"success": False, "error": str(e)}
 
+def start_data_format_migration(batch_size: int = 500):
+    """Lancer la migration du format de stockage en tâche de fond"""
+    try:
+        if migration_status["running"]:
+            return {"success": False, "error": "Migration already running"}
+        if not scheduler.running:
+            return {"success": False, "error": "Scheduler is not running"}
+        scheduler.add_job(
+            migrate_data_format,
+            args=[batch_size],
+            id="migrate_data_format",
+            name="Migrate data format",
+            replace_existing=True,
+            max_instances=1
+        )
+        logger.info("✅ Data format migration scheduled")
+        return {"success": True, "message": "Data format migration started"}
+    except Exception as e:
+        logger.error(f"Error starting data format migration: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+def start_term_stats_rebuild(batch_size: int = 1000):
+    """Recalculer les fréquences des mots-clés en tâche de fond"""
+    try:
+        if term_stats_status["running"]:
+            return {"success": False, "error": "Term stats rebuild already running"}
+        if not scheduler.running:
+            return {"success": False, "error": "Scheduler is not running"}
+        scheduler.add_job(
+            rebuild_term_stats,
+            args=[batch_size],
+            id="term_stats_rebuild",
+            name="Rebuild keyword frequencies",
+            replace_existing=True,
+            max_instances=1
+        )
+        logger.info("✅ Term stats rebuild scheduled")
+        return {"success": True, "message": "Term stats rebuild started"}
+    except Exception as e:
+        logger.error(f"Error starting term stats rebuild: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+def start_retention(batch_size: int = 500):
+    """Lancer immédiatement la politique de rétention en tâche de fond"""
+    try:
+        if retention_status["running"]:
+            return {"success": False, "error": "Retention already running"}
+        if not scheduler.running:
+            return {"success": False, "error": "Scheduler is not running"}
+        scheduler.add_job(
+            run_retention,
+            args=[batch_size],
+            id="retention_now",
+            name="Apply retention policy now",
+            replace_existing=True,
+            max_instances=1
+        )
+        logger.info("✅ Retention run scheduled")
+        return {"success": True, "message": "Retention started"}
+    except Exception as e:
+        logger.error(f"Error starting retention: {str(e)}")
+        return {"success": False, "error": str(e)}
+
 def get_scheduler_status():
     """Obtenir le statut du scheduler"""
     return {
@@ -0,0 +1,109 @@
+from ingest import register
+from collections import OrderedDict
+from typing import List, Optional
+import json
+import os
+import threading
+import time
+
+# Cache LRU des réponses de /search, invalidé par les écritures:
+# - chaque écriture de scraped_data (hooks d'ingestion) incrémente la
+#   génération globale et celle de la source du document
+# - une réponse filtrée sur une source ne dépend que de la génération de
+#   cette source, les autres de la génération globale: une réponse dont la
+#   génération a changé depuis son calcul n'est plus servie
+# - SEARCH_CACHE_TTL borne l'âge des réponses (écritures hors hooks:
+#   expiration TTL, suppression de partition)
+
+def _env_number(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+class SearchCache:
+    """Réponses de recherche par requête normalisée, avec statistiques de hit rate"""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # clé → (génération, calculée à, réponse)
+        self._generation = 0
+        self._source_generations = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    @staticmethod
+    def key(query) -> str:
+        """Clé de la requête: mots-clés dédupliqués et triés, options sérialisées"""
+        fields = query.model_dump(mode="json")
+        fields["keywords"] = sorted(set(fields["keywords"]))
+        return json.dumps(fields, sort_keys=True)
+
+    def generation(self, source_id: Optional[str] = None) -> tuple:
+        """Génération dont dépend une requête (à lire avant de la calculer)"""
+        with self._lock:
+            if source_id is None:
+                return ("*", self._generation)
+            return (source_id, self._source_generations.get(source_id, 0))
+
+    def get(self, key: str, generation: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if entry[0] != generation or time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.stats["stale"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[2]
+
+    def put(self, key: str, generation: tuple, response):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, time.monotonic(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, source_ids: List[Optional[str]]):
+        """Écriture: nouvelle génération globale et pour chaque source concernée"""
+        with self._lock:
+            self._generation += 1
+            for source_id in set(source_ids):
+                if source_id is not None:
+                    self._source_generations[source_id] = self._source_generations.get(source_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats.update({"hits": 0, "misses": 0, "stale": 0, "evictions": 0})
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "generation": self._generation
+            }
+
+search_cache = SearchCache(
+    int(_env_number("SEARCH_CACHE_SIZE", 1000)),
+    _env_number("SEARCH_CACHE_TTL", 300)
+)
+
+def invalidate_documents(documents: List[dict]):
+    """Hook d'ingestion: invalider les réponses touchées par les documents écrits"""
+    search_cache.invalidate([
+        str(doc["source_id"]) if doc.get("source_id") is not None else None
+        for doc in documents
+    ])
+
+register("search_cache", invalidate_documents, invalidate_documents)
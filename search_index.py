@@ -0,0 +1,663 @@
+from db import collection as scraped_collection
+from doc_format import fill_text_fields, tokenize
+from boolean_query import positive_terms
+from trigram_index import TrigramIndex
+from ingest import register
+from facets import truncate_date
+from array import array
+from bson import ObjectId
+from collections import Counter
+from datetime import datetime, UTC
+from typing import List, Optional
+import heapq
+import logging
+import math
+import os
+import pickle
+import sys
+import threading
+
+try:
+    import zstandard as zstd
+except ImportError:  # compression optionnelle
+    zstd = None
+
+logger = logging.getLogger(__name__)
+
+# Index inversé en mémoire de scraped_data pour la recherche classée (BM25)
+# et les requêtes booléennes (phrases, NEAR/k, AND/OR/NOT, boolean_query.py).
+# - postings: terme → (numéros de documents, fréquences, positions), tableaux
+#   compacts (array) alimentés à l'écriture par les hooks d'ingestion
+#   (ingest.py); les positions d'un document suivent celles des documents
+#   précédents (décalage = somme des fréquences précédentes)
+# - trigrammes du vocabulaire (trigram_index.py) pour la recherche floue,
+#   reconstruits depuis les postings au chargement d'un instantané
+# - attributs par document (date, source, types de contenu et de source,
+#   groupe de quasi-doublons) pour les filtres, les facettes et le
+#   regroupement des doublons
+# - suppressions: pierres tombales, compactées au-delà de COMPACT_RATIO
+# - instantané sur disque (SEARCH_INDEX_PATH) rechargé au démarrage, puis
+#   rattrapage des documents dont l'_id est postérieur au dernier indexé
+BM25_K1 = 1.2
+BM25_B = 0.75
+COMPACT_RATIO = 0.25
+SNAPSHOT_VERSION = 4
+SNAPSHOT_MAGIC = {True: b"IDXZ", False: b"IDXP"}  # compressé zstd ou non
+
+def get_index_path() -> str:
+    return os.getenv("SEARCH_INDEX_PATH", "search_index.snapshot")
+
+def _timestamp(date: Optional[datetime]) -> float:
+    if date is None:
+        return 0.0
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=UTC)
+    return date.timestamp()
+
+def _intern(value):
+    # Types de contenu et de source: une seule chaîne partagée par valeur
+    return sys.intern(value) if isinstance(value, str) else value
+
+class InvertedIndex:
+    """Index inversé avec statistiques de termes pour le classement BM25"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.doc_ids = []       # numéro → _id
+            self.numbers = {}       # _id → numéro
+            self.lengths = array("I")
+            self.dates = array("d")
+            self.sources = []       # numéro → source_id
+            self.content_types = []  # numéro → content_type
+            self.source_types = []  # numéro → source_type
+            self.cluster_ids = []   # numéro → cluster_id (near_duplicates.py)
+            self.deleted = bytearray()
+            self.deleted_count = 0
+            self.postings = {}      # terme → (array numéros, array fréquences, array positions)
+            self.trigrams = TrigramIndex()
+            self.live = 0
+            self.total_length = 0
+            self.last_id = None     # dernier _id rattrapé (point de reprise de catch_up)
+            self.catching_up = False
+
+    def __len__(self) -> int:
+        return self.live
+
+    def add(
+        self,
+        doc_id,
+        tokens: List[str],
+        scraped_at: Optional[datetime] = None,
+        source_id=None,
+        content_type: Optional[str] = None,
+        source_type: Optional[str] = None,
+        cluster_id=None
+    ):
+        """Indexer les termes d'un document, dans l'ordre (réindexé s'il l'était déjà)"""
+        positions = {}
+        for position, term in enumerate(tokens):
+            positions.setdefault(term, []).append(position)
+
+        with self._lock:
+            if doc_id in self.numbers:
+                self._remove(doc_id)
+            number = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.numbers[doc_id] = number
+            length = len(tokens)
+            self.lengths.append(length)
+            self.dates.append(_timestamp(scraped_at))
+            self.sources.append(source_id)
+            self.content_types.append(_intern(content_type))
+            self.source_types.append(_intern(source_type))
+            self.cluster_ids.append(cluster_id)
+            self.deleted.append(0)
+            for term, term_positions in positions.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array("I"), array("I"), array("I"))
+                    self.trigrams.add(term)
+                postings[0].append(number)
+                postings[1].append(len(term_positions))
+                postings[2].extend(term_positions)
+            self.live += 1
+            self.total_length += length
+            if not self.catching_up:
+                self._advance(doc_id)
+
+    def _advance(self, doc_id):
+        if isinstance(doc_id, ObjectId) and (self.last_id is None or doc_id > self.last_id):
+            self.last_id = doc_id
+
+    def begin_catch_up(self):
+        """Rattrapage: les écritures ne déplacent plus last_id (point de départ renvoyé)"""
+        with self._lock:
+            self.catching_up = True
+            return self.last_id
+
+    def end_catch_up(self, last_id):
+        """Fin du rattrapage: last_id avance jusqu'au dernier document lu"""
+        with self._lock:
+            self.catching_up = False
+            if last_id is not None:
+                self._advance(last_id)
+
+    def remove(self, doc_id) -> bool:
+        with self._lock:
+            return self._remove(doc_id)
+
+    def _remove(self, doc_id) -> bool:
+        number = self.numbers.pop(doc_id, None)
+        if number is None:
+            return False
+        self.deleted[number] = 1
+        self.deleted_count += 1
+        self.live -= 1
+        self.total_length -= self.lengths[number]
+        if self.deleted_count > COMPACT_RATIO * len(self.doc_ids):
+            self.compact()
+        return True
+
+    def compact(self):
+        """Renuméroter les documents vivants et purger les postings des supprimés"""
+        with self._lock:
+            renumber = {}
+            doc_ids, lengths, dates, sources = [], array("I"), array("d"), []
+            content_types, source_types, cluster_ids = [], [], []
+            for number, doc_id in enumerate(self.doc_ids):
+                if self.deleted[number]:
+                    continue
+                renumber[number] = len(doc_ids)
+                doc_ids.append(doc_id)
+                lengths.append(self.lengths[number])
+                dates.append(self.dates[number])
+                sources.append(self.sources[number])
+                content_types.append(self.content_types[number])
+                source_types.append(self.source_types[number])
+                cluster_ids.append(self.cluster_ids[number])
+
+            postings = {}
+            for term, (numbers, counts, positions) in self.postings.items():
+                kept = (array("I"), array("I"), array("I"))
+                offset = 0
+                for number, count in zip(numbers, counts):
+                    if number in renumber:
+                        kept[0].append(renumber[number])
+                        kept[1].append(count)
+                        kept[2].extend(positions[offset:offset + count])
+                    offset += count
+                if kept[0]:
+                    postings[term] = kept
+                else:
+                    self.trigrams.discard(term)
+
+            self.doc_ids, self.lengths, self.dates, self.sources = doc_ids, lengths, dates, sources
+            self.content_types, self.source_types, self.cluster_ids = content_types, source_types, cluster_ids
+            self.numbers = {doc_id: number for number, doc_id in enumerate(doc_ids)}
+            self.deleted = bytearray(len(doc_ids))
+            self.deleted_count = 0
+            self.postings = postings
+
+    def document_frequency(self, term: str) -> int:
+        postings = self.postings.get(term)
+        if postings is None:
+            return 0
+        if not self.deleted_count:
+            return len(postings[0])
+        return sum(1 for number in postings[0] if not self.deleted[number])
+
+    def search(
+        self,
+        terms: List[str],
+        k: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        source_id=None,
+        facets: List[str] = (),
+        interval: str = "day",
+        collapse: bool = False
+    ) -> tuple:
+        """Classement BM25: (nombre de documents correspondants, [(score, _id)] des k meilleurs, facettes)
+
+        Si collapse, seul le mieux classé de chaque groupe de quasi-doublons est compté.
+        """
+        with self._lock:
+            if not self.live:
+                return 0, [], {}
+            accepted = self._filter(start, end, source_id)
+            scores = self._scores(terms, accepted)
+            if collapse:
+                scores = self._collapse(scores)
+            return len(scores), self._top(scores, k), self._facet_counts(scores, facets, interval)
+
+    def _filter(self, start: Optional[datetime], end: Optional[datetime], source_id):
+        """Prédicat des documents vivants dans la période et la source demandées"""
+        low = _timestamp(start) if start else None
+        high = _timestamp(end) if end else None
+
+        def accepted(number: int) -> bool:
+            if self.deleted[number]:
+                return False
+            if (low is not None and self.dates[number] < low) or (high is not None and self.dates[number] > high):
+                return False
+            return source_id is None or self.sources[number] == source_id
+        return accepted
+
+    def _scores(self, terms: List[str], accepted, candidates: Optional[set] = None) -> dict:
+        """Scores BM25 des documents acceptés contenant au moins un des termes"""
+        average_length = self.total_length / self.live or 1
+        scores = {}
+        for term in dict.fromkeys(terms):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            df = self.document_frequency(term)
+            idf = math.log(1 + (self.live - df + 0.5) / (df + 0.5))
+            for number, tf in zip(postings[0], postings[1]):
+                if (candidates is not None and number not in candidates) or not accepted(number):
+                    continue
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[number] / average_length)
+                scores[number] = scores.get(number, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return scores
+
+    def _top(self, scores: dict, k: int) -> list:
+        # Sélection des k meilleurs par tas, sans trier tous les résultats
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1]) if k else []
+        return [(score, self.doc_ids[number]) for number, score in top]
+
+    def _collapse(self, ranking: dict) -> dict:
+        """Meilleur document (clé de classement la plus haute) de chaque groupe de quasi-doublons"""
+        best = {}
+        for number, key in ranking.items():
+            cluster_id = self.cluster_ids[number]
+            group = number if cluster_id is None else cluster_id  # sans groupe: document seul
+            current = best.get(group)
+            if current is None or key > ranking[current]:
+                best[group] = number
+        return {number: ranking[number] for number in best.values()}
+
+    def _facet_counts(self, numbers, facets: List[str], interval: str) -> dict:
+        """Comptes par valeur de chaque facette (facets.py) sur les documents trouvés"""
+        columns = {"source_id": self.sources, "content_type": self.content_types, "source_type": self.source_types}
+        counters = {}
+        for facet in dict.fromkeys(facets):
+            if facet == "scraped_at":
+                # Dates distinctes comptées d'abord: une troncature par date
+                counter = Counter()
+                for timestamp, count in Counter(self.dates[number] for number in numbers).items():
+                    counter[truncate_date(timestamp, interval) if timestamp else None] += count
+            else:
+                values = columns[facet]
+                counter = Counter(values[number] for number in numbers)
+            counters[facet] = counter
+        return counters
+
+    # ----- Requêtes booléennes et positionnelles -----
+
+    def _positions(self, term: str, numbers: Optional[set] = None) -> dict:
+        """Positions du terme par document vivant (parmi numbers si fourni)"""
+        postings = self.postings.get(term)
+        if postings is None:
+            return {}
+        found = {}
+        offset = 0
+        for number, count in zip(postings[0], postings[1]):
+            if not self.deleted[number] and (numbers is None or number in numbers):
+                found[number] = postings[2][offset:offset + count]
+            offset += count
+        return found
+
+    def _phrase(self, terms: List[str], numbers: Optional[set] = None) -> dict:
+        """Positions de début de la phrase par document"""
+        if not terms:
+            return {}
+        lists = [self._positions(term, numbers) for term in terms]
+        if len(lists) == 1:
+            return lists[0]
+        candidates = set(min(lists, key=len))
+        for positions in lists:
+            candidates &= positions.keys()
+        found = {}
+        for number in candidates:
+            following = [set(positions[number]) for positions in lists[1:]]
+            starts = [
+                start for start in lists[0][number]
+                if all(start + offset + 1 in positions for offset, positions in enumerate(following))
+            ]
+            if starts:
+                found[number] = starts
+        return found
+
+    @staticmethod
+    def _near(left: dict, right: dict, distance: int) -> dict:
+        """Documents où une occurrence de chaque côté est à distance mots ou moins"""
+        found = {}
+        for number in left.keys() & right.keys():
+            a, b = left[number], right[number]
+            i = j = 0
+            matched = []
+            while i < len(a) and j < len(b):
+                if abs(a[i] - b[j]) <= distance:
+                    matched.append(min(a[i], b[j]))
+                if a[i] < b[j]:
+                    i += 1
+                else:
+                    j += 1
+            if matched:
+                found[number] = sorted(set(matched))
+        return found
+
+    def expand(self, term: str, max_edits: Optional[int] = None) -> List[str]:
+        """Termes du vocabulaire proches de term (lui-même compris s'il est indexé)"""
+        with self._lock:
+            return [
+                candidate for candidate, _ in self.trigrams.similar(term, max_edits)
+                if self.document_frequency(candidate)
+            ]
+
+    def containing(self, fragment: str, limit: int) -> Optional[List[str]]:
+        """Termes du vocabulaire contenant fragment, ou None s'ils sont plus de limit"""
+        with self._lock:
+            words = self.trigrams.containing(fragment)
+            if words is None:  # moins de 3 caractères: parcours du vocabulaire
+                words = (term for term in self.postings if fragment in term)
+            found = []
+            for word in words:
+                if word in self.postings:
+                    found.append(word)
+                    if len(found) > limit:
+                        return None
+            return sorted(found)
+
+    def _universe(self) -> set:
+        return {number for number in range(len(self.doc_ids)) if not self.deleted[number]}
+
+    def _evaluate(self, node: tuple):
+        """Positions par document (termes, phrases, NEAR) ou ensemble de documents"""
+        kind = node[0]
+        if kind == "term":
+            return self._positions(node[1])
+        if kind == "phrase":
+            return self._phrase(node[1])
+        if kind == "near":
+            return self._near(self._evaluate(node[1]), self._evaluate(node[2]), node[3])
+        if kind == "or":
+            documents = set()
+            for child in node[1]:
+                documents |= set(self._evaluate(child))
+            return documents
+        if kind == "and":
+            included = [child for child in node[1] if child[0] != "not"]
+            excluded = [child[1] for child in node[1] if child[0] == "not"]
+            if included:
+                # Intersection en partant des listes les plus courtes
+                sets = sorted((set(self._evaluate(child)) for child in included), key=len)
+                documents = sets[0]
+                for other in sets[1:]:
+                    documents &= other
+            else:
+                documents = self._universe()
+            for child in excluded:
+                documents -= set(self._evaluate(child))
+            return documents
+        if kind == "not":
+            return self._universe() - set(self._evaluate(node[1]))
+        raise ValueError(f"Unknown query node: {kind}")
+
+    def _matched_spans(self, node: tuple, numbers: set) -> dict:
+        """Occurrences [début, fin) en positions de mots, par document, d'un terme, d'une phrase ou d'un NEAR"""
+        kind = node[0]
+        if kind == "term":
+            return {number: [(p, p + 1) for p in positions] for number, positions in self._positions(node[1], numbers).items()}
+        if kind == "phrase":
+            size = len(node[1])
+            return {number: [(p, p + size) for p in starts] for number, starts in self._phrase(node[1], numbers).items()}
+        # NEAR: chaque paire d'occurrences assez proches, d'un seul bloc
+        left, right = self._matched_spans(node[1], numbers), self._matched_spans(node[2], numbers)
+        found = {}
+        for number in left.keys() & right.keys():
+            pairs = [
+                (min(a[0], b[0]), max(a[1], b[1]))
+                for a in left[number] for b in right[number]
+                if abs(a[0] - b[0]) <= node[3]
+            ]
+            if pairs:
+                found[number] = pairs
+        return found
+
+    def _collect_spans(self, node: tuple, numbers: set, spans: dict):
+        kind = node[0]
+        if kind in ("term", "phrase", "near"):
+            for number, found in self._matched_spans(node, numbers).items():
+                spans[number].update(found)
+        elif kind in ("and", "or"):
+            for child in node[1]:
+                self._collect_spans(child, numbers, spans)
+        # NOT: rien à surligner
+
+    def spans(self, node: tuple, doc_ids: list) -> dict:
+        """Occurrences correspondant à la requête dans chaque document: {_id: [(début, fin)]} en positions de mots.
+
+        Calculées depuis les postings positionnels, pour les seuls documents
+        demandés (page de résultats): une phrase ou un NEAR forme un seul
+        intervalle, les termes exclus (NOT) ne sont pas repris.
+        """
+        with self._lock:
+            numbers = {self.numbers[doc_id]: doc_id for doc_id in doc_ids if doc_id in self.numbers}
+            spans = {number: set() for number in numbers}
+            self._collect_spans(node, set(numbers), spans)
+            return {numbers[number]: sorted(found) for number, found in spans.items()}
+
+    def query(
+        self,
+        node: tuple,
+        k: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        source_id=None,
+        ranked: bool = False,
+        facets: List[str] = (),
+        interval: str = "day",
+        collapse: bool = False
+    ) -> tuple:
+        """Requête booléenne: (nombre de documents, [(score ou None, _id)] des k premiers, facettes)
+
+        Classement BM25 sur les termes recherchés si ranked, sinon du plus récent au plus ancien;
+        si collapse, un document (le premier dans ce classement) par groupe de quasi-doublons.
+        """
+        with self._lock:
+            if not self.live:
+                return 0, [], {}
+            accepted = self._filter(start, end, source_id)
+            documents = {number for number in self._evaluate(node) if accepted(number)}
+            if ranked:
+                scores = self._scores(positive_terms(node), accepted, documents)
+                for number in documents:
+                    scores.setdefault(number, 0.0)
+                if collapse:
+                    scores = self._collapse(scores)
+                return len(scores), self._top(scores, k), self._facet_counts(scores, facets, interval)
+            if collapse:
+                documents = self._collapse({number: (self.dates[number], number) for number in documents})
+            counts = self._facet_counts(documents, facets, interval)
+            latest = heapq.nlargest(k, documents, key=lambda number: (self.dates[number], number)) if k else []
+            return len(documents), [(None, self.doc_ids[number]) for number in latest], counts
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": self.live,
+                "terms": len(self.postings),
+                "trigrams": len(self.trigrams.postings),
+                "average_length": round(self.total_length / self.live, 2) if self.live else 0,
+                "deleted_pending_compaction": self.deleted_count,
+                "last_id": str(self.last_id) if self.last_id else None
+            }
+
+    # ----- Instantané disque -----
+
+    def save(self, path: str):
+        """Écrire l'instantané (fichier temporaire synchronisé puis renommé)"""
+        with self._lock:
+            if self.deleted_count:
+                self.compact()
+            payload = pickle.dumps({
+                "version": SNAPSHOT_VERSION,
+                "doc_ids": self.doc_ids,
+                "lengths": self.lengths,
+                "dates": self.dates,
+                "sources": self.sources,
+                "content_types": self.content_types,
+                "source_types": self.source_types,
+                "cluster_ids": self.cluster_ids,
+                "postings": self.postings,
+                "total_length": self.total_length,
+                "last_id": self.last_id
+            }, protocol=pickle.HIGHEST_PROTOCOL)
+
+        compressed = zstd is not None
+        if compressed:
+            payload = zstd.ZstdCompressor().compress(payload)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(SNAPSHOT_MAGIC[compressed] + payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    def load(self, path: str) -> bool:
+        """Charger un instantané; False s'il est absent ou d'une autre version"""
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            magic, payload = f.read(4), f.read()
+        if magic == SNAPSHOT_MAGIC[True]:
+            if zstd is None:
+                raise RuntimeError("zstandard is required to read the search index snapshot")
+            payload = zstd.ZstdDecompressor().decompress(payload)
+        elif magic != SNAPSHOT_MAGIC[False]:
+            return False
+        state = pickle.loads(payload)
+        if state.get("version") != SNAPSHOT_VERSION:
+            return False
+
+        with self._lock:
+            self.doc_ids = state["doc_ids"]
+            self.numbers = {doc_id: number for number, doc_id in enumerate(self.doc_ids)}
+            self.lengths = state["lengths"]
+            self.dates = state["dates"]
+            self.sources = state["sources"]
+            self.content_types = [_intern(value) for value in state["content_types"]]
+            self.source_types = [_intern(value) for value in state["source_types"]]
+            self.cluster_ids = state["cluster_ids"]
+            self.deleted = bytearray(len(self.doc_ids))
+            self.deleted_count = 0
+            self.postings = state["postings"]
+            self.trigrams = TrigramIndex()
+            for term in self.postings:
+                self.trigrams.add(term)
+            self.live = len(self.doc_ids)
+            self.total_length = state["total_length"]
+            self.last_id = state["last_id"]
+        return True
+
+search_index = InvertedIndex()
+
+index_status = {
+    "state": "empty",  # empty, loading, ready, error
+    "loaded_from_snapshot": False,
+    "caught_up": 0,
+    "saved_at": None,
+    "error": None
+}
+
+_catch_up_lock = threading.Lock()
+
+# ==================== Alimentation ====================
+
+def index_documents(documents: List[dict]):
+    """Hook d'ingestion: indexer les documents insérés"""
+    for doc in documents:
+        if "_id" in doc and "content_text" in doc:
+            search_index.add(
+                doc["_id"],
+                tokenize(doc["content_text"]),
+                doc.get("scraped_at"),
+                doc.get("source_id"),
+                doc.get("content_type"),
+                doc.get("source_type"),
+                doc.get("cluster_id")
+            )
+
+def unindex_documents(documents: List[dict]):
+    """Hook d'ingestion: retirer les documents supprimés"""
+    for doc in documents:
+        search_index.remove(doc["_id"])
+
+register("search_index", index_documents, unindex_documents)
+
+def catch_up(batch_size: int = 1000) -> int:
+    """Indexer les documents dont l'_id suit le dernier indexé (démarrage, autres processus)"""
+    if not _catch_up_lock.acquire(blocking=False):
+        return 0  # rattrapage déjà en cours
+    try:
+        indexed = 0
+        # Curseur local: les documents indexés par les hooks pendant le
+        # rattrapage ne doivent pas faire sauter les documents non encore lus
+        last_id = search_index.begin_catch_up()
+        try:
+            while True:
+                batch = list(
+                    scraped_collection.find(
+                        {"_id": {"$gt": last_id}} if last_id else {},
+                        {"content_text": 1, "scraped_at": 1, "source_id": 1, "content_type": 1, "source_type": 1, "cluster_id": 1}
+                    )
+                    .sort("_id", 1)
+                    .limit(batch_size)
+                )
+                if not batch:
+                    break
+                fill_text_fields(batch, ("content_text",))
+                index_documents(batch)
+                last_id = batch[-1]["_id"]
+                indexed += len(batch)
+                if len(batch) < batch_size:
+                    break
+        finally:
+            search_index.end_catch_up(last_id)
+        index_status["caught_up"] += indexed
+        return indexed
+    finally:
+        _catch_up_lock.release()
+
+def load_search_index():
+    """Démarrage: recharger l'instantané puis rattraper les documents récents"""
+    index_status.update({"state": "loading", "error": None})
+    try:
+        path = get_index_path()
+        index_status["loaded_from_snapshot"] = search_index.load(path)
+        indexed = catch_up()
+        index_status["state"] = "ready"
+        logger.info(
+            f"✅ Search index ready: {len(search_index)} documents "
+            f"({'snapshot' if index_status['loaded_from_snapshot'] else 'rebuilt'}, {indexed} caught up)"
+        )
+    except Exception as e:
+        index_status.update({"state": "error", "error": str(e)})
+        logger.error(f"Error loading search index: {str(e)}")
+
+def save_search_index():
+    """Écrire l'instantané de l'index sur disque"""
+    try:
+        search_index.save(get_index_path())
+        index_status["saved_at"] = datetime.now(UTC)
+    except Exception as e:
+        index_status["error"] = str(e)
+        logger.error(f"Error saving search index: {str(e)}")
@@ -0,0 +1,509 @@
+from db import collection as scraped_collection
+from doc_format import fill_text_fields, tokenize
+from ingest import register
+from bson import ObjectId
+from collections import Counter
+from datetime import datetime, UTC
+from functools import lru_cache
+from typing import List, Optional
+import numpy as np
+import logging
+import math
+import os
+import pickle
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Recherche sémantique locale (sans service externe ni GPU): plongements
+# TF-IDF hachés des documents, calculés à l'ingestion (hooks ingest.py).
+# - vectoriseur: termes et trigrammes de caractères des termes (variantes,
+#   flexions) hachés dans EMBEDDING_DIM composantes signées; schéma lnc.ltc:
+#   documents en log-tf normalisés, IDF appliqué à la requête seulement, si
+#   bien que les vecteurs stockés ne dépendent pas de la collection
+# - matrice float32 des vecteurs dans un fichier projeté en mémoire
+#   (SEMANTIC_INDEX_PATH.vectors), métadonnées dans SEMANTIC_INDEX_PATH.meta
+# - top-k cosinus exact par blocs de CHUNK_ROWS lignes, plusieurs requêtes
+#   par produit matriciel; au-delà de ANN_THRESHOLD documents, index
+#   approché (IVF): k-moyennes sphériques, seules les ANN_PROBES listes les
+#   plus proches de la requête sont parcourues
+EMBEDDING_DIM = int(os.getenv("SEMANTIC_DIM", "512"))
+SUBWORD_WEIGHT = 0.5
+CHUNK_ROWS = 65536
+INITIAL_CAPACITY = 1024
+GROWTH = 1.5
+COMPACT_RATIO = 0.25
+ANN_THRESHOLD = int(os.getenv("SEMANTIC_ANN_THRESHOLD", "1000000"))
+ANN_PROBES = 16
+ANN_SAMPLE = 50000
+ANN_ITERATIONS = 10
+ANN_MAX_LISTS = 1024
+SNAPSHOT_VERSION = 1
+
+def get_semantic_path() -> str:
+    return os.getenv("SEMANTIC_INDEX_PATH", "semantic_index")
+
+def _hash(feature: str, dim: int) -> tuple:
+    # Hachage stable entre processus (les vecteurs sont persistés)
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % dim, -1.0 if digest & 0x80000000 else 1.0
+
+@lru_cache(maxsize=200000)
+def _term_features(term: str, dim: int) -> tuple:
+    """Composantes et poids signés d'un terme et de ses trigrammes de caractères"""
+    padded = f"<{term}>"
+    features = [(term, 1.0)] + [(padded[i:i + 3], SUBWORD_WEIGHT) for i in range(len(padded) - 2)]
+    hashed = [(_hash(feature, dim), weight) for feature, weight in features]
+    return [index for (index, _), _ in hashed], [sign * weight for (_, sign), weight in hashed]
+
+def embed(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Vecteur log-tf haché (non normalisé) d'un texte"""
+    indices, weights = [], []
+    for term, count in Counter(tokenize(text)).items():
+        term_indices, term_weights = _term_features(term, dim)
+        scale = 1 + math.log(count)
+        indices.extend(term_indices)
+        weights.extend(weight * scale for weight in term_weights)
+    return np.bincount(indices, weights, minlength=dim).astype(np.float32)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+class SemanticIndex:
+    """Matrice des plongements de documents et recherche des plus proches voisins"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self._lock = threading.RLock()
+        self.path = None  # None: matrice en mémoire (pas de fichier)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+            self.capacity = 0
+            self.rows = 0
+            self.doc_ids = []        # ligne → _id
+            self.numbers = {}        # _id → ligne
+            self.dates = np.zeros(0)
+            self.source_codes = np.zeros(0, dtype=np.int32)  # ligne → code de source
+            self.sources = {None: 0}  # source_id → code
+            self.deleted = np.zeros(0, dtype=bool)
+            self.deleted_count = 0
+            self.assignments = np.zeros(0, dtype=np.int32)   # ligne → liste IVF (-1: aucune)
+            self.df = np.zeros(self.dim)  # documents par composante (IDF des requêtes)
+            self.centroids = None
+            self.trained_rows = 0
+            self.live = 0
+            self.last_id = None      # dernier _id rattrapé (point de reprise de catch_up_semantic)
+            self.catching_up = False
+            if self.path:
+                self._reserve(INITIAL_CAPACITY)
+
+    def __len__(self) -> int:
+        return self.live
+
+    def _vectors_path(self) -> str:
+        return f"{self.path}.vectors"
+
+    def _map(self, capacity: int):
+        """Projeter le fichier des vecteurs (agrandi avec des zéros si besoin)"""
+        path = self._vectors_path()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.matrix = None  # libérer la projection précédente avant d'agrandir le fichier
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            f.truncate(capacity * self.dim * 4)
+        self.matrix = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _reserve(self, rows: int):
+        if rows <= self.capacity:
+            return
+        capacity = max(rows, int(self.capacity * GROWTH), INITIAL_CAPACITY)
+        if self.path:
+            if isinstance(self.matrix, np.memmap):
+                self.matrix.flush()
+            self._map(capacity)
+        else:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            matrix[:self.rows] = self.matrix[:self.rows]
+            self.matrix = matrix
+        self.dates = np.resize(self.dates, capacity)
+        self.source_codes = np.resize(self.source_codes, capacity)
+        self.deleted = np.resize(self.deleted, capacity)
+        self.assignments = np.resize(self.assignments, capacity)
+        self.capacity = capacity
+
+    def add(self, doc_id, text: str, scraped_at: Optional[datetime] = None, source_id=None):
+        """Plonger et stocker un document (remplacé s'il était déjà indexé)"""
+        vector = _normalize(embed(text, self.dim))
+        with self._lock:
+            if doc_id in self.numbers:
+                self._remove(doc_id)
+            self._reserve(self.rows + 1)
+            row = self.rows
+            self.matrix[row] = vector
+            if scraped_at is not None and scraped_at.tzinfo is None:
+                scraped_at = scraped_at.replace(tzinfo=UTC)
+            self.dates[row] = scraped_at.timestamp() if scraped_at else 0.0
+            self.source_codes[row] = self.sources.setdefault(source_id, len(self.sources))
+            self.deleted[row] = False
+            self.assignments[row] = -1 if self.centroids is None else int(np.argmax(self.centroids @ vector))
+            self.df[np.flatnonzero(vector)] += 1
+            self.doc_ids.append(doc_id)
+            self.numbers[doc_id] = row
+            self.rows += 1
+            self.live += 1
+            if not self.catching_up:
+                self._advance(doc_id)
+
+    def _advance(self, doc_id):
+        if isinstance(doc_id, ObjectId) and (self.last_id is None or doc_id > self.last_id):
+            self.last_id = doc_id
+
+    def begin_catch_up(self):
+        """Rattrapage: les écritures ne déplacent plus last_id (point de départ renvoyé)"""
+        with self._lock:
+            self.catching_up = True
+            return self.last_id
+
+    def end_catch_up(self, last_id):
+        """Fin du rattrapage: last_id avance jusqu'au dernier document lu"""
+        with self._lock:
+            self.catching_up = False
+            if last_id is not None:
+                self._advance(last_id)
+
+    def remove(self, doc_id) -> bool:
+        with self._lock:
+            return self._remove(doc_id)
+
+    def _remove(self, doc_id) -> bool:
+        row = self.numbers.pop(doc_id, None)
+        if row is None:
+            return False
+        self.deleted[row] = True
+        self.deleted_count += 1
+        self.live -= 1
+        self.df[np.flatnonzero(self.matrix[row])] -= 1
+        return True
+
+    def compact(self):
+        """Déplacer les lignes vivantes en tête de matrice (ordre conservé)"""
+        with self._lock:
+            keep = np.flatnonzero(~self.deleted[:self.rows])
+            # Lignes conservées croissantes: chaque bloc est copié vers une position inférieure
+            for start in range(0, len(keep), CHUNK_ROWS):
+                rows = keep[start:start + CHUNK_ROWS]
+                self.matrix[start:start + len(rows)] = self.matrix[rows]
+            for column in ("dates", "source_codes", "deleted", "assignments"):
+                values = getattr(self, column)
+                values[:len(keep)] = values[keep]
+            self.doc_ids = [self.doc_ids[row] for row in keep]
+            self.numbers = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+            self.rows = len(keep)
+            self.deleted_count = 0
+
+    # ----- Recherche -----
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Vecteurs des requêtes: log-tf pondéré par l'IDF actuel, normalisés"""
+        with self._lock:
+            idf = np.log((1 + self.live) / (1 + self.df)) + 1
+        return _normalize(np.stack([embed(text, self.dim) * idf for text in texts]).astype(np.float32))
+
+    def _accepted(self, start: Optional[datetime], end: Optional[datetime], source_id) -> np.ndarray:
+        """Masque des lignes vivantes dans la période et la source demandées"""
+        mask = ~self.deleted[:self.rows]
+        dates = self.dates[:self.rows]
+        if start:
+            mask &= dates >= (start if start.tzinfo else start.replace(tzinfo=UTC)).timestamp()
+        if end:
+            mask &= dates <= (end if end.tzinfo else end.replace(tzinfo=UTC)).timestamp()
+        if source_id is not None:
+            code = self.sources.get(source_id)
+            if code is None:
+                mask[:] = False
+            else:
+                mask &= self.source_codes[:self.rows] == code
+        return mask
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        source_id=None,
+        approximate: Optional[bool] = None
+    ) -> tuple:
+        """Top-k cosinus de chaque requête: (approché ou non, [[(score, _id)]] par requête)"""
+        with self._lock:
+            if approximate is None:
+                approximate = self.live >= ANN_THRESHOLD and self.centroids is not None
+        if approximate and self.centroids is None:
+            self.train()  # demandé explicitement avant le premier entraînement
+        with self._lock:
+            approximate = approximate and self.centroids is not None
+            mask = self._accepted(start, end, source_id)
+            if not k or not mask.any():
+                return approximate, [[] for _ in queries]
+            if approximate:
+                found = [self._probe(query, mask, k) for query in queries]
+            else:
+                found = self._scan(queries, mask, k)
+            return approximate, [
+                [(float(score), self.doc_ids[row]) for score, row in zip(scores, rows) if score > 0]
+                for scores, rows in found
+            ]
+
+    def _scan(self, queries: np.ndarray, mask: np.ndarray, k: int) -> list:
+        """Parcours exact de la matrice par blocs, toutes les requêtes à la fois"""
+        best = [(np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)) for _ in queries]
+        for start in range(0, self.rows, CHUNK_ROWS):
+            block_mask = mask[start:start + CHUNK_ROWS]
+            if not block_mask.any():
+                continue
+            scores = np.asarray(self.matrix[start:start + len(block_mask)]) @ queries.T
+            scores[~block_mask] = -np.inf
+            for column in range(len(queries)):
+                best[column] = _merge_top(best[column], scores[:, column], start, k)
+        return [_sorted_top(scores, rows) for scores, rows in best]
+
+    def _probe(self, query: np.ndarray, mask: np.ndarray, k: int) -> tuple:
+        """Recherche approchée: lignes des listes IVF les plus proches de la requête"""
+        probes = np.argsort(-(self.centroids @ query))[:ANN_PROBES]
+        rows = np.flatnonzero(np.isin(self.assignments[:self.rows], probes) & mask)
+        if not len(rows):
+            return np.empty(0, dtype=np.float32), rows
+        scores = np.asarray(self.matrix[rows]) @ query
+        top = np.argpartition(-scores, k - 1)[:k] if len(rows) > k else np.arange(len(rows))
+        return _sorted_top(scores[top], rows[top])
+
+    def train(self, seed: int = 0):
+        """Entraîner l'index approché (k-moyennes sphériques) puis affecter chaque ligne.
+
+        Seuls l'échantillonnage et l'affectation de chaque bloc prennent le
+        verrou: les écritures et recherches continuent pendant l'entraînement.
+        """
+        with self._lock:
+            live = np.flatnonzero(~self.deleted[:self.rows])
+            if not len(live):
+                return
+            generator = np.random.default_rng(seed)
+            sample = np.asarray(self.matrix[np.sort(generator.choice(live, min(len(live), ANN_SAMPLE), replace=False))])
+            lists = min(ANN_MAX_LISTS, max(1, int(math.sqrt(len(live)))))
+            trained_rows, rows = len(live), self.rows
+
+        centroids = sample[generator.choice(len(sample), lists, replace=False)]
+        for _ in range(ANN_ITERATIONS):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            # Sommes par liste: échantillon trié par liste puis sommes par segment
+            counts = np.bincount(nearest, minlength=lists)
+            starts = np.cumsum(counts) - counts
+            filled = counts > 0
+            sums = centroids.copy()  # liste vide: centroïde conservé
+            sums[filled] = np.add.reduceat(sample[np.argsort(nearest, kind="stable")], starts[filled])
+            centroids = _normalize(sums)
+
+        with self._lock:
+            # Nouvelles lignes affectées à l'écriture, anciennes bloc par bloc
+            self.centroids = centroids
+            self.trained_rows = trained_rows
+            self.assignments[:rows] = -1
+        for start in range(0, rows, CHUNK_ROWS):
+            with self._lock:
+                end = min(start + CHUNK_ROWS, rows, self.rows)
+                if start >= end:
+                    break  # compaction pendant l'entraînement: lignes déjà renumérotées
+                block = np.asarray(self.matrix[start:end])
+                self.assignments[start:end] = np.argmax(block @ centroids.T, axis=1)
+
+    def needs_training(self) -> bool:
+        """Index approché absent ou entraîné sur moins de la moitié des documents actuels"""
+        return self.live >= ANN_THRESHOLD and (self.centroids is None or self.live > 2 * self.trained_rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": self.live,
+                "dimensions": self.dim,
+                "capacity": self.capacity,
+                "memory_mapped": isinstance(self.matrix, np.memmap),
+                "approximate_lists": 0 if self.centroids is None else len(self.centroids),
+                "deleted_pending_compaction": self.deleted_count,
+                "last_id": str(self.last_id) if self.last_id else None
+            }
+
+    # ----- Persistance -----
+
+    def save(self):
+        """Synchroniser la matrice projetée puis écrire les métadonnées (renommage atomique)"""
+        with self._lock:
+            if not self.path:
+                return
+            if self.deleted_count > COMPACT_RATIO * max(self.rows, 1):
+                self.compact()
+            self.matrix.flush()
+            rows = self.rows
+            payload = pickle.dumps({
+                "version": SNAPSHOT_VERSION,
+                "dim": self.dim,
+                "doc_ids": self.doc_ids,
+                "dates": self.dates[:rows].copy(),
+                "source_codes": self.source_codes[:rows].copy(),
+                "sources": self.sources,
+                "deleted": self.deleted[:rows].copy(),
+                "assignments": self.assignments[:rows].copy(),
+                "df": self.df.copy(),
+                "centroids": self.centroids,
+                "trained_rows": self.trained_rows,
+                "last_id": self.last_id
+            }, protocol=pickle.HIGHEST_PROTOCOL)
+        temporary = f"{self.path}.meta.tmp"
+        with open(temporary, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, f"{self.path}.meta")
+
+    def open(self, path: str) -> bool:
+        """Utiliser les fichiers de path; True si un index compatible y a été rechargé.
+
+        Sinon l'index repart vide sur un nouveau fichier de vecteurs.
+        """
+        with self._lock:
+            self.path = path
+            state = None
+            if os.path.exists(f"{path}.meta") and os.path.exists(self._vectors_path()):
+                with open(f"{path}.meta", "rb") as f:
+                    state = pickle.load(f)
+                if state.get("version") != SNAPSHOT_VERSION or state.get("dim") != self.dim:
+                    state = None
+            if state is None:
+                if os.path.exists(self._vectors_path()):
+                    os.remove(self._vectors_path())
+                self.clear()
+                return False
+
+            rows = len(state["doc_ids"])
+            capacity = max(rows, os.path.getsize(self._vectors_path()) // (self.dim * 4), INITIAL_CAPACITY)
+            self._map(capacity)
+            self.capacity, self.rows = capacity, rows
+            self.doc_ids = state["doc_ids"]
+            self.deleted = np.resize(state["deleted"], capacity)
+            self.numbers = {doc_id: row for row, doc_id in enumerate(self.doc_ids) if not self.deleted[row]}
+            self.dates = np.resize(state["dates"], capacity)
+            self.source_codes = np.resize(state["source_codes"], capacity)
+            self.sources = state["sources"]
+            self.assignments = np.resize(state["assignments"], capacity)
+            self.deleted_count = int(self.deleted[:rows].sum())
+            self.df = state["df"]
+            self.centroids = state["centroids"]
+            self.trained_rows = state["trained_rows"]
+            self.live = rows - self.deleted_count
+            self.last_id = state["last_id"]
+            return True
+
+def _merge_top(best: tuple, scores: np.ndarray, offset: int, k: int) -> tuple:
+    """Garder les k meilleurs scores entre les meilleurs précédents et un bloc"""
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    merged_scores = np.concatenate([best[0], scores[top]])
+    merged_rows = np.concatenate([best[1], top + offset])
+    if len(merged_scores) > k:
+        keep = np.argpartition(-merged_scores, k - 1)[:k]
+        merged_scores, merged_rows = merged_scores[keep], merged_rows[keep]
+    return merged_scores, merged_rows
+
+def _sorted_top(scores: np.ndarray, rows: np.ndarray) -> tuple:
+    order = np.argsort(-scores, kind="stable")
+    return scores[order], rows[order]
+
+semantic_index = SemanticIndex()
+
+semantic_status = {
+    "state": "empty",  # empty, loading, ready, error
+    "loaded_from_disk": False,
+    "caught_up": 0,
+    "saved_at": None,
+    "error": None
+}
+
+_catch_up_lock = threading.Lock()
+
+# ==================== Alimentation ====================
+
+def embed_documents(documents: List[dict]):
+    """Hook d'ingestion: plonger les documents insérés"""
+    for doc in documents:
+        if "_id" in doc and "content_text" in doc:
+            semantic_index.add(doc["_id"], doc["content_text"], doc.get("scraped_at"), doc.get("source_id"))
+
+def unembed_documents(documents: List[dict]):
+    """Hook d'ingestion: retirer les documents supprimés"""
+    for doc in documents:
+        semantic_index.remove(doc["_id"])
+
+register("semantic_index", embed_documents, unembed_documents)
+
+def catch_up_semantic(batch_size: int = 1000) -> int:
+    """Plonger les documents dont l'_id suit le dernier indexé (démarrage, autres processus)"""
+    if not _catch_up_lock.acquire(blocking=False):
+        return 0  # rattrapage déjà en cours
+    try:
+        embedded = 0
+        # Curseur local, comme catch_up (search_index.py)
+        last_id = semantic_index.begin_catch_up()
+        try:
+            while True:
+                batch = list(
+                    scraped_collection.find(
+                        {"_id": {"$gt": last_id}} if last_id else {},
+                        {"content_text": 1, "scraped_at": 1, "source_id": 1}
+                    )
+                    .sort("_id", 1)
+                    .limit(batch_size)
+                )
+                if not batch:
+                    break
+                fill_text_fields(batch, ("content_text",))
+                embed_documents(batch)
+                last_id = batch[-1]["_id"]
+                embedded += len(batch)
+                if len(batch) < batch_size:
+                    break
+        finally:
+            semantic_index.end_catch_up(last_id)
+        semantic_status["caught_up"] += embedded
+        return embedded
+    finally:
+        _catch_up_lock.release()
+
+def load_semantic_index():
+    """Démarrage: projeter la matrice sur disque puis rattraper les documents récents"""
+    semantic_status.update({"state": "loading", "error": None})
+    try:
+        semantic_status["loaded_from_disk"] = semantic_index.open(get_semantic_path())
+        embedded = catch_up_semantic()
+        semantic_status["state"] = "ready"
+        logger.info(f"✅ Semantic index ready: {len(semantic_index)} documents ({embedded} caught up)")
+    except Exception as e:
+        semantic_status.update({"state": "error", "error": str(e)})
+        logger.error(f"Error loading semantic index: {str(e)}")
+
+def save_semantic_index():
+    """Écrire les métadonnées (et entraîner l'index approché s'il est dépassé)"""
+    try:
+        if semantic_index.needs_training():
+            semantic_index.train()
+        semantic_index.save()
+        semantic_status["saved_at"] = datetime.now(UTC)
+    except Exception as e:
+        semantic_status["error"] = str(e)
+        logger.error(f"Error saving semantic index: {str(e)}")
@@ -0,0 +1,225 @@
+from db import collection as scraped_collection, async_collection
+from doc_format import prepare_document, decode_items, items_text, DATA_FIELDS
+from ingest import documents_inserted
+from pymongo.errors import DuplicateKeyError
+from collections import Counter
+from datetime import datetime, UTC
+from typing import List, Optional
+import hashlib
+
+# Une version complète (keyframe) est stockée au moins toutes les N versions,
+# ce qui borne le nombre de deltas à rejouer pour reconstruire une version.
+KEYFRAME_INTERVAL = 20
+
+# Scrapes concurrents d'une même source: nouvelles tentatives quand le numéro
+# de version a été pris entre la lecture et l'insertion (index unique)
+VERSION_RETRIES = 5
+
+# Chaîne keyframe + deltas à rejouer: données seulement
+CHAIN_PROJECTION = {"item_hashes": 0, "content_text": 0, "term_freq": 0, "terms": 0, "minhash": 0, "cluster_id": 0}
+
+def hash_item(value) -> str:
+    """Hash d'un élément extrait"""
+    return hashlib.sha1(str(value).encode("utf-8")).hexdigest()[:16]
+
+def hash_snapshot(item_hashes: List[str]) -> str:
+    """Hash d'un snapshot complet (ordre des éléments inclus)"""
+    return hashlib.sha1("\n".join(item_hashes).encode("utf-8")).hexdigest()
+
+def compute_delta(previous_hashes: List[str], data: List[dict]) -> Optional[dict]:
+    """Calculer les éléments ajoutés/supprimés par rapport à la version précédente.
+
+    Retourne None si les éléments conservés ont changé d'ordre: le delta ne
+    suffirait pas à reconstruire la version, il faut alors un snapshot complet.
+    """
+    new_hashes = [hash_item(item["value"]) for item in data]
+
+    # Éléments précédents conservés (premières occurrences) / supprimés
+    remaining = Counter(new_hashes)
+    kept = []
+    removed = []
+    for item_hash in previous_hashes:
+        if remaining[item_hash] > 0:
+            remaining[item_hash] -= 1
+            kept.append(item_hash)
+        else:
+            removed.append(item_hash)
+
+    # Éléments nouveaux, avec leur position dans la nouvelle version
+    claimed = Counter(kept)
+    kept_in_new_order = []
+    added = []
+    for item, item_hash in zip(data, new_hashes):
+        if claimed[item_hash] > 0:
+            claimed[item_hash] -= 1
+            kept_in_new_order.append(item_hash)
+        else:
+            added.append(item)
+
+    if kept_in_new_order != kept:
+        return None
+
+    return {"added": added, "removed": removed}
+
+def apply_delta(previous_data: List[dict], added: List[dict], removed: List[str], count: int) -> List[dict]:
+    """Reconstruire une version à partir de la précédente et d'un delta"""
+    # Conserver les premières occurrences, comme dans compute_delta
+    quota = Counter(hash_item(item["value"]) for item in previous_data)
+    quota.subtract(removed)
+    kept = []
+    for item in previous_data:
+        item_hash = hash_item(item["value"])
+        if quota[item_hash] > 0:
+            quota[item_hash] -= 1
+            kept.append(item["value"])
+
+    values = [None] * count
+    for item in added:
+        values[item["index"] - 1] = item["value"]
+    kept_iter = iter(kept)
+    for i in range(count):
+        if values[i] is None:
+            values[i] = next(kept_iter)
+
+    return [{"index": i + 1, "value": value} for i, value in enumerate(values)]
+
+def store_snapshot(document: dict) -> dict:
+    """Sauvegarder le résultat d'un scrape de source en tant que version.
+
+    - snapshot identique à la dernière version: seul last_seen_at est mis à jour
+    - snapshot modifié: seuls les éléments ajoutés/supprimés sont stockés
+      (avec un snapshot complet toutes les KEYFRAME_INTERVAL versions)
+
+    Les champs texte (recherche, index, analyses) portent toujours sur la
+    version complète, y compris pour un delta.
+    """
+    for attempt in range(VERSION_RETRIES):
+        try:
+            return _store_version(document)
+        except DuplicateKeyError:
+            # Version enregistrée entre-temps par un autre scrape: relire la dernière
+            if attempt == VERSION_RETRIES - 1:
+                raise
+
+def _store_version(document: dict) -> dict:
+    """Une tentative de store_snapshot (DuplicateKeyError si la version est déjà prise)"""
+    source_id = document["source_id"]
+    data = document["data"]
+    now = document.get("scraped_at", datetime.now(UTC))
+
+    item_hashes = [hash_item(item["value"]) for item in data]
+    snapshot_hash = hash_snapshot(item_hashes)
+
+    previous = scraped_collection.find_one(
+        {"source_id": source_id, "version": {"$exists": True}},
+        {"version": 1, "snapshot_hash": 1, "item_hashes": 1, "keyframe_version": 1, "scraped_at": 1},
+        sort=[("version", -1)]
+    )
+
+    if previous and previous["snapshot_hash"] == snapshot_hash:
+        scraped_collection.update_one(
+            {"_id": previous["_id"]},
+            {"$set": {"last_seen_at": now}, "$inc": {"seen_count": 1}}
+        )
+        return {
+            "status": "unchanged",
+            "document_id": previous["_id"],
+            "version": previous["version"],
+            "changed_at": previous.get("scraped_at")
+        }
+
+    version = previous["version"] + 1 if previous else 1
+    delta = None
+    if previous and version - previous["keyframe_version"] < KEYFRAME_INTERVAL:
+        delta = compute_delta(previous["item_hashes"], data)
+        # Un delta plus gros que la version elle-même n'a pas d'intérêt
+        if delta and len(delta["added"]) + len(delta["removed"]) >= len(data):
+            delta = None
+
+    snapshot = {
+        **document,
+        "version": version,
+        "snapshot_hash": snapshot_hash,
+        "item_hashes": item_hashes,
+        "count": len(data),
+        "seen_count": 1,
+        "last_seen_at": now
+    }
+    if delta is None:
+        snapshot["storage"] = "full"
+        snapshot["keyframe_version"] = version
+    else:
+        snapshot["storage"] = "delta"
+        snapshot["data"] = delta["added"]
+        snapshot["removed"] = delta["removed"]
+        snapshot["base_version"] = previous["version"]
+        snapshot["keyframe_version"] = previous["keyframe_version"]
+        snapshot["full_text"] = True
+
+    stored = prepare_document(snapshot, text=items_text(data))
+    inserted = scraped_collection.insert_one(stored)
+    stored["_id"] = inserted.inserted_id
+    documents_inserted([stored])
+    return {
+        "status": "changed" if previous else "initial",
+        "document_id": inserted.inserted_id,
+        "version": version,
+        "storage": snapshot["storage"]
+    }
+
+async def list_versions(source_id) -> List[dict]:
+    """Lister les versions d'une source (sans le contenu)"""
+    cursor = async_collection.find(
+        {"source_id": source_id, "version": {"$exists": True}},
+        {
+            "version": 1, "snapshot_hash": 1, "storage": 1, "count": 1,
+            "scraped_at": 1, "last_seen_at": 1, "seen_count": 1
+        }
+    ).sort("version", -1)
+    return await cursor.to_list(None)
+
+def rebuild_snapshot(chain: List[dict]) -> dict:
+    """Rejouer une chaîne keyframe + deltas (triée par version croissante)"""
+    data = []
+    for snapshot in chain:
+        if snapshot["storage"] == "full":
+            data = decode_items(snapshot)
+        else:
+            data = apply_delta(data, decode_items(snapshot), snapshot["removed"], snapshot["count"])
+
+    result = chain[-1]
+    for field in ("removed", "base_version", "full_text", *DATA_FIELDS):
+        result.pop(field, None)
+    result["data"] = data
+    return result
+
+async def reconstruct_version(source_id, version: int) -> Optional[dict]:
+    """Reconstruire une version à partir du dernier snapshot complet et des deltas"""
+    target = await async_collection.find_one(
+        {"source_id": source_id, "version": version},
+        {"keyframe_version": 1}
+    )
+    if not target:
+        return None
+
+    cursor = async_collection.find(
+        {
+            "source_id": source_id,
+            "version": {"$gte": target["keyframe_version"], "$lte": version}
+        },
+        CHAIN_PROJECTION
+    ).sort("version", 1)
+    return rebuild_snapshot(await cursor.to_list(None))
+
+def version_text(doc: dict) -> str:
+    """Texte complet d'une version stockée en delta (migration des anciens deltas)"""
+    chain = list(
+        scraped_collection.find(
+            {
+                "source_id": doc["source_id"],
+                "version": {"$gte": doc["keyframe_version"], "$lte": doc["version"]}
+            },
+            CHAIN_PROJECTION
+        ).sort("version", 1)
+    )
+    return items_text(rebuild_snapshot(chain)["data"])
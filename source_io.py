@@ -0,0 +1,101 @@
+from typing import List
+from xml.etree import ElementTree
+import csv
+import io
+import json
+
+# Import / export des sources en masse: CSV, JSON ou OPML (listes de flux RSS
+# des lecteurs de flux). Chaque format est lu en une liste de lignes (dict)
+# validées ensuite par le modèle SourceCreate.
+
+SOURCE_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+    "opml": "text/x-opml; charset=utf-8"
+}
+SOURCE_FIELDS = ["name", "url", "source_type", "frequency", "selector", "limit", "active", "description"]
+
+def _clean(row: dict) -> dict:
+    """Retirer les cellules vides (valeurs par défaut du modèle)"""
+    return {
+        key.strip(): value.strip() if isinstance(value, str) else value
+        for key, value in row.items()
+        if key and value not in (None, "")
+    }
+
+def parse_csv(text: str) -> List[dict]:
+    return [_clean(row) for row in csv.DictReader(io.StringIO(text))]
+
+def parse_json(text: str) -> List[dict]:
+    """Liste de sources, ou objet {"sources": [...]} (format de l'export)"""
+    payload = json.loads(text)
+    if isinstance(payload, dict):
+        payload = payload.get("sources", [])
+    if not isinstance(payload, list):
+        raise ValueError("JSON import expects a list of sources")
+    return [_clean(row) if isinstance(row, dict) else row for row in payload]
+
+def parse_opml(text: str) -> List[dict]:
+    """Outlines OPML: xmlUrl → source RSS, url/htmlUrl → source web"""
+    root = ElementTree.fromstring(text)
+    rows = []
+    for outline in root.iter("outline"):
+        attributes = outline.attrib
+        url = attributes.get("xmlUrl") or attributes.get("url")
+        if not url:
+            continue  # dossier de l'OPML
+        rows.append(_clean({
+            "name": attributes.get("title") or attributes.get("text"),
+            "url": url,
+            "source_type": attributes.get("sourceType") or ("rss" if attributes.get("xmlUrl") else "website"),
+            "frequency": attributes.get("frequency"),
+            "limit": attributes.get("limit"),
+            "selector": attributes.get("selector"),
+            "description": attributes.get("description")
+        }))
+    return rows
+
+PARSERS = {"csv": parse_csv, "json": parse_json, "opml": parse_opml}
+
+def parse_sources(text: str, format: str) -> List[dict]:
+    """Lire un fichier d'import; lève ValueError si le contenu est invalide"""
+    try:
+        return PARSERS[format](text)
+    except (json.JSONDecodeError, ElementTree.ParseError, csv.Error) as e:
+        raise ValueError(f"Invalid {format.upper()} content: {str(e)}")
+
+def dump_csv(sources: List[dict]) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=SOURCE_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for source in sources:
+        writer.writerow({field: source.get(field) for field in SOURCE_FIELDS})
+    return buffer.getvalue()
+
+def dump_json(sources: List[dict]) -> str:
+    return json.dumps(
+        {"sources": [{field: source.get(field) for field in SOURCE_FIELDS} for source in sources]},
+        ensure_ascii=False,
+        indent=2
+    )
+
+def dump_opml(sources: List[dict]) -> str:
+    root = ElementTree.Element("opml", version="2.0")
+    ElementTree.SubElement(ElementTree.SubElement(root, "head"), "title").text = "Web Crawler sources"
+    body = ElementTree.SubElement(root, "body")
+    for source in sources:
+        attributes = {"text": source.get("name") or "", "title": source.get("name") or ""}
+        if source.get("source_type") == "rss":
+            attributes.update({"type": "rss", "xmlUrl": source.get("url") or ""})
+        else:
+            attributes.update({"type": "link", "url": source.get("url") or "", "sourceType": source.get("source_type") or ""})
+        for field in ("frequency", "limit", "selector", "description"):
+            if source.get(field) is not None:
+                attributes[field] = str(source[field])
+        ElementTree.SubElement(body, "outline", attributes)
+    return ElementTree.tostring(root, encoding="unicode", xml_declaration=True)
+
+DUMPERS = {"csv": dump_csv, "json": dump_json, "opml": dump_opml}
+
+def dump_sources(sources: List[dict], format: str) -> str:
+    return DUMPERS[format](sources)
@@ -0,0 +1,167 @@
+from db import collection as scraped_collection, term_stats_collection
+from doc_format import compute_term_freq, normalize_text, extract_text, fill_text_fields
+from ingest import register
+from pymongo import UpdateOne
+from datetime import datetime, UTC
+from typing import List
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Fréquence des mots-clés de scraped_data, tenue à jour à l'écriture:
+# collection term_stats ({_id: mot, count: occurrences, documents: nb de
+# documents}) indexée sur count, pour un top-k sans relire les documents.
+# Les hooks d'ingestion cumulent les variations en mémoire; elles sont
+# écrites par lots (flush_term_stats) avant chaque lecture et périodiquement.
+
+# Mots de 3 lettres ou plus, lettres Unicode (accents compris), sans chiffres
+KEYWORD_PATTERN = re.compile(r"[^\W\d_]{3,}")
+
+STOPWORDS = frozenset("""
+    les des une est pas que qui dans pour par sur avec son ses aux ces cette
+    mais ont été être sont elle ils elles nous vous leur leurs lui même tout
+    tous toute toutes plus moins très aussi comme fait faire peut sans sous
+    entre vers chez donc car dont où quand alors encore après avant depuis
+    bien ainsi cela ceci celui celle ceux notre nos votre vos
+    the and for are but not you all any can had her was one our out has him
+    his how its may new now old see two way who did get let say she too use
+    that with have this will your from they been were what when which their
+    there then them than these those would could should about into more other
+    some such only over also just like most very here where while
+""".split())
+
+term_stats_status = {
+    "running": False,
+    "terms": 0,
+    "documents": 0,
+    "started_at": None,
+    "finished_at": None,
+    "error": None
+}
+
+_pending = {}  # mot → [occurrences, documents] pas encore écrits
+_pending_lock = threading.Lock()
+
+def keyword_counts(term_freq: dict) -> dict:
+    """Mots-clés retenus d'un document (hors mots vides, nombres, mots courts)"""
+    return {
+        term: count for term, count in term_freq.items()
+        if KEYWORD_PATTERN.fullmatch(term) and term not in STOPWORDS
+    }
+
+def _document_terms(doc: dict) -> dict:
+    term_freq = doc.get("term_freq")
+    if term_freq is None:
+        term_freq = compute_term_freq(normalize_text(extract_text(doc)))
+    return keyword_counts(term_freq)
+
+def _accumulate(documents: List[dict], sign: int):
+    with _pending_lock:
+        for doc in documents:
+            for term, count in _document_terms(doc).items():
+                pending = _pending.setdefault(term, [0, 0])
+                pending[0] += sign * count
+                pending[1] += sign
+
+def record_inserted(documents: List[dict]):
+    """Hook d'ingestion: compter les mots des documents insérés"""
+    _accumulate(documents, 1)
+
+def record_deleted(documents: List[dict]):
+    """Hook d'ingestion: décompter les mots des documents supprimés"""
+    _accumulate(documents, -1)
+
+register("term_stats", record_inserted, record_deleted)
+
+def flush_term_stats() -> int:
+    """Écrire les variations en attente (un $inc par mot, en un lot)"""
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    operations = [
+        UpdateOne({"_id": term}, {"$inc": {"count": count, "documents": documents}}, upsert=True)
+        for term, (count, documents) in pending.items()
+        if count or documents
+    ]
+    if not operations:
+        return 0
+    try:
+        term_stats_collection.bulk_write(operations, ordered=False)
+        if any(count < 0 for count, _ in pending.values()):
+            term_stats_collection.delete_many({"count": {"$lte": 0}})
+    except Exception:
+        # Variations remises en attente pour la prochaine écriture
+        with _pending_lock:
+            for term, (count, documents) in pending.items():
+                current = _pending.setdefault(term, [0, 0])
+                current[0] += count
+                current[1] += documents
+        raise
+    return len(operations)
+
+def rebuild_term_stats(batch_size: int = 1000) -> int:
+    """Recalculer term_stats depuis scraped_data (amorçage, dérive après expiration TTL)"""
+    term_stats_status.update({
+        "running": True,
+        "terms": 0,
+        "documents": 0,
+        "started_at": datetime.now(UTC),
+        "finished_at": None,
+        "error": None
+    })
+    try:
+        totals = {}
+        last_id = None
+        while True:
+            batch = list(
+                scraped_collection.find({"_id": {"$gt": last_id}} if last_id else {}, {"term_freq": 1})
+                .sort("_id", 1)
+                .limit(batch_size)
+            )
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+            fill_text_fields(batch, ("term_freq",))
+            for doc in batch:
+                for term, count in keyword_counts(doc["term_freq"]).items():
+                    total = totals.setdefault(term, [0, 0])
+                    total[0] += count
+                    total[1] += 1
+            term_stats_status["documents"] += len(batch)
+
+        with _pending_lock:
+            _pending.clear()
+        term_stats_collection.delete_many({})
+        rows = [
+            {"_id": term, "count": count, "documents": documents}
+            for term, (count, documents) in totals.items()
+        ]
+        for start in range(0, len(rows), batch_size):
+            term_stats_collection.insert_many(rows[start:start + batch_size])
+        term_stats_status["terms"] = len(totals)
+        logger.info(f"✅ Term stats rebuilt: {len(totals)} terms from {term_stats_status['documents']} documents")
+        return len(totals)
+    except Exception as e:
+        term_stats_status["error"] = str(e)
+        logger.error(f"Error rebuilding term stats: {str(e)}")
+        raise
+    finally:
+        term_stats_status["running"] = False
+        term_stats_status["finished_at"] = datetime.now(UTC)
+
+def bootstrap_term_stats():
+    """Démarrage: construire term_stats si la table est vide alors que des documents existent"""
+    try:
+        if term_stats_collection.estimated_document_count() == 0 and scraped_collection.find_one({}, {"_id": 1}):
+            rebuild_term_stats()
+    except Exception as e:
+        logger.error(f"Error bootstrapping term stats: {str(e)}")
+
+def top_terms(limit: int) -> tuple:
+    """(nombre de mots distincts, [(mot, occurrences, documents)] les plus fréquents)"""
+    flush_term_stats()
+    rows = term_stats_collection.find({}).sort([("count", -1), ("_id", 1)]).limit(limit)
+    top = [(row["_id"], row["count"], row.get("documents", 0)) for row in rows]
+    return term_stats_collection.estimated_document_count(), top
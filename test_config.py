@@ -1,6 +1,6 @@
 import pytest
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from dotenv import load_dotenv
 from bson import ObjectId
@@ -18,7 +18,7 @@ client = TestClient(app)
 @patch('routes.config.db')
 def test_get_config(mock_db):
     """Test récupérer la configuration"""
-    mock_config_collection = MagicMock()
+    mock_config_collection = AsyncMock()
     mock_db.__getitem__.return_value = mock_config_collection
     
     mock_config = {
@@ -45,7 +45,7 @@ def test_get_config(mock_db):
 @patch('routes.config.db')
 def test_update_config(mock_db):
     """Test mettre à jour la configuration"""
-    mock_config_collection = MagicMock()
+    mock_config_collection = AsyncMock()
     mock_db.__getitem__.return_value = mock_config_collection
     
     old_config = {
@@ -86,8 +86,8 @@ def test_update_config(mock_db):
 @patch('routes.config.db')
 def test_get_crawler_stats(mock_db):
     """Test obtenir les statistiques du crawler"""
-    mock_sources_collection = MagicMock()
-    mock_scraped_collection = MagicMock()
+    mock_sources_collection = AsyncMock()
+    mock_scraped_collection = AsyncMock()
     
     def mock_getitem(key):
         if key == "sources":
@@ -115,7 +115,7 @@ def test_get_crawler_stats(mock_db):
 @patch('routes.config.db')
 def test_reset_config(mock_db):
     """Test réinitialiser la configuration"""
-    mock_config_collection = MagicMock()
+    mock_config_collection = AsyncMock()
     mock_db.__getitem__.return_value = mock_config_collection
     
     mock_config = {
@@ -141,7 +141,7 @@ def test_reset_config(mock_db):
 @patch('routes.config.db')
 def test_toggle_crawler_enabled(mock_db):
     """Test activer/désactiver le crawler"""
-    mock_config_collection = MagicMock()
+    mock_config_collection = AsyncMock()
     mock_db.__getitem__.return_value = mock_config_collection
     
     old_config = {
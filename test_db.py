@@ -0,0 +1,68 @@
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+import asyncio
+
+# ==================== Test Connexion MongoDB ====================
+
+def test_client_created_lazily():
+    """Test l'import de db ne crée pas de client"""
+    db.close()
+
+    assert db._client is None
+    assert db.collection.name == "scraped_data"
+    assert db._client is None
+    print("✅ test_client_created_lazily PASSED")
+
+def test_missing_mongo_uri(monkeypatch):
+    """Test erreur claire si MONGO_URI n'est pas défini"""
+    db.close()
+    monkeypatch.delenv("MONGO_URI", raising=False)
+
+    with pytest.raises(ValueError):
+        db.get_client()
+    print("✅ test_missing_mongo_uri PASSED")
+
+def test_client_options(monkeypatch):
+    """Test options du pool configurables par variables d'environnement"""
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "250")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zlib, ")
+
+    options = db.get_client_options()
+
+    assert options["maxPoolSize"] == 250
+    assert options["retryWrites"] is True
+    assert options["compressors"] == ["zlib"]
+    print("✅ test_client_options PASSED")
+
+@patch('db.get_client')
+def test_ping_database(mock_get_client):
+    """Test mesure de latence de la base"""
+    mock_get_client.return_value = MagicMock()
+
+    stats = db.ping_database()
+
+    assert stats["status"] == "ok"
+    assert stats["ping_ms"] is not None
+    mock_get_client.return_value.admin.command.assert_called_once_with("ping")
+    print("✅ test_ping_database PASSED")
+
+@patch('db.get_async_client')
+def test_ping_database_async_cached(mock_get_client, monkeypatch):
+    """Test ping par le client async, mesure récente réutilisée"""
+    monkeypatch.setitem(db.ping_stats, "checked_at", None)
+    mock_get_client.return_value.admin.command = AsyncMock(return_value={"ok": 1})
+
+    first = asyncio.run(db.ping_database_async())
+    second = asyncio.run(db.ping_database_async())
+    asyncio.run(db.ping_database_async(max_age=0))
+
+    assert first["status"] == "ok"
+    assert second == first
+    assert mock_get_client.return_value.admin.command.await_count == 2
+    print("✅ test_ping_database_async_cached PASSED")
@@ -0,0 +1,114 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from dotenv import load_dotenv
+from bson import ObjectId
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import doc_format
+from doc_format import (
+    encode_data, compact_document, decode_items, extract_text, migrate_data_format,
+    prepare_document, fill_text_fields
+)
+
+# ==================== Test Format de stockage ====================
+
+def test_encode_compact_values():
+    """Test l'index est implicite dans le format compact"""
+    items = [{"index": 1, "value": "first"}, {"index": 2, "value": "second"}]
+
+    fields = encode_data(items)
+
+    assert fields == {"data_format": 2, "data": ["first", "second"]}
+    assert decode_items(fields) == items
+    print("✅ test_encode_compact_values PASSED")
+
+def test_encode_keeps_sparse_positions():
+    """Test les positions non contiguës (deltas) sont conservées"""
+    items = [{"index": 3, "value": "c"}, {"index": 7, "value": "g"}]
+
+    fields = encode_data(items)
+
+    assert fields["data_index"] == [3, 7]
+    assert decode_items(fields) == items
+    print("✅ test_encode_keeps_sparse_positions PASSED")
+
+@pytest.mark.skipif(doc_format.zstd is None, reason="zstandard not installed")
+def test_encode_compresses_large_payloads():
+    """Test les gros documents sont compressés"""
+    items = [{"index": i + 1, "value": "lorem ipsum " * 50} for i in range(100)]
+
+    stored = compact_document({"url": "https://example.com", "data": items})
+
+    assert "data" not in stored
+    assert "data_z" in stored
+    assert decode_items(stored) == items
+    print("✅ test_encode_compresses_large_payloads PASSED")
+
+def test_extract_text_both_formats():
+    """Test lecture transparente de l'ancien et du nouveau format"""
+    legacy = {"data": [{"index": 1, "value": "hello"}, {"index": 2, "value": "world"}]}
+    compact = {"data_format": 2, "data": ["hello", "world"]}
+    social = {"content": "hello world"}
+
+    assert extract_text(legacy) == "hello world"
+    assert extract_text(compact) == "hello world"
+    assert extract_text(social) == "hello world"
+    print("✅ test_extract_text_both_formats PASSED")
+
+@patch('doc_format.scraped_collection')
+def test_migrate_data_format(mock_collection):
+    """Test migration par lots des anciens documents"""
+    batch = [
+        {"_id": ObjectId(), "data": [{"index": 1, "value": "a"}]},
+        {"_id": ObjectId(), "data": [{"index": 1, "value": "b"}]}
+    ]
+    first_cursor = MagicMock()
+    first_cursor.limit.return_value = batch
+    empty_cursor = MagicMock()
+    empty_cursor.limit.return_value = []
+    mock_collection.find.side_effect = [first_cursor, empty_cursor]
+
+    migrated = migrate_data_format(batch_size=2)
+
+    assert migrated == 2
+    operations = mock_collection.bulk_write.call_args[0][0]
+    assert operations[0]._doc["$set"] == {
+        "data_format": 2,
+        "data": ["a"],
+        "content_text": "a",
+        "term_freq": {},
+        "terms": [],
+        "minhash": None,  # texte sans terme: pas de groupe de quasi-doublons
+        "cluster_id": None
+    }
+    print("✅ test_migrate_data_format PASSED")
+
+def test_prepare_document_text_fields():
+    """Test le texte et les fréquences sont calculés à l'écriture"""
+    stored = prepare_document({
+        "url": "https://example.com",
+        "data": [{"index": 1, "value": "Python  rocks"}, {"index": 2, "value": "python\nagain"}]
+    })
+
+    assert stored["content_text"] == "Python rocks python again"
+    assert stored["term_freq"] == {"python": 2, "rocks": 1, "again": 1}
+    print("✅ test_prepare_document_text_fields PASSED")
+
+@patch('doc_format.scraped_collection.find')
+def test_fill_text_fields_fetches_legacy_documents(mock_find):
+    """Test seuls les anciens documents sans champs texte sont relus"""
+    legacy_id = ObjectId()
+    docs = [
+        {"_id": ObjectId(), "content_text": "already there", "term_freq": {}},
+        {"_id": legacy_id}
+    ]
+    mock_find.return_value = [{"_id": legacy_id, "data": [{"index": 1, "value": "old doc"}]}]
+
+    fill_text_fields(docs)
+
+    assert docs[0]["content_text"] == "already there"
+    assert docs[1]["content_text"] == "old doc"
+    assert mock_find.call_args[0][0] == {"_id": {"$in": [legacy_id]}}
+    print("✅ test_fill_text_fields_fetches_legacy_documents PASSED")
@@ -0,0 +1,92 @@
+import pytest
+import csv
+import gzip
+import io
+import json
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from datetime import datetime, UTC, timedelta
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+from main import app
+from doc_format import prepare_document
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    """Export sur le moteur en mémoire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    yield
+    db.close()
+
+def insert_documents(count: int, **fields):
+    now = datetime.now(UTC)
+    db.collection.insert_many([
+        prepare_document({
+            "url": f"https://example.com/{i}",
+            "content": f"document {i}",
+            "source_type": "website",
+            "source_name": "Blog",
+            "scraped_at": now - timedelta(hours=i),
+            **fields
+        })
+        for i in range(count)
+    ])
+
+# ==================== Test Export ====================
+
+def test_export_csv_in_batches():
+    """Test export CSV complet sur plusieurs lots, du plus récent au plus ancien"""
+    insert_documents(7)
+
+    response = client.get("/export?format=csv&batch_size=3")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].endswith('.csv"')
+    assert [row["url"] for row in rows] == [f"https://example.com/{i}" for i in range(7)]
+    assert rows[0]["content_text"] == "document 0"
+    print("✅ test_export_csv_in_batches PASSED")
+
+def test_export_ndjson_filters_and_gzip():
+    """Test export NDJSON compressé, filtré par type et par dates"""
+    insert_documents(3)
+    insert_documents(2, source_type="rss")
+    start = (datetime.now(UTC) - timedelta(minutes=90)).isoformat()
+
+    response = client.get("/export", params={
+        "format": "ndjson", "source_type": "website", "start_date": start,
+        "fields": "url,scraped_at", "gzip": "true"
+    })
+    lines = gzip.decompress(response.content).decode("utf-8").splitlines()
+
+    assert response.headers["content-type"] == "application/gzip"
+    assert [json.loads(line)["url"] for line in lines] == ["https://example.com/0", "https://example.com/1"]
+    assert set(json.loads(lines[0])) == {"url", "scraped_at"}
+    print("✅ test_export_ndjson_filters_and_gzip PASSED")
+
+def test_export_parquet():
+    """Test export Parquet (un row group par lot)"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    insert_documents(5)
+
+    response = client.get("/export?format=parquet&batch_size=2")
+    table = pq.read_table(io.BytesIO(response.content))
+
+    assert table.num_rows == 5
+    assert pq.ParquetFile(io.BytesIO(response.content)).num_row_groups == 3
+    assert table.column("url").to_pylist()[0] == "https://example.com/0"
+    print("✅ test_export_parquet PASSED")
+
+def test_export_invalid_parameters():
+    """Test erreurs 400 avant le début du flux"""
+    assert client.get("/export?format=xml").status_code == 400
+    assert client.get("/export?source_id=invalid").status_code == 400
+    assert client.get("/export?batch_size=0").status_code == 400
+    print("✅ test_export_invalid_parameters PASSED")
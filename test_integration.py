@@ -1,6 +1,6 @@
 import pytest
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from dotenv import load_dotenv
 from bson import ObjectId
@@ -130,7 +130,7 @@ def test_full_flow_create_source(mock_insert):
 @patch('routes.config.db')
 def test_full_flow_get_config(mock_db):
     """Test du flux complet: récupérer la configuration"""
-    mock_config_collection = MagicMock()
+    mock_config_collection = AsyncMock()
     mock_config = {
         "_id": ObjectId(),
         "global_frequency": 24,
@@ -169,7 +169,8 @@ def test_full_flow_search(mock_find, mock_count):
     mock_cursor = MagicMock()
     mock_cursor.skip.return_value = mock_cursor
     mock_cursor.limit.return_value = mock_cursor
-    mock_cursor.sort.return_value = [mock_doc]
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=[mock_doc])
     mock_find.return_value = mock_cursor
     
     response = client.post("/search/", json={
@@ -0,0 +1,79 @@
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from bson import ObjectId
+from datetime import datetime, UTC
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+from main import app
+from keyword_matcher import KeywordMatcher, get_matcher, build_snippet
+
+client = TestClient(app)
+
+# ==================== Test Automate de mots-clés ====================
+
+def test_matcher_reports_overlapping_keywords():
+    """Test toutes les occurrences sont trouvées en un parcours, chevauchements compris"""
+    matcher = KeywordMatcher(["he", "she", "hers", "his"])
+    positions = matcher.find("ushers and his HERS")
+
+    assert positions == {"she": [1], "he": [2, 15], "hers": [2, 15], "his": [11]}
+    assert KeywordMatcher(["hers"], case_sensitive=True).find("ushers HERS") == {"hers": [2]}
+    assert matcher.matched("nothing") == []
+    print("✅ test_matcher_reports_overlapping_keywords PASSED")
+
+def test_matcher_positions_and_cache():
+    """Test positions dans le texte d'origine et automate partagé par ensemble de mots-clés"""
+    # "İ" devient deux caractères en minuscules: positions recalées sur le texte d'origine
+    assert KeywordMatcher(["istanbul"]).find("Vol İ Istanbul") == {"istanbul": [6]}
+    assert KeywordMatcher(["bul"]).find("İstanbul") == {"bul": [5]}
+    assert KeywordMatcher(["a"]).find("a a a a", max_positions=2) == {"a": [0, 2]}
+    assert get_matcher(["python", "java"]) is get_matcher(["java", "python", "java"])
+    assert get_matcher(["python"]) is not get_matcher(["python"], case_sensitive=True)
+    print("✅ test_matcher_positions_and_cache PASSED")
+
+@patch('routes.search.scraped_collection.count_documents')
+@patch('routes.search.scraped_collection.find')
+def test_search_reports_keyword_positions(mock_find, mock_count):
+    """Test la recherche renvoie les mots-clés trouvés et leurs positions"""
+    mock_count.return_value = 1
+    mock_cursor = MagicMock()
+    mock_cursor.skip.return_value = mock_cursor
+    mock_cursor.limit.return_value = mock_cursor
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=[{
+        "_id": ObjectId(),
+        "url": "https://example.com",
+        "source_id": None,
+        "content_text": "FastAPI with Python, python everywhere",
+        "scraped_at": datetime.now(UTC)
+    }])
+    mock_find.return_value = mock_cursor
+
+    brands = [f"brand{i}" for i in range(300)]
+    response = client.post("/search/", json={"keywords": brands + ["python", "fastapi"]})
+    result = response.json()["results"][0]
+
+    assert response.status_code == 200
+    assert result["matched_keywords"] == ["fastapi", "python"]
+    assert result["positions"] == {"fastapi": [0], "python": [13, 21]}
+    assert result["highlights"] == [[0, 7], [13, 19], [21, 27]]
+    print("✅ test_search_reports_keyword_positions PASSED")
+
+def test_snippet_centred_on_matches():
+    """Test extrait centré sur le groupe d'occurrences le plus riche, surlignages relatifs"""
+    text = "intro " * 100 + "the interest rate rose " + "filler " * 40 + "rate again " + "tail " * 80
+    matcher = get_matcher(["interest", "rate"])
+    snippet, offset, highlights = build_snippet(text, matcher.find(text), size=80)
+
+    assert len(snippet) <= 80
+    assert snippet == text[offset:offset + len(snippet)]
+    assert [snippet[start:end] for start, end in highlights] == ["interest", "rate"]
+    assert not snippet.startswith("ntro")  # mot non coupé au début
+    # Occurrences qui se chevauchent: un seul surlignage
+    assert build_snippet("ushers", KeywordMatcher(["she", "hers"]).find("ushers")) == ("ushers", 0, [[1, 6]])
+    assert build_snippet("no match here", {}, size=5) == ("no ma", 0, [])
+    print("✅ test_snippet_centred_on_matches PASSED")
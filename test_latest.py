@@ -0,0 +1,121 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from bson import ObjectId
+from datetime import datetime, UTC
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+from main import app
+from scheduler import scrape_source_job
+from snapshots import store_snapshot
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    """État courant des sources sur le moteur en mémoire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    yield
+    db.close()
+
+def scrape_result(values):
+    return {
+        "success": True,
+        "data": [{"index": i + 1, "value": value} for i, value in enumerate(values)],
+        "content_type": "text/html",
+        "count": len(values)
+    }
+
+def add_source(**fields) -> str:
+    source = {"name": "Site", "url": "https://example.com", "source_type": "website", "active": True, **fields}
+    return str(db.sources_collection.insert_one(source).inserted_id)
+
+# ==================== Test État courant ====================
+
+@patch('scheduler.scrape_url')
+def test_scrape_maintains_latest_state(mock_scrape):
+    """Test chaque scrape met à jour l'état courant embarqué dans la source"""
+    source_id = add_source()
+    values = [f"item {i}" for i in range(5)]
+    mock_scrape.return_value = scrape_result(values)
+    scrape_source_job(source_id)
+    scrape_source_job(source_id)
+    values[0] = "changed"
+    mock_scrape.return_value = scrape_result(values)
+    scrape_source_job(source_id)
+
+    source = db.sources_collection.find_one({"_id": ObjectId(source_id)})
+    latest = client.get(f"/sources/{source_id}/latest").json()
+    states = client.get("/sources/latest").json()
+    status = client.get("/sources-status").json()
+
+    assert source["scrape_count"] == 3
+    assert source["latest"]["version"] == 2
+    # Version 2 stockée en delta: l'état courant n'a rien à rejouer
+    assert [item["value"] for item in latest["data"]] == values
+    assert states["sources"][0]["latest"]["version"] == 2
+    assert "data" not in states["sources"][0]["latest"]
+    assert status["sources"][0]["latest"]["count"] == 5
+    print("✅ test_scrape_maintains_latest_state PASSED")
+
+def test_latest_falls_back_to_versions():
+    """Test une source scrappée avant l'état embarqué est reconstruite depuis ses versions"""
+    source_id = add_source()
+    store_snapshot({
+        "source_id": ObjectId(source_id),
+        "data": scrape_result(["a", "b"])["data"],
+        "scraped_at": datetime.now(UTC)
+    })
+
+    latest = client.get(f"/sources/{source_id}/latest").json()
+
+    assert latest["version"] == 1
+    assert [item["value"] for item in latest["data"]] == ["a", "b"]
+    assert client.get(f"/sources/{add_source(name='Neuf')}/latest").status_code == 404
+    print("✅ test_latest_falls_back_to_versions PASSED")
+
+@patch('latest.LATEST_RSS_ENTRIES', 3)
+@patch('routes.rss.parse_rss_feed')
+def test_rss_latest_entries_embedded(mock_parse):
+    """Test les dernières entrées RSS sont servies depuis la source, sans lire scraped_data"""
+    source_id = add_source(name="Flux", url="https://example.com/feed.xml", source_type="rss")
+
+    def feed(links):
+        return {
+            "success": True,
+            "feed_info": {"title": "Flux"},
+            "total_entries": len(links),
+            "entries": [
+                {"title": link, "link": link, "guid": link, "summary": "", "published": "", "author": ""}
+                for link in links
+            ]
+        }
+
+    mock_parse.return_value = feed(["a1", "a2"])
+    client.post(f"/rss/refresh/{source_id}")
+    mock_parse.return_value = feed(["b1", "b2", "a1"])
+    client.post(f"/rss/refresh/{source_id}")
+
+    with patch('routes.rss.scraped_collection.find') as mock_find:
+        page = client.get(f"/rss/source/{source_id}/latest", params={"limit": 3}).json()
+        mock_find.assert_not_called()
+    history = client.get(f"/rss/source/{source_id}/latest", params={"limit": 10}).json()
+
+    # Même ordre que la lecture de scraped_data, limité aux 3 dernières entrées
+    assert [entry["title"] for entry in page["entries"]] == [entry["title"] for entry in history["entries"][:3]]
+    assert [entry["title"] for entry in page["entries"]] == ["b2", "b1", "a2"]
+    assert len(history["entries"]) == 4
+
+    # Liste des sources après rafraîchissement: résumé de l'état courant, sans les entrées
+    response = client.get("/rss/sources")
+    assert response.status_code == 200
+    listed = response.json()["sources"][0]
+    assert listed["id"] == source_id
+    assert set(listed["latest"]) == {"document_id", "version", "changed_at", "scraped_at", "count"}
+    print("✅ test_rss_latest_entries_embedded PASSED")
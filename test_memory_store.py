@@ -0,0 +1,144 @@
+import pytest
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from datetime import datetime, UTC, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+from main import app
+from memory_store import MemoryClient
+
+client = TestClient(app)
+
+@pytest.fixture
+def collection():
+    return MemoryClient()["webscraper"]["scraped_data"]
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    """Toute l'application sur le moteur en mémoire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    # Le client async MongoDB d'un test précédent n'est fermé qu'au shutdown
+    monkeypatch.setattr(db, "_async_client", None)
+    yield
+    db.close()
+
+# ==================== Test Moteur en mémoire ====================
+
+def test_query_operators(collection):
+    """Test opérateurs de requête, tri, skip et limit"""
+    now = datetime.now(UTC)
+    for i in range(5):
+        collection.insert_one({"n": i, "tags": ["a", "b"][:i % 3], "scraped_at": now - timedelta(hours=i)})
+
+    assert collection.count_documents({"n": {"$gte": 3}}) == 2
+    assert collection.count_documents({"tags": "b"}) == 1
+    assert collection.count_documents({"$or": [{"n": 0}, {"n": {"$in": [3, 4]}}]}) == 3
+    assert collection.count_documents({"tags": {"$exists": True, "$size": 0}}) == 2
+    assert collection.count_documents({"scraped_at": {"$lt": now - timedelta(minutes=90)}}) == 3
+
+    page = collection.find({}, {"n": 1, "_id": 0}).sort("scraped_at", 1).skip(1).limit(2)
+    assert list(page) == [{"n": 3}, {"n": 2}]
+    print("✅ test_query_operators PASSED")
+
+def test_documents_are_copied(collection):
+    """Test les documents lus/écrits ne partagent pas de références"""
+    document = {"data": ["a"]}
+    collection.insert_one(document)
+    document["data"].append("b")
+
+    stored = collection.find_one({"_id": document["_id"]})
+    stored["data"].append("c")
+
+    assert collection.find_one({})["data"] == ["a"]
+    print("✅ test_documents_are_copied PASSED")
+
+def test_update_operators_and_upsert(collection):
+    """Test $set/$inc/$unset et upsert avec $setOnInsert"""
+    collection.insert_one({"name": "a", "count": 1, "tmp": True})
+    collection.update_one({"name": "a"}, {"$set": {"meta.seen": True}, "$inc": {"count": 2}, "$unset": {"tmp": ""}})
+
+    result = collection.update_one(
+        {"name": "b"}, {"$setOnInsert": {"count": 0}, "$set": {"active": True}}, upsert=True
+    )
+
+    assert collection.find_one({"name": "a"}, {"_id": 0}) == {"name": "a", "count": 3, "meta": {"seen": True}}
+    assert result.upserted_id is not None
+    assert collection.find_one({"name": "b"}, {"_id": 0}) == {"name": "b", "count": 0, "active": True}
+    print("✅ test_update_operators_and_upsert PASSED")
+
+def test_unique_index_and_bulk_upserts(collection):
+    """Test index unique partiel et bulk_write d'upserts (déduplication RSS)"""
+    collection.create_index("entry_key", unique=True, partialFilterExpression={"entry_key": {"$exists": True}})
+    operations = [
+        UpdateOne({"entry_key": key}, {"$setOnInsert": {"title": key}}, upsert=True)
+        for key in ("k1", "k2", "k1")
+    ]
+
+    result = collection.bulk_write(operations, ordered=False)
+
+    assert set(result.upserted_ids) == {0, 1}
+    assert result.matched_count == 1
+    collection.insert_one({"title": "sans clé"})
+    collection.insert_one({"title": "sans clé"})
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_one({"entry_key": "k1"})
+    with pytest.raises(BulkWriteError):
+        collection.insert_many([{"entry_key": "k3"}, {"entry_key": "k3"}])
+    print("✅ test_unique_index_and_bulk_upserts PASSED")
+
+def test_aggregate(collection):
+    """Test pipelines d'agrégation des statistiques"""
+    collection.insert_many([
+        {"sentiment": "positive", "keywords": ["ai", "web"]},
+        {"sentiment": "positive", "keywords": ["ai"]},
+        {"sentiment": "negative", "keywords": []}
+    ])
+
+    sentiments = list(collection.aggregate([{"$group": {"_id": "$sentiment", "count": {"$sum": 1}}}]))
+    keywords = list(collection.aggregate([
+        {"$unwind": "$keywords"},
+        {"$group": {"_id": "$keywords", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": 1}
+    ]))
+
+    assert {item["_id"]: item["count"] for item in sentiments} == {"positive": 2, "negative": 1}
+    assert keywords == [{"_id": "ai", "count": 2}]
+    assert sorted(collection.distinct("keywords")) == ["ai", "web"]
+    print("✅ test_aggregate PASSED")
+
+# ==================== Test API sur le moteur en mémoire ====================
+
+def test_api_on_memory_backend(memory_backend):
+    """Test l'API fonctionne de bout en bout sans MongoDB"""
+    for i in range(3):
+        response = client.post("/sources/", json={
+            "name": f"Source {i}",
+            "url": f"https://example.com/{i}",
+            "source_type": "website",
+            "frequency": 24
+        })
+        assert response.status_code == 201
+
+    first_page = client.get("/sources/?limit=2")
+    cursor = first_page.headers["X-Next-Cursor"]
+    second_page = client.get(f"/sources/?limit=2&cursor={cursor}")
+
+    assert [s["name"] for s in first_page.json()] == ["Source 2", "Source 1"]
+    assert [s["name"] for s in second_page.json()] == ["Source 0"]
+    assert db.sources_collection.count_documents({}) == 3
+    print("✅ test_api_on_memory_backend PASSED")
+
+def test_unknown_backend(monkeypatch):
+    """Test erreur claire si STORAGE_BACKEND est inconnu"""
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+
+    with pytest.raises(ValueError):
+        db.get_storage_backend()
+    print("✅ test_unknown_backend PASSED")
@@ -0,0 +1,195 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from bson import ObjectId
+from datetime import datetime, UTC, timedelta
+import threading
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+from main import app
+from doc_format import prepare_document, tokenize
+from ingest import documents_inserted
+import near_duplicates
+from routes.rss import save_rss_entries
+import asyncio
+from near_duplicates import DuplicateIndex, duplicate_index, begin_duplicate_index_load, load_duplicate_index, minhash, similarity
+from search_index import search_index
+
+client = TestClient(app)
+
+RELEASE = (
+    "The ministry of economy announced on Monday a new support plan for small businesses "
+    "affected by rising energy prices, with direct grants and lower interest loans available "
+    "from next month through regional development agencies across the country"
+)
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    """Quasi-doublons sur le moteur en mémoire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    duplicate_index.clear()
+    search_index.clear()
+    yield
+    duplicate_index.clear()
+    search_index.clear()
+    db.close()
+
+def insert(text: str, **fields) -> dict:
+    stored = prepare_document({
+        "url": "https://example.com",
+        "content": text,
+        "scraped_at": datetime.now(UTC),
+        **fields
+    })
+    stored["_id"] = db.collection.insert_one(stored).inserted_id
+    documents_inserted([stored])
+    return stored
+
+# ==================== Test Quasi-doublons ====================
+
+def test_minhash_estimates_jaccard():
+    """Test signatures stables, similarité estimée proche pour une reprise légèrement modifiée"""
+    original = minhash(tokenize(RELEASE))
+    edited = minhash(tokenize(RELEASE.replace("on Monday", "on Tuesday") + " (AFP)"))
+    other = minhash(tokenize("Local football club wins the regional cup after a dramatic penalty shootout"))
+
+    assert (minhash(tokenize(RELEASE)) == original).all()
+    assert similarity(original, edited) >= 0.7
+    assert similarity(original, other) < 0.1
+    assert minhash([]) is None
+
+    index = DuplicateIndex()
+    cluster_id = index.assign(original)
+    assert index.assign(minhash(tokenize(RELEASE + " Source: AFP"))) == cluster_id
+    other_id = index.assign(other)
+    assert other_id != cluster_id
+    # Groupes réservés, enregistrés à l'insertion d'un document
+    assert len(index) == 0
+    index.add(cluster_id, original)
+    index.add(other_id, other)
+    assert len(index) == 2
+    assert index.assign(minhash(tokenize(RELEASE + " (AFP)"))) == cluster_id
+    print("✅ test_minhash_estimates_jaccard PASSED")
+
+def test_clusters_assigned_at_ingest_and_reloaded():
+    """Test cluster_id commun aux reprises, rechargé depuis les documents au démarrage"""
+    first = insert(RELEASE, source_name="feed-a")
+    second = insert(RELEASE + " Read more on our website.", source_name="feed-b")
+    other = insert("Weather forecast: heavy rain expected in the north this weekend")
+    empty = insert("")
+
+    assert first["cluster_id"] == second["cluster_id"]
+    assert other["cluster_id"] != first["cluster_id"]
+    assert empty["cluster_id"] is None
+
+    duplicate_index.clear()
+    load_duplicate_index()
+    assert len(duplicate_index) == 2
+    assert insert(RELEASE + " Updated.")["cluster_id"] == first["cluster_id"]
+
+    data = client.get(f"/search/duplicates/{second['_id']}").json()
+    assert data["cluster_id"] == str(first["cluster_id"])
+    assert len(data["documents"]) == 3
+    print("✅ test_clusters_assigned_at_ingest_and_reloaded PASSED")
+
+def test_versions_of_a_source_kept_apart():
+    """Test les versions d'une même source ne sont pas regroupées; une reprise par une autre source l'est"""
+    source_id = ObjectId()
+    first = insert(RELEASE, source_id=source_id)
+    second = insert(RELEASE + " Updated.", source_id=source_id)
+    copy = insert(RELEASE + " (AFP)", source_id=ObjectId())
+
+    assert first["cluster_id"] != second["cluster_id"]
+    assert copy["cluster_id"] in (first["cluster_id"], second["cluster_id"])
+
+    duplicate_index.clear()
+    load_duplicate_index()
+    third = insert(RELEASE + " Corrected.", source_id=source_id)
+    assert third["cluster_id"] not in (first["cluster_id"], second["cluster_id"])
+    print("✅ test_versions_of_a_source_kept_apart PASSED")
+
+def test_clusters_registered_on_insert_only(monkeypatch):
+    """Test un document préparé mais jamais inséré ne laisse pas de représentant fantôme"""
+    entry = {"title": "Plan", "link": "https://example.com/plan", "guid": "plan", "summary": RELEASE, "published": "", "author": ""}
+    asyncio.run(save_rss_entries([entry], "https://example.com/feed", "Flux"))
+    # Même entrée, résumé modifié par le flux: l'upsert n'insère rien
+    edited = {**entry, "summary": "Local football club wins the regional cup after a dramatic penalty shootout"}
+    saved = asyncio.run(save_rss_entries([edited], "https://example.com/feed", "Flux"))
+    assert saved["already_seen"] == 1
+    assert len(duplicate_index) == 1
+
+    # Préparé sans insertion (version déjà prise): réservation expirée, non enregistrée
+    monkeypatch.setattr(near_duplicates, "PENDING_SECONDS", 0)
+    phantom = prepare_document({"content": "Weather forecast: heavy rain expected in the north this weekend"})
+    stored = insert("Weather forecast: heavy rain expected in the north this weekend")
+    assert len(duplicate_index) == 2
+    assert stored["cluster_id"] != phantom["cluster_id"]
+    assert duplicate_index.stats()["pending"] == 0
+    print("✅ test_clusters_registered_on_insert_only PASSED")
+
+def test_assignment_waits_for_index_load():
+    """Test une écriture pendant le chargement rejoint le groupe existant au lieu d'en créer un"""
+    first = insert(RELEASE)
+    duplicate_index.clear()
+    begin_duplicate_index_load()
+
+    written = {}
+    writer = threading.Thread(target=lambda: written.update(insert(RELEASE + " Updated.")))
+    writer.start()
+    writer.join(0.2)
+    assert writer.is_alive()
+
+    load_duplicate_index()
+    writer.join(5)
+    assert written["cluster_id"] == first["cluster_id"]
+    assert len(duplicate_index) == 1
+    print("✅ test_assignment_waits_for_index_load PASSED")
+
+def test_search_collapses_duplicates():
+    """Test un résultat par groupe (le plus récent ou le mieux classé), total en groupes"""
+    now = datetime.now(UTC)
+    older = insert(RELEASE, scraped_at=now - timedelta(hours=2))
+    newer = insert(RELEASE + " Published by the regional agency.", scraped_at=now - timedelta(hours=1))
+    single = insert("Energy prices keep rising for small businesses", scraped_at=now)
+
+    plain = client.post("/search/", json={"keywords": ["energy"]}).json()
+    collapsed = client.post("/search/", json={"keywords": ["energy"], "collapse_duplicates": True, "facets": ["source_id"]}).json()
+    ranked = client.post("/search/", json={"keywords": ["energy"], "collapse_duplicates": True, "ranked": True}).json()
+
+    assert plain["total"] == 3
+    assert collapsed["total"] == 2
+    assert [r["id"] for r in collapsed["results"]] == [str(single["_id"]), str(newer["_id"])]
+    assert collapsed["results"][1]["duplicates"] == 2
+    assert collapsed["results"][1]["cluster_id"] == str(older["cluster_id"])
+    assert collapsed["facets"]["source_id"] == [{"value": None, "count": 2}]
+    assert ranked["total"] == 2
+    assert len({r["cluster_id"] for r in ranked["results"]}) == 2
+    print("✅ test_search_collapses_duplicates PASSED")
+
+@patch('routes.analytics.analyze_document_with_llm')
+def test_analytics_one_representative_per_cluster(mock_llm):
+    """Test un appel LLM par groupe; les reprises réutilisent l'analyse du représentant"""
+    mock_llm.return_value = {
+        "summary": "Support plan", "sentiment": "neutral", "category": "economy",
+        "keywords": ["energy"], "entities": ["ministry"]
+    }
+    first = insert(RELEASE)
+    second = insert(RELEASE + " (Reuters)")
+    insert("Weather forecast: heavy rain expected in the north this weekend")
+
+    data = client.post("/analytics/analyze-batch", json={"limit": 10}).json()
+    assert data["analyzed_count"] == 2
+    assert str(second["_id"]) not in [r["document_id"] for r in data["results"]]
+    assert str(first["_id"]) in [r["document_id"] for r in data["results"]]
+
+    reused = client.post("/analytics/analyze-document", json={"document_id": str(second["_id"])}).json()
+    assert reused["category"] == "economy"
+    assert mock_llm.call_count == 2
+    assert client.post("/analytics/analyze-batch", json={"limit": 10}).json()["analyzed_count"] == 0
+    print("✅ test_analytics_one_representative_per_cluster PASSED")
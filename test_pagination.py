@@ -0,0 +1,87 @@
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from bson import ObjectId
+from datetime import datetime, UTC
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+from main import app
+from pagination import encode_cursor, decode_cursor, keyset_filter, next_cursor
+
+client = TestClient(app)
+
+# ==================== Test Pagination ====================
+
+def test_cursor_roundtrip():
+    """Test encoder/décoder un curseur"""
+    doc_id = ObjectId()
+    scraped_at = datetime(2026, 1, 15, 10, 30)
+
+    value, decoded_id = decode_cursor(encode_cursor(scraped_at, doc_id))
+
+    assert value == scraped_at
+    assert decoded_id == doc_id
+    print("✅ test_cursor_roundtrip PASSED")
+
+def test_keyset_filter():
+    """Test filtre "après le curseur" sur (date, _id)"""
+    doc_id = ObjectId()
+    scraped_at = datetime(2026, 1, 15, 10, 30)
+
+    mongo_filter = keyset_filter({"source_type": "rss"}, "scraped_at", encode_cursor(scraped_at, doc_id))
+
+    assert mongo_filter == {"$and": [
+        {"source_type": "rss"},
+        {"$or": [
+            {"scraped_at": {"$lt": scraped_at}},
+            {"scraped_at": scraped_at, "_id": {"$lt": doc_id}}
+        ]}
+    ]}
+    print("✅ test_keyset_filter PASSED")
+
+def test_next_cursor_last_page():
+    """Test pas de curseur suivant sur une page incomplète"""
+    docs = [{"_id": ObjectId(), "scraped_at": datetime.now(UTC)}]
+
+    assert next_cursor(docs, "scraped_at", 10) is None
+    assert next_cursor(docs, "scraped_at", 1) is not None
+    print("✅ test_next_cursor_last_page PASSED")
+
+def test_invalid_cursor():
+    """Test curseur invalide"""
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+    response = client.get("/sources/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    print("✅ test_invalid_cursor PASSED")
+
+@patch('routes.sources.sources_collection.find')
+def test_list_sources_paginated(mock_find):
+    """Test lister les sources par pages"""
+    sources = [
+        {
+            "_id": ObjectId(),
+            "name": f"Source {i}",
+            "url": f"https://example{i}.com",
+            "source_type": "website",
+            "created_at": datetime.now(UTC)
+        }
+        for i in range(2)
+    ]
+    mock_cursor = MagicMock()
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.limit.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=sources)
+    mock_find.return_value = mock_cursor
+
+    response = client.get("/sources/", params={"limit": 2})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    cursor = response.headers["X-Next-Cursor"]
+    assert decode_cursor(cursor)[1] == sources[-1]["_id"]
+    print("✅ test_list_sources_paginated PASSED")
@@ -0,0 +1,150 @@
+import pytest
+import asyncio
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from datetime import datetime, UTC, timedelta
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+import pymongo
+from main import app
+from partitions import UpdateOne, partition_for, scraped_at_range
+from memory_store import MemoryCollection
+from routes.rss import save_rss_entries
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def partitioned_backend(monkeypatch):
+    """Moteur en mémoire avec partitionnement mensuel de scraped_data"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.setenv("SCRAPED_DATA_PARTITIONING", "monthly")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    yield
+    db.close()
+
+def month(year: int, month: int, day: int = 15) -> datetime:
+    return datetime(year, month, day, tzinfo=UTC)
+
+def raw_collection(name: str):
+    return db.get_database()[name]
+
+# ==================== Test Partitionnement ====================
+
+def test_writes_routed_by_month():
+    """Test les écritures vont dans la partition du mois de scraped_at"""
+    db.collection.insert_one({"content": "octobre", "scraped_at": month(2026, 10)})
+    db.collection.insert_many([
+        {"content": "septembre", "scraped_at": month(2026, 9)},
+        {"content": "octobre bis", "scraped_at": month(2026, 10, 20)}
+    ])
+
+    assert raw_collection("scraped_data_2026_10").count_documents({}) == 2
+    assert raw_collection("scraped_data_2026_09").count_documents({}) == 1
+    assert db.collection.count_documents({}) == 3
+    assert partition_for(month(2026, 1)) == "scraped_data_2026_01"
+    print("✅ test_writes_routed_by_month PASSED")
+
+def test_reads_only_overlapping_partitions():
+    """Test les lectures bornées par date n'ouvrent que les partitions concernées"""
+    for m in (8, 9, 10):
+        db.collection.insert_one({"content": f"mois {m}", "scraped_at": month(2026, m)})
+    # Données antérieures au partitionnement
+    raw_collection("scraped_data").insert_one({"content": "ancien", "scraped_at": month(2026, 10, 1)})
+
+    names = db.collection.partition_names()
+    targets = [name for name, _ in db.collection._targets(names, {"scraped_at": {"$gte": month(2026, 9, 1)}})]
+    docs = list(db.collection.find({"scraped_at": {"$gte": month(2026, 9, 1)}}).sort("scraped_at", -1))
+
+    assert targets == ["scraped_data", "scraped_data_2026_10", "scraped_data_2026_09"]
+    assert [doc["content"] for doc in docs] == ["mois 10", "ancien", "mois 9"]
+    assert scraped_at_range({"$and": [{"scraped_at": {"$lt": month(2026, 9)}}]}) == (None, month(2026, 9))
+    print("✅ test_reads_only_overlapping_partitions PASSED")
+
+def test_latest_page_stops_early():
+    """Test une page triée par date ne lit pas les partitions plus anciennes"""
+    for m in (8, 9, 10):
+        db.collection.insert_many([{"n": i, "scraped_at": month(2026, m, i + 1)} for i in range(3)])
+
+    with patch.object(MemoryCollection, "find", autospec=True, side_effect=MemoryCollection.find) as find:
+        page = db.collection.find({}, {"n": 1, "_id": 0}).sort("scraped_at", -1).limit(2)
+        assert list(page) == [{"n": 2}, {"n": 1}]
+    read = [call.args[0].name for call in find.call_args_list]
+
+    assert read == ["scraped_data", "scraped_data_2026_10"]
+
+    latest = db.collection.find_one({}, sort=[("scraped_at", -1)])
+    assert latest["scraped_at"].month == 10
+    print("✅ test_latest_page_stops_early PASSED")
+
+def test_unbounded_reads_stream_partitions():
+    """Test sans limite, les partitions sont lues à la demande et fusionnées dans l'ordre du tri"""
+    for m in (8, 9, 10):
+        db.collection.insert_many([{"n": m + 3 * i, "scraped_at": month(2026, m, i + 1)} for i in range(3)])
+
+    with patch.object(MemoryCollection, "find", autospec=True, side_effect=MemoryCollection.find) as find:
+        cursor = db.collection.find({}).sort("scraped_at", -1)
+        assert next(cursor)["n"] == 16
+    read = [call.args[0].name for call in find.call_args_list]
+
+    assert read == ["scraped_data", "scraped_data_2026_10"]
+    assert [doc["n"] for doc in db.collection.find({}, {"n": 1}).sort("n", 1)] == list(range(8, 17))
+    top = asyncio.run(db.async_collection.find({}, {"n": 1, "_id": 0}).sort("n", -1).to_list(4))
+    assert top == [{"n": 16}, {"n": 15}, {"n": 14}, {"n": 13}]
+    print("✅ test_unbounded_reads_stream_partitions PASSED")
+
+def test_rss_upserts_deduplicated_across_partitions():
+    """Test une entrée RSS déjà vue le mois précédent n'est pas réinsérée"""
+    db.collection.bulk_write([
+        UpdateOne({"entry_key": "k1"}, {"$setOnInsert": {"scraped_at": month(2026, 9)}}, upsert=True)
+    ])
+    entries = [{"link": "https://example.com/a", "guid": "a", "title": "A", "summary": "", "published": "", "author": ""}]
+
+    with patch("routes.rss.compute_entry_key", return_value="k1"):
+        saved = asyncio.run(save_rss_entries(entries, "https://example.com/feed", "Flux"))
+
+    assert saved["already_seen"] == 1
+    assert db.collection.count_documents({"entry_key": "k1"}) == 1
+    assert db.collection.find_one({"entry_key": "k1"})["last_seen_at"] is not None
+    # Opérations de pymongo sans leurs arguments publics: refusées plutôt que mal routées
+    with pytest.raises(TypeError):
+        db.collection.bulk_write([pymongo.UpdateOne({"entry_key": "k1"}, {"$set": {"n": 1}})])
+    print("✅ test_rss_upserts_deduplicated_across_partitions PASSED")
+
+def test_aggregate_across_partitions():
+    """Test les agrégations couvrent toutes les partitions concernées"""
+    db.collection.insert_many([
+        {"source_name": "A", "scraped_at": month(2026, 9)},
+        {"source_name": "A", "scraped_at": month(2026, 10)},
+        {"source_name": "B", "scraped_at": month(2026, 10)}
+    ])
+
+    counts = list(db.collection.aggregate([
+        {"$match": {"scraped_at": {"$gte": month(2026, 1, 1)}}},
+        {"$group": {"_id": "$source_name", "count": {"$sum": 1}}}
+    ]))
+
+    assert {item["_id"]: item["count"] for item in counts} == {"A": 2, "B": 1}
+    assert sorted(db.collection.distinct("source_name")) == ["A", "B"]
+    print("✅ test_aggregate_across_partitions PASSED")
+
+def test_drop_partition_endpoint():
+    """Test suppression d'une partition entière via l'API"""
+    db.collection.insert_one({"content": "ancien", "scraped_at": month(2025, 1)})
+    db.collection.insert_one({"content": "récent", "scraped_at": datetime.now(UTC) - timedelta(minutes=1)})
+
+    listed = client.get("/scheduler/partitions").json()
+    dropped = client.delete("/scheduler/partitions/scraped_data_2025_01")
+    current = client.delete(f"/scheduler/partitions/{partition_for(None)}")
+    invalid = client.delete("/scheduler/partitions/sources")
+
+    assert [p["partition"] for p in listed["partitions"]] == [partition_for(None), "scraped_data_2025_01"]
+    assert dropped.status_code == 200
+    assert current.status_code == 409
+    assert invalid.status_code == 400
+    assert db.collection.count_documents({}) == 1
+    print("✅ test_drop_partition_endpoint PASSED")
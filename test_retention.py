@@ -0,0 +1,172 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from bson import ObjectId
+from datetime import datetime, UTC, timedelta
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+import retention
+from main import app
+from archive import iter_archived, list_partitions, write_archive
+from doc_format import prepare_document
+from snapshots import store_snapshot
+from routes.rss import save_rss_entries
+import asyncio
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch, tmp_path):
+    """Moteur en mémoire et dossier d'archives temporaire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.setenv("ARCHIVE_DIR", str(tmp_path))
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    yield
+    retention.load_policy({})
+    db.close()
+
+def insert_document(days_ago: int, **fields):
+    document = {
+        "url": "https://example.com",
+        "content": fields.pop("content", "python news"),
+        "scraped_at": datetime.now(UTC) - timedelta(days=days_ago),
+        **fields
+    }
+    return db.collection.insert_one(prepare_document(document)).inserted_id
+
+def set_policy(**policy):
+    db.db["crawler_config"].insert_one(policy)
+
+# ==================== Test Rétention ====================
+
+def test_expired_documents_archived_then_deleted():
+    """Test les documents hors fenêtre sont archivés puis supprimés"""
+    old_id = insert_document(40, source_name="Blog")
+    recent_id = insert_document(2, source_name="Blog")
+    set_policy(retention_days=30, archive_expired=True)
+
+    status = retention.run_retention()
+
+    assert status["archived"] == 1
+    assert status["deleted"] == 1
+    assert db.collection.find_one({"_id": old_id}) is None
+    assert db.collection.find_one({"_id": recent_id}) is not None
+    archived = list(iter_archived({"source_name": "Blog"}))
+    assert [doc["_id"] for doc in archived] == [old_id]
+    assert isinstance(archived[0]["scraped_at"], datetime)
+    assert list_partitions()[0]["files"] == 1
+    print("✅ test_expired_documents_archived_then_deleted PASSED")
+
+def test_archives_without_scraped_at_sorted_last():
+    """Test un document archivé sans scraped_at est lu en dernier, dates relues en UTC"""
+    write_archive("scraped_data", [
+        {"_id": ObjectId(), "content": "sans date"},
+        {"_id": ObjectId(), "content": "daté", "scraped_at": datetime.now(UTC)}
+    ])
+
+    archived = list(iter_archived())
+
+    assert [doc["content"] for doc in archived] == ["daté", "sans date"]
+    assert archived[0]["scraped_at"].tzinfo is not None
+    print("✅ test_archives_without_scraped_at_sorted_last PASSED")
+
+def test_source_override():
+    """Test surcharge de rétention par source"""
+    source_id = db.sources_collection.insert_one({"name": "Archive longue"}).inserted_id
+    kept_id = insert_document(40, source_id=source_id, source_name="Archive longue")
+    expired_id = insert_document(40, source_name="Autre")
+    set_policy(retention_days=30, source_retention_days={str(source_id): 90})
+
+    retention.run_retention()
+
+    assert db.collection.find_one({"_id": kept_id}) is not None
+    assert db.collection.find_one({"_id": expired_id}) is None
+    print("✅ test_source_override PASSED")
+
+@patch('snapshots.KEYFRAME_INTERVAL', 2)
+def test_snapshot_chain_kept():
+    """Test les versions nécessaires aux versions récentes ne sont pas supprimées"""
+    source_id = ObjectId()
+    values = [f"item {i}" for i in range(10)]
+    for version, days_ago in enumerate([50, 45, 40, 1], start=1):
+        values[0] = f"changed {version}"
+        store_snapshot({
+            "source_id": source_id,
+            "data": [{"index": i + 1, "value": v} for i, v in enumerate(values)],
+            "scraped_at": datetime.now(UTC) - timedelta(days=days_ago)
+        })
+    set_policy(retention_days=30)
+
+    retention.run_retention()
+
+    remaining = db.collection.find({"source_id": source_id}).sort("version", 1)
+    assert [(doc["version"], doc["storage"]) for doc in remaining] == [(3, "full"), (4, "delta")]
+    print("✅ test_snapshot_chain_kept PASSED")
+
+def test_expired_rss_entries_not_reinserted():
+    """Test une entrée RSS supprimée par la rétention n'est pas réinsérée si le flux la liste encore"""
+    entries = [
+        {"title": f"Article {i}", "link": f"https://example.com/{i}", "guid": str(i),
+         "summary": "python", "published": "", "author": ""}
+        for i in range(2)
+    ]
+    asyncio.run(save_rss_entries(entries[:1], "https://example.com/feed", "Flux"))
+    db.collection.update_many({}, {"$set": {"scraped_at": datetime.now(UTC) - timedelta(days=40)}})
+    set_policy(retention_days=30, archive_expired=False)
+
+    retention.run_retention()
+    # Expiration pure: les entrées RSS restent à la charge du job (pierre tombale)
+    assert "expire_at" in prepare_document({"content": "texte"})
+    assert "expire_at" not in prepare_document({"entry_key": "k", "content": "texte"})
+    saved = asyncio.run(save_rss_entries(entries, "https://example.com/feed", "Flux"))
+
+    assert [doc["guid"] for doc in saved["new_documents"]] == ["1"]
+    assert saved["already_seen"] == 1
+    assert [doc["guid"] for doc in db.collection.find({})] == ["1"]
+    print("✅ test_expired_rss_entries_not_reinserted PASSED")
+
+def test_pure_expiry_sets_expire_at():
+    """Test expiration pure: expire_at fixé à l'écriture pour l'index TTL"""
+    retention.load_policy({"retention_days": 7, "archive_expired": False})
+    scraped_at = datetime.now(UTC)
+
+    stored = prepare_document({"content": "texte", "scraped_at": scraped_at})
+    versioned = prepare_document({"data": [], "version": 1, "scraped_at": scraped_at})
+
+    assert stored["expire_at"] == scraped_at + timedelta(days=7)
+    assert "expire_at" not in versioned
+    print("✅ test_pure_expiry_sets_expire_at PASSED")
+
+def test_search_include_archived():
+    """Test la recherche lit les partitions archivées sur demande"""
+    insert_document(40, content="python archivé")
+    insert_document(41, content="python archivé aussi")
+    insert_document(1, content="python récent")
+    set_policy(retention_days=30)
+    retention.run_retention()
+
+    hot = client.post("/search/", json={"keywords": ["python"]}).json()
+    with_archives = client.post("/search/", json={"keywords": ["python"], "include_archived": True}).json()
+    search = {"keywords": ["python"], "include_archived": True}
+    first_page = client.post("/search/", json={**search, "limit": 2}).json()
+    second_page = client.post("/search/", json={**search, "limit": 2, "cursor": first_page["next_cursor"]}).json()
+    hot_page = client.post("/search/", json={**search, "limit": 1}).json()
+    skipped = client.post("/search/", json={**search, "limit": 1, "skip": 2}).json()
+
+    assert hot["total"] == 1
+    assert with_archives["total"] == 3
+    assert [r["archived"] for r in with_archives["results"]] == [False, True, True]
+    assert with_archives["results"][1]["content"] == "python archivé"
+    # Total identique sur chaque page; les archives ont leur propre curseur
+    assert [first_page["total"], second_page["total"], hot_page["total"], skipped["total"]] == [3, 3, 3, 3]
+    assert [r["content"] for r in first_page["results"]] == ["python récent", "python archivé"]
+    assert [r["content"] for r in second_page["results"]] == ["python archivé aussi"]
+    assert second_page["next_cursor"] is None
+    assert [r["content"] for r in hot_page["results"]] == ["python récent"]
+    assert [r["content"] for r in skipped["results"]] == ["python archivé aussi"]
+    print("✅ test_search_include_archived PASSED")
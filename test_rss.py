@@ -1,9 +1,10 @@
 import pytest
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from dotenv import load_dotenv
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
 from datetime import datetime, UTC
 
 # Charger les variables d'environnement depuis .env
@@ -50,10 +51,12 @@ def test_parse_rss_feed(mock_parse):
     assert "entries" in data
     print("✅ test_parse_rss_feed PASSED")
 
-@patch('routes.rss.scraped_collection.insert_one')
+@patch('routes.rss.tombstones_collection.find')
+@patch('routes.rss.scraped_collection.bulk_write')
 @patch('routes.rss.feedparser.parse')
-def test_scrape_rss_feed(mock_parse, mock_insert):
+def test_scrape_rss_feed(mock_parse, mock_bulk_write, mock_tombstones):
     """Test scraper un flux RSS"""
+    mock_tombstones.return_value.to_list = AsyncMock(return_value=[])
     mock_feed = MagicMock()
     mock_feed.bozo = False
     mock_feed.feed = {
@@ -74,7 +77,7 @@ def test_scrape_rss_feed(mock_parse, mock_insert):
     
     mock_feed.entries = [mock_entry]
     mock_parse.return_value = mock_feed
-    mock_insert.return_value = MagicMock(inserted_id=ObjectId())
+    mock_bulk_write.return_value = MagicMock(upserted_ids={0: ObjectId()})
     
     response = client.post("/rss/scrape-rss", params={
         "rss_url": "https://example.com/feed.xml",
@@ -84,6 +87,8 @@ def test_scrape_rss_feed(mock_parse, mock_insert):
     assert response.status_code == 200
     data = response.json()
     assert data["scraped_entries"] == 1
+    assert data["new_entries"] == 1
+    assert data["already_seen"] == 0
     print("✅ test_scrape_rss_feed PASSED")
 
 @patch('routes.rss.sources_collection.insert_one')
@@ -124,7 +129,7 @@ def test_get_rss_sources(mock_find):
         "source_type": "rss",
         "frequency": 24
     }
-    mock_find.return_value = [mock_source]
+    mock_find.return_value.to_list = AsyncMock(return_value=[mock_source])
     
     response = client.get("/rss/sources")
     
@@ -157,7 +162,8 @@ def test_get_rss_source_latest(mock_find_one, mock_find):
     
     mock_cursor = MagicMock()
     mock_cursor.sort.return_value = mock_cursor
-    mock_cursor.limit.return_value = [mock_doc]
+    mock_cursor.limit.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=[mock_doc])
     mock_find.return_value = mock_cursor
     
     response = client.get(f"/rss/source/{source_id}/latest", params={"limit": 10})
@@ -168,12 +174,14 @@ def test_get_rss_source_latest(mock_find_one, mock_find):
     assert "entries" in data
     print("✅ test_get_rss_source_latest PASSED")
 
+@patch('routes.rss.tombstones_collection.find')
 @patch('routes.rss.sources_collection.update_one')
-@patch('routes.rss.scraped_collection.insert_one')
+@patch('routes.rss.scraped_collection.bulk_write')
 @patch('routes.rss.sources_collection.find_one')
 @patch('routes.rss.feedparser.parse')
-def test_refresh_rss_source(mock_parse, mock_find_one, mock_insert, mock_update):
+def test_refresh_rss_source(mock_parse, mock_find_one, mock_bulk_write, mock_update, mock_tombstones):
     """Test rafraîchir une source RSS"""
+    mock_tombstones.return_value.to_list = AsyncMock(return_value=[])
     source_id = str(ObjectId())
     mock_feed = MagicMock()
     mock_feed.bozo = False
@@ -202,7 +210,7 @@ def test_refresh_rss_source(mock_parse, mock_find_one, mock_insert, mock_update)
         "limit": 20
     }
     
-    mock_insert.return_value = MagicMock(inserted_id=ObjectId())
+    mock_bulk_write.return_value = MagicMock(upserted_ids={0: ObjectId()})
     mock_update.return_value = MagicMock(modified_count=1)
     
     response = client.post(f"/rss/refresh/{source_id}")
@@ -210,4 +218,85 @@ def test_refresh_rss_source(mock_parse, mock_find_one, mock_insert, mock_update)
     assert response.status_code == 200
     data = response.json()
     assert data["entries_scraped"] == 1
+    assert data["new_entries"] == 1
     print("✅ test_refresh_rss_source PASSED")
+
+@patch('routes.rss.tombstones_collection.find')
+@patch('routes.rss.sources_collection.update_one')
+@patch('routes.rss.scraped_collection.bulk_write')
+@patch('routes.rss.sources_collection.find_one')
+@patch('routes.rss.feedparser.parse')
+def test_refresh_rss_source_already_seen(mock_parse, mock_find_one, mock_bulk_write, mock_update, mock_tombstones):
+    """Test rafraîchir une source RSS dont les entrées sont déjà stockées"""
+    mock_tombstones.return_value.to_list = AsyncMock(return_value=[])
+    source_id = str(ObjectId())
+    mock_feed = MagicMock()
+    mock_feed.bozo = False
+    mock_feed.feed = {"title": "Example Feed"}
+    
+    entries = []
+    for i in range(2):
+        mock_entry = MagicMock()
+        mock_entry.get = MagicMock(side_effect=lambda key, default="", i=i: {
+            "title": f"Article {i}",
+            "link": f"https://example.com/article{i}",
+            "id": f"guid-{i}"
+        }.get(key, default))
+        entries.append(mock_entry)
+    
+    mock_feed.entries = entries
+    mock_parse.return_value = mock_feed
+    mock_find_one.return_value = {
+        "_id": ObjectId(source_id),
+        "name": "Example RSS",
+        "url": "https://example.com/feed.xml",
+        "source_type": "rss"
+    }
+    # Aucune entrée n'est nouvelle: aucun upsert
+    mock_bulk_write.return_value = MagicMock(upserted_ids={})
+    
+    response = client.post(f"/rss/refresh/{source_id}")
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["new_entries"] == 0
+    assert data["already_seen"] == 2
+    
+    operations = mock_bulk_write.call_args[0][0]
+    keys = {op.filter["entry_key"] for op in operations}
+    assert len(keys) == 2
+    print("✅ test_refresh_rss_source_already_seen PASSED")
+
+@patch('routes.rss.tombstones_collection.find')
+@patch('routes.rss.scraped_collection.bulk_write')
+@patch('routes.rss.feedparser.parse')
+def test_scrape_rss_feed_concurrent_refresh(mock_parse, mock_bulk_write, mock_tombstones):
+    """Test entrée insérée par un rafraîchissement concurrent (E11000): comptée comme déjà vue"""
+    mock_tombstones.return_value.to_list = AsyncMock(return_value=[])
+    mock_feed = MagicMock()
+    mock_feed.bozo = False
+    mock_feed.feed = {"title": "Example Feed"}
+    entries = []
+    for i in range(2):
+        mock_entry = MagicMock()
+        mock_entry.get = MagicMock(side_effect=lambda key, default="", i=i: {
+            "title": f"Article {i}",
+            "link": f"https://example.com/article{i}",
+            "id": f"guid-{i}"
+        }.get(key, default))
+        entries.append(mock_entry)
+    mock_feed.entries = entries
+    mock_parse.return_value = mock_feed
+    mock_bulk_write.side_effect = BulkWriteError({
+        "writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000 duplicate key error"}],
+        "writeConcernErrors": [], "nInserted": 0, "nUpserted": 1, "nMatched": 0, "nModified": 0, "nRemoved": 0,
+        "upserted": [{"index": 0, "_id": ObjectId()}]
+    })
+
+    response = client.post("/rss/scrape-rss", params={"rss_url": "https://example.com/feed.xml"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["new_entries"] == 1
+    assert data["already_seen"] == 1
+    print("✅ test_scrape_rss_feed_concurrent_refresh PASSED")
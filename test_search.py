@@ -1,6 +1,6 @@
 import pytest
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from dotenv import load_dotenv
 from bson import ObjectId
@@ -9,7 +9,13 @@ from datetime import datetime, UTC
 # Charger les variables d'environnement depuis .env
 load_dotenv()
 
+import db
 from main import app
+from doc_format import prepare_document
+from routes.search import build_keyword_filter
+from search_index import search_index, index_status
+from search_cache import search_cache
+from datetime import timedelta
 
 client = TestClient(app)
 
@@ -45,7 +51,8 @@ def test_search_keywords(mock_find, mock_count):
     mock_cursor = MagicMock()
     mock_cursor.skip.return_value = mock_cursor
     mock_cursor.limit.return_value = mock_cursor
-    mock_cursor.sort.return_value = [mock_doc1, mock_doc2]
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=[mock_doc1, mock_doc2])
     mock_find.return_value = mock_cursor
     
     response = client.post("/search/", json={
@@ -82,7 +89,8 @@ def test_search_exact_match(mock_find, mock_count):
     mock_cursor = MagicMock()
     mock_cursor.skip.return_value = mock_cursor
     mock_cursor.limit.return_value = mock_cursor
-    mock_cursor.sort.return_value = [mock_doc]
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=[mock_doc])
     mock_find.return_value = mock_cursor
     
     response = client.post("/search/", json={
@@ -117,7 +125,8 @@ def test_search_multiple_keywords(mock_find, mock_count):
     mock_cursor = MagicMock()
     mock_cursor.skip.return_value = mock_cursor
     mock_cursor.limit.return_value = mock_cursor
-    mock_cursor.sort.return_value = [mock_doc]
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=[mock_doc])
     mock_find.return_value = mock_cursor
     
     response = client.post("/search/", json={
@@ -134,25 +143,10 @@ def test_search_multiple_keywords(mock_find, mock_count):
     assert len(data["results"][0]["matched_keywords"]) >= 1
     print("✅ test_search_multiple_keywords PASSED")
 
-@patch('routes.search.scraped_collection.find')
-def test_get_top_keywords(mock_find):
+@patch('routes.search.top_terms')
+def test_get_top_keywords(mock_top_terms):
     """Test obtenir les keywords les plus fréquents"""
-    mock_doc1 = {
-        "_id": ObjectId(),
-        "data": [
-            {"value": "python programming tutorial"},
-            {"value": "python is awesome"}
-        ]
-    }
-    
-    mock_doc2 = {
-        "_id": ObjectId(),
-        "data": [
-            {"value": "fastapi web framework"}
-        ]
-    }
-    
-    mock_find.return_value = [mock_doc1, mock_doc2]
+    mock_top_terms.return_value = (5, [("python", 2, 1), ("fastapi", 1, 1)])
     
     response = client.get("/search/keywords")
     
@@ -170,7 +164,8 @@ def test_search_no_results(mock_find, mock_count):
     mock_cursor = MagicMock()
     mock_cursor.skip.return_value = mock_cursor
     mock_cursor.limit.return_value = mock_cursor
-    mock_cursor.sort.return_value = []
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=[])
     mock_find.return_value = mock_cursor
     
     response = client.post("/search/", json={
@@ -186,3 +181,112 @@ def test_search_no_results(mock_find, mock_count):
     assert data["total"] == 0
     assert len(data["results"]) == 0
     print("✅ test_search_no_results PASSED")
+
+@patch('routes.search.scraped_collection.count_documents')
+@patch('routes.search.scraped_collection.find')
+def test_search_precomputed_content_text(mock_find, mock_count):
+    """Test recherche sur le texte précalculé (projection sans données brutes)"""
+    mock_count.return_value = 1
+    
+    mock_doc = {
+        "_id": ObjectId(),
+        "url": "https://example.com",
+        "source_id": None,
+        "content_text": "Precomputed Python content",
+        "scraped_at": datetime.now(UTC)
+    }
+    
+    mock_cursor = MagicMock()
+    mock_cursor.skip.return_value = mock_cursor
+    mock_cursor.limit.return_value = mock_cursor
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=[mock_doc])
+    mock_find.return_value = mock_cursor
+    
+    response = client.post("/search/", json={"keywords": ["python"]})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["results"]) == 1
+    assert data["results"][0]["content"] == "Precomputed Python content"
+    assert "data" not in mock_find.call_args[0][1]
+    print("✅ test_search_precomputed_content_text PASSED")
+
+# ==================== Test Correspondance côté base ====================
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    """Recherche sur le moteur en mémoire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    yield
+    db.close()
+
+def test_search_matches_in_database(memory_backend):
+    """Test total et pages ne portent que sur les documents correspondants"""
+    now = datetime.now(UTC)
+    db.collection.insert_many([
+        prepare_document({
+            "url": f"https://example.com/{i}",
+            "content": "Rare Keyword inside" if i % 10 == 0 else "common filler text",
+            "scraped_at": now - timedelta(minutes=i)
+        })
+        for i in range(40)
+    ])
+
+    first = client.post("/search/", json={"keywords": ["rare keyword"], "limit": 3}).json()
+    second = client.post("/search/", json={"keywords": ["rare keyword"], "limit": 3, "cursor": first["next_cursor"]}).json()
+    prefix = client.post("/search/", json={"keywords": ["keyw"]}).json()
+    case = client.post("/search/", json={"keywords": ["rare keyword"], "case_sensitive": True}).json()
+
+    assert first["total"] == 4
+    assert [r["url"] for r in first["results"]] == [f"https://example.com/{i}" for i in (0, 10, 20)]
+    assert [r["url"] for r in second["results"]] == ["https://example.com/30"]
+    assert second["next_cursor"] is None
+    assert prefix["total"] == 4
+    assert case["total"] == 0
+    print("✅ test_search_matches_in_database PASSED")
+
+
+def test_search_substring_and_whole_word(memory_backend):
+    """Test mot-clé à l'intérieur d'un mot plus long: trouvé par défaut, exclu en mots entiers"""
+    now = datetime.now(UTC)
+    db.collection.insert_many([
+        prepare_document({"url": "https://example.com/corporate", "content": "Corporate bonds rally", "scraped_at": now}),
+        prepare_document({"url": "https://example.com/rate", "content": "The rate was cut", "scraped_at": now - timedelta(minutes=1)})
+    ])
+
+    substring = client.post("/search/", json={"keywords": ["rate"]}).json()
+    whole = client.post("/search/", json={"keywords": ["rate"], "exact_match": True}).json()
+
+    assert substring["total"] == 2
+    assert [r["url"] for r in substring["results"]] == ["https://example.com/corporate", "https://example.com/rate"]
+    assert substring["results"][0]["highlights"] == [[5, 9]]
+    assert whole["total"] == 1
+    assert [r["url"] for r in whole["results"]] == ["https://example.com/rate"]
+    assert whole["results"][0]["positions"] == {"rate": [4]}
+    print("✅ test_search_substring_and_whole_word PASSED")
+
+def test_substring_candidates_from_index_vocabulary(memory_backend, monkeypatch):
+    """Test sous-chaîne: candidats lus par terms (vocabulaire de l'index), regex en vérification"""
+    monkeypatch.setitem(index_status, "state", "ready")
+    search_index.clear()
+    search_cache.clear()
+    now = datetime.now(UTC)
+    db.collection.insert_many([
+        prepare_document({"url": "https://example.com/corporate", "content": "Corporate bonds rally", "scraped_at": now}),
+        prepare_document({"url": "https://example.com/rate", "content": "The rate was cut", "scraped_at": now - timedelta(minutes=1)}),
+        prepare_document({"url": "https://example.com/other", "content": "Nothing relevant", "scraped_at": now})
+    ])
+
+    data = client.post("/search/", json={"keywords": ["rate"]}).json()
+    keyword_filter = build_keyword_filter(["rate"])
+
+    assert [r["url"] for r in data["results"]] == ["https://example.com/corporate", "https://example.com/rate"]
+    assert keyword_filter["$and"][0] == {"$or": [{"terms": {"$in": ["corporate", "rate"]}}, {"terms": {"$exists": False}}]}
+    # Trop court pour un terme indexé: regex seule
+    assert build_keyword_filter(["a"]) == {"content_text": {"$regex": "a", "$options": "i"}}
+    search_index.clear()
+    search_cache.clear()
+    print("✅ test_substring_candidates_from_index_vocabulary PASSED")
@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from bson import ObjectId
+from datetime import datetime, UTC
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+from main import app
+from search_cache import SearchCache, search_cache
+from routes.search import SearchQuery
+from snapshots import store_snapshot
+from doc_format import prepare_document
+from search_index import search_index, index_status
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    """Cache de recherche sur le moteur en mémoire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    search_cache.clear()
+    search_index.clear()
+    yield
+    search_cache.clear()
+    search_index.clear()
+    db.close()
+
+def scrape(source_id: ObjectId, text: str):
+    store_snapshot({"source_id": source_id, "data": [{"index": 1, "value": text}], "scraped_at": datetime.now(UTC)})
+
+# ==================== Test Cache de recherche ====================
+
+def test_cache_hits_and_write_invalidation():
+    """Test réponses servies du cache, invalidées par les écritures concernées seulement"""
+    first, second = ObjectId(), ObjectId()
+    scrape(first, "python crawler")
+
+    scoped = {"keywords": ["python"], "source_id": str(first)}
+    assert client.post("/search/", json={"keywords": ["python", "crawler"]}).json()["total"] == 1
+    # Même requête normalisée (ordre des mots-clés), requête renvoyée telle quelle
+    cached = client.post("/search/", json={"keywords": ["crawler", "python", "crawler"]}).json()
+    assert cached["query"]["keywords"] == ["crawler", "python", "crawler"]
+    client.post("/search/", json=scoped)
+
+    # Écriture d'une autre source: la requête globale est recalculée, pas celle de first
+    scrape(second, "python scheduler")
+    assert client.post("/search/", json={"keywords": ["python", "crawler"]}).json()["total"] == 2
+    assert client.post("/search/", json=scoped).json()["total"] == 1
+
+    metrics = client.get("/search/cache").json()
+    assert metrics["hits"] == 2
+    assert metrics["stale"] == 1
+    assert metrics["hit_rate"] == 0.4
+    print("✅ test_cache_hits_and_write_invalidation PASSED")
+
+def test_cache_lru_eviction_and_ttl():
+    """Test taille bornée (moins récemment utilisée évincée) et âge maximal"""
+    cache = SearchCache(max_entries=2, ttl=60)
+    keys = [cache.key(SearchQuery(keywords=[word])) for word in ("a", "b", "c")]
+    generation = cache.generation()
+    cache.put(keys[0], generation, "A")
+    cache.put(keys[1], generation, "B")
+    cache.get(keys[0], generation)
+    cache.put(keys[2], generation, "C")
+
+    assert cache.get(keys[1], generation) is None
+    assert cache.get(keys[0], generation) == "A"
+    assert cache.metrics()["evictions"] == 1
+
+    cache.ttl = 0
+    assert cache.get(keys[2], generation) is None
+    print("✅ test_cache_lru_eviction_and_ttl PASSED")
+
+def test_index_searches_cached_once_index_ready(monkeypatch):
+    """Test recherches par l'index: pas de cache pendant le chargement, invalidées par le rattrapage"""
+    scrape(ObjectId(), "python crawler")
+    ranked = {"keywords": ["python"], "ranked": True}
+
+    monkeypatch.setitem(index_status, "state", "loading")
+    client.post("/search/", json=ranked)
+    client.post("/search/", json=ranked)
+    assert client.get("/search/cache").json()["hits"] == 0
+
+    monkeypatch.setitem(index_status, "state", "ready")
+    client.post("/search/", json=ranked)
+    assert client.post("/search/", json=ranked).json()["total"] == 1
+    assert client.get("/search/cache").json()["hits"] == 1
+
+    # Document écrit par un autre processus (sans hook): trouvé par le rattrapage
+    db.collection.insert_one(prepare_document({"content": "python scheduler", "scraped_at": datetime.now(UTC)}))
+    assert client.post("/search/", json=ranked).json()["total"] == 2
+    assert client.get("/search/cache").json()["hits"] == 1
+    print("✅ test_index_searches_cached_once_index_ready PASSED")
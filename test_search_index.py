@@ -0,0 +1,299 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from bson import ObjectId
+from datetime import datetime, UTC, timedelta
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+from main import app
+from doc_format import prepare_document, tokenize
+from boolean_query import parse_query
+import search_index as search_index_module
+from ingest import documents_inserted
+from search_index import InvertedIndex, search_index, catch_up
+import semantic_index as semantic_index_module
+from semantic_index import SemanticIndex, semantic_index, catch_up_semantic
+from snapshots import store_snapshot
+from search_cache import search_cache
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    """Index de recherche sur le moteur en mémoire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    search_index.clear()
+    semantic_index.clear()
+    search_cache.clear()
+    yield
+    search_index.clear()
+    semantic_index.clear()
+    search_cache.clear()
+    db.close()
+
+def insert(text: str, **fields) -> ObjectId:
+    document = {
+        "url": "https://example.com",
+        "data": [{"index": 1, "value": text}],
+        "source_id": None,
+        "scraped_at": datetime.now(UTC),
+        **fields
+    }
+    return db.collection.insert_one(prepare_document(document)).inserted_id
+
+# ==================== Test Index inversé ====================
+
+def test_ranked_search_orders_by_bm25():
+    """Test la recherche classée trie par pertinence et indexe les nouvelles écritures"""
+    dense = insert("python python python tutorial")
+    sparse = insert("python among many other unrelated words in a long document about cooking")
+    insert("nothing relevant here")
+
+    response = client.post("/search/", json={"keywords": ["python"], "ranked": True})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["total"] == 2
+    assert [r["id"] for r in data["results"]] == [str(dense), str(sparse)]
+    assert data["results"][0]["score"] > data["results"][1]["score"]
+
+    # Écriture notifiée par le hook d'ingestion: indexée sans rattrapage
+    source_id = ObjectId()
+    store_snapshot({
+        "source_id": source_id,
+        "data": [{"index": 1, "value": "python python python python"}],
+        "scraped_at": datetime.now(UTC)
+    })
+    assert len(search_index) == 4
+    data = client.post(
+        "/search/", json={"keywords": ["python"], "ranked": True, "source_id": str(source_id)}
+    ).json()
+    assert data["total"] == 1
+    assert data["results"][0]["source_id"] == str(source_id)
+    print("✅ test_ranked_search_orders_by_bm25 PASSED")
+
+def test_index_remove_and_compact():
+    """Test suppressions, filtre par date et compaction des postings"""
+    index = InvertedIndex()
+    now = datetime.now(UTC)
+    ids = [ObjectId() for _ in range(4)]
+    for i, doc_id in enumerate(ids):
+        index.add(doc_id, tokenize(f"alpha beta {'gamma ' * i}"), now - timedelta(days=i))
+
+    assert index.search(["gamma"], 10)[0] == 3
+    assert index.search(["alpha"], 10, start=now - timedelta(days=1, hours=1))[0] == 2
+
+    index.remove(ids[3])
+    assert [doc_id for _, doc_id in index.search(["gamma"], 1)[1]] == [ids[2]]
+    index.remove(ids[2])  # au-delà de COMPACT_RATIO: postings réécrits
+    assert index.deleted_count == 0
+    assert len(index.doc_ids) == 2
+    assert index.search(["gamma"], 10)[0] == 1
+    assert index.query(parse_query('"beta gamma"'), 10)[0] == 1
+    print("✅ test_index_remove_and_compact PASSED")
+
+def test_snapshot_roundtrip(tmp_path):
+    """Test l'instantané disque restitue le même classement"""
+    for text in ["web crawler", "crawler crawler scheduler", "scheduler"]:
+        insert(text)
+    client.post("/search/", json={"keywords": ["crawler"], "ranked": True})
+    path = str(tmp_path / "index.snapshot")
+    search_index.save(path)
+
+    restored = InvertedIndex()
+    assert restored.load(path)
+    assert restored.search(["crawler", "scheduler"], 3) == search_index.search(["crawler", "scheduler"], 3)
+    assert restored.last_id == search_index.last_id
+    assert not InvertedIndex().load(str(tmp_path / "missing.snapshot"))
+    print("✅ test_snapshot_roundtrip PASSED")
+
+def test_catch_up_with_concurrent_ingest():
+    """Test une écriture pendant le rattrapage ne fait pas sauter les documents non encore lus"""
+    existing = [insert(f"python document {i}") for i in range(25)]
+    live = []
+    fill_text_fields = search_index_module.fill_text_fields
+
+    def fill_and_ingest(batch, fields):
+        fill_text_fields(batch, fields)
+        if not live:
+            # Écriture d'une route d'ingestion pendant le premier lot
+            stored = prepare_document({"url": "https://example.com", "content": "python live", "scraped_at": datetime.now(UTC)})
+            stored["_id"] = db.collection.insert_one(stored).inserted_id
+            documents_inserted([stored])
+            live.append(stored["_id"])
+
+    with patch("search_index.fill_text_fields", side_effect=fill_and_ingest):
+        catch_up(batch_size=10)
+
+    assert len(search_index) == 26
+    assert all(doc_id in search_index.numbers for doc_id in existing)
+    assert search_index.last_id == live[0]
+    print("✅ test_catch_up_with_concurrent_ingest PASSED")
+
+def test_semantic_catch_up_with_concurrent_ingest():
+    """Test même garantie pour le rattrapage de l'index sémantique"""
+    existing = [insert(f"python document {i}") for i in range(25)]
+    live = []
+    fill_text_fields = semantic_index_module.fill_text_fields
+
+    def fill_and_ingest(batch, fields):
+        fill_text_fields(batch, fields)
+        if not live:
+            stored = prepare_document({"url": "https://example.com", "content": "python live", "scraped_at": datetime.now(UTC)})
+            stored["_id"] = db.collection.insert_one(stored).inserted_id
+            documents_inserted([stored])
+            live.append(stored["_id"])
+
+    with patch("semantic_index.fill_text_fields", side_effect=fill_and_ingest):
+        catch_up_semantic(batch_size=10)
+
+    assert len(semantic_index) == 26
+    assert all(doc_id in semantic_index.numbers for doc_id in existing)
+    assert semantic_index.last_id == live[0]
+    print("✅ test_semantic_catch_up_with_concurrent_ingest PASSED")
+
+def test_boolean_query_parsing():
+    """Test priorités NOT > NEAR > AND > OR, ET implicite et mots composés"""
+    assert parse_query('taux OR "interest rate" NOT bank') == (
+        "or", [("term", "taux"), ("and", [("phrase", ["interest", "rate"]), ("not", ("term", "bank"))])]
+    )
+    assert parse_query("(a1 OR b1) c1 NEAR/2 d1") == (
+        "and", [("or", [("term", "a1"), ("term", "b1")]), ("near", ("term", "c1"), ("term", "d1"), 2)]
+    )
+    assert parse_query("machine-learning") == ("phrase", ["machine", "learning"])
+    for invalid in ['"open', "(a1 OR b1", "a1 OR", "(a1 OR b1) NEAR/3 c1", ""]:
+        with pytest.raises(ValueError):
+            parse_query(invalid)
+    print("✅ test_boolean_query_parsing PASSED")
+
+def test_expression_search():
+    """Test phrases, proximité et opérateurs booléens sur l'index positionnel"""
+    now = datetime.now(UTC)
+    phrase = insert("The central bank raised the interest rate again", scraped_at=now - timedelta(hours=1))
+    near = insert("Rate of interest and a higher rate", scraped_at=now - timedelta(hours=2))
+    far = insert("Interest in the housing market grew while the mortgage rate fell", scraped_at=now - timedelta(hours=3))
+    other = insert("Bank holidays announced", scraped_at=now)
+
+    def ids(expression, **options):
+        data = client.post("/search/", json={"expression": expression, **options}).json()
+        return [r["id"] for r in data["results"]]
+
+    assert ids('"interest rate"') == [str(phrase)]
+    assert ids("interest NEAR/2 rate") == [str(phrase), str(near)]
+    assert ids("interest AND rate NOT bank") == [str(near), str(far)]
+    assert ids("bank OR mortgage") == [str(other), str(phrase), str(far)]
+    assert ids("NOT interest") == [str(other)]
+    ranked = client.post("/search/", json={"expression": "rate", "ranked": True}).json()
+    assert ranked["results"][0]["id"] == str(near)
+    assert ranked["results"][0]["matched_keywords"] == ["rate"]
+    assert client.post("/search/", json={"expression": '"unterminated'}).status_code == 400
+    print("✅ test_expression_search PASSED")
+
+def test_expression_highlights():
+    """Test surlignages depuis les postings: phrase d'un bloc, ni sous-chaînes ni termes exclus"""
+    insert("Corporate lenders cut the interest rate, the interest on rate cards stays")
+
+    def first(expression):
+        return client.post("/search/", json={"expression": expression}).json()["results"][0]
+
+    phrase = first('"interest rate"')
+    assert phrase["highlights"] == [[26, 39]]
+    assert phrase["positions"] == {"interest rate": [26]}
+    assert phrase["matched_keywords"] == ["interest rate"]
+    assert first("cards OR NOT interest")["highlights"] == [[62, 67]]
+    assert first("corporate NEAR/1 lenders")["highlights"] == [[0, 17]]
+    print("✅ test_expression_highlights PASSED")
+
+def test_fuzzy_search():
+    """Test variantes proches trouvées par trigrammes, sans parcourir les documents"""
+    now = datetime.now(UTC)
+    ocr = insert("Le règlernent intérieur du conseil", scraped_at=now - timedelta(hours=1))
+    exact = insert("Nouveau règlement adopté", scraped_at=now)
+    insert("Un document sans rapport", scraped_at=now - timedelta(hours=2))
+
+    data = client.post("/search/", json={"keywords": ["règlement"], "fuzzy": True}).json()
+    strict = client.post("/search/", json={"keywords": ["règlement"], "fuzzy": True, "max_edits": 0}).json()
+
+    assert [r["id"] for r in data["results"]] == [str(exact), str(ocr)]
+    assert data["results"][1]["matched_keywords"] == ["règlernent"]
+    assert strict["total"] == 1
+    assert search_index.expand("conseil") == ["conseil"]
+    assert search_index.expand("cnoseil", max_edits=2) == ["conseil"]
+    print("✅ test_fuzzy_search PASSED")
+
+def test_index_highlights_whole_words():
+    """Test surlignages des recherches tolérante et classée sur les mots indexés, pas dans les mots plus longs"""
+    insert("Corporate rate decisions")
+
+    for options in ({"fuzzy": True}, {"ranked": True}):
+        result = client.post("/search/", json={"keywords": ["rate"], **options}).json()["results"][0]
+        assert result["highlights"] == [[10, 14]]
+        assert result["positions"] == {"rate": [10]}
+    print("✅ test_index_highlights_whole_words PASSED")
+
+def test_search_facets():
+    """Test facettes en une agrégation $facet et depuis l'index, mêmes comptes"""
+    day = datetime(2024, 3, 6, 12, tzinfo=UTC)  # mercredi
+    rss, social = ObjectId(), ObjectId()
+    insert("rate cut expected", scraped_at=day, source_id=rss, source_type="rss", content_type="rss")
+    insert("rate hike", scraped_at=day - timedelta(hours=3), source_id=rss, source_type="rss", content_type="rss")
+    insert("rate news", scraped_at=day - timedelta(days=3), source_id=social, source_type="social_media")
+    insert("unrelated", scraped_at=day, source_id=social, source_type="social_media")
+
+    request = {"keywords": ["rate"], "limit": 1, "facets": ["source_type", "content_type", "scraped_at"]}
+    data = client.post("/search/", json=request).json()
+    ranked = client.post("/search/", json={**request, "ranked": True}).json()
+
+    assert data["total"] == 3 and len(data["results"]) == 1
+    assert data["facets"]["source_type"] == [{"value": "rss", "count": 2}, {"value": "social_media", "count": 1}]
+    assert data["facets"]["content_type"] == [{"value": "rss", "count": 2}, {"value": None, "count": 1}]
+    assert data["facets"]["scraped_at"] == [
+        {"value": "2024-03-03T00:00:00+00:00", "count": 1},
+        {"value": "2024-03-06T00:00:00+00:00", "count": 2}
+    ]
+    assert ranked["facets"] == data["facets"]
+
+    weekly = client.post("/search/", json={**request, "facets": ["scraped_at"], "facet_interval": "week"}).json()
+    assert weekly["facets"]["scraped_at"] == [
+        {"value": "2024-02-26T00:00:00+00:00", "count": 1},
+        {"value": "2024-03-04T00:00:00+00:00", "count": 2}
+    ]
+    assert client.post("/search/", json={"keywords": ["rate"]}).json()["facets"] is None
+    assert client.post("/search/", json={"keywords": ["rate"], "facets": ["url"]}).status_code == 400
+    print("✅ test_search_facets PASSED")
+
+def test_semantic_search(tmp_path):
+    """Test recherche sémantique par lot, index approché et matrice projetée sur disque"""
+    rates = insert("The central bank raised interest rates to curb inflation")
+    football = insert("The football team won the championship final")
+    insert("Recipe for a chocolate cake with butter")
+
+    data = client.post("/search/semantic", json={"queries": ["rising interest rate", "football championship"], "limit": 2}).json()
+    assert [match["results"][0]["id"] for match in data["results"]] == [str(rates), str(football)]
+    assert data["results"][0]["results"][0]["score"] > 0
+    assert data["approximate"] is False
+    approximate = client.post("/search/semantic", json={"queries": ["interest rate"], "limit": 1, "approximate": True}).json()
+    assert approximate["approximate"] is True
+    assert approximate["results"][0]["results"][0]["id"] == str(rates)
+    assert client.post("/search/semantic", json={"queries": []}).status_code == 400
+
+    # Matrice agrandie dans le fichier projeté, relue après réouverture
+    index = SemanticIndex(dim=64)
+    assert not index.open(str(tmp_path / "semantic"))
+    ids = [ObjectId() for _ in range(1500)]
+    for i, doc_id in enumerate(ids):
+        index.add(doc_id, f"document number {i} topic{i % 7}")
+    index.remove(ids[0])
+    index.save()
+    restored = SemanticIndex(dim=64)
+    assert restored.open(str(tmp_path / "semantic"))
+    query = restored.embed_queries(["document topic3"])
+    assert len(restored) == 1499
+    assert restored.search(query, 5) == index.search(query, 5)
+    print("✅ test_semantic_search PASSED")
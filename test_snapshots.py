@@ -0,0 +1,124 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from dotenv import load_dotenv
+from bson import ObjectId
+from datetime import datetime, UTC
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+from pymongo.errors import DuplicateKeyError
+from snapshots import compute_delta, apply_delta, hash_item, hash_snapshot, store_snapshot
+
+def make_data(values):
+    return [{"index": i + 1, "value": value} for i, value in enumerate(values)]
+
+# ==================== Test Snapshots ====================
+
+def test_delta_roundtrip():
+    """Test reconstruire une version à partir d'un delta"""
+    previous = make_data(["a", "b", "c", "b"])
+    current = make_data(["a", "x", "c", "y"])
+
+    delta = compute_delta([hash_item(v["value"]) for v in previous], current)
+
+    assert [item["value"] for item in delta["added"]] == ["x", "y"]
+    assert len(delta["removed"]) == 2
+    assert apply_delta(previous, delta["added"], delta["removed"], len(current)) == current
+    print("✅ test_delta_roundtrip PASSED")
+
+def test_delta_duplicates_roundtrip():
+    """Test delta avec éléments dupliqués"""
+    previous = make_data(["a", "b", "a"])
+    current = make_data(["a", "b", "z"])
+
+    delta = compute_delta([hash_item(v["value"]) for v in previous], current)
+
+    assert apply_delta(previous, delta["added"], delta["removed"], len(current)) == current
+    print("✅ test_delta_duplicates_roundtrip PASSED")
+
+def test_delta_reordered_requires_full_snapshot():
+    """Test un changement d'ordre impose un snapshot complet"""
+    previous = make_data(["a", "b", "c"])
+    current = make_data(["c", "b", "a"])
+
+    assert compute_delta([hash_item(v["value"]) for v in previous], current) is None
+    print("✅ test_delta_reordered_requires_full_snapshot PASSED")
+
+@patch('snapshots.scraped_collection')
+def test_store_snapshot_unchanged(mock_collection):
+    """Test un snapshot identique ne crée pas de nouveau document"""
+    source_id = ObjectId()
+    data = make_data(["a", "b"])
+    previous_id = ObjectId()
+    mock_collection.find_one.return_value = {
+        "_id": previous_id,
+        "version": 3,
+        "keyframe_version": 1,
+        "snapshot_hash": hash_snapshot([hash_item("a"), hash_item("b")]),
+        "item_hashes": [hash_item("a"), hash_item("b")]
+    }
+
+    result = store_snapshot({"source_id": source_id, "data": data, "scraped_at": datetime.now(UTC)})
+
+    assert result["status"] == "unchanged"
+    assert result["document_id"] == previous_id
+    mock_collection.insert_one.assert_not_called()
+    mock_collection.update_one.assert_called_once()
+    print("✅ test_store_snapshot_unchanged PASSED")
+
+@patch('snapshots.scraped_collection')
+def test_store_snapshot_changed_stores_delta(mock_collection):
+    """Test un snapshot modifié ne stocke que le delta"""
+    source_id = ObjectId()
+    previous_values = [f"item {i}" for i in range(10)]
+    mock_collection.find_one.return_value = {
+        "_id": ObjectId(),
+        "version": 1,
+        "keyframe_version": 1,
+        "snapshot_hash": "old",
+        "item_hashes": [hash_item(v) for v in previous_values]
+    }
+    mock_collection.insert_one.return_value = MagicMock(inserted_id=ObjectId())
+
+    result = store_snapshot({
+        "source_id": source_id,
+        "data": make_data(previous_values[:9] + ["new item"]),
+        "scraped_at": datetime.now(UTC)
+    })
+
+    assert result["status"] == "changed"
+    assert result["version"] == 2
+    stored = mock_collection.insert_one.call_args[0][0]
+    assert stored["storage"] == "delta"
+    assert stored["data"] == ["new item"]
+    assert stored["data_index"] == [10]
+    assert stored["removed"] == [hash_item("item 9")]
+    # Champs texte de la version complète, pas du seul élément ajouté
+    assert stored["content_text"] == " ".join(previous_values[:9] + ["new item"])
+    print("✅ test_store_snapshot_changed_stores_delta PASSED")
+
+@patch('snapshots.scraped_collection')
+def test_store_snapshot_retries_taken_version(mock_collection):
+    """Test un scrape concurrent ayant pris le numéro de version: nouvelle tentative avec le suivant"""
+    def version(number):
+        return {
+            "_id": ObjectId(),
+            "version": number,
+            "keyframe_version": number,
+            "snapshot_hash": f"hash {number}",
+            "item_hashes": [hash_item(f"v{number}")]
+        }
+    mock_collection.find_one.side_effect = [version(1), version(2)]
+    inserted_id = ObjectId()
+    mock_collection.insert_one.side_effect = [
+        DuplicateKeyError("E11000 duplicate key error"),
+        MagicMock(inserted_id=inserted_id)
+    ]
+
+    result = store_snapshot({"source_id": ObjectId(), "data": make_data(["new"]), "scraped_at": datetime.now(UTC)})
+
+    assert result["version"] == 3
+    assert result["document_id"] == inserted_id
+    assert [call.args[0]["version"] for call in mock_collection.insert_one.call_args_list] == [2, 3]
+    print("✅ test_store_snapshot_retries_taken_version PASSED")
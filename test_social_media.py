@@ -1,6 +1,6 @@
 import pytest
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from dotenv import load_dotenv
 from bson import ObjectId
@@ -60,7 +60,7 @@ def test_get_social_media_sources(mock_find):
         "last_scraped": None,
         "scrape_count": 0
     }
-    mock_find.return_value = [mock_source]
+    mock_find.return_value.to_list = AsyncMock(return_value=[mock_source])
     
     response = client.get("/social/sources")
     
@@ -73,7 +73,7 @@ def test_get_social_media_sources(mock_find):
 @patch('routes.social_media.sources_collection.find')
 def test_get_social_media_sources_by_platform(mock_find):
     """Test obtenir les sources filtrées par plateforme"""
-    mock_find.return_value = []
+    mock_find.return_value.to_list = AsyncMock(return_value=[])
     
     response = client.get("/social/sources", params={"platform": "instagram"})
     
@@ -175,7 +175,8 @@ def test_get_social_media_posts(mock_find_one, mock_find):
     
     mock_cursor = MagicMock()
     mock_cursor.sort.return_value = mock_cursor
-    mock_cursor.limit.return_value = [mock_post]
+    mock_cursor.limit.return_value = mock_cursor
+    mock_cursor.to_list = AsyncMock(return_value=[mock_post])
     mock_find.return_value = mock_cursor
     
     response = client.get(f"/social/source/{source_id}/posts")
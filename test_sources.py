@@ -1,6 +1,6 @@
 import pytest
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from dotenv import load_dotenv
 from bson import ObjectId
@@ -8,6 +8,7 @@ from bson import ObjectId
 # Charger les variables d'environnement depuis .env
 load_dotenv()
 
+import db
 from main import app
 
 client = TestClient(app)
@@ -46,7 +47,7 @@ def test_list_sources(mock_find):
         "active": True,
         "created_at": "2026-01-15T00:00:00Z"
     }
-    mock_find.return_value = [mock_source]
+    mock_find.return_value.to_list = AsyncMock(return_value=[mock_source])
     
     response = client.get("/sources/")
     
@@ -132,6 +133,77 @@ def test_toggle_source(mock_update_one, mock_find_one):
     assert response.status_code == 200
     print("✅ test_toggle_source PASSED")
 
+# ==================== Test Import / export en masse ====================
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    """Sources sur le moteur en mémoire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    yield
+    db.close()
+
+OPML_IMPORT = """<?xml version="1.0"?>
+<opml version="2.0"><body>
+  <outline text="Tech">
+    <outline text="Feed A" xmlUrl="https://a.example.com/feed.xml"/>
+    <outline text="Feed B" xmlUrl="https://b.example.com/feed.xml"/>
+    <outline text="Feed A bis" xmlUrl="https://a.example.com/feed.xml"/>
+    <outline text="Broken" xmlUrl="https://broken.example.com/feed.xml"/>
+  </outline>
+</body></opml>"""
+
+def fake_parse_rss_feed(url, limit=20):
+    if "broken" in url:
+        return {"success": False, "error": "not a feed", "data": []}
+    return {"success": True, "feed_info": {"description": f"Flux {url}"}, "entries": []}
+
+@patch('routes.sources.schedule_sources')
+@patch('routes.sources.parse_rss_feed', side_effect=fake_parse_rss_feed)
+def test_import_opml(mock_parse, mock_schedule, memory_backend):
+    """Test import OPML: validation des flux, doublons, écriture et planification en masse"""
+    mock_schedule.return_value = {"success": True, "scheduled_count": 2, "errors": []}
+
+    response = client.post("/sources/import?format=opml", content=OPML_IMPORT)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [row["status"] for row in data["rows"]] == ["created", "created", "duplicate", "invalid"]
+    assert data["created"] == 2 and data["scheduled"] == 2
+    assert mock_parse.call_count == 3
+    assert [s["url"] for s in mock_schedule.call_args.args[0]] == [
+        "https://a.example.com/feed.xml", "https://b.example.com/feed.xml"
+    ]
+    stored = db.sources_collection.find_one({"name": "Feed A"})
+    assert stored["source_type"] == "rss" and stored["limit"] == 20
+    assert stored["description"] == "Flux https://a.example.com/feed.xml"
+
+    again = client.post("/sources/import?format=opml&validate=false&schedule=false", content=OPML_IMPORT).json()
+    assert again["created"] == 1 and again["duplicates"] == 3
+    print("✅ test_import_opml PASSED")
+
+def test_import_csv_report_and_export(memory_backend):
+    """Test import CSV avec lignes invalides, puis export réimportable"""
+    body = "name,url,source_type,frequency,active\n" \
+           "Site,https://example.com,website,12,true\n" \
+           ",https://no-name.example.com,website,,\n" \
+           "Mauvaise fréquence,https://bad.example.com,website,souvent,\n"
+
+    data = client.post("/sources/import?format=csv&schedule=false", content=body.encode("utf-8")).json()
+
+    assert [row["status"] for row in data["rows"]] == ["created", "invalid", "invalid"]
+    assert "frequency" in data["rows"][2]["error"]
+
+    for format in ("csv", "json", "opml"):
+        exported = client.get(f"/sources/export?format={format}")
+        assert exported.status_code == 200
+        assert "https://example.com" in exported.text
+    reimport = client.post("/sources/import?format=json&schedule=false", content=client.get("/sources/export").content)
+    assert reimport.json()["duplicates"] == 1
+    assert client.post("/sources/import?format=xml", content="").status_code == 400
+    print("✅ test_import_csv_report_and_export PASSED")
+
 # ==================== Test Scrape existant ====================
 
 @patch('routes.scrape.get_config')
@@ -0,0 +1,65 @@
+import pytest
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from datetime import datetime, UTC
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+import db
+import term_stats
+from main import app
+from doc_format import prepare_document
+from ingest import documents_inserted, documents_deleted
+from term_stats import keyword_counts, rebuild_term_stats
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    """Fréquences des mots-clés sur le moteur en mémoire"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    term_stats._pending.clear()
+    yield
+    term_stats._pending.clear()
+    db.close()
+
+def insert(text: str) -> dict:
+    stored = prepare_document({"url": "https://example.com", "content": text, "scraped_at": datetime.now(UTC)})
+    stored["_id"] = db.collection.insert_one(stored).inserted_id
+    return stored
+
+# ==================== Test Fréquences des mots-clés ====================
+
+def test_keywords_counted_at_ingest():
+    """Test mots accentués conservés, mots vides et nombres écartés, suppressions décomptées"""
+    first = insert("Les élections régionales et les élections municipales 2026")
+    second = insert("élections à Besançon")
+    documents_inserted([first, second])
+
+    data = client.get("/search/keywords", params={"limit": 2}).json()
+
+    assert data["top_keywords"][0] == {"keyword": "élections", "count": 3, "documents": 2}
+    assert data["total_unique_keywords"] == 4  # élections, régionales, municipales, besançon
+    assert keyword_counts({"les": 2, "2026": 1, "été": 1, "café": 1}) == {"café": 1}
+
+    db.collection.delete_one({"_id": first["_id"]})
+    documents_deleted([first])
+    data = client.get("/search/keywords").json()
+
+    assert {"keyword": "élections", "count": 1, "documents": 1} in data["top_keywords"]
+    assert data["total_unique_keywords"] == 2
+    print("✅ test_keywords_counted_at_ingest PASSED")
+
+def test_rebuild_from_existing_documents():
+    """Test recalcul complet de term_stats depuis scraped_data"""
+    for text in ["crawler python", "python scheduler", "python"]:
+        insert(text)
+
+    assert rebuild_term_stats(batch_size=2) == 3
+    top = client.get("/search/keywords", params={"limit": 1}).json()["top_keywords"]
+
+    assert top == [{"keyword": "python", "count": 3, "documents": 3}]
+    print("✅ test_rebuild_from_existing_documents PASSED")
@@ -0,0 +1,101 @@
+import pytest
+from fastapi.testclient import TestClient
+from dotenv import load_dotenv
+from datetime import datetime, UTC, timedelta
+from unittest.mock import patch
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+from main import app
+from ingest import documents_inserted
+from doc_format import fill_text_fields
+from trending import SpaceSaving, TrendingTerms, trending_terms, warm_trending
+import db
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_trending():
+    trending_terms.clear()
+    yield
+    trending_terms.clear()
+
+# ==================== Test Termes tendance ====================
+
+def test_space_saving_keeps_heavy_hitters():
+    """Test mémoire bornée: les termes fréquents restent suivis, erreur bornée"""
+    summary = SpaceSaving(capacity=10)
+    for i in range(1000):
+        summary.add("python", 3)
+        summary.add(f"rare{i}")
+
+    assert len(summary) == 10
+    assert summary.counts["python"] == 3000
+    assert summary.errors["python"] <= 1000 // 10
+    print("✅ test_space_saving_keeps_heavy_hitters PASSED")
+
+def test_windows_merge_hourly_buckets():
+    """Test chaque fenêtre additionne ses heures, avec le compte de la fenêtre précédente"""
+    now = datetime(2026, 10, 19, 12, 30, tzinfo=UTC)
+    trending = TrendingTerms()
+    trending.add({"élections": 2}, now, now)
+    trending.add({"élections": 1, "météo": 5}, now - timedelta(hours=3), now)
+    trending.add({"météo": 4}, now - timedelta(hours=30), now)
+    trending.add({"ancien": 9}, now - timedelta(days=30), now)
+
+    hour = trending.top("hour", now=now)
+    day = trending.top("day", now=now)
+    week = trending.top("week", now=now)
+
+    assert [(t["term"], t["count"]) for t in hour] == [("élections", 2)]
+    assert [(t["term"], t["count"], t["previous_count"]) for t in day] == [("météo", 5, 4), ("élections", 3, 0)]
+    assert [(t["term"], t["count"]) for t in week] == [("météo", 9), ("élections", 3)]
+    assert trending.stats()["buckets"] == 3
+    print("✅ test_windows_merge_hourly_buckets PASSED")
+
+def test_trending_endpoint_fed_at_ingest():
+    """Test GET /search/trending lit les documents notifiés à l'ingestion"""
+    documents_inserted([
+        {"_id": i, "term_freq": {"crawler": 2, "les": 5, "2026": 1}, "scraped_at": datetime.now(UTC)}
+        for i in range(3)
+    ])
+
+    response = client.get("/search/trending", params={"window": "hour"})
+
+    assert response.status_code == 200
+    assert response.json()["terms"][0] == {"term": "crawler", "count": 6, "error": 0, "previous_count": 0}
+    assert len(response.json()["terms"]) == 1
+    assert client.get("/search/trending", params={"window": "year"}).status_code == 400
+    print("✅ test_trending_endpoint_fed_at_ingest PASSED")
+
+def test_warm_up_from_recent_documents(monkeypatch):
+    """Test redémarrage: fenêtres reconstruites depuis scraped_at, sans double compte"""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    db.close()
+    monkeypatch.setattr(db, "_async_client", None)
+    now = datetime.now(UTC)
+    db.collection.insert_many([
+        {"_id": 1, "term_freq": {"crawler": 2}, "scraped_at": now - timedelta(hours=2)},
+        {"_id": 2, "term_freq": {"crawler": 1, "météo": 4}, "scraped_at": now - timedelta(hours=30)},
+        {"_id": 3, "term_freq": {"ancien": 9}, "scraped_at": now - timedelta(days=30)}
+    ])
+    live = {"_id": 4, "term_freq": {"crawler": 5}, "scraped_at": now - timedelta(minutes=5)}
+
+    def ingest_during_warm_up(batch, fields):
+        # Insertion concurrente: le hook compte le document avant qu'il soit relu
+        if db.collection.find_one({"_id": 4}) is None:
+            db.collection.insert_one(dict(live))
+            documents_inserted([live])
+        return fill_text_fields(batch, fields)
+
+    with patch("trending.fill_text_fields", side_effect=ingest_during_warm_up):
+        assert warm_trending(batch_size=1) == 2
+
+    day = trending_terms.top("day")
+    week = trending_terms.top("week")
+
+    assert [(t["term"], t["count"]) for t in day] == [("crawler", 7)]
+    assert [(t["term"], t["count"]) for t in week] == [("crawler", 8), ("météo", 4)]
+    db.close()
+    print("✅ test_warm_up_from_recent_documents PASSED")
@@ -0,0 +1,186 @@
+from db import collection as scraped_collection
+from term_stats import keyword_counts
+from ingest import register
+from doc_format import compute_term_freq, normalize_text, extract_text, fill_text_fields
+from datetime import datetime, UTC, timedelta
+from typing import List, Optional
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Termes tendance par fenêtre de temps: un résumé Space-Saving (top-k en
+# mémoire bornée) par heure d'ingestion, alimenté par les hooks d'écriture.
+# Une fenêtre additionne les résumés de ses heures: le coût d'une requête ne
+# dépend que du nombre d'heures et de BUCKET_CAPACITY, pas du volume scrappé.
+# Chaque compte surestime d'au plus "error" (propriété de Space-Saving).
+# Les résumés ne vivent qu'en mémoire: au démarrage, warm_trending les
+# reconstruit depuis les documents récents (scraped_at) de scraped_data.
+BUCKET_SECONDS = 3600
+BUCKET_CAPACITY = 500
+WINDOWS = {"hour": 1, "day": 24, "week": 168}  # en heures
+RETAINED_BUCKETS = 2 * max(WINDOWS.values())   # fenêtre courante + précédente
+
+class SpaceSaving:
+    """Résumé Space-Saving: au plus capacity termes suivis, compteurs surestimés d'au plus error"""
+
+    def __init__(self, capacity: int = BUCKET_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self._heap = []  # (compte, terme), entrées périmées ignorées au retrait
+
+    def add(self, term: str, weight: int = 1):
+        if term in self.counts:
+            self.counts[term] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[term] = weight
+            self.errors[term] = 0
+        else:
+            # Remplacer le terme le moins compté: il hérite de son compte comme erreur
+            minimum, evicted = self._pop_minimum()
+            del self.counts[evicted], self.errors[evicted]
+            self.counts[term] = minimum + weight
+            self.errors[term] = minimum
+        heapq.heappush(self._heap, (self.counts[term], term))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, term) for term, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_minimum(self) -> tuple:
+        while True:
+            count, term = heapq.heappop(self._heap)
+            if self.counts.get(term) == count:
+                return count, term
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+class TrendingTerms:
+    """Résumés Space-Saving par heure, fusionnés à la demande par fenêtre"""
+
+    def __init__(self, capacity: int = BUCKET_CAPACITY):
+        self.capacity = capacity
+        self._buckets = {}  # numéro d'heure → SpaceSaving
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    @staticmethod
+    def _bucket(date: Optional[datetime]) -> int:
+        date = date or datetime.now(UTC)
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=UTC)
+        return int(date.timestamp() // BUCKET_SECONDS)
+
+    def add(self, terms: dict, date: Optional[datetime] = None, now: Optional[datetime] = None):
+        """Compter les termes ({terme: occurrences}) d'un document dans l'heure de date"""
+        bucket, current = self._bucket(date), self._bucket(now)
+        if bucket <= current - RETAINED_BUCKETS:
+            return  # trop ancien pour une fenêtre
+        with self._lock:
+            summary = self._buckets.get(bucket)
+            if summary is None:
+                summary = self._buckets[bucket] = SpaceSaving(self.capacity)
+                for old in [key for key in self._buckets if key <= current - RETAINED_BUCKETS]:
+                    del self._buckets[old]
+            for term, count in terms.items():
+                summary.add(term, count)
+
+    def _merge(self, first: int, last: int) -> dict:
+        merged = {}
+        for bucket in range(first, last + 1):
+            summary = self._buckets.get(bucket)
+            if summary is None:
+                continue
+            for term, count in summary.counts.items():
+                total = merged.setdefault(term, [0, 0])
+                total[0] += count
+                total[1] += summary.errors[term]
+        return merged
+
+    def top(self, window: str, limit: int = 20, now: Optional[datetime] = None) -> List[dict]:
+        """Termes les plus fréquents de la fenêtre, avec le compte de la fenêtre précédente"""
+        hours = WINDOWS[window]
+        current = self._bucket(now)
+        with self._lock:
+            merged = self._merge(current - hours + 1, current)
+            previous = self._merge(current - 2 * hours + 1, current - hours)
+        top = heapq.nlargest(limit, merged.items(), key=lambda item: (item[1][0], item[0]))
+        return [
+            {
+                "term": term,
+                "count": count,
+                "error": error,
+                "previous_count": previous.get(term, [0])[0]
+            }
+            for term, (count, error) in top
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buckets": len(self._buckets),
+                "tracked_terms": sum(len(summary) for summary in self._buckets.values()),
+                "capacity": self.capacity
+            }
+
+trending_terms = TrendingTerms()
+
+_warming_ids = None  # pendant warm_trending: _id déjà comptés par le hook
+_warming_lock = threading.Lock()
+
+def record_trending(documents: List[dict]):
+    """Hook d'ingestion: compter les mots-clés des documents insérés dans leur heure"""
+    now = datetime.now(UTC)
+    for doc in documents:
+        term_freq = doc.get("term_freq")
+        if term_freq is None:
+            term_freq = compute_term_freq(normalize_text(extract_text(doc)))
+        with _warming_lock:
+            if _warming_ids is not None and "_id" in doc:
+                _warming_ids.add(doc["_id"])
+        trending_terms.add(keyword_counts(term_freq), doc.get("scraped_at"), now)
+
+register("trending", record_trending)
+
+def warm_trending(batch_size: int = 1000) -> int:
+    """Démarrage: recompter les documents des fenêtres retenues (scraped_at récent)"""
+    global _warming_ids
+    now = datetime.now(UTC)
+    since = now - timedelta(seconds=RETAINED_BUCKETS * BUCKET_SECONDS)
+    with _warming_lock:
+        _warming_ids = set()
+    counted = 0
+    try:
+        last_id = None
+        while True:
+            query = {"scraped_at": {"$gte": since, "$lt": now}}
+            if last_id:
+                query["_id"] = {"$gt": last_id}
+            batch = list(
+                scraped_collection.find(query, {"term_freq": 1, "scraped_at": 1})
+                .sort("_id", 1)
+                .limit(batch_size)
+            )
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+            fill_text_fields(batch, ("term_freq",))
+            for doc in batch:
+                # Document inséré pendant le préchauffage: déjà compté par le hook
+                with _warming_lock:
+                    if doc["_id"] in _warming_ids:
+                        continue
+                trending_terms.add(keyword_counts(doc["term_freq"]), doc["scraped_at"], now)
+                counted += 1
+        logger.info(f"✅ Trending terms warmed up from {counted} documents")
+    except Exception as e:
+        logger.error(f"Error warming up trending terms: {str(e)}")
+    finally:
+        with _warming_lock:
+            _warming_ids = None
+    return counted
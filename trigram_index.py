@@ -0,0 +1,94 @@
+from collections import Counter
+from typing import List, Optional
+
+# Recherche tolérante aux fautes (OCR, variantes d'orthographe): index des
+# trigrammes de caractères du vocabulaire de l'index de recherche.
+# Deux mots à d distances d'édition partagent au moins
+# max(len) + 2 - 3d trigrammes (bornes complétées par deux espaces): seuls
+# les mots du vocabulaire qui atteignent ce seuil sont comparés par distance
+# d'édition, sans parcourir tout le vocabulaire ni les documents.
+PADDING = "  "
+
+def trigrams(word: str) -> Counter:
+    padded = f"{PADDING}{word}{PADDING}"
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def default_max_edits(word: str) -> int:
+    """Modifications tolérées selon la longueur: 0 (≤ 3), 1 (≤ 7), 2 au-delà"""
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+def edit_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """Distance de Levenshtein, ou None si elle dépasse limit (arrêt anticipé)"""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+class TrigramIndex:
+    """Trigramme → mots du vocabulaire qui le contiennent"""
+
+    def __init__(self):
+        self.postings = {}
+
+    def add(self, word: str):
+        for trigram in trigrams(word):
+            self.postings.setdefault(trigram, set()).add(word)
+
+    def discard(self, word: str):
+        for trigram in trigrams(word):
+            words = self.postings.get(trigram)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self.postings[trigram]
+
+    def similar(self, word: str, max_edits: Optional[int] = None) -> List[tuple]:
+        """Mots du vocabulaire à max_edits modifications ou moins: [(mot, distance)]"""
+        if max_edits is None:
+            max_edits = default_max_edits(word)
+        grams = trigrams(word)
+        # Seuil du lemme des q-grammes (trigrammes distincts: répétitions déduites)
+        duplicates = sum(grams.values()) - len(grams)
+        threshold = max(1, len(word) + 2 - 3 * max_edits - duplicates)
+
+        shared = Counter()
+        for trigram in grams:
+            shared.update(self.postings.get(trigram, ()))
+
+        found = []
+        for candidate, count in shared.items():
+            if count < threshold:
+                continue
+            distance = edit_distance(word, candidate, max_edits)
+            if distance is not None:
+                found.append((candidate, distance))
+        return sorted(found, key=lambda item: (item[1], item[0]))
+
+    def containing(self, fragment: str) -> Optional[set]:
+        """Mots du vocabulaire contenant fragment, ou None s'il a moins de 3 caractères"""
+        grams = {fragment[i:i + 3] for i in range(len(fragment) - 2)}
+        if not grams:
+            return None
+        words = None
+        # Intersection des trigrammes, du plus rare au plus fréquent
+        for trigram in sorted(grams, key=lambda gram: len(self.postings.get(gram, ()))):
+            posting = self.postings.get(trigram)
+            if not posting:
+                return set()
+            words = set(posting) if words is None else words & posting
+            if not words:
+                return set()
+        return {word for word in words if fragment in word}